@@ -0,0 +1,102 @@
+-- CreateTable
+CREATE TABLE "Loan" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "loanBookId" TEXT NOT NULL,
+    "nbfiId" TEXT NOT NULL,
+    "loanId" TEXT NOT NULL,
+    "applicationId" TEXT NOT NULL,
+    "dpdAsOfReportingDate" INTEGER NOT NULL,
+    "dpdBucket" TEXT NOT NULL,
+    "currentBalance" REAL NOT NULL,
+    "loanDisbursedAmount" REAL NOT NULL,
+    "totalOverdueAmount" REAL NOT NULL,
+    "loanDisbursedDate" TEXT NOT NULL,
+    "interestRate" REAL NOT NULL,
+    "loanWrittenOff" BOOLEAN NOT NULL,
+    "repossession" BOOLEAN NOT NULL,
+    "recoveryAfterWriteoff" REAL NOT NULL,
+    "geography" TEXT,
+    "product" TEXT,
+    "segment" TEXT,
+    "borrowerName" TEXT,
+    "residualTenureMonths" INTEGER,
+    CONSTRAINT "Loan_loanBookId_fkey" FOREIGN KEY ("loanBookId") REFERENCES "LoanBook" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- RedefineTables
+PRAGMA defer_foreign_keys=ON;
+PRAGMA foreign_keys=OFF;
+CREATE TABLE "new_LoanBook" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "nbfiId" TEXT NOT NULL,
+    "uploadedAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "rows" TEXT,
+    "rowCount" INTEGER NOT NULL DEFAULT 0,
+    "totalBalance" REAL NOT NULL DEFAULT 0,
+    CONSTRAINT "LoanBook_nbfiId_fkey" FOREIGN KEY ("nbfiId") REFERENCES "Nbfi" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+INSERT INTO "new_LoanBook" ("id", "nbfiId", "uploadedAt", "rows") SELECT "id", "nbfiId", "uploadedAt", "rows" FROM "LoanBook";
+DROP TABLE "LoanBook";
+ALTER TABLE "new_LoanBook" RENAME TO "LoanBook";
+CREATE INDEX "LoanBook_nbfiId_idx" ON "LoanBook"("nbfiId");
+CREATE INDEX "LoanBook_nbfiId_uploadedAt_idx" ON "LoanBook"("nbfiId", "uploadedAt");
+PRAGMA foreign_keys=ON;
+PRAGMA defer_foreign_keys=OFF;
+
+-- MigrateData: explode legacy JSON blobs into typed Loan rows
+INSERT INTO "Loan" (
+    "loanBookId", "nbfiId", "loanId", "applicationId", "dpdAsOfReportingDate", "dpdBucket",
+    "currentBalance", "loanDisbursedAmount", "totalOverdueAmount", "loanDisbursedDate", "interestRate",
+    "loanWrittenOff", "repossession", "recoveryAfterWriteoff",
+    "geography", "product", "segment", "borrowerName", "residualTenureMonths"
+)
+SELECT
+    lb."id",
+    lb."nbfiId",
+    COALESCE(json_extract(j.value, '$.loanId'), ''),
+    COALESCE(json_extract(j.value, '$.applicationId'), ''),
+    CAST(COALESCE(json_extract(j.value, '$.dpdAsOfReportingDate'), 0) AS INTEGER),
+    CASE
+        WHEN COALESCE(json_extract(j.value, '$.dpdAsOfReportingDate'), 0) <= 0 THEN 'Current'
+        WHEN json_extract(j.value, '$.dpdAsOfReportingDate') <= 30 THEN '1-30'
+        WHEN json_extract(j.value, '$.dpdAsOfReportingDate') <= 60 THEN '31-60'
+        WHEN json_extract(j.value, '$.dpdAsOfReportingDate') <= 90 THEN '61-90'
+        WHEN json_extract(j.value, '$.dpdAsOfReportingDate') <= 180 THEN '91-180'
+        ELSE '180+'
+    END,
+    COALESCE(json_extract(j.value, '$.currentBalance'), 0),
+    COALESCE(json_extract(j.value, '$.loanDisbursedAmount'), 0),
+    COALESCE(json_extract(j.value, '$.totalOverdueAmount'), 0),
+    COALESCE(json_extract(j.value, '$.loanDisbursedDate'), ''),
+    COALESCE(json_extract(j.value, '$.interestRate'), 0),
+    COALESCE(json_extract(j.value, '$.loanWrittenOff'), 0),
+    COALESCE(json_extract(j.value, '$.repossession'), 0),
+    COALESCE(json_extract(j.value, '$.recoveryAfterWriteoff'), 0),
+    json_extract(j.value, '$.geography'),
+    json_extract(j.value, '$.product'),
+    json_extract(j.value, '$.segment'),
+    json_extract(j.value, '$.borrowerName'),
+    CAST(json_extract(j.value, '$.residualTenureMonths') AS INTEGER)
+FROM "LoanBook" lb, json_each(lb."rows") j
+WHERE lb."rows" IS NOT NULL;
+
+UPDATE "LoanBook" SET
+    "rowCount" = (SELECT COUNT(*) FROM "Loan" l WHERE l."loanBookId" = "LoanBook"."id"),
+    "totalBalance" = COALESCE((SELECT SUM(l."currentBalance") FROM "Loan" l WHERE l."loanBookId" = "LoanBook"."id"), 0),
+    "rows" = NULL
+WHERE "rows" IS NOT NULL;
+
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_loanId_idx" ON "Loan"("loanBookId", "loanId");
+
+-- CreateIndex
+CREATE INDEX "Loan_nbfiId_loanBookId_idx" ON "Loan"("nbfiId", "loanBookId");
+
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_dpdBucket_idx" ON "Loan"("loanBookId", "dpdBucket");
+
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_geography_idx" ON "Loan"("loanBookId", "geography");
+
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_product_idx" ON "Loan"("loanBookId", "product");
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "LoanBook" ADD COLUMN "status" TEXT NOT NULL DEFAULT 'ready';
@@ -0,0 +1,11 @@
+-- AlterTable
+ALTER TABLE "LoanBook" ADD COLUMN "kind" TEXT NOT NULL DEFAULT 'full';
+ALTER TABLE "LoanBook" ADD COLUMN "baseBookId" TEXT;
+ALTER TABLE "LoanBook" ADD COLUMN "chainDepth" INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE "LoanBook" ADD COLUMN "aggregates" TEXT;
+
+-- AlterTable
+ALTER TABLE "Loan" ADD COLUMN "deltaOp" TEXT NOT NULL DEFAULT 'upsert';
+
+-- CreateIndex
+CREATE INDEX "LoanBook_baseBookId_idx" ON "LoanBook"("baseBookId");
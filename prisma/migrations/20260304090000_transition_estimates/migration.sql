@@ -0,0 +1,21 @@
+-- CreateTable
+CREATE TABLE "TransitionEstimate" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "nbfiId" TEXT NOT NULL,
+    "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "filename" TEXT,
+    "format" TEXT NOT NULL,
+    "rowsRead" INTEGER NOT NULL,
+    "loanCount" INTEGER NOT NULL,
+    "periodStart" TEXT,
+    "periodEnd" TEXT,
+    "periodCount" INTEGER NOT NULL,
+    "skipped" INTEGER NOT NULL DEFAULT 0,
+    "overall" TEXT NOT NULL,
+    "byProduct" TEXT NOT NULL,
+    "byVintage" TEXT NOT NULL,
+    CONSTRAINT "TransitionEstimate_nbfiId_fkey" FOREIGN KEY ("nbfiId") REFERENCES "Nbfi" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE INDEX "TransitionEstimate_nbfiId_createdAt_idx" ON "TransitionEstimate"("nbfiId", "createdAt");
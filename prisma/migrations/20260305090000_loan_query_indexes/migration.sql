@@ -0,0 +1,11 @@
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_borrowerName_idx" ON "Loan"("loanBookId", "borrowerName");
+
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_currentBalance_idx" ON "Loan"("loanBookId", "currentBalance");
+
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_dpdAsOfReportingDate_idx" ON "Loan"("loanBookId", "dpdAsOfReportingDate");
+
+-- CreateIndex
+CREATE INDEX "Loan_loanBookId_loanDisbursedDate_idx" ON "Loan"("loanBookId", "loanDisbursedDate");
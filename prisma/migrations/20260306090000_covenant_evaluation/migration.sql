@@ -0,0 +1,45 @@
+-- CreateTable
+CREATE TABLE "CovenantStatus" (
+    "covenantId" TEXT NOT NULL PRIMARY KEY,
+    "nbfiId" TEXT NOT NULL,
+    "value" REAL NOT NULL,
+    "date" TEXT NOT NULL,
+    "status" TEXT NOT NULL,
+    "previousValue" REAL,
+    "trend" TEXT NOT NULL,
+    "evaluatedAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "CovenantStatus_nbfiId_fkey" FOREIGN KEY ("nbfiId") REFERENCES "Nbfi" ("id") ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT "CovenantStatus_covenantId_fkey" FOREIGN KEY ("covenantId") REFERENCES "CovenantDefinition" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateTable
+CREATE TABLE "EarlyWarning" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "nbfiId" TEXT NOT NULL,
+    "covenantId" TEXT,
+    "metric" TEXT NOT NULL,
+    "severity" TEXT NOT NULL,
+    "message" TEXT NOT NULL,
+    "predictedBreachDate" TEXT,
+    "trend" TEXT NOT NULL,
+    "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "EarlyWarning_nbfiId_fkey" FOREIGN KEY ("nbfiId") REFERENCES "Nbfi" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE INDEX "CovenantReading_nbfiId_covenantId_date_idx" ON "CovenantReading"("nbfiId", "covenantId", "date");
+
+-- CreateIndex
+CREATE INDEX "CovenantReading_covenantId_date_idx" ON "CovenantReading"("covenantId", "date");
+
+-- CreateIndex
+CREATE INDEX "CovenantStatus_nbfiId_idx" ON "CovenantStatus"("nbfiId");
+
+-- CreateIndex
+CREATE INDEX "CovenantStatus_status_idx" ON "CovenantStatus"("status");
+
+-- CreateIndex
+CREATE INDEX "EarlyWarning_nbfiId_idx" ON "EarlyWarning"("nbfiId");
+
+-- CreateIndex
+CREATE INDEX "EarlyWarning_severity_createdAt_idx" ON "EarlyWarning"("severity", "createdAt");
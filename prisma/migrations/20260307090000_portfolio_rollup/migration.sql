@@ -0,0 +1,34 @@
+-- CreateTable
+CREATE TABLE "PortfolioRollup" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "nbfiId" TEXT NOT NULL,
+    "transactionId" TEXT NOT NULL,
+    "loanBookId" TEXT NOT NULL,
+    "dpdBucket" TEXT NOT NULL,
+    "geography" TEXT NOT NULL,
+    "product" TEXT NOT NULL,
+    "vintage" TEXT NOT NULL,
+    "loanCount" INTEGER NOT NULL,
+    "balance" REAL NOT NULL,
+    "disbursed" REAL NOT NULL,
+    "overdue" REAL NOT NULL,
+    "interestWeighted" REAL NOT NULL,
+    "par30Count" INTEGER NOT NULL,
+    "par30Balance" REAL NOT NULL,
+    "par90Count" INTEGER NOT NULL,
+    "par90Balance" REAL NOT NULL,
+    "writtenOffCount" INTEGER NOT NULL,
+    "writtenOffBalance" REAL NOT NULL,
+    "recovery" REAL NOT NULL,
+    "updatedAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "PortfolioRollup_loanBookId_fkey" FOREIGN KEY ("loanBookId") REFERENCES "LoanBook" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE INDEX "PortfolioRollup_transactionId_idx" ON "PortfolioRollup"("transactionId");
+
+-- CreateIndex
+CREATE INDEX "PortfolioRollup_nbfiId_dpdBucket_idx" ON "PortfolioRollup"("nbfiId", "dpdBucket");
+
+-- CreateIndex
+CREATE INDEX "PortfolioRollup_loanBookId_idx" ON "PortfolioRollup"("loanBookId");
@@ -0,0 +1,29 @@
+-- CreateTable
+CREATE TABLE "FeedFile" (
+    "id" TEXT NOT NULL PRIMARY KEY,
+    "nbfiId" TEXT NOT NULL,
+    "docTypeId" TEXT NOT NULL,
+    "fileName" TEXT NOT NULL,
+    "checksum" TEXT NOT NULL,
+    "source" TEXT NOT NULL DEFAULT 'sftp',
+    "status" TEXT NOT NULL,
+    "bytes" INTEGER NOT NULL DEFAULT 0,
+    "rowsRead" INTEGER NOT NULL DEFAULT 0,
+    "rowsAccepted" INTEGER NOT NULL DEFAULT 0,
+    "rowsRejected" INTEGER NOT NULL DEFAULT 0,
+    "periods" INTEGER,
+    "errorCount" INTEGER NOT NULL DEFAULT 0,
+    "durationMs" INTEGER NOT NULL DEFAULT 0,
+    "tests" TEXT,
+    "issues" TEXT,
+    "resultId" TEXT,
+    "receivedAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "completedAt" DATETIME,
+    CONSTRAINT "FeedFile_nbfiId_fkey" FOREIGN KEY ("nbfiId") REFERENCES "Nbfi" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "FeedFile_nbfiId_checksum_key" ON "FeedFile"("nbfiId", "checksum");
+
+-- CreateIndex
+CREATE INDEX "FeedFile_nbfiId_docTypeId_receivedAt_idx" ON "FeedFile"("nbfiId", "docTypeId", "receivedAt");
@@ -0,0 +1,20 @@
+-- CreateIndex
+CREATE INDEX "Commentary_nbfiId_idx" ON "Commentary"("nbfiId");
+
+-- CreateIndex
+CREATE INDEX "CovenantDefinition_nbfiId_idx" ON "CovenantDefinition"("nbfiId");
+
+-- CreateIndex
+CREATE INDEX "CovenantReading_nbfiId_date_id_covenantId_value_status_idx" ON "CovenantReading"("nbfiId", "date", "id", "covenantId", "value", "status");
+
+-- CreateIndex
+CREATE INDEX "Document_nbfiId_idx" ON "Document"("nbfiId");
+
+-- CreateIndex
+CREATE INDEX "DocumentSubmission_documentId_idx" ON "DocumentSubmission"("documentId");
+
+-- CreateIndex
+CREATE INDEX "ProvisioningRule_nbfiId_idx" ON "ProvisioningRule"("nbfiId");
+
+-- CreateIndex
+CREATE INDEX "AuditLog_nbfiId_createdAt_id_idx" ON "AuditLog"("nbfiId", "createdAt", "id");
@@ -0,0 +1,6 @@
+-- AlterTable
+ALTER TABLE "FeedFile" ADD COLUMN "attempts" INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE "FeedFile" ADD COLUMN "claimedAt" DATETIME;
+
+-- Existing claims were taken when the file was received
+UPDATE "FeedFile" SET "claimedAt" = "receivedAt";
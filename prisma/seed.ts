@@ -15,6 +15,7 @@ const db = new PrismaClient({ adapter });
 // Lazy imports for seed data (loaded at runtime)
 async function loadSeedData() {
   const { NBFI_SEEDS, getAllSeedLoanBooks } = await import('../src/lib/seedTransactions.js');
+  const { createLoanBook } = await import('../src/lib/loanStore.js');
   const inputTemplate = await import('../data/input-template.json', { with: { type: 'json' } });
   const nbfiOutput = await import('../data/nbfi-output.json', { with: { type: 'json' } });
   const cashflow = await import('../data/cashflow.json', { with: { type: 'json' } });
@@ -25,6 +26,7 @@ async function loadSeedData() {
 
   return {
     NBFI_SEEDS,
+    createLoanBook,
     allLoanBooks: getAllSeedLoanBooks(),
     inputTemplate: inputTemplate.default,
     nbfiOutput: nbfiOutput.default,
@@ -74,6 +76,7 @@ async function main() {
 
   const {
     NBFI_SEEDS,
+    createLoanBook,
     allLoanBooks,
     inputTemplate,
     nbfiOutput,
@@ -87,10 +90,16 @@ async function main() {
   // Clear existing data
   await db.auditLog.deleteMany();
   await db.poolSelection.deleteMany();
+  await db.portfolioRollup.deleteMany();
+  await db.loan.deleteMany();
   await db.loanBook.deleteMany();
+  await db.transitionEstimate.deleteMany();
+  await db.feedFile.deleteMany();
   await db.provisioningRule.deleteMany();
   await db.documentSubmission.deleteMany();
   await db.document.deleteMany();
+  await db.earlyWarning.deleteMany();
+  await db.covenantStatus.deleteMany();
   await db.covenantReading.deleteMany();
   await db.covenantDefinition.deleteMany();
   await db.commentary.deleteMany();
@@ -213,12 +222,7 @@ async function main() {
     // Loan books
     const loanRows = allLoanBooks[s.id];
     if (loanRows && loanRows.length > 0) {
-      await db.loanBook.create({
-        data: {
-          nbfiId: s.id,
-          rows: JSON.stringify(loanRows),
-        },
-      });
+      await createLoanBook(db, s.id, loanRows);
     }
 
     // Pool selection for first NBFI (confirmed)
@@ -251,6 +255,11 @@ async function main() {
     });
   }
 
+  // Latest covenant statuses and early warnings from the seeded books, financials and readings
+  const { runCovenantEvaluation } = await import('../src/lib/covenantEngine.js');
+  const evaluation = await runCovenantEvaluation();
+  console.log(`  Evaluated covenants: ${evaluation.readings} readings, ${evaluation.alerts} early warnings`);
+
   const count = await db.nbfi.count();
   console.log(`✅ Seeded ${count} NBFIs successfully.`);
 }
@@ -0,0 +1,43 @@
+/**
+ * Benchmark: Monte Carlo loss simulation across the worker pool vs a single thread.
+ *
+ * Usage: npx tsx scripts/bench-monte-carlo.ts [paths=10000] [months=36]
+ */
+
+import { performance } from 'perf_hooks';
+import { runMonteCarlo, getMonteCarloPool, simulateChunk } from '../src/lib/monteCarlo';
+import { WorkerPool } from '../src/lib/workerPool';
+
+const PATHS = parseInt(process.argv[2] || '10000', 10);
+const MONTHS = parseInt(process.argv[3] || '36', 10);
+const BUCKETS = { Current: 120_000_000, '1-30': 14_000_000, '31-60': 6_000_000, '61-90': 3_500_000, '91-180': 2_500_000, '180+': 1_200_000 };
+
+async function main() {
+  console.log(`Monte Carlo benchmark — ${PATHS.toLocaleString()} paths × ${MONTHS} months × 3 scenarios`);
+
+  const pool = getMonteCarloPool();
+  await runMonteCarlo(BUCKETS, { paths: pool.size * 500, months: 1 }); // spin workers up
+  if (pool.stats().failed) console.warn('  workers could not start: the "worker pool" timing below is single-threaded');
+  let t0 = performance.now();
+  const parallel = await runMonteCarlo(BUCKETS, { paths: PATHS, months: MONTHS });
+  const parallelMs = performance.now() - t0;
+  console.log(`  worker pool (${pool.size} workers)`.padEnd(32) + `${parallelMs.toFixed(0).padStart(7)} ms`);
+
+  // size 0: the worker factory is never called
+  const inline = new WorkerPool('monteCarlo-inline', () => { throw new Error('inline pool'); }, simulateChunk, 0);
+  t0 = performance.now();
+  const serial = await runMonteCarlo(BUCKETS, { paths: PATHS, months: MONTHS }, inline);
+  const serialMs = performance.now() - t0;
+  console.log('  single thread'.padEnd(32) + `${serialMs.toFixed(0).padStart(7)} ms`);
+  console.log(`  speedup: ${(serialMs / parallelMs).toFixed(1)}x`);
+
+  for (const r of parallel) {
+    console.log(`  ${r.scenario.padEnd(7)} EL ${r.lossRate.mean.toFixed(2)}%  VaR99 ${r.lossRate.p99.toFixed(2)}%  ES99 ${r.lossRate.es99.toFixed(2)}%`);
+  }
+  const mismatch = parallel.some((r, i) => r.var99 !== serial[i].var99 || r.expectedLoss !== serial[i].expectedLoss);
+  await pool.destroy();
+  if (mismatch) { console.error('  MISMATCH between pooled and single-thread results'); process.exit(1); }
+  console.log('  results match');
+}
+
+main();
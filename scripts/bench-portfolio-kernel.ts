@@ -0,0 +1,100 @@
+/**
+ * Benchmark: per-metric rollRate.ts functions vs the fused portfolioKernel.
+ * Reproduces the set of metrics the monitoring page computes on `effectiveRows`.
+ *
+ * Usage: npx tsx scripts/bench-portfolio-kernel.ts [loanCount=500000] [iterations=5]
+ */
+
+import { performance } from 'perf_hooks';
+import baseBook from '../data/mock-loan-book.json';
+import type { LoanLevelRow } from '../src/lib/types';
+import {
+  computeFinancialSummary, computeECL, computeProvisions, rollRateProjection, computeCureRate,
+  computeCNL, computeCDR, computeHHI, computeRepaymentVelocity, computeBorrowingBase,
+  computeEligibilityWaterfall, computeShadowReconciliation, estimateLoss, projectBucketBalances,
+} from '../src/lib/rollRate';
+import { toLoanColumns, computePortfolioMetrics } from '../src/lib/portfolioKernel';
+
+const N = parseInt(process.argv[2] || '500000', 10);
+const ITERATIONS = parseInt(process.argv[3] || '5', 10);
+const FACILITY = 150_000_000;
+
+function buildBook(n: number): LoanLevelRow[] {
+  const base = baseBook as LoanLevelRow[];
+  let s = 42;
+  const rand = () => { s = (s * 16807) % 2147483647; return (s - 1) / 2147483646; };
+  const rows: LoanLevelRow[] = new Array(n);
+  for (let i = 0; i < n; i++) {
+    const src = base[i % base.length];
+    const mul = 0.7 + rand() * 0.8;
+    rows[i] = { ...src, loanId: `BENCH-${i}`, currentBalance: src.currentBalance * mul, loanDisbursedAmount: src.loanDisbursedAmount * mul };
+  }
+  return rows;
+}
+
+function legacy(rows: LoanLevelRow[]) {
+  return {
+    financials: computeFinancialSummary(rows),
+    ecl: computeECL(rows),
+    provisions: computeProvisions(rows),
+    loss: estimateLoss(rows),
+    rollRate: rollRateProjection(rows),
+    cureRate: computeCureRate(rows),
+    cnl: computeCNL(rows),
+    cdr: computeCDR(rows),
+    geoHHI: computeHHI(rows, r => r.geography || 'Unknown'),
+    prodHHI: computeHHI(rows, r => r.product || 'Unknown'),
+    velocity: computeRepaymentVelocity(rows),
+    borrowingBase: computeBorrowingBase(rows, FACILITY),
+    eligibility: computeEligibilityWaterfall(rows),
+    shadow: computeShadowReconciliation(rows),
+  };
+}
+
+function fused(rows: LoanLevelRow[]) {
+  const m = computePortfolioMetrics(toLoanColumns(rows), FACILITY);
+  return { ...m, rollRate: projectBucketBalances(m.bucketBalances) };
+}
+
+function time<T>(label: string, fn: () => T): { ms: number; result: T } {
+  let result = fn(); // warm-up
+  const samples: number[] = [];
+  for (let i = 0; i < ITERATIONS; i++) {
+    const t0 = performance.now();
+    result = fn();
+    samples.push(performance.now() - t0);
+  }
+  samples.sort((a, b) => a - b);
+  const ms = samples[Math.floor(samples.length / 2)];
+  console.log(`  ${label.padEnd(28)} median ${ms.toFixed(1).padStart(8)} ms`);
+  return { ms, result };
+}
+
+function close(a: number, b: number) {
+  return Math.abs(a - b) <= 1e-6 * Math.max(1, Math.abs(a), Math.abs(b));
+}
+
+const rows = buildBook(N);
+console.log(`Portfolio kernel benchmark — ${N.toLocaleString()} loans, ${ITERATIONS} iterations`);
+const a = time('per-metric (rollRate.ts)', () => legacy(rows));
+const b = time('fused kernel (incl. load)', () => fused(rows));
+const cols = toLoanColumns(rows);
+time('fused kernel (columns warm)', () => computePortfolioMetrics(cols, FACILITY));
+console.log(`  speedup: ${(a.ms / b.ms).toFixed(1)}x`);
+
+const checks: [string, number, number][] = [
+  ['totalBal', a.result.financials.totalBal, b.result.financialSummary.totalBal],
+  ['provisions', a.result.provisions, b.result.provisions],
+  ['ecl12m', a.result.ecl.ecl12m, b.result.ecl.ecl12m],
+  ['cnl', a.result.cnl.cnl, b.result.cnl.cnl],
+  ['cdr', a.result.cdr.cdr, b.result.cdr.cdr],
+  ['cureRate', a.result.cureRate.rate, b.result.cureRate.rate],
+  ['geoHHI', a.result.geoHHI.hhi, b.result.geographyHHI.hhi],
+  ['vp', a.result.velocity.vp, b.result.repaymentVelocity.vp],
+  ['borrowingBase', a.result.borrowingBase.borrowingBase, b.result.borrowingBase.borrowingBase],
+  ['eligible(last step)', a.result.eligibility[4].passBalance, b.result.eligibility[4].passBalance],
+];
+const mismatches = checks.filter(([, x, y]) => !close(x, y));
+for (const [name, x, y] of mismatches) console.error(`  MISMATCH ${name}: ${x} vs ${y}`);
+if (mismatches.length) process.exit(1);
+console.log('  results match');
@@ -0,0 +1,334 @@
+/**
+ * Benchmark suite: times and memory-profiles the hot paths at several synthetic
+ * book sizes (syntheticLoanBook.ts), writes machine-readable results and flags
+ * regressions against a stored baseline.
+ *
+ * Cases: rollRate.ts metrics, the fused kernel, applyPoolSelection, runStressGrid,
+ * the loan-book POST / GET database work (full upload in one transaction; latest
+ * book read back and serialised), and the streamed XLSX / CSV loan-tape exports.
+ * Database cases upload into a throwaway `bench-suite` NBFI, which is deleted
+ * (with its books) afterwards.
+ *
+ * Usage: npm run bench -- [--sizes=10k,100k,1m,5m] [--iterations=5] [--cases=metrics,pool,...]
+ *                         [--no-db] [--out=bench/results/latest.json]
+ *                         [--baseline=bench/baseline.json] [--save-baseline] [--tolerance=0.25]
+ *
+ * Exits 1 when a case is slower (or retains more heap) than the baseline by more
+ * than the tolerance. Baselines are machine-specific: record one with
+ * --save-baseline on the machine that compares against it.
+ */
+
+import { performance } from 'perf_hooks';
+import { mkdirSync, readFileSync, writeFileSync, existsSync } from 'fs';
+import os from 'os';
+import path from 'path';
+import type { LoanLevelRow, PoolSelectionState, SecuritisationStructure } from '../src/lib/types';
+import { generateSyntheticBook } from '../src/lib/syntheticLoanBook';
+import {
+  computeFinancialSummary, computeECL, computeProvisions, rollRateProjection, computeCureRate,
+  computeCNL, computeCDR, computeHHI, computeRepaymentVelocity, computeBorrowingBase,
+  computeEligibilityWaterfall, computeShadowReconciliation, estimateLoss, computeVintageData,
+} from '../src/lib/rollRate';
+import { toLoanColumns, computePortfolioMetrics } from '../src/lib/portfolioKernel';
+import { applyPoolSelection } from '../src/lib/poolSelection';
+import { gridAxis } from '../src/lib/stressGrid';
+import { poolMetricsFromLoans, runStressGrid } from '../src/lib/securitisationWaterfall';
+import { createLoanBook, findLatestLoanBook, readLoanRows } from '../src/lib/loanStore';
+import { LOAN_PAGE_MAX } from '../src/lib/loanQuery';
+import { XlsxExport, csvStream, loanColumns, writeRowsSheet } from '../src/lib/exportStream';
+import { db } from '../src/lib/db';
+
+// ------------------------------------------------------------------
+// Options
+// ------------------------------------------------------------------
+
+function arg(name: string): string | undefined {
+  const hit = process.argv.find((a) => a === `--${name}` || a.startsWith(`--${name}=`));
+  return hit === undefined ? undefined : hit.includes('=') ? hit.slice(hit.indexOf('=') + 1) : 'true';
+}
+
+const SIZE_SUFFIX: Record<string, number> = { '': 1, k: 1e3, m: 1e6 };
+
+function parseSize(s: string): number {
+  const m = /^(\d+(?:\.\d+)?)([km]?)$/i.exec(s.trim());
+  if (!m) throw new Error(`Bad size "${s}" (expected e.g. 10000, 100k, 1m)`);
+  return Math.round(parseFloat(m[1]) * SIZE_SUFFIX[m[2].toLowerCase()]);
+}
+
+const SIZES = (arg('sizes') ?? '10k,100k,1m').split(',').map(parseSize);
+const ITERATIONS = parseInt(arg('iterations') ?? '5', 10);
+const CASE_FILTER = arg('cases')?.split(',');
+const USE_DB = arg('no-db') === undefined;
+const OUT = arg('out') ?? path.join('bench', 'results', 'latest.json');
+const BASELINE = arg('baseline') ?? path.join('bench', 'baseline.json');
+const SAVE_BASELINE = arg('save-baseline') !== undefined;
+const TOLERANCE = parseFloat(arg('tolerance') ?? '0.25');
+
+// Differences below these floors are noise, whatever the ratio
+const MIN_REGRESSION_MS = 5;
+const MIN_REGRESSION_MB = 16;
+
+const BENCH_NBFI = 'bench-suite';
+const FACILITY = 150_000_000;
+const STRUCTURE: SecuritisationStructure = {
+  seniorPct: 70, mezzaninePct: 20, equityPct: 10, overCollateralisationPct: 10,
+  seniorCoupon: 8, mezzanineCoupon: 14, finalised: true,
+};
+const SELECTION: PoolSelectionState = {
+  excludedSegments: ['Corporate'],
+  filterSnapshot: {
+    loanAmountMin: 25_000,
+    dpdBuckets: ['Current', '1-30', '31-60'],
+    geographies: ['Nairobi', 'Mombasa', 'Nakuru', 'Kisumu', 'Eldoret', 'Thika'],
+    products: [],
+  },
+  confirmedAt: '2026-01-31T00:00:00.000Z',
+};
+
+// ------------------------------------------------------------------
+// Cases
+// ------------------------------------------------------------------
+
+interface BenchCase {
+  name: string;
+  db?: boolean;
+  iterations?: number;                  // overrides --iterations (slow database cases)
+  setup?: () => Promise<void>;          // untimed, before every run
+  run: (rows: LoanLevelRow[]) => unknown;
+}
+
+async function* pagesOf(rows: LoanLevelRow[]): AsyncGenerator<LoanLevelRow[]> {
+  for (let i = 0; i < rows.length; i += LOAN_PAGE_MAX) yield rows.slice(i, i + LOAN_PAGE_MAX);
+}
+
+async function countBytes(stream: ReadableStream<Uint8Array>): Promise<number> {
+  const reader = stream.getReader();
+  let n = 0;
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) return n;
+    n += value.byteLength;
+  }
+}
+
+const CASES: BenchCase[] = [
+  {
+    name: 'metrics',
+    run: (rows) => ({
+      financials: computeFinancialSummary(rows),
+      ecl: computeECL(rows),
+      provisions: computeProvisions(rows),
+      loss: estimateLoss(rows),
+      rollRate: rollRateProjection(rows),
+      cureRate: computeCureRate(rows),
+      cnl: computeCNL(rows),
+      cdr: computeCDR(rows),
+      geoHHI: computeHHI(rows, (r) => r.geography || 'Unknown'),
+      velocity: computeRepaymentVelocity(rows),
+      borrowingBase: computeBorrowingBase(rows, FACILITY),
+      eligibility: computeEligibilityWaterfall(rows),
+      shadow: computeShadowReconciliation(rows),
+      vintages: computeVintageData(rows),
+    }),
+  },
+  { name: 'kernel', run: (rows) => computePortfolioMetrics(toLoanColumns(rows), FACILITY) },
+  // The first run builds the bitmap index; later runs reuse it, as the monitoring page does
+  { name: 'pool', run: (rows) => applyPoolSelection(rows, SELECTION).length },
+  {
+    name: 'stress',
+    run: (rows) => {
+      const pool = poolMetricsFromLoans(rows);
+      return runStressGrid(pool.totalBalance, pool.avgRate, STRUCTURE, gridAxis(0, 30, 11), gridAxis(0, 40, 9));
+    },
+  },
+  {
+    name: 'loanbook.post',
+    db: true,
+    iterations: 1,
+    setup: async () => { await db.loanBook.deleteMany({ where: { nbfiId: BENCH_NBFI } }); },
+    run: async (rows) => {
+      const { rows: body } = JSON.parse(JSON.stringify({ rows })) as { rows: LoanLevelRow[] };
+      return db.$transaction((tx) => createLoanBook(tx, BENCH_NBFI, body, 'full'), { timeout: 30 * 60_000 });
+    },
+  },
+  {
+    name: 'loanbook.get',
+    db: true,
+    run: async () => {
+      const book = await findLatestLoanBook(db, BENCH_NBFI);
+      if (!book) throw new Error('loanbook.get needs loanbook.post to have run');
+      return JSON.stringify({ rows: await readLoanRows(db, book.id), loanBookId: book.id }).length;
+    },
+  },
+  {
+    name: 'export.xlsx',
+    run: async (rows) => {
+      const x = new XlsxExport();
+      const bytes = countBytes(x.stream);
+      await writeRowsSheet(x, 'Loan Tape', loanColumns(), pagesOf(rows));
+      await x.finish();
+      return bytes;
+    },
+  },
+  { name: 'export.csv', run: (rows) => countBytes(csvStream(loanColumns(), pagesOf(rows))) },
+];
+
+// ------------------------------------------------------------------
+// Measurement
+// ------------------------------------------------------------------
+
+interface BenchResult {
+  case: string;
+  size: number;
+  iterations: number;
+  firstMs: number;          // first (cold) run
+  medianMs: number;
+  minMs: number;
+  heapRetainedMb: number;   // heap still held after the first run, result alive
+  maxRssMb: number;         // process RSS high-water mark once the case has run
+}
+
+interface BenchReport {
+  meta: { date: string; node: string; platform: string; cpus: number; cpuModel: string; sizes: number[] };
+  results: BenchResult[];
+}
+
+const gc = (globalThis as { gc?: () => void }).gc;
+const mb = (bytes: number) => Math.round(bytes / 1048576 * 10) / 10;
+
+async function measure(c: BenchCase, rows: LoanLevelRow[]): Promise<BenchResult> {
+  const iterations = c.iterations ?? ITERATIONS;
+  await c.setup?.();
+  gc?.();
+  const heapBefore = process.memoryUsage().heapUsed;
+  let t0 = performance.now();
+  const keep = [await c.run(rows)];
+  const firstMs = performance.now() - t0;
+  gc?.();
+  const heapRetainedMb = mb(process.memoryUsage().heapUsed - heapBefore);
+  keep.length = 0;
+
+  const samples: number[] = [firstMs];
+  if (iterations > 1) {
+    samples.length = 0;
+    for (let i = 0; i < iterations; i++) {
+      await c.setup?.();
+      t0 = performance.now();
+      await c.run(rows);
+      samples.push(performance.now() - t0);
+    }
+  }
+  samples.sort((a, b) => a - b);
+  const round = (v: number) => Math.round(v * 100) / 100;
+  return {
+    case: c.name,
+    size: rows.length,
+    iterations,
+    firstMs: round(firstMs),
+    medianMs: round(samples[Math.floor(samples.length / 2)]),
+    minMs: round(samples[0]),
+    heapRetainedMb,
+    maxRssMb: mb(process.resourceUsage().maxRSS * 1024),
+  };
+}
+
+// ------------------------------------------------------------------
+// Baseline comparison
+// ------------------------------------------------------------------
+
+function compare(results: BenchResult[], baseline: BenchReport): string[] {
+  const base = new Map(baseline.results.map((r) => [`${r.case}@${r.size}`, r]));
+  const regressions: string[] = [];
+  for (const r of results) {
+    const b = base.get(`${r.case}@${r.size}`);
+    if (!b) continue;
+    if (r.medianMs > b.medianMs * (1 + TOLERANCE) && r.medianMs - b.medianMs > MIN_REGRESSION_MS) {
+      regressions.push(`${r.case} @ ${r.size.toLocaleString()}: median ${r.medianMs} ms vs baseline ${b.medianMs} ms (+${Math.round((r.medianMs / b.medianMs - 1) * 100)}%)`);
+    }
+    if (r.heapRetainedMb > b.heapRetainedMb * (1 + TOLERANCE) && r.heapRetainedMb - b.heapRetainedMb > MIN_REGRESSION_MB) {
+      regressions.push(`${r.case} @ ${r.size.toLocaleString()}: retained heap ${r.heapRetainedMb} MB vs baseline ${b.heapRetainedMb} MB`);
+    }
+  }
+  return regressions;
+}
+
+function writeJson(file: string, data: unknown) {
+  mkdirSync(path.dirname(file), { recursive: true });
+  writeFileSync(file, JSON.stringify(data, null, 2) + '\n');
+}
+
+// ------------------------------------------------------------------
+// Main
+// ------------------------------------------------------------------
+
+async function main() {
+  const cases = CASES.filter((c) => (USE_DB || !c.db) && (!CASE_FILTER || CASE_FILTER.includes(c.name)));
+  console.log(`Benchmark suite — sizes ${SIZES.map((s) => s.toLocaleString()).join(', ')}; ${cases.map((c) => c.name).join(', ')}`);
+  if (!gc) console.log('  (run with NODE_OPTIONS=--expose-gc for stable heap figures)');
+
+  if (cases.some((c) => c.db)) {
+    await db.nbfi.upsert({
+      where: { id: BENCH_NBFI },
+      create: {
+        id: BENCH_NBFI, name: 'Benchmark NBFI', keyContacts: '', fundingAmount: FACILITY,
+        description: 'Synthetic books written by scripts/bench-suite.ts', dateOnboarded: new Date().toISOString().slice(0, 10),
+      },
+      update: {},
+    });
+  }
+
+  const results: BenchResult[] = [];
+  try {
+    for (const size of SIZES) {
+      const t0 = performance.now();
+      let rows: LoanLevelRow[] | null = generateSyntheticBook(size);
+      console.log(`\n${size.toLocaleString()} loans (generated in ${(performance.now() - t0).toFixed(0)} ms)`);
+      for (const c of cases) {
+        const r = await measure(c, rows);
+        results.push(r);
+        console.log(
+          `  ${c.name.padEnd(16)} median ${r.medianMs.toFixed(1).padStart(10)} ms` +
+          `   first ${r.firstMs.toFixed(1).padStart(10)} ms   heap ${r.heapRetainedMb.toFixed(1).padStart(8)} MB   rss ${r.maxRssMb.toFixed(0).padStart(6)} MB`,
+        );
+      }
+      rows = null;
+    }
+  } finally {
+    if (cases.some((c) => c.db)) await db.nbfi.delete({ where: { id: BENCH_NBFI } }).catch(() => {});
+  }
+
+  const report: BenchReport = {
+    meta: {
+      date: new Date().toISOString(), node: process.version, platform: `${process.platform}-${process.arch}`,
+      cpus: os.cpus().length, cpuModel: os.cpus()[0]?.model ?? 'unknown', sizes: SIZES,
+    },
+    results,
+  };
+  writeJson(OUT, report);
+  console.log(`\nResults written to ${OUT}`);
+
+  if (SAVE_BASELINE) {
+    writeJson(BASELINE, report);
+    console.log(`Baseline saved to ${BASELINE}`);
+    return;
+  }
+  if (!existsSync(BASELINE)) {
+    console.log(`No baseline at ${BASELINE}; record one with --save-baseline`);
+    return;
+  }
+  const regressions = compare(results, JSON.parse(readFileSync(BASELINE, 'utf8')) as BenchReport);
+  if (regressions.length) {
+    console.error(`\n${regressions.length} regression(s) beyond ${Math.round(TOLERANCE * 100)}% of the baseline:`);
+    for (const line of regressions) console.error(`  REGRESSION ${line}`);
+    process.exitCode = 1;
+  } else {
+    console.log(`No regressions against ${BASELINE} (tolerance ${Math.round(TOLERANCE * 100)}%)`);
+  }
+}
+
+main()
+  .catch((e) => {
+    console.error('Benchmark suite failed:', e);
+    process.exit(1);
+  })
+  .finally(() => db.$disconnect());
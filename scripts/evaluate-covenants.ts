@@ -0,0 +1,23 @@
+/**
+ * Covenant / early-warning evaluation across all NBFIs (or the ones given).
+ * Writes CovenantReading, CovenantStatus and EarlyWarning rows — suitable for cron
+ * when the app's in-process scheduler is disabled (COVENANT_EVAL_INTERVAL_MINUTES=0).
+ *
+ * Usage: npm run evaluate:covenants [-- nbfiId ...]
+ */
+
+import { runCovenantEvaluation } from '../src/lib/covenantEngine';
+import { db } from '../src/lib/db';
+
+async function main() {
+  const ids = process.argv.slice(2);
+  const s = await runCovenantEvaluation(ids.length ? ids : undefined);
+  console.log(`Evaluated ${s.nbfis} NBFIs in ${s.ms} ms — ${s.readings} readings, ${s.breached} breached, ${s.alerts} alerts`);
+}
+
+main()
+  .catch((e) => {
+    console.error('Covenant evaluation failed:', e);
+    process.exit(1);
+  })
+  .finally(() => db.$disconnect());
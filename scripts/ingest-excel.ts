@@ -7,17 +7,64 @@
  * Usage: npm run ingest
  * 
  * If no Excel file is found, it prints a message and exits gracefully.
+ *
+ * Directory mode loads one spreads workbook per NBFI (<nbfiId>.xlsx) into
+ * Nbfi.financialData, skipping workbooks unchanged since their last ingestion:
+ *
+ *   npm run ingest -- --dir=data/source/spreads [--workers=N] [--batch=50] [--force]
  */
 
 import * as XLSX from 'xlsx';
 import * as fs from 'fs';
 import * as path from 'path';
+import { readSheetRows } from '../src/lib/spreadsWorkbook';
 
 const SOURCE_DIR = path.join(__dirname, '..', 'data', 'source');
 const OUTPUT_DIR = path.join(__dirname, '..', 'data');
 const EXCEL_NAME = 'MFI Financial Spreads Output.xlsx';
 
+function arg(name: string): string | undefined {
+  return process.argv.find((a) => a.startsWith(`--${name}=`))?.split('=')[1];
+}
+
+async function ingestDirectory(dir: string) {
+  // Loaded lazily so the single-workbook mode does not need the database
+  const { db } = await import('../src/lib/db');
+  const { createSpreadsPool, ingestSpreadsDirectory } = await import('../src/lib/spreadsIngest');
+  const { runCovenantEvaluation } = await import('../src/lib/covenantEngine');
+  const workers = arg('workers');
+  const pool = createSpreadsPool(workers !== undefined ? Number(workers) : undefined);
+  try {
+    const s = await ingestSpreadsDirectory(dir, {
+      pool,
+      force: process.argv.includes('--force'),
+      batchSize: Number(arg('batch')) || undefined,
+    });
+    for (const o of s.outcomes.filter((o) => o.status !== 'unchanged')) {
+      const detail = o.status === 'unknown_nbfi' ? 'no NBFI with this id' : `${o.matched} rows matched, ${o.unmatched} unmatched, parsed in ${o.parseMs} ms`;
+      console.log(`${o.status.padEnd(12)} ${o.fileName} — ${detail}`);
+    }
+    console.log(`${s.files} workbooks in ${dir}: ${s.ingested} ingested, ${s.unchanged} unchanged, ${s.failed} failed in ${s.ms} ms (${pool.size} workers)`);
+    if (s.updatedNbfiIds.length) {
+      const e = await runCovenantEvaluation(s.updatedNbfiIds);
+      console.log(`Covenants re-evaluated for ${e.nbfis} NBFIs in ${e.ms} ms`);
+    }
+  } finally {
+    await pool.destroy();
+    await db.$disconnect();
+  }
+}
+
 function main() {
+  const dir = arg('dir');
+  if (dir) {
+    ingestDirectory(path.resolve(dir)).catch((e) => {
+      console.error('Spreads ingestion failed:', e);
+      process.exit(1);
+    });
+    return;
+  }
+
   const excelPath = path.join(SOURCE_DIR, EXCEL_NAME);
 
   if (!fs.existsSync(excelPath)) {
@@ -28,7 +75,7 @@ function main() {
   }
 
   console.log(`Reading ${excelPath}...`);
-  const workbook = XLSX.read(fs.readFileSync(excelPath), { type: 'buffer', cellDates: true });
+  const workbook = XLSX.readFile(excelPath, { cellDates: true, cellFormula: false, cellHTML: false, cellStyles: false });
   console.log(`Sheets found: ${workbook.SheetNames.join(', ')}`);
 
   // Process each sheet
@@ -57,18 +104,9 @@ function main() {
   console.log('Ingestion complete!');
 }
 
+// Populated rows only, each as wide as the sheet's used range
 function sheetToRows(sheet: XLSX.WorkSheet): (string | number | null)[][] {
-  const range = XLSX.utils.decode_range(sheet['!ref'] || 'A1');
-  const rows: (string | number | null)[][] = [];
-  for (let r = range.s.r; r <= range.e.r; r++) {
-    const row: (string | number | null)[] = [];
-    for (let c = range.s.c; c <= range.e.c; c++) {
-      const cell = sheet[XLSX.utils.encode_cell({ r, c })];
-      row.push(cell ? (cell.v !== undefined ? cell.v : null) : null);
-    }
-    rows.push(row);
-  }
-  return rows;
+  return readSheetRows(sheet).map((r) => r.cells);
 }
 
 function processNBFISheet(sheet: XLSX.WorkSheet) {
@@ -0,0 +1,33 @@
+/**
+ * One pass over the SFTP drop-zone: ingest every file not received before and print
+ * a line per file — suitable for cron when the app's watcher is disabled (FEED_POLL_SECONDS=0).
+ *
+ * Layout: <dir>/<nbfiId>/exports/{loanbook,loanhistory,financials,mis}/<file>.csv|xlsx
+ * Usage:  npm run ingest:feeds [-- --dir=data/sftp --concurrency=4]
+ */
+
+import path from 'path';
+import { FEED_DROP_DIR, scanFeedDropZone } from '../src/lib/feedIngest';
+import { db } from '../src/lib/db';
+
+function arg(name: string): string | undefined {
+  return process.argv.find((a) => a.startsWith(`--${name}=`))?.split('=')[1];
+}
+
+async function main() {
+  const dir = path.resolve(arg('dir') ?? FEED_DROP_DIR);
+  const concurrency = Number(arg('concurrency')) || undefined;
+  const s = await scanFeedDropZone(dir, concurrency);
+  for (const o of s.outcomes) {
+    const rate = o.durationMs > 0 ? ` (${Math.round(o.rowsRead / (o.durationMs / 1000)).toLocaleString()} rows/s)` : '';
+    console.log(`${o.status.padEnd(8)} ${o.nbfiId}/${o.docTypeId}/${o.fileName} — ${o.rowsRead.toLocaleString()} rows in ${o.durationMs} ms${rate}`);
+  }
+  console.log(`${s.files} files in ${dir}: ${s.processed} ingested (${s.failed} failed), ${s.skipped} already received — ${s.rows.toLocaleString()} rows in ${s.ms} ms`);
+}
+
+main()
+  .catch((e) => {
+    console.error('Feed ingestion failed:', e);
+    process.exit(1);
+  })
+  .finally(() => db.$disconnect());
@@ -0,0 +1,37 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { jsonWithEtag } from '@/lib/httpCache';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+const MAX_ALERTS = 200;
+// Most severe first; anything else sorts after these
+const SEVERITY_ORDER = ['critical', 'warning', 'info'];
+
+// GET /api/alerts — early-warning alerts across all NBFIs, from the covenant evaluation job
+// Query: nbfiId (optional), limit (default 50, max 200). Honours If-None-Match.
+// Response: { alerts: [{ id, nbfiId, nbfiName, covenantId, metric, severity, message, predictedBreachDate, trend, createdAt }] }
+export const GET = withRouteMetrics('/api/alerts', async (request: NextRequest) => {
+  const sp = request.nextUrl.searchParams;
+  const limit = Math.min(Math.max(Number(sp.get('limit')) || 50, 1), MAX_ALERTS);
+  const nbfiId = sp.get('nbfiId');
+  try {
+    // One query per severity in rank order, each newest-first on the (severity, createdAt) index,
+    // stopping once the page is full
+    const newest = (severity: string | null, take: number) => db.earlyWarning.findMany({
+      where: { ...(nbfiId ? { nbfiId } : {}), severity: severity ?? { notIn: SEVERITY_ORDER } },
+      orderBy: { createdAt: 'desc' },
+      take,
+      include: { nbfi: { select: { name: true } } },
+    });
+    const rows: Awaited<ReturnType<typeof newest>> = [];
+    for (const severity of [...SEVERITY_ORDER, null]) {
+      if (rows.length >= limit) break;
+      rows.push(...await newest(severity, limit - rows.length));
+    }
+    const alerts = rows.map(({ nbfi, createdAt, ...a }) => ({ ...a, nbfiName: nbfi.name, createdAt: createdAt.toISOString() }));
+    return jsonWithEtag(request, { alerts });
+  } catch (err) {
+    console.error('[GET /api/alerts]', err);
+    return NextResponse.json({ error: 'Failed to fetch alerts' }, { status: 500 });
+  }
+});
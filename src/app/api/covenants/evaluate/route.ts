@@ -0,0 +1,21 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { runCovenantEvaluation } from '@/lib/covenantEngine';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+export const runtime = 'nodejs';
+export const maxDuration = 300;
+
+// POST /api/covenants/evaluate — run the covenant / early-warning evaluation now
+// Body (optional): { nbfiIds?: string[] } — default every NBFI with covenants
+// Response: { nbfis, readings, breached, alerts, ms }
+export const POST = withRouteMetrics('/api/covenants/evaluate', async (request: NextRequest) => {
+  try {
+    const body = await request.json().catch(() => ({}));
+    const nbfiIds: string[] | undefined = Array.isArray(body?.nbfiIds) ? body.nbfiIds : undefined;
+    const summary = await runCovenantEvaluation(nbfiIds);
+    return NextResponse.json(summary);
+  } catch (err) {
+    console.error('[POST /api/covenants/evaluate]', err);
+    return NextResponse.json({ error: 'Failed to evaluate covenants' }, { status: 500 });
+  }
+});
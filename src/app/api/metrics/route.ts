@@ -0,0 +1,13 @@
+import { NextResponse } from 'next/server';
+import { METRICS_CONTENT_TYPE, renderMetrics } from '@/lib/instrumentation';
+
+export const runtime = 'nodejs';
+export const dynamic = 'force-dynamic';
+
+// GET /api/metrics — request latency / span / payload histograms, Prisma query timings and
+// process memory, in the Prometheus text exposition format (see lib/instrumentation.ts)
+export async function GET() {
+  return new NextResponse(renderMetrics(), {
+    headers: { 'Content-Type': METRICS_CONTENT_TYPE, 'Cache-Control': 'no-store' },
+  });
+}
@@ -0,0 +1,84 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getNbfiLoanLevelWaterfall } from '@/lib/serverAnalytics';
+import { DPD_BUCKETS } from '@/lib/types';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+export const runtime = 'nodejs';
+
+const MAX_PERIODS = 120;
+
+function num(sp: URLSearchParams, name: string): number | undefined {
+  const v = sp.get(name);
+  if (v == null || v === '') return undefined;
+  const n = Number(v);
+  return Number.isFinite(n) ? n : undefined;
+}
+
+const inPercentRange = (n: number) => Number.isFinite(n) && n >= 0 && n <= 100;
+
+// "5" → 5% for every bucket; "Current:2,31-60:15,180+:60" → per bucket, others fall back to `fallback`.
+// Returns a problem string for a rate that is not a number in 0–100 or an unknown bucket.
+function bucketVector(name: string, spec: string | null, fallback: number): Record<string, number> | string {
+  const out: Record<string, number> = {};
+  for (const b of DPD_BUCKETS) out[b] = fallback;
+  if (!spec) return out;
+  if (!spec.includes(':')) {
+    const n = Number(spec);
+    if (!inPercentRange(n)) return `${name} must be a rate between 0 and 100`;
+    for (const b of DPD_BUCKETS) out[b] = n;
+    return out;
+  }
+  for (const part of spec.split(',')) {
+    const i = part.lastIndexOf(':');
+    const bucket = part.slice(0, i), n = Number(part.slice(i + 1));
+    if (!(DPD_BUCKETS as readonly string[]).includes(bucket)) return `${name}: unknown DPD bucket "${bucket}"`;
+    if (!inPercentRange(n)) return `${name}: rate for ${bucket} must be between 0 and 100`;
+    out[bucket] = n;
+  }
+  return out;
+}
+
+// GET /api/nbfis/[id]/analytics/cashflow-waterfall — loan-level cash flows run through the tranche waterfall
+// Query: periods (default 12, max 120), cdr / cpr (annual %, a single rate or bucket:rate list; defaults 5 / 10),
+//        severity (loss given default %, 0–100, default 100), tenure (months ≥ 1 for loans without residualTenureMonths)
+// Rates, severity or tenure outside those ranges answer 400.
+// Response header X-Cache: HIT | MISS
+export const GET = withRouteMetrics('/api/nbfis/[id]/analytics/cashflow-waterfall', async (request: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = request.nextUrl.searchParams;
+  const periods = Math.min(Math.max(Math.floor(num(sp, 'periods') ?? 12), 1), MAX_PERIODS);
+  const defaultRates = bucketVector('cdr', sp.get('cdr'), 5);
+  if (typeof defaultRates === 'string') return NextResponse.json({ error: defaultRates }, { status: 400 });
+  const prepayRates = bucketVector('cpr', sp.get('cpr'), 10);
+  if (typeof prepayRates === 'string') return NextResponse.json({ error: prepayRates }, { status: 400 });
+  const severity = num(sp, 'severity');
+  if (sp.get('severity') && (severity === undefined || !inPercentRange(severity))) {
+    return NextResponse.json({ error: 'severity must be between 0 and 100' }, { status: 400 });
+  }
+  const tenure = num(sp, 'tenure');
+  if (sp.get('tenure') && (tenure === undefined || tenure < 1)) {
+    return NextResponse.json({ error: 'tenure must be at least 1 month' }, { status: 400 });
+  }
+
+  try {
+    const result = await getNbfiLoanLevelWaterfall(id, {
+      defaultRates,
+      prepayRates,
+      severity,
+      defaultTenure: tenure,
+    }, periods);
+    if (!result) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+    if (result === 'no-structure') {
+      return NextResponse.json({ error: 'No securitisation structure configured' }, { status: 400 });
+    }
+    return NextResponse.json(
+      { loanBookId: result.loanBookId, ...result.payload },
+      { headers: { 'X-Cache': result.cacheHit ? 'HIT' : 'MISS' } },
+    );
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/analytics/cashflow-waterfall]', err);
+    return NextResponse.json({ error: 'Failed to run cash-flow waterfall' }, { status: 500 });
+  }
+});
@@ -0,0 +1,50 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getNbfiMonteCarlo } from '@/lib/serverAnalytics';
+import type { ScenarioKey } from '@/lib/rollRate';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+export const runtime = 'nodejs';
+
+const SCENARIOS: ScenarioKey[] = ['base', 'stress', 'severe'];
+const MAX_PATHS = 100_000;
+const MAX_MONTHS = 120;
+
+function num(sp: URLSearchParams, name: string): number | undefined {
+  const v = sp.get(name);
+  if (v == null || v === '') return undefined;
+  const n = Number(v);
+  return Number.isFinite(n) ? n : undefined;
+}
+
+// GET /api/nbfis/[id]/analytics/monte-carlo — simulated loss distribution (VaR / ES) per scenario
+// Query: paths (default 10000), months (36), rho (0.12), phi (0.7), amortisation (1/24), seed, scenarios=base,stress,severe
+// Response header X-Cache: HIT | MISS
+export const GET = withRouteMetrics('/api/nbfis/[id]/analytics/monte-carlo', async (request: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = request.nextUrl.searchParams;
+  const scenarios = sp.get('scenarios')?.split(',').filter((s): s is ScenarioKey => (SCENARIOS as string[]).includes(s));
+  const paths = num(sp, 'paths');
+  const months = num(sp, 'months');
+
+  try {
+    const result = await getNbfiMonteCarlo(id, {
+      paths: paths != null ? Math.min(paths, MAX_PATHS) : undefined,
+      months: months != null ? Math.min(months, MAX_MONTHS) : undefined,
+      rho: num(sp, 'rho'),
+      phi: num(sp, 'phi'),
+      amortisation: num(sp, 'amortisation'),
+      seed: num(sp, 'seed'),
+      scenarios: scenarios?.length ? scenarios : undefined,
+    });
+    if (!result) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+    return NextResponse.json(
+      { loanBookId: result.loanBookId, estimateId: result.estimateId, results: result.results },
+      { headers: { 'X-Cache': result.cacheHit ? 'HIT' : 'MISS' } },
+    );
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/analytics/monte-carlo]', err);
+    return NextResponse.json({ error: 'Failed to run Monte Carlo simulation' }, { status: 500 });
+  }
+});
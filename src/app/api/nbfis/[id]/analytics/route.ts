@@ -0,0 +1,51 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getNbfiAnalytics } from '@/lib/serverAnalytics';
+import { jsonWithEtag } from '@/lib/httpCache';
+import type { LoanFilters } from '@/lib/poolSelection';
+import type { ScenarioKey } from '@/lib/rollRate';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+const SCENARIOS: ScenarioKey[] = ['base', 'stress', 'severe'];
+
+function list(sp: URLSearchParams, name: string): string[] {
+  const v = sp.get(name);
+  return v ? v.split(',').map(s => s.trim()).filter(Boolean) : [];
+}
+
+// GET /api/nbfis/[id]/analytics — aggregated portfolio analytics for the latest loan book
+// Query: product, geography, segment, dpdBuckets, ticketSize (comma lists), scenario=base|stress|severe,
+//        pool=1 (apply the confirmed pool selection), trendMonths
+// Response: the AnalyticsPayload plus loanBookId and dimensions (filter options of the whole book).
+// Header X-Cache: HIT | MISS. Honours If-None-Match.
+export const GET = withRouteMetrics('/api/nbfis/[id]/analytics', async (request: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = request.nextUrl.searchParams;
+  const filters: LoanFilters = {
+    product: list(sp, 'product'),
+    geography: list(sp, 'geography'),
+    segment: list(sp, 'segment'),
+    dpdBuckets: list(sp, 'dpdBuckets'),
+    ticketSize: list(sp, 'ticketSize'),
+  };
+  const scenarioParam = sp.get('scenario') as ScenarioKey | null;
+  const scenario: ScenarioKey = scenarioParam && SCENARIOS.includes(scenarioParam) ? scenarioParam : 'base';
+  const trendMonths = Math.min(Math.max(parseInt(sp.get('trendMonths') || '12', 10) || 12, 1), 60);
+
+  try {
+    const result = await getNbfiAnalytics(id, {
+      filters,
+      scenario,
+      securityPackage: sp.get('pool') === '1',
+      trendMonths,
+    });
+    if (!result) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+    const res = jsonWithEtag(request, { loanBookId: result.loanBookId, ...result.payload });
+    res.headers.set('X-Cache', result.cacheHit ? 'HIT' : 'MISS');
+    return res;
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/analytics]', err);
+    return NextResponse.json({ error: 'Failed to compute analytics' }, { status: 500 });
+  }
+});
@@ -0,0 +1,70 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getNbfiStressGrid } from '@/lib/serverAnalytics';
+import { gridAxis, STRESS_MEASURES } from '@/lib/stressGrid';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+export const runtime = 'nodejs';
+
+const MAX_AXIS = 200;
+const MAX_CELLS = 100_000;
+
+// Axis as a comma list ("3,6,9") or an inclusive range "from:to:steps" ("0:30:50")
+function axis(sp: URLSearchParams, name: string, fallback: number[] | undefined): number[] | undefined {
+  const v = sp.get(name);
+  if (v == null || v === '') return fallback;
+  if (v.includes(':')) {
+    const [from, to, steps] = v.split(':').map(Number);
+    if (![from, to, steps].every(Number.isFinite)) return undefined;
+    return gridAxis(from, to, Math.min(Math.max(Math.floor(steps), 1), MAX_AXIS));
+  }
+  const out = v.split(',').map(Number).filter(Number.isFinite);
+  return out.length ? out.slice(0, MAX_AXIS) : undefined;
+}
+
+// GET /api/nbfis/[id]/analytics/stress-grid — securitisation waterfall over a dense stress grid
+// Query: loss (default 0:30:31), prepay (0:30:4), periods (12), oc (structure's OC), breakeven=1
+// Cells come back flattened in STRESS_MEASURES order; see StressGridResult for the layout.
+// Response header X-Cache: HIT | MISS
+export const GET = withRouteMetrics('/api/nbfis/[id]/analytics/stress-grid', async (request: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = request.nextUrl.searchParams;
+  const lossRates = axis(sp, 'loss', gridAxis(0, 30, 31));
+  const prepayRates = axis(sp, 'prepay', gridAxis(0, 30, 4));
+  const periods = axis(sp, 'periods', undefined)?.map((p) => Math.min(Math.max(Math.round(p), 1), 360));
+  const ocPcts = axis(sp, 'oc', undefined);
+  if (!lossRates || !prepayRates) {
+    return NextResponse.json({ error: 'Invalid loss or prepay axis' }, { status: 400 });
+  }
+  const cells = lossRates.length * prepayRates.length * (periods?.length ?? 1) * (ocPcts?.length ?? 1);
+  if (cells > MAX_CELLS) {
+    return NextResponse.json({ error: `Grid too large (${cells} cells, max ${MAX_CELLS})` }, { status: 400 });
+  }
+
+  try {
+    const result = await getNbfiStressGrid(id, { lossRates, prepayRates, periods, ocPcts }, sp.get('breakeven') === '1');
+    if (!result) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+    if (result === 'no-structure') {
+      return NextResponse.json({ error: 'No securitisation structure configured' }, { status: 400 });
+    }
+    const { grid } = result;
+    return NextResponse.json(
+      {
+        loanBookId: result.loanBookId,
+        hash: grid.hash,
+        lossRates: grid.lossRates,
+        prepayRates: grid.prepayRates,
+        periods: grid.periods,
+        ocPcts: grid.ocPcts,
+        measures: STRESS_MEASURES,
+        cells: Array.from(grid.cells),
+        breakevens: result.breakevens,
+      },
+      { headers: { 'X-Cache': result.cacheHit ? 'HIT' : 'MISS' } },
+    );
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/analytics/stress-grid]', err);
+    return NextResponse.json({ error: 'Failed to run stress grid' }, { status: 500 });
+  }
+});
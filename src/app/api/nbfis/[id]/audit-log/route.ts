@@ -1,19 +1,31 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
+import { cursorPage, cursorPageArgs } from '@/lib/dbHelpers';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string }> };
 
-// GET /api/nbfis/[id]/audit-log — returns full audit trail for one NBFI
-export async function GET(_req: NextRequest, { params }: Params) {
+const AUDIT_PAGE = 100;
+const MAX_AUDIT_PAGE = 500;
+
+// GET /api/nbfis/[id]/audit-log — audit trail for one NBFI, one page at a time
+// Query: order (asc — oldest first, the default — or desc), limit (100, max 500),
+//   cursor (nextCursor of the previous page). Served from the (nbfiId, createdAt, id) index.
+export const GET = withRouteMetrics('/api/nbfis/[id]/audit-log', async (req: NextRequest, { params }: Params) => {
   const { id } = await params;
+  const sp = req.nextUrl.searchParams;
   try {
-    const entries = await db.auditLog.findMany({
+    const dir = sp.get('order') === 'desc' ? 'desc' : 'asc';
+    const { limit, args } = cursorPageArgs(sp, AUDIT_PAGE, MAX_AUDIT_PAGE);
+    const rows = await db.auditLog.findMany({
       where: { nbfiId: id },
-      orderBy: { createdAt: 'asc' },
+      orderBy: [{ createdAt: dir }, { id: dir }],
+      ...args,
     });
-    return NextResponse.json({ entries });
+    const page = cursorPage(rows, limit);
+    return NextResponse.json({ entries: page.items, nextCursor: page.nextCursor });
   } catch (err) {
     console.error('[GET /api/nbfis/[id]/audit-log]', err);
     return NextResponse.json({ error: 'Failed to fetch audit log' }, { status: 500 });
   }
-}
+});
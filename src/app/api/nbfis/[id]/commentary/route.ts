@@ -1,12 +1,13 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
 import { v4 as uuidv4 } from 'uuid';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string }> };
 
 // POST /api/nbfis/[id]/commentary
 // Body: { id?, author, role, text, timestamp? }
-export async function POST(request: NextRequest, { params }: Params) {
+export const POST = withRouteMetrics('/api/nbfis/[id]/commentary', async (request: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const body = await request.json();
@@ -40,4 +41,4 @@ export async function POST(request: NextRequest, { params }: Params) {
     console.error('[POST /api/nbfis/[id]/commentary]', err);
     return NextResponse.json({ error: 'Failed to add commentary' }, { status: 500 });
   }
-}
+});
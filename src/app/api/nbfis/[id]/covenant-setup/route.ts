@@ -1,13 +1,15 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
+import { queueCovenantEvaluation } from '@/lib/covenantEngine';
 import { v4 as uuidv4 } from 'uuid';
 import type { CovenantDef, DocumentRequirement, ProvisioningRule } from '@/lib/types';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string }> };
 
 // PUT /api/nbfis/[id]/covenant-setup — save covenants, documents, provisioning rules atomically
 // Body: { covenants: CovenantDef[], documents: DocumentRequirement[], provisioningRules: { nbfi, lender }, userId, userName }
-export async function PUT(request: NextRequest, { params }: Params) {
+export const PUT = withRouteMetrics('/api/nbfis/[id]/covenant-setup', async (request: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const body = await request.json();
@@ -26,51 +28,42 @@ export async function PUT(request: NextRequest, { params }: Params) {
     } = body;
 
     await db.$transaction(async (tx) => {
-      // 1. Replace covenant definitions
+      // 1-3. Replace covenant definitions, documents and provisioning rules, one insert each
       await tx.covenantDefinition.deleteMany({ where: { nbfiId: id } });
-      for (const c of covenants) {
-        await tx.covenantDefinition.create({
-          data: {
-            id: c.id || uuidv4(),
-            nbfiId: id,
-            metric: c.metric,
-            operator: c.operator,
-            threshold: c.threshold,
-            frequency: c.frequency,
-            format: c.format,
-          },
-        });
-      }
+      await tx.covenantDefinition.createMany({
+        data: covenants.map((c) => ({
+          id: c.id || uuidv4(),
+          nbfiId: id,
+          metric: c.metric,
+          operator: c.operator,
+          threshold: c.threshold,
+          frequency: c.frequency,
+          format: c.format,
+        })),
+      });
 
-      // 2. Replace documents
       await tx.document.deleteMany({ where: { nbfiId: id } });
-      for (const d of documents) {
-        await tx.document.create({
-          data: {
-            id: d.id || uuidv4(),
-            nbfiId: id,
-            name: d.name,
-            frequency: d.frequency,
-            nextDueDate: d.nextDueDate,
-            status: d.status || 'pending',
-            submittedDate: d.submittedDate || null,
-            submittedBy: d.submittedBy || null,
-          },
-        });
-      }
+      await tx.document.createMany({
+        data: documents.map((d) => ({
+          id: d.id || uuidv4(),
+          nbfiId: id,
+          name: d.name,
+          frequency: d.frequency,
+          nextDueDate: d.nextDueDate,
+          status: d.status || 'pending',
+          submittedDate: d.submittedDate || null,
+          submittedBy: d.submittedBy || null,
+        })),
+      });
 
-      // 3. Replace provisioning rules
       await tx.provisioningRule.deleteMany({ where: { nbfiId: id } });
-      for (const r of provisioningRules.nbfi) {
-        await tx.provisioningRule.create({
-          data: { nbfiId: id, policyType: 'nbfi', bucket: r.bucket, dpdMin: r.dpdMin, dpdMax: r.dpdMax, provisionPercent: r.provisionPercent },
-        });
-      }
-      for (const r of provisioningRules.lender) {
-        await tx.provisioningRule.create({
-          data: { nbfiId: id, policyType: 'lender', bucket: r.bucket, dpdMin: r.dpdMin, dpdMax: r.dpdMax, provisionPercent: r.provisionPercent },
-        });
-      }
+      await tx.provisioningRule.createMany({
+        data: (['nbfi', 'lender'] as const).flatMap((policyType) =>
+          provisioningRules[policyType].map((r) => ({
+            nbfiId: id, policyType, bucket: r.bucket, dpdMin: r.dpdMin, dpdMax: r.dpdMax, provisionPercent: r.provisionPercent,
+          })),
+        ),
+      });
 
       // 4. Mark setup complete
       await tx.nbfi.update({ where: { id }, data: { setupCompleted: true, status: 'setup_complete' } });
@@ -88,9 +81,10 @@ export async function PUT(request: NextRequest, { params }: Params) {
       });
     });
 
+    queueCovenantEvaluation(id);
     return NextResponse.json({ ok: true });
   } catch (err) {
     console.error('[PUT /api/nbfis/[id]/covenant-setup]', err);
     return NextResponse.json({ error: 'Failed to save covenant setup' }, { status: 500 });
   }
-}
+});
@@ -1,12 +1,13 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
 import { v4 as uuidv4 } from 'uuid';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string; docId: string }> };
 
 // PATCH /api/nbfis/[id]/documents/[docId]
 // Body: { status, date?, uploadedBy?, userId, userName }
-export async function PATCH(request: NextRequest, { params }: Params) {
+export const PATCH = withRouteMetrics('/api/nbfis/[id]/documents/[docId]', async (request: NextRequest, { params }: Params) => {
   const { id, docId } = await params;
   try {
     const body = await request.json();
@@ -18,16 +19,15 @@ export async function PATCH(request: NextRequest, { params }: Params) {
       updateData.submittedBy = uploadedBy || 'Unknown';
     }
 
-    await db.document.update({ where: { id: docId }, data: updateData });
+    const doc = await db.document.update({ where: { id: docId }, data: updateData, select: { name: true } });
 
     if (status === 'submitted' && date) {
-      const doc = await db.document.findUnique({ where: { id: docId }, select: { name: true } });
       await db.documentSubmission.create({
         data: {
           id: uuidv4(),
           documentId: docId,
           date,
-          filename: `${(doc?.name || 'document').replace(/\s+/g, '_')}_${date}.pdf`,
+          filename: `${(doc.name || 'document').replace(/\s+/g, '_')}_${date}.pdf`,
           uploadedBy: uploadedBy || 'Unknown',
         },
       });
@@ -49,4 +49,4 @@ export async function PATCH(request: NextRequest, { params }: Params) {
     console.error('[PATCH /api/nbfis/[id]/documents/[docId]]', err);
     return NextResponse.json({ error: 'Failed to update document' }, { status: 500 });
   }
-}
+});
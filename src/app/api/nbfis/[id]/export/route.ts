@@ -0,0 +1,102 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { findLatestLoanBook, readBookAggregates, LOAN_FIELDS, type LoanField } from '@/lib/loanStore';
+import { iterateLoanPages, parseLoanSort } from '@/lib/loanQuery';
+import { loadBookRows } from '@/lib/serverAnalytics';
+import { toPoolSelectionState } from '@/lib/dbHelpers';
+import { applyPoolSelection } from '@/lib/poolSelection';
+import { ensurePortfolioRollup, queryPortfolioRollup } from '@/lib/portfolioRollup';
+import {
+  XlsxExport, XLSX_CONTENT_TYPE, CSV_CONTENT_TYPE, attachmentHeaders,
+  csvStream, loanColumns, writeAnalyticsSheets, writeRowsSheet, writeSpreadsSheets,
+} from '@/lib/exportStream';
+import type { FinancialData, LoanLevelRow, PoolSelectionState } from '@/lib/types';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+export const runtime = 'nodejs';
+
+const SHEETS = ['spreads', 'loans', 'pool', 'analytics'] as const;
+type Sheet = (typeof SHEETS)[number];
+
+function listParam(sp: URLSearchParams, key: string): string[] | undefined {
+  const v = sp.get(key);
+  return v ? v.split(',').filter(Boolean) : undefined;
+}
+
+async function* poolPages(pages: AsyncIterable<LoanLevelRow[]>, selection: PoolSelectionState): AsyncGenerator<LoanLevelRow[]> {
+  for await (const page of pages) {
+    const selected = applyPoolSelection(page, selection);
+    if (selected.length) yield selected;
+  }
+}
+
+// GET /api/nbfis/[id]/export — streamed export of the latest loan book and the NBFI's spreads
+// Query: format=xlsx (default) | csv
+//        sheets=spreads,loans,pool,analytics (xlsx; default all) — csv exports one table: sheet=loans (default) | pool
+//        fields=loanId,currentBalance,...  sort=-currentBalance  q=<prefix>  dpdBuckets=...  geographies=...  products=...
+// The loan filters apply to the loan and pool tables; analytics describe the whole book.
+export const GET = withRouteMetrics('/api/nbfis/[id]/export', async (req: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = req.nextUrl.searchParams;
+  const format = sp.get('format') === 'csv' ? 'csv' : 'xlsx';
+  const sheets = new Set((listParam(sp, 'sheets') ?? SHEETS).filter((s): s is Sheet => (SHEETS as readonly string[]).includes(s)));
+  const fields = listParam(sp, 'fields')?.filter((f): f is LoanField => (LOAN_FIELDS as readonly string[]).includes(f));
+  const query = {
+    fields,
+    dpdBuckets: listParam(sp, 'dpdBuckets'),
+    geographies: listParam(sp, 'geographies'),
+    products: listParam(sp, 'products'),
+    sort: parseLoanSort(sp.get('sort')),
+    search: sp.get('q')?.trim() || undefined,
+  };
+
+  try {
+    const [nbfi, book, ps] = await Promise.all([
+      db.nbfi.findUnique({ where: { id }, select: { name: true, financialData: true } }),
+      findLatestLoanBook(db, id),
+      db.poolSelection.findUnique({ where: { nbfiId: id } }),
+    ]);
+    if (!nbfi) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+    const selection = ps ? toPoolSelectionState(ps) : undefined;
+    // The pool filter needs every column, whatever `fields` asks to export
+    const pages = (q: typeof query) => iterateLoanPages(db, book!.id, q, loadBookRows);
+    const pool = () => poolPages(pages({ ...query, fields: undefined }), selection!);
+    const stem = `${nbfi.name.replace(/\s+/g, '_')}_${new Date().toISOString().slice(0, 10)}`;
+
+    if (format === 'csv') {
+      const table = sp.get('sheet') === 'pool' ? 'pool' : 'loans';
+      if (!book) return NextResponse.json({ error: 'No loan book uploaded' }, { status: 404 });
+      if (table === 'pool' && !selection?.confirmedAt) {
+        return NextResponse.json({ error: 'No confirmed pool selection' }, { status: 400 });
+      }
+      const body = csvStream(loanColumns(fields), table === 'pool' ? pool() : pages(query));
+      return new NextResponse(body, { headers: attachmentHeaders(`${stem}_${table === 'pool' ? 'Pool' : 'Loan_Tape'}.csv`, CSV_CONTENT_TYPE) });
+    }
+
+    if (!book && !(sheets.has('spreads') && nbfi.financialData)) {
+      return NextResponse.json({ error: 'Nothing to export' }, { status: 404 });
+    }
+    const body = XlsxExport.run('[GET /api/nbfis/[id]/export]', async (x) => {
+      if (sheets.has('spreads') && nbfi.financialData) {
+        writeSpreadsSheets(x.workbook, JSON.parse(nbfi.financialData) as Partial<FinancialData>);
+      }
+      if (!book) return;
+      if (sheets.has('loans')) await writeRowsSheet(x, 'Loan Tape', loanColumns(fields), pages(query));
+      if (sheets.has('pool') && selection?.confirmedAt) await writeRowsSheet(x, 'Pool Selection', loanColumns(fields), pool());
+      if (sheets.has('analytics')) {
+        await ensurePortfolioRollup();
+        const [agg, rollup] = await Promise.all([
+          readBookAggregates(db, book.id),
+          queryPortfolioRollup(db, ['dpdBucket', 'geography', 'product', 'vintage'], { transactionIds: [id] }),
+        ]);
+        writeAnalyticsSheets(x.workbook, agg, rollup.groups);
+      }
+    });
+    return new NextResponse(body, { headers: attachmentHeaders(`${stem}_Export.xlsx`, XLSX_CONTENT_TYPE) });
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/export]', err);
+    return NextResponse.json({ error: 'Export failed' }, { status: 500 });
+  }
+});
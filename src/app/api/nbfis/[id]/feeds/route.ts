@@ -0,0 +1,32 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { toFeedErrors, toFeedRecord } from '@/lib/feedIngest';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+export const runtime = 'nodejs';
+
+// Most recent drop-zone files returned per request
+const FEED_LOG_LIMIT = 500;
+
+// GET /api/nbfis/[id]/feeds — drop-zone ingestion log (per-file rows, throughput, status) and its errors
+// Query: docType (optional DOC_TYPE_SCHEMAS id)
+export const GET = withRouteMetrics('/api/nbfis/[id]/feeds', async (request: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const docTypeId = request.nextUrl.searchParams.get('docType') || undefined;
+  try {
+    const files = await db.feedFile.findMany({
+      where: { nbfiId: id, docTypeId, status: { notIn: ['processing', 'retry'] } },
+      orderBy: { receivedAt: 'desc' },
+      take: FEED_LOG_LIMIT,
+    });
+    return NextResponse.json({
+      records: files.map((f) => ({ docTypeId: f.docTypeId, ...toFeedRecord(f) })),
+      errors: files.flatMap((f) => toFeedErrors(f).map((e) => ({ docTypeId: f.docTypeId, ...e }))),
+    });
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/feeds]', err);
+    return NextResponse.json({ error: 'Failed to fetch feed log' }, { status: 500 });
+  }
+});
@@ -1,10 +1,12 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
+import { queueCovenantEvaluation } from '@/lib/covenantEngine';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string }> };
 
 // GET /api/nbfis/[id]/financial-data
-export async function GET(_req: NextRequest, { params }: Params) {
+export const GET = withRouteMetrics('/api/nbfis/[id]/financial-data', async (_req: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const n = await db.nbfi.findUnique({ where: { id }, select: { financialData: true } });
@@ -15,11 +17,11 @@ export async function GET(_req: NextRequest, { params }: Params) {
     console.error('[GET /api/nbfis/[id]/financial-data]', err);
     return NextResponse.json({ error: 'Failed to fetch financial data' }, { status: 500 });
   }
-}
+});
 
 // POST /api/nbfis/[id]/financial-data — load / save financial data + advance status to 'spreading'
 // Body: { financialData, userId, userName }
-export async function POST(request: NextRequest, { params }: Params) {
+export const POST = withRouteMetrics('/api/nbfis/[id]/financial-data', async (request: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const body = await request.json();
@@ -45,9 +47,10 @@ export async function POST(request: NextRequest, { params }: Params) {
       },
     });
 
+    queueCovenantEvaluation(id);
     return NextResponse.json({ ok: true });
   } catch (err) {
     console.error('[POST /api/nbfis/[id]/financial-data]', err);
     return NextResponse.json({ error: 'Failed to save financial data' }, { status: 500 });
   }
-}
+});
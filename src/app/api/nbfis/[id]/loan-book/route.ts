@@ -1,59 +1,96 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
+import { invalidateAnalytics } from '@/lib/analyticsCache';
+import { queueCovenantEvaluation } from '@/lib/covenantEngine';
+import {
+  createLoanBook, findLatestLoanBook, findLoanIdProblem, readLoanRows, readBookAggregates, LOAN_FIELDS,
+  type LoanField, type LoanBookMode,
+} from '@/lib/loanStore';
+import { aggregateRatios } from '@/lib/loanDelta';
+import { etagOf, jsonWithEtag, matchesEtag, notModified } from '@/lib/httpCache';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string }> };
 
+function listParam(sp: URLSearchParams, key: string): string[] | undefined {
+  const v = sp.get(key);
+  return v ? v.split(',').filter(Boolean) : undefined;
+}
+
 // GET /api/nbfis/[id]/loan-book — returns the latest loan book rows
-export async function GET(_req: NextRequest, { params }: Params) {
+// Query (optional): fields=loanId,currentBalance  dpdBuckets=31-60,61-90  geographies=...  products=...
+//                   summary=1 — cached aggregates (bucket / vintage balances, PAR ratios) instead of rows
+// Books are immutable snapshots, so the ETag is the book id plus the query; a matching
+// If-None-Match answers 304 before any loans are read.
+export const GET = withRouteMetrics('/api/nbfis/[id]/loan-book', async (req: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
-    const loanBook = await db.loanBook.findFirst({
-      where: { nbfiId: id },
-      orderBy: { uploadedAt: 'desc' },
-    });
-    const rows = loanBook ? JSON.parse(loanBook.rows) : [];
-    return NextResponse.json({ rows });
+    const sp = req.nextUrl.searchParams;
+    const loanBook = await findLatestLoanBook(db, id);
+    const etag = etagOf(loanBook?.id ?? 'none', sp.toString());
+    if (matchesEtag(req, etag)) return notModified(etag);
+    if (sp.get('summary') === '1') {
+      if (!loanBook) return jsonWithEtag(req, { loanBookId: null, aggregates: null, ratios: null }, etag);
+      const aggregates = await readBookAggregates(db, loanBook.id);
+      return jsonWithEtag(req, { loanBookId: loanBook.id, aggregates, ratios: aggregateRatios(aggregates) }, etag);
+    }
+    const fields = listParam(sp, 'fields')?.filter((f): f is LoanField => (LOAN_FIELDS as readonly string[]).includes(f));
+    const rows = loanBook
+      ? await readLoanRows(db, loanBook.id, {
+          fields,
+          dpdBuckets: listParam(sp, 'dpdBuckets'),
+          geographies: listParam(sp, 'geographies'),
+          products: listParam(sp, 'products'),
+        })
+      : [];
+    return jsonWithEtag(req, { rows, loanBookId: loanBook?.id ?? null }, etag);
   } catch (err) {
     console.error('[GET /api/nbfis/[id]/loan-book]', err);
     return NextResponse.json({ error: 'Failed to fetch loan book' }, { status: 500 });
   }
-}
+});
 
 // POST /api/nbfis/[id]/loan-book — upload / replace loan book
-// Body: { rows: LoanLevelRow[], meta?, userId, userName }
-export async function POST(request: NextRequest, { params }: Params) {
+// Body: { rows: LoanLevelRow[], meta?, mode?: 'full' | 'delta' (default 'full'), userId, userName }
+export const POST = withRouteMetrics('/api/nbfis/[id]/loan-book', async (request: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const body = await request.json();
     const { rows, meta, userId, userName } = body;
+    const mode: LoanBookMode = body.mode === 'delta' ? 'delta' : 'full';
+    if (!Array.isArray(rows)) return NextResponse.json({ error: 'rows must be an array' }, { status: 400 });
+    const problem = findLoanIdProblem(rows);
+    if (problem) return NextResponse.json({ error: `Invalid loan book: ${problem}` }, { status: 400 });
 
-    await db.loanBook.create({
-      data: {
-        nbfiId: id,
-        rows: JSON.stringify(rows),
-      },
-    });
-
-    if (meta) {
-      await db.nbfi.update({
-        where: { id },
-        data: { loanBookMeta: JSON.stringify(meta) },
+    const book = await db.$transaction(async (tx) => {
+      const created = await createLoanBook(tx, id, rows, mode);
+
+      if (meta) {
+        await tx.nbfi.update({
+          where: { id },
+          data: { loanBookMeta: JSON.stringify(meta) },
+        });
+      }
+
+      await tx.auditLog.create({
+        data: {
+          nbfiId: id,
+          userId: userId || 'system',
+          userName: userName || 'System',
+          action: 'loan_book_uploaded',
+          notes: created.delta
+            ? `${rows.length} loan rows uploaded (delta: ${created.delta.added} new, ${created.delta.changed} changed, ${created.delta.closed} closed)`
+            : `${rows.length} loan rows uploaded`,
+        },
       });
-    }
+      return created;
+    }, { timeout: 60000 });
 
-    await db.auditLog.create({
-      data: {
-        nbfiId: id,
-        userId: userId || 'system',
-        userName: userName || 'System',
-        action: 'loan_book_uploaded',
-        notes: `${rows.length} loan rows uploaded`,
-      },
-    });
-
-    return NextResponse.json({ ok: true, count: rows.length }, { status: 201 });
+    invalidateAnalytics(id);
+    queueCovenantEvaluation(id);
+    return NextResponse.json({ ok: true, count: rows.length, loanBookId: book.id, kind: book.kind, delta: book.delta }, { status: 201 });
   } catch (err) {
     console.error('[POST /api/nbfis/[id]/loan-book]', err);
     return NextResponse.json({ error: 'Failed to upload loan book' }, { status: 500 });
   }
-}
+});
@@ -0,0 +1,69 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { ingestLoanTape, recordLoanBookUpload, type TapeFormat } from '@/lib/loanTapeIngest';
+import type { LoanBookMode } from '@/lib/loanStore';
+import type { LoanBookUploadMeta } from '@/lib/types';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+export const runtime = 'nodejs';
+export const maxDuration = 300;
+
+// POST /api/nbfis/[id]/loan-book/upload — streaming CSV / XLSX tape ingestion
+// Body: raw file bytes. Query: filename, format=csv|xlsx (inferred from filename), source, userId, userName,
+//        mode=full|delta (default full; delta stores only loans changed since the previous snapshot)
+// Response: NDJSON — { type: 'progress', ... } lines while ingesting, then one { type: 'done' | 'error', ... }
+// The status is sent with the first frame. A tape that ends before its first progress frame (bad header,
+// no valid rows, a small file) answers 201 when accepted, 422 when rejected and 500 on failure. Once
+// progress has streamed the status is already 201, so clients must read the final frame for the outcome.
+export const POST = withRouteMetrics('/api/nbfis/[id]/loan-book/upload', async (request: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = request.nextUrl.searchParams;
+  const filename = sp.get('filename') || 'loanbook.csv';
+  const format: TapeFormat = (sp.get('format') as TapeFormat) || (/\.xlsx?$/i.test(filename) ? 'xlsx' : 'csv');
+  const source = (sp.get('source') as LoanBookUploadMeta['source']) || 'nbfi_portal';
+  const userId = sp.get('userId') || 'system';
+  const userName = sp.get('userName') || 'System';
+  const mode: LoanBookMode = sp.get('mode') === 'delta' ? 'delta' : 'full';
+  const contentLength = Number(request.headers.get('content-length')) || undefined;
+
+  if (!request.body) return NextResponse.json({ error: 'Empty upload' }, { status: 400 });
+  const nbfi = await db.nbfi.findUnique({ where: { id }, select: { id: true } });
+  if (!nbfi) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+
+  const body = request.body;
+  const encoder = new TextEncoder();
+  let firstFrame!: (event: Record<string, unknown>) => void;
+  const first = new Promise<Record<string, unknown>>((resolve) => { firstFrame = resolve; });
+  const stream = new ReadableStream<Uint8Array>({
+    async start(controller) {
+      const send = (event: Record<string, unknown>) => {
+        firstFrame(event);
+        controller.enqueue(encoder.encode(JSON.stringify(event) + '\n'));
+      };
+      try {
+        const result = await ingestLoanTape(id, body, {
+          format,
+          mode,
+          totalBytes: contentLength,
+          onProgress: (p) => send({ type: 'progress', ...p }),
+        });
+
+        if (result.ok) await recordLoanBookUpload(id, result, { filename, source, userId, userName });
+        send({ type: 'done', ...result });
+      } catch (err) {
+        console.error('[POST /api/nbfis/[id]/loan-book/upload]', err);
+        send({ type: 'error', error: 'Failed to ingest loan book' });
+      } finally {
+        controller.close();
+      }
+    },
+  });
+
+  const head = await first;
+  return new Response(stream, {
+    status: head.type === 'error' ? 500 : head.type === 'done' && !head.ok ? 422 : 201,
+    headers: { 'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-store' },
+  });
+});
@@ -0,0 +1,90 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { invalidateAnalytics } from '@/lib/analyticsCache';
+import type { TapeFormat } from '@/lib/loanTapeIngest';
+import {
+  estimateTransitionMatrices, saveTransitionEstimate, findLatestTransitionEstimate,
+} from '@/lib/transitionMatrix';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+export const runtime = 'nodejs';
+export const maxDuration = 300;
+
+// GET /api/nbfis/[id]/loan-history — latest empirical transition matrices (overall, per product, per vintage)
+export const GET = withRouteMetrics('/api/nbfis/[id]/loan-history', async (_req: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  try {
+    const estimate = await findLatestTransitionEstimate(db, id);
+    return NextResponse.json({ estimate });
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/loan-history]', err);
+    return NextResponse.json({ error: 'Failed to fetch transition estimate' }, { status: 500 });
+  }
+});
+
+// POST /api/nbfis/[id]/loan-history — stream a long or wide loan performance history and estimate transitions
+// Body: raw file bytes. Query: filename, format=csv|xlsx (inferred from filename), userId, userName
+// Response: NDJSON — { type: 'progress', ... } lines, then one { type: 'done' | 'error', ... }
+// The status is sent with the first frame: 201 when it is progress or done, 422 when the history holds no
+// transitions, 500 on failure. After progress has streamed, clients must read the final frame for the outcome.
+export const POST = withRouteMetrics('/api/nbfis/[id]/loan-history', async (request: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = request.nextUrl.searchParams;
+  const filename = sp.get('filename') || 'loan_history.csv';
+  const format: TapeFormat = (sp.get('format') as TapeFormat) || (/\.xlsx?$/i.test(filename) ? 'xlsx' : 'csv');
+  const userId = sp.get('userId') || 'system';
+  const userName = sp.get('userName') || 'System';
+  const contentLength = Number(request.headers.get('content-length')) || undefined;
+
+  if (!request.body) return NextResponse.json({ error: 'Empty upload' }, { status: 400 });
+  const nbfi = await db.nbfi.findUnique({ where: { id }, select: { id: true } });
+  if (!nbfi) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+
+  const body = request.body;
+  const encoder = new TextEncoder();
+  let firstFrame!: (status: number) => void;
+  const first = new Promise<number>((resolve) => { firstFrame = resolve; });
+  const stream = new ReadableStream<Uint8Array>({
+    async start(controller) {
+      const send = (event: Record<string, unknown>, status = 201) => {
+        firstFrame(status);
+        controller.enqueue(encoder.encode(JSON.stringify(event) + '\n'));
+      };
+      try {
+        const result = await estimateTransitionMatrices(body, {
+          format,
+          totalBytes: contentLength,
+          onProgress: (p) => send({ type: 'progress', ...p }),
+        });
+        if (result.overall.observations === 0) {
+          send({ type: 'error', error: 'No consecutive monthly observations found', ...result }, 422);
+          return;
+        }
+        const saved = await saveTransitionEstimate(db, id, result, filename);
+        await db.auditLog.create({
+          data: {
+            nbfiId: id,
+            userId,
+            userName,
+            action: 'loan_history_uploaded',
+            notes: `${result.rowsRead} ${result.format}-format rows from ${filename}: ${result.overall.observations} transitions over ${result.periodCount} periods`,
+          },
+        });
+        invalidateAnalytics(id);
+        send({ type: 'done', estimateId: saved.id, ...result });
+      } catch (err) {
+        console.error('[POST /api/nbfis/[id]/loan-history]', err);
+        send({ type: 'error', error: 'Failed to process loan history' }, 500);
+      } finally {
+        controller.close();
+      }
+    },
+  });
+
+  return new Response(stream, {
+    status: await first,
+    headers: { 'Content-Type': 'application/x-ndjson', 'Cache-Control': 'no-store' },
+  });
+});
@@ -0,0 +1,50 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { findLatestLoanBook, LOAN_FIELDS, type LoanField } from '@/lib/loanStore';
+import { loanBookPlan, loanCursorProblem, parseLoanSort, queryLoanPage } from '@/lib/loanQuery';
+import { loadBookRows } from '@/lib/serverAnalytics';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+type Params = { params: Promise<{ id: string }> };
+
+function listParam(sp: URLSearchParams, key: string): string[] | undefined {
+  const v = sp.get(key);
+  return v ? v.split(',').filter(Boolean) : undefined;
+}
+
+// GET /api/nbfis/[id]/loans — one page of the latest loan book
+// Query: limit (100, max 1000), cursor (nextCursor of the previous page) or offset (jump to a row),
+//        sort=-currentBalance,loanId  q=<prefix of loanId or borrowerName>  fields=loanId,currentBalance
+//        dpdBuckets=...  geographies=...  products=...
+// Response: { loanBookId, rows, nextCursor, total } — total only on pages requested without a cursor.
+// 400 for a cursor that is malformed or was issued for a different loan book.
+export const GET = withRouteMetrics('/api/nbfis/[id]/loans', async (req: NextRequest, { params }: Params) => {
+  const { id } = await params;
+  const sp = req.nextUrl.searchParams;
+  try {
+    const book = await findLatestLoanBook(db, id);
+    if (!book) return NextResponse.json({ loanBookId: null, rows: [], nextCursor: null, total: 0 });
+
+    const plan = await loanBookPlan(db, book.id);
+    const cursor = sp.get('cursor');
+    const problem = plan && loanCursorProblem(cursor, plan.paging);
+    if (problem) return NextResponse.json({ error: `Invalid cursor: ${problem}` }, { status: 400 });
+
+    const offset = Number(sp.get('offset'));
+    const page = await queryLoanPage(db, book.id, {
+      fields: listParam(sp, 'fields')?.filter((f): f is LoanField => (LOAN_FIELDS as readonly string[]).includes(f)),
+      dpdBuckets: listParam(sp, 'dpdBuckets'),
+      geographies: listParam(sp, 'geographies'),
+      products: listParam(sp, 'products'),
+      sort: parseLoanSort(sp.get('sort')),
+      search: sp.get('q')?.trim() || undefined,
+      limit: Number(sp.get('limit')) || undefined,
+      cursor,
+      offset: Number.isFinite(offset) && offset > 0 ? Math.floor(offset) : undefined,
+    }, loadBookRows, plan);
+    return NextResponse.json({ loanBookId: book.id, ...page });
+  } catch (err) {
+    console.error('[GET /api/nbfis/[id]/loans]', err);
+    return NextResponse.json({ error: 'Failed to fetch loans' }, { status: 500 });
+  }
+});
@@ -1,11 +1,13 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
 import { toPoolSelectionState } from '@/lib/dbHelpers';
+import { invalidateAnalytics } from '@/lib/analyticsCache';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string }> };
 
 // GET /api/nbfis/[id]/pool-selection
-export async function GET(_req: NextRequest, { params }: Params) {
+export const GET = withRouteMetrics('/api/nbfis/[id]/pool-selection', async (_req: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const ps = await db.poolSelection.findUnique({ where: { nbfiId: id } });
@@ -15,11 +17,11 @@ export async function GET(_req: NextRequest, { params }: Params) {
     console.error('[GET /api/nbfis/[id]/pool-selection]', err);
     return NextResponse.json({ error: 'Failed to fetch pool selection' }, { status: 500 });
   }
-}
+});
 
 // PUT /api/nbfis/[id]/pool-selection — upsert pool selection
 // Body: { excludedSegments, filterSnapshot, confirmedAt?, userId, userName }
-export async function PUT(request: NextRequest, { params }: Params) {
+export const PUT = withRouteMetrics('/api/nbfis/[id]/pool-selection', async (request: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const body = await request.json();
@@ -40,6 +42,8 @@ export async function PUT(request: NextRequest, { params }: Params) {
       },
     });
 
+    invalidateAnalytics(id);
+
     if (confirmedAt) {
       await db.nbfi.update({ where: { id }, data: { status: 'pool_selected' } });
       await db.auditLog.create({
@@ -59,4 +63,4 @@ export async function PUT(request: NextRequest, { params }: Params) {
     console.error('[PUT /api/nbfis/[id]/pool-selection]', err);
     return NextResponse.json({ error: 'Failed to save pool selection' }, { status: 500 });
   }
-}
+});
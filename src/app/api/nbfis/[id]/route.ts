@@ -1,25 +1,79 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
-import { toNBFIRecord, NBFI_INCLUDE } from '@/lib/dbHelpers';
+import {
+  nbfiRecordJson, toCovenantDefs, toCovenantReadings, toDocuments, toEarlyWarnings, toNbfiSummary, toPoolSelectionState,
+  cursorPage, cursorPageArgs, COVENANT_READING_SELECT, NBFI_COVENANTS_SELECT, NBFI_DETAIL_INCLUDE, NBFI_DOCUMENTS_SELECT,
+  NBFI_SUMMARY_SELECT,
+} from '@/lib/dbHelpers';
+import { jsonTextWithEtag, jsonWithEtag } from '@/lib/httpCache';
+import { span, withRouteMetrics } from '@/lib/instrumentation';
+import { queueCovenantEvaluation } from '@/lib/covenantEngine';
 
 type Params = { params: Promise<{ id: string }> };
 
-// GET /api/nbfis/[id]
-export async function GET(_req: NextRequest, { params }: Params) {
+const READINGS_PAGE = 200;
+const MAX_READINGS_PAGE = 1000;
+
+// GET /api/nbfis/[id] — one NBFI; every view honours If-None-Match
+// Default (view=detail): full NBFIRecord plus poolSelection.
+// view=summary: the NbfiSummary row of the list view.
+// view=covenants: definitions, latest status per covenant, early warnings and one page of
+//   readings, newest first. Query: limit (200, max 1000), cursor (nextCursor of the previous page).
+// view=documents: document requirements with their submissions.
+export const GET = withRouteMetrics('/api/nbfis/[id]', async (req: NextRequest, { params }: Params) => {
   const { id } = await params;
+  const sp = req.nextUrl.searchParams;
   try {
-    const n = await db.nbfi.findUnique({ where: { id }, include: NBFI_INCLUDE });
-    if (!n) return NextResponse.json({ error: 'Not found' }, { status: 404 });
-    return NextResponse.json(toNBFIRecord(n));
+    switch (sp.get('view')) {
+      case 'summary': {
+        const n = await db.nbfi.findUnique({ where: { id }, select: NBFI_SUMMARY_SELECT });
+        if (!n) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+        return jsonWithEtag(req, toNbfiSummary(n));
+      }
+      case 'covenants': {
+        const { limit, args } = cursorPageArgs(sp, READINGS_PAGE, MAX_READINGS_PAGE);
+        const [n, readings] = await Promise.all([
+          db.nbfi.findUnique({ where: { id }, select: NBFI_COVENANTS_SELECT }),
+          db.covenantReading.findMany({
+            where: { nbfiId: id },
+            select: COVENANT_READING_SELECT,
+            orderBy: [{ date: 'desc' }, { id: 'desc' }],
+            ...args,
+          }),
+        ]);
+        if (!n) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+        const page = cursorPage(readings, limit);
+        return jsonWithEtag(req, {
+          covenants: toCovenantDefs(n.covenantDefs),
+          statuses: n.covenantStatuses,
+          earlyWarnings: toEarlyWarnings(n.earlyWarningAlerts),
+          readings: toCovenantReadings(page.items),
+          nextCursor: page.nextCursor,
+        });
+      }
+      case 'documents': {
+        const n = await db.nbfi.findUnique({ where: { id }, select: NBFI_DOCUMENTS_SELECT });
+        if (!n) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+        return jsonWithEtag(req, { documents: toDocuments(n.documents) });
+      }
+      default: {
+        const n = await db.nbfi.findUnique({ where: { id }, include: NBFI_DETAIL_INCLUDE });
+        if (!n) return NextResponse.json({ error: 'Not found' }, { status: 404 });
+        const json = span('json', () => nbfiRecordJson(n, {
+          poolSelection: n.poolSelection ? toPoolSelectionState(n.poolSelection) : null,
+        }));
+        return jsonTextWithEtag(req, json);
+      }
+    }
   } catch (err) {
     console.error('[GET /api/nbfis/[id]]', err);
     return NextResponse.json({ error: 'Failed to fetch NBFI' }, { status: 500 });
   }
-}
+});
 
 // PATCH /api/nbfis/[id] — generic field updates
 // Accepts: { field, value } where field is a scalar top-level JSON column
-export async function PATCH(request: NextRequest, { params }: Params) {
+export const PATCH = withRouteMetrics('/api/nbfis/[id]', async (request: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const body = await request.json();
@@ -48,15 +102,17 @@ export async function PATCH(request: NextRequest, { params }: Params) {
     }
 
     await db.nbfi.update({ where: { id }, data: updateData });
+    // Covenant metrics are derived from these columns
+    if ('monitoringData' in body || 'financialData' in body) queueCovenantEvaluation(id);
     return NextResponse.json({ ok: true });
   } catch (err) {
     console.error('[PATCH /api/nbfis/[id]]', err);
     return NextResponse.json({ error: 'Failed to update NBFI' }, { status: 500 });
   }
-}
+});
 
 // DELETE /api/nbfis/[id]
-export async function DELETE(_req: NextRequest, { params }: Params) {
+export const DELETE = withRouteMetrics('/api/nbfis/[id]', async (_req: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     await db.nbfi.delete({ where: { id } });
@@ -65,4 +121,4 @@ export async function DELETE(_req: NextRequest, { params }: Params) {
     console.error('[DELETE /api/nbfis/[id]]', err);
     return NextResponse.json({ error: 'Failed to delete NBFI' }, { status: 500 });
   }
-}
+});
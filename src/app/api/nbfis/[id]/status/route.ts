@@ -1,11 +1,12 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
+import { withRouteMetrics } from '@/lib/instrumentation';
 
 type Params = { params: Promise<{ id: string }> };
 
 // PATCH /api/nbfis/[id]/status
 // Body: { status, userId, userName, recommendation?, approverComments?, notes? }
-export async function PATCH(request: NextRequest, { params }: Params) {
+export const PATCH = withRouteMetrics('/api/nbfis/[id]/status', async (request: NextRequest, { params }: Params) => {
   const { id } = await params;
   try {
     const body = await request.json();
@@ -39,4 +40,4 @@ export async function PATCH(request: NextRequest, { params }: Params) {
     console.error('[PATCH /api/nbfis/[id]/status]', err);
     return NextResponse.json({ error: 'Failed to update status' }, { status: 500 });
   }
-}
+});
@@ -1,42 +1,71 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { db } from '@/lib/db';
-import { toNBFIRecord, toPoolSelectionState, NBFI_INCLUDE, parseLoanRows } from '@/lib/dbHelpers';
+import {
+  cursorPage, cursorPageArgs, nbfiRecordJson, toNbfiSummary, toPoolSelectionState, NBFI_DETAIL_INCLUDE, NBFI_SUMMARY_SELECT,
+} from '@/lib/dbHelpers';
+import { jsonTextWithEtag, jsonWithEtag } from '@/lib/httpCache';
+import { readLoanRows } from '@/lib/loanStore';
 import { v4 as uuidv4 } from 'uuid';
+import { span, withRouteMetrics } from '@/lib/instrumentation';
 
-// GET /api/nbfis — returns all NBFIs + loanBooks + poolSelections for AppContext hydration
-export async function GET() {
+const SUMMARY_PAGE = 100;
+const MAX_SUMMARY_PAGE = 500;
+
+// GET /api/nbfis — startup hydration
+// Default (view=summary): paginated NbfiSummary list — status, counts, latest loan-book totals and
+//   latest covenant status; no loans. Query: limit (100, max 500), cursor (nextCursor of the previous page).
+//   Detail and loans are fetched per NBFI from /api/nbfis/[id] and /api/nbfis/[id]/loan-book.
+// view=full: every NBFIRecord with its latest loan book and pool selection in one response (legacy).
+// Both honour If-None-Match.
+export const GET = withRouteMetrics('/api/nbfis', async (request: NextRequest) => {
+  const sp = request.nextUrl.searchParams;
   try {
-    const nbfis = await db.nbfi.findMany({
-      include: {
-        ...NBFI_INCLUDE,
-        loanBooks: { orderBy: { uploadedAt: 'asc' } },
-      },
-      orderBy: { createdAt: 'asc' },
+    if (sp.get('view') === 'full') return await getFull(request);
+
+    const { limit, args } = cursorPageArgs(sp, SUMMARY_PAGE, MAX_SUMMARY_PAGE);
+    const rows = await db.nbfi.findMany({
+      select: NBFI_SUMMARY_SELECT,
+      orderBy: [{ createdAt: 'asc' }, { id: 'asc' }],
+      ...args,
     });
+    const page = cursorPage(rows, limit);
+    return jsonWithEtag(request, { nbfis: page.items.map(toNbfiSummary), nextCursor: page.nextCursor });
+  } catch (err) {
+    console.error('[GET /api/nbfis]', err);
+    return NextResponse.json({ error: 'Failed to load NBFIs' }, { status: 500 });
+  }
+});
 
-    const nbfiRecords = nbfis.map(toNBFIRecord);
+async function getFull(request: NextRequest) {
+  const nbfis = await db.nbfi.findMany({
+    include: {
+      ...NBFI_DETAIL_INCLUDE,
+      loanBooks: { where: { status: 'ready' }, orderBy: { uploadedAt: 'desc' }, take: 1, select: { id: true } },
+    },
+    orderBy: { createdAt: 'asc' },
+  });
 
-    const loanBooks: Record<string, unknown[]> = {};
-    const poolSelections: Record<string, unknown> = {};
+  const loanBooks: Record<string, unknown[]> = {};
+  const poolSelections: Record<string, unknown> = {};
 
-    for (const n of nbfis) {
-      const rows = parseLoanRows(n.loanBooks);
-      if (rows.length) loanBooks[n.id] = rows;
+  for (const n of nbfis) {
+    const rows = n.loanBooks.length ? await readLoanRows(db, n.loanBooks[0].id) : [];
+    if (rows.length) loanBooks[n.id] = rows;
 
-      if (n.poolSelection) {
-        poolSelections[n.id] = toPoolSelectionState(n.poolSelection);
-      }
+    if (n.poolSelection) {
+      poolSelections[n.id] = toPoolSelectionState(n.poolSelection);
     }
-
-    return NextResponse.json({ nbfis: nbfiRecords, loanBooks, poolSelections });
-  } catch (err) {
-    console.error('[GET /api/nbfis]', err);
-    return NextResponse.json({ error: 'Failed to load NBFIs' }, { status: 500 });
   }
+
+  // Records are serialised with their JSON columns spliced in undecoded
+  const json = span('json', () =>
+    `{"nbfis":[${nbfis.map((n) => nbfiRecordJson(n)).join(',')}],"loanBooks":${JSON.stringify(loanBooks)},"poolSelections":${JSON.stringify(poolSelections)}}`,
+  );
+  return jsonTextWithEtag(request, json);
 }
 
 // POST /api/nbfis — create a new NBFI
-export async function POST(request: NextRequest) {
+export const POST = withRouteMetrics('/api/nbfis', async (request: NextRequest) => {
   try {
     const body = await request.json();
     const { name, keyContacts, fundingAmount, description, userId, userName } = body;
@@ -73,4 +102,4 @@ export async function POST(request: NextRequest) {
     console.error('[POST /api/nbfis]', err);
     return NextResponse.json({ error: 'Failed to create NBFI' }, { status: 500 });
   }
-}
+});
@@ -0,0 +1,43 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { db } from '@/lib/db';
+import { jsonWithEtag } from '@/lib/httpCache';
+import {
+  ensurePortfolioRollup, queryPortfolioRollup, ROLLUP_DIMENSIONS, type RollupDimension,
+} from '@/lib/portfolioRollup';
+import { withRouteMetrics } from '@/lib/instrumentation';
+
+export const runtime = 'nodejs';
+
+function list(sp: URLSearchParams, name: string): string[] | undefined {
+  const v = sp.get(name);
+  return v ? v.split(',').map((s) => s.trim()).filter(Boolean) : undefined;
+}
+
+// GET /api/portfolio/rollup — portfolio totals from the materialised rollup cells
+// Query: groupBy (comma list of nbfiId, transactionId, dpdBucket, geography, product, vintage; default nbfiId),
+//        nbfiIds, transactionIds, dpdBuckets, geographies, products, vintages (comma lists). Honours If-None-Match.
+// Response: { groups: RollupGroup[], totals: RollupGroup, dimensions: { nbfiId, geography, product, vintage } }
+export const GET = withRouteMetrics('/api/portfolio/rollup', async (request: NextRequest) => {
+  const sp = request.nextUrl.searchParams;
+  const groupBy = (list(sp, 'groupBy') ?? ['nbfiId']) as RollupDimension[];
+  const unknown = groupBy.filter((d) => !(ROLLUP_DIMENSIONS as readonly string[]).includes(d));
+  if (unknown.length) {
+    return NextResponse.json({ error: `Unknown groupBy dimension: ${unknown.join(', ')}` }, { status: 400 });
+  }
+
+  try {
+    await ensurePortfolioRollup();
+    const result = await queryPortfolioRollup(db, groupBy, {
+      nbfiIds: list(sp, 'nbfiIds'),
+      transactionIds: list(sp, 'transactionIds'),
+      dpdBuckets: list(sp, 'dpdBuckets'),
+      geographies: list(sp, 'geographies'),
+      products: list(sp, 'products'),
+      vintages: list(sp, 'vintages'),
+    });
+    return jsonWithEtag(request, result);
+  } catch (err) {
+    console.error('[GET /api/portfolio/rollup]', err);
+    return NextResponse.json({ error: 'Failed to fetch portfolio rollup' }, { status: 500 });
+  }
+});
@@ -1,6 +1,6 @@
 'use client';
 
-import { useApp } from '@/context/AppContext';
+import { useApp, usePortfolioRollup } from '@/context/AppContext';
 import { useRouter } from 'next/navigation';
 import { useEffect, useState, useMemo } from 'react';
 import Sidebar from '@/components/Sidebar';
@@ -11,6 +11,8 @@ import {
   FileText, Activity, Wifi,
 } from 'lucide-react';
 import type { NBFIRecord } from '@/lib/types';
+import type { NbfiSummary } from '@/lib/dbHelpers';
+import type { LoanLevelRow } from '@/lib/types';
 import { TRANSACTION_MAP } from '@/lib/seedTransactions';
 import { estimateLoss } from '@/lib/rollRate';
 
@@ -35,10 +37,27 @@ function StatusBadge({ status }: { status: string }) {
   return <span className={`badge badge-${status}`}>{labels[status] || status}</span>;
 }
 
+// Latest covenant status counts: the server's precomputed CovenantStatus rows (via the NBFI summary),
+// or a scan of the local readings for NBFIs the server has not returned yet
+function covenantCounts(n: NBFIRecord, summary: NbfiSummary | undefined) {
+  if (summary) {
+    return { breached: summary.covenantsBreached, watch: summary.covenantsWatch, compliant: summary.covenantsCompliant };
+  }
+  const latest = new Map<string, { date: string; status: string }>();
+  for (const r of n.covenantReadings ?? []) {
+    const ex = latest.get(r.covenantId);
+    if (!ex || r.date > ex.date) latest.set(r.covenantId, r);
+  }
+  const counts = { breached: 0, watch: 0, compliant: 0 };
+  latest.forEach(r => { counts[r.status as keyof typeof counts]++; });
+  return counts;
+}
+
 export default function DashboardPage() {
-  const { user, nbfis, deleteNBFI, loanBookData } = useApp();
+  const { user, nbfis, deleteNBFI, loanBookData, nbfiSummaries } = useApp();
   const router = useRouter();
   const [deleteTarget, setDeleteTarget] = useState<NBFIRecord | null>(null);
+  const rollup = usePortfolioRollup(['nbfiId']);
 
   useEffect(() => {
     if (!user) router.push('/');
@@ -60,6 +79,37 @@ export default function DashboardPage() {
     draft: nbfis.filter(n => ['draft', 'uploading', 'spreading'].includes(n.status)).length,
   };
 
+  // Per-NBFI loan book stats from the materialised rollup; loans already loaded in this
+  // session and the stored book totals cover NBFIs the rollup does not (yet) hold
+  const loanStats = useMemo(() => {
+    const byNbfi = new Map((rollup?.groups ?? []).map(g => [g.key.nbfiId, g]));
+    const out: Record<string, { loanCount: number; balance: number; par30: number; lossRate: number }> = {};
+    nbfis.forEach(n => {
+      const g = byNbfi.get(n.id);
+      if (g && g.loanCount > 0) {
+        out[n.id] = { loanCount: g.loanCount, balance: g.balance, par30: (g.par30Count / g.loanCount) * 100, lossRate: g.balance > 0 ? g.expectedLoss / g.balance : 0 };
+        return;
+      }
+      const txIds = TRANSACTION_MAP[n.id] || [n.id];
+      const loaded: LoanLevelRow[] = [];
+      let loanCount = 0, balance = 0;
+      for (const txId of txIds) {
+        const rows = loanBookData[txId];
+        if (rows?.length) {
+          for (const r of rows) loaded.push(r);
+        } else if (nbfiSummaries[txId]?.loanBook) {
+          loanCount += nbfiSummaries[txId].loanBook!.rowCount;
+          balance += nbfiSummaries[txId].loanBook!.totalBalance;
+        }
+      }
+      loanCount += loaded.length;
+      balance += loaded.reduce((s, r) => s + r.currentBalance, 0);
+      const par30 = loaded.length > 0 ? (loaded.filter(r => r.dpdAsOfReportingDate > 30).length / loaded.length) * 100 : 0;
+      out[n.id] = { loanCount, balance, par30, lossRate: loaded.length > 0 ? estimateLoss(loaded).rate : 0 };
+    });
+    return out;
+  }, [nbfis, rollup, loanBookData, nbfiSummaries]);
+
   const portfolioSummary = useMemo(() => {
     let totalExposure = 0;
     let totalLoanBookBalance = 0;
@@ -71,29 +121,16 @@ export default function DashboardPage() {
 
     nbfis.forEach(n => {
       totalExposure += n.fundingAmount;
-
-      const txIds = TRANSACTION_MAP[n.id] || [n.id];
-      const allNbfiLoans = txIds.flatMap(txId => loanBookData[txId] || []);
-      if (allNbfiLoans.length) {
-        totalLoanBookBalance += allNbfiLoans.reduce((s, r) => s + r.currentBalance, 0);
-        totalLoans += allNbfiLoans.length;
-      }
+      totalLoanBookBalance += loanStats[n.id]?.balance ?? 0;
+      totalLoans += loanStats[n.id]?.loanCount ?? 0;
 
       if (n.documents) {
         overdueDocCount += n.documents.filter(d => d.status === 'overdue').length;
       }
 
-      if (n.covenants && n.covenantReadings) {
-        const latestMap = new Map<string, { status: string }>();
-        for (const r of n.covenantReadings) {
-          const ex = latestMap.get(r.covenantId);
-          if (!ex || r.date > (ex as { date?: string }).date!) latestMap.set(r.covenantId, r);
-        }
-        latestMap.forEach(r => {
-          if (r.status === 'breached') breachedCovenantCount++;
-          else if (r.status === 'compliant') compliantCovenantCount++;
-        });
-      }
+      const cov = covenantCounts(n, nbfiSummaries[n.id]);
+      breachedCovenantCount += cov.breached;
+      compliantCovenantCount += cov.compliant;
 
       if (['monitoring', 'setup_complete', 'approved', 'pool_selected'].includes(n.status)) {
         activeNbfis++;
@@ -101,7 +138,7 @@ export default function DashboardPage() {
     });
 
     return { totalExposure, totalLoanBookBalance, totalLoans, overdueDocCount, breachedCovenantCount, compliantCovenantCount, activeNbfis };
-  }, [nbfis, loanBookData]);
+  }, [nbfis, loanStats, nbfiSummaries]);
 
   return (
     <div className="flex min-h-screen">
@@ -150,23 +187,13 @@ export default function DashboardPage() {
             <tbody>
               {nbfis.map(nbfi => {
                 const txIds = TRANSACTION_MAP[nbfi.id] || [nbfi.id];
-                const allLoans = txIds.flatMap(txId => loanBookData[txId] || []);
-                const loanCount = allLoans.length;
-                const loanBalance = allLoans.reduce((s, r) => s + r.currentBalance, 0);
-                const par30 = loanCount > 0 ? (allLoans.filter(r => r.dpdAsOfReportingDate > 30).length / loanCount * 100) : 0;
-                const loss = loanCount > 0 ? estimateLoss(allLoans) : { rate: 0 };
+                const { loanCount, balance: loanBalance, par30, lossRate } = loanStats[nbfi.id] ?? { loanCount: 0, balance: 0, par30: 0, lossRate: 0 };
+                const loss = { rate: lossRate };
 
                 let covenantLabel = '—';
                 let covenantColor = 'text-gray-400';
-                if (nbfi.covenantReadings?.length) {
-                  const latestMap = new Map<string, string>();
-                  for (const r of nbfi.covenantReadings) {
-                    const ex = latestMap.get(r.covenantId);
-                    if (!ex || r.date > ex) latestMap.set(r.covenantId, r.status);
-                  }
-                  const statuses = Array.from(latestMap.values());
-                  const breached = statuses.filter(s => s === 'breached').length;
-                  const watch = statuses.filter(s => s === 'watch').length;
+                const { breached, watch, compliant } = covenantCounts(nbfi, nbfiSummaries[nbfi.id]);
+                if (breached + watch + compliant > 0) {
                   if (breached > 0) { covenantLabel = `${breached} breached`; covenantColor = 'text-red-600'; }
                   else if (watch > 0) { covenantLabel = `${watch} watch`; covenantColor = 'text-amber-600'; }
                   else { covenantLabel = 'All OK'; covenantColor = 'text-green-600'; }
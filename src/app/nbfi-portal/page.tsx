@@ -1,6 +1,6 @@
 'use client';
 
-import { useApp } from '@/context/AppContext';
+import { useApp, useLoanBooks } from '@/context/AppContext';
 import { useRouter } from 'next/navigation';
 import { useEffect } from 'react';
 import Sidebar from '@/components/Sidebar';
@@ -12,6 +12,7 @@ import {
 
 export default function NBFIPortalPage() {
   const { user, getNBFI, loanBookData } = useApp();
+  useLoanBooks([user?.nbfiId]);
   const router = useRouter();
 
   useEffect(() => {
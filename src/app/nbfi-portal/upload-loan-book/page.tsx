@@ -16,7 +16,7 @@ import {
   getErrorTypeLabel,
 } from '@/lib/integrationSchemas';
 import type { ValidationTest } from '@/lib/integrationSchemas';
-import { MOCK_LOAN_BOOK } from '@/lib/mockLoanBook';
+import type { IngestResult } from '@/lib/loanTapeIngest';
 
 type TabId = 'upload' | 'mapping' | 'testing' | 'history';
 type UploadType = 'initial_history' | 'daily_tape';
@@ -96,6 +96,23 @@ function StageList({ stages, current }: { stages: string[]; current: number }) {
   );
 }
 
+type UploadProgress = { rowsRead: number; bytesRead: number; totalBytes: number };
+
+// Live counters from the route's NDJSON progress frames
+function StreamProgress({ progress }: { progress: UploadProgress }) {
+  const pct = progress.totalBytes ? Math.min(100, (progress.bytesRead / progress.totalBytes) * 100) : 0;
+  return (
+    <div className="mb-2">
+      <div className="w-full bg-gray-100 rounded-full h-2 mb-2">
+        <div className="bg-blue-500 h-2 rounded-full transition-all duration-300" style={{ width: `${pct}%` }} />
+      </div>
+      <p className="text-xs text-gray-500">
+        {progress.rowsRead.toLocaleString()} rows read · {(progress.bytesRead / 1e6).toFixed(1)} of {(progress.totalBytes / 1e6).toFixed(1)} MB
+      </p>
+    </div>
+  );
+}
+
 function ProgressBar({ value, max }: { value: number; max: number }) {
   return (
     <div className="w-full bg-gray-100 rounded-full h-2 mb-3">
@@ -167,7 +184,7 @@ function FormatGuide() {
 
 export default function NBFIUploadLoanBookPage() {
   const router = useRouter();
-  const { user, getNBFI, setLoanBookData, setLoanBookMeta } = useApp();
+  const { user, getNBFI, setLoanBookMeta, uploadLoanTape, uploadLoanHistory } = useApp();
   const nbfi = user?.nbfiId ? getNBFI(user.nbfiId) : null;
 
   const [activeTab, setActiveTab] = useState<TabId>('upload');
@@ -178,8 +195,10 @@ export default function NBFIUploadLoanBookPage() {
   const [dragOver, setDragOver] = useState(false);
   const [file, setFile] = useState<File | null>(null);
   const [processing, setProcessing] = useState(false);
-  const [stageIndex, setStageIndex] = useState(-1);
+  const [progress, setProgress] = useState<UploadProgress | null>(null);
   const [done, setDone] = useState(false);
+  const [uploadError, setUploadError] = useState<string | null>(null);
+  const [tapeResult, setTapeResult] = useState<IngestResult | null>(null);
   const [coverageSummary, setCoverageSummary] = useState<{
     periods: number; start: string; end: string; rows: number; format: string;
   } | null>(null);
@@ -208,29 +227,34 @@ export default function NBFIUploadLoanBookPage() {
 
   const handleFile = useCallback(async (f: File) => {
     if (!nbfi) return;
-    setFile(f); setProcessing(true); setDone(false); setStageIndex(0);
-    const stages = uploadType === 'initial_history' ? HISTORY_STAGES : TAPE_STAGES;
-    for (let i = 0; i < stages.length; i++) {
-      await new Promise(r => setTimeout(r, 600 + Math.random() * 400));
-      setStageIndex(i);
-    }
-    const rows = MOCK_LOAN_BOOK.slice(0, 520);
-    const totalBal = rows.reduce((s, r) => s + r.currentBalance, 0);
+    setFile(f); setProcessing(true); setDone(false); setUploadError(null); setTapeResult(null);
+    setProgress({ rowsRead: 0, bytesRead: 0, totalBytes: f.size });
+    const onProgress = (p: { rowsRead: number; bytesRead: number }) => setProgress({ rowsRead: p.rowsRead, bytesRead: p.bytesRead, totalBytes: f.size });
     if (uploadType === 'initial_history') {
-      setCoverageSummary({ periods: 24, start: 'Jan 2022', end: 'Dec 2023', rows: rows.length * 24, format: historyFormat === 'auto' ? 'Long (auto-detected)' : historyFormat === 'wide' ? 'Wide' : 'Long' });
-      setLoanBookData(nbfi.id, rows);
+      const result = await uploadLoanHistory(nbfi.id, f, onProgress);
+      setProcessing(false);
+      if (result.type !== 'done') { setUploadError(result.error); return; }
+      const formatLabel = result.format === 'wide' ? 'Wide' : 'Long';
+      setCoverageSummary({
+        periods: result.periodCount, start: result.periodStart ?? '—', end: result.periodEnd ?? '—', rows: result.rowsRead,
+        format: historyFormat === 'auto' ? `${formatLabel} (auto-detected)` : formatLabel,
+      });
       setLoanBookMeta(nbfi.id, {
         source: 'initial_history', uploadedAt: new Date().toISOString(), uploadedBy: user?.name ?? 'NBFI User',
-        rowCount: rows.length * 24, totalBalance: totalBal, filename: f.name,
-        historyMonths: 24, periodCount: 24, dateRangeStart: '2022-01', dateRangeEnd: '2023-12',
-        inputFormat: historyFormat === 'auto' ? 'long' : historyFormat,
+        rowCount: result.rowsRead, totalBalance: nbfi.loanBookMeta?.totalBalance ?? 0, filename: f.name,
+        historyMonths: result.periodCount, periodCount: result.periodCount,
+        dateRangeStart: result.periodStart ?? undefined, dateRangeEnd: result.periodEnd ?? undefined,
+        inputFormat: result.format,
       });
     } else {
-      setLoanBookData(nbfi.id, rows);
-      setLoanBookMeta(nbfi.id, { source: 'nbfi_portal', uploadedAt: new Date().toISOString(), uploadedBy: user?.name ?? 'NBFI User', rowCount: rows.length, totalBalance: totalBal, filename: f.name, inputFormat: 'snapshot' });
+      const result = await uploadLoanTape(nbfi.id, f, 'nbfi_portal', onProgress);
+      setProcessing(false);
+      if (result.type !== 'done') { setUploadError(result.error); return; }
+      setTapeResult(result);
+      if (!result.ok) { setUploadError('The tape was rejected — fix the failing checks below and upload it again.'); return; }
     }
-    setProcessing(false); setDone(true);
-  }, [nbfi, uploadType, historyFormat, user, setLoanBookData, setLoanBookMeta]);
+    setDone(true);
+  }, [nbfi, uploadType, historyFormat, user, setLoanBookMeta, uploadLoanTape, uploadLoanHistory]);
 
   const handleTestRun = async () => {
     if (!testFile) return;
@@ -313,7 +337,7 @@ export default function NBFIUploadLoanBookPage() {
                 { id: 'initial_history' as UploadType, label: 'Loan Performance History', sub: '12–36 months · Initial upload · Long or Wide format', accent: 'blue' },
                 { id: 'daily_tape' as UploadType, label: 'Daily Loan Tape', sub: 'Current snapshot · Ongoing · One row per loan', accent: 'green' },
               ]).map(opt => (
-                <button key={opt.id} onClick={() => { setUploadType(opt.id); setFile(null); setDone(false); setCoverageSummary(null); }}
+                <button key={opt.id} onClick={() => { setUploadType(opt.id); setFile(null); setDone(false); setCoverageSummary(null); setUploadError(null); setTapeResult(null); }}
                   className={`text-left p-4 rounded-lg border-2 transition-colors ${uploadType === opt.id ? `border-${opt.accent}-500 bg-${opt.accent}-50` : 'border-gray-200 bg-white hover:border-gray-300'}`}>
                   <p className={`text-sm font-semibold ${uploadType === opt.id ? `text-${opt.accent}-700` : 'text-gray-700'}`}>{opt.label}</p>
                   <p className="text-xs text-gray-500 mt-0.5">{opt.sub}</p>
@@ -339,7 +363,7 @@ export default function NBFIUploadLoanBookPage() {
               </div>
             )}
 
-            {!file && !processing && !done && (
+            {(!file || uploadError) && !processing && !done && (
               <div
                 className={`border-2 border-dashed rounded-xl p-10 text-center transition-colors ${dragOver ? 'border-blue-400 bg-blue-50' : 'border-gray-300 bg-white'}`}
                 onDragOver={e => { e.preventDefault(); setDragOver(true); }}
@@ -361,8 +385,24 @@ export default function NBFIUploadLoanBookPage() {
             {processing && (
               <div className="bg-white border border-gray-200 rounded-xl p-6">
                 <p className="text-sm font-semibold text-gray-700 mb-1">Processing: <span className="text-gray-500 font-normal">{file?.name}</span></p>
-                <ProgressBar value={stageIndex} max={(uploadType === 'initial_history' ? HISTORY_STAGES : TAPE_STAGES).length} />
-                <StageList stages={uploadType === 'initial_history' ? HISTORY_STAGES : TAPE_STAGES} current={stageIndex} />
+                {progress && <StreamProgress progress={progress} />}
+              </div>
+            )}
+
+            {uploadError && !processing && (
+              <div className="bg-white border border-red-200 rounded-xl p-6">
+                <div className="flex items-center gap-2 mb-2"><AlertCircle className="w-5 h-5 text-red-500" /><p className="font-semibold text-red-700">Upload failed: <span className="font-normal text-gray-600">{file?.name}</span></p></div>
+                <p className="text-xs text-gray-600 mb-3">{uploadError}</p>
+                {tapeResult && (
+                  <ul className="space-y-1">
+                    {tapeResult.tests.filter(t => !t.pass).map(t => (
+                      <li key={t.name} className={`flex items-start gap-2 text-xs ${t.severity === 'error' ? 'text-red-600' : 'text-yellow-700'}`}>
+                        <AlertTriangle className="w-3.5 h-3.5 mt-0.5 flex-shrink-0" />
+                        <span>{t.name}{t.detail ? ` — ${t.detail}` : ''}</span>
+                      </li>
+                    ))}
+                  </ul>
+                )}
               </div>
             )}
 
@@ -390,32 +430,31 @@ export default function NBFIUploadLoanBookPage() {
               </div>
             )}
 
-            {done && uploadType === 'daily_tape' && (
+            {done && uploadType === 'daily_tape' && tapeResult && (
               <div className="bg-white border border-green-200 rounded-xl p-6">
-                <div className="flex items-center gap-2 mb-3"><CheckCircle className="w-5 h-5 text-green-500" /><p className="font-semibold text-green-700">Daily Loan Tape uploaded — {MOCK_LOAN_BOOK.length.toLocaleString()} rows loaded</p></div>
-                <div className="overflow-x-auto rounded border border-gray-100 mb-3">
-                  <table className="w-full text-xs">
-                    <thead className="bg-gray-50 border-b"><tr>{['Loan ID','App ID','DPD','Balance','Disbursed','Overdue','Rate','Geography','Product'].map(h => <th key={h} className="px-3 py-2 text-left text-gray-500 font-medium">{h}</th>)}</tr></thead>
-                    <tbody>
-                      {MOCK_LOAN_BOOK.slice(0, 5).map((row, i) => (
-                        <tr key={i} className={`border-t ${i % 2 ? 'bg-gray-50' : ''}`}>
-                          <td className="px-3 py-1.5 font-mono">{row.loanId}</td>
-                          <td className="px-3 py-1.5 font-mono">{row.applicationId}</td>
-                          <td className="px-3 py-1.5">
-                            <span className={`px-1.5 py-0.5 rounded text-xs font-medium ${row.dpdAsOfReportingDate === 0 ? 'bg-green-100 text-green-700' : row.dpdAsOfReportingDate <= 30 ? 'bg-yellow-100 text-yellow-700' : 'bg-red-100 text-red-700'}`}>{row.dpdAsOfReportingDate}</span>
-                          </td>
-                          <td className="px-3 py-1.5">{row.currentBalance.toLocaleString()}</td>
-                          <td className="px-3 py-1.5">{row.loanDisbursedAmount.toLocaleString()}</td>
-                          <td className="px-3 py-1.5">{row.totalOverdueAmount.toLocaleString()}</td>
-                          <td className="px-3 py-1.5">{row.interestRate}%</td>
-                          <td className="px-3 py-1.5">{row.geography ?? '—'}</td>
-                          <td className="px-3 py-1.5">{row.product ?? '—'}</td>
-                        </tr>
-                      ))}
-                    </tbody>
-                  </table>
+                <div className="flex items-center gap-2 mb-3"><CheckCircle className="w-5 h-5 text-green-500" /><p className="font-semibold text-green-700">Daily Loan Tape uploaded — {tapeResult.rowCount.toLocaleString()} loans in the book</p></div>
+                <div className="grid grid-cols-4 gap-3 mb-4">
+                  {[
+                    { label: 'Rows Read', value: tapeResult.rowsRead.toLocaleString() },
+                    { label: 'Rows Rejected', value: tapeResult.rowsRejected.toLocaleString() },
+                    { label: 'Total Balance', value: `${(tapeResult.totalBalance / 1e6).toFixed(1)}M` },
+                    { label: 'Stored As', value: tapeResult.delta ? `Delta (${tapeResult.delta.changed.toLocaleString()} changed)` : 'Full snapshot' },
+                  ].map(m => (
+                    <div key={m.label} className="bg-green-50 rounded-lg p-3 text-center">
+                      <p className="text-lg font-bold text-green-700">{m.value}</p>
+                      <p className="text-xs text-green-600">{m.label}</p>
+                    </div>
+                  ))}
                 </div>
-                <button onClick={() => { setFile(null); setDone(false); }} className="text-xs text-gray-600 border border-gray-200 rounded px-3 py-1.5 hover:bg-gray-50">Upload another file</button>
+                <ul className="space-y-1 mb-3">
+                  {tapeResult.tests.map(t => (
+                    <li key={t.name} className={`flex items-start gap-2 text-xs ${t.pass ? 'text-green-600' : t.severity === 'error' ? 'text-red-600' : 'text-yellow-700'}`}>
+                      {t.pass ? <CheckCircle className="w-3.5 h-3.5 mt-0.5 flex-shrink-0" /> : <AlertTriangle className="w-3.5 h-3.5 mt-0.5 flex-shrink-0" />}
+                      <span>{t.name}{t.detail ? ` — ${t.detail}` : ''}</span>
+                    </li>
+                  ))}
+                </ul>
+                <button onClick={() => { setFile(null); setDone(false); setTapeResult(null); }} className="text-xs text-gray-600 border border-gray-200 rounded px-3 py-1.5 hover:bg-gray-50">Upload another file</button>
               </div>
             )}
             <FormatGuide />
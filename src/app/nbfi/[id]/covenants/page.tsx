@@ -1,6 +1,6 @@
 'use client';
 
-import { useApp } from '@/context/AppContext';
+import { useApp, useLoanBooks } from '@/context/AppContext';
 import { useRouter, useParams, useSearchParams } from 'next/navigation';
 import { useEffect, useState, useMemo } from 'react';
 import Sidebar from '@/components/Sidebar';
@@ -45,6 +45,20 @@ function EWTrendIcon({ trend }: { trend: EarlyWarningAlert['trend'] }) {
   return <Minus className="w-4 h-4 text-gray-400" />;
 }
 
+type TrendCard = { metric: string; current: number; unit: string; trend: EarlyWarningAlert['trend']; breachDate?: string };
+
+// Shown until the NBFI has covenant readings of its own
+const SAMPLE_TREND_CARDS: TrendCard[] = [
+  { metric: 'CRAR', current: 14.7, unit: '%', trend: 'deteriorating', breachDate: '2025-06-30' },
+  { metric: 'Net NPA Ratio', current: 3.8, unit: '%', trend: 'deteriorating', breachDate: '2024-12-31' },
+  { metric: 'Collection Efficiency', current: 98.2, unit: '%', trend: 'deteriorating', breachDate: '2025-12-31' },
+  { metric: 'PAR 30', current: 5.2, unit: '%', trend: 'deteriorating', breachDate: '2025-06-30' },
+  { metric: 'Debt-to-Equity', current: 3.7, unit: 'x', trend: 'stable' },
+];
+
+// Latest status per covenant from the evaluation job (GET /api/nbfis/[id]?view=covenants)
+type CovenantStatusRow = { covenantId: string; value: number; date: string; status: CovenantReading['status']; trend: EarlyWarningAlert['trend'] };
+
 const BUCKET_LABELS: Record<string, string> = {
   normal: 'Normal', watch: 'Watch', substandard: 'Substandard', doubtful: 'Doubtful', loss: 'Loss',
 };
@@ -54,6 +68,22 @@ function classifyLoan(loan: LoanLevelRow, rules: ProvisioningRule[]): Provisioni
   return rules.find(r => dpd >= r.dpdMin && dpd <= r.dpdMax);
 }
 
+function computeBuckets(rules: ProvisioningRule[], loans: LoanLevelRow[]) {
+  const buckets = rules.map(r => ({
+    ...r,
+    loanCount: 0,
+    totalBalance: 0,
+  }));
+  for (const loan of loans) {
+    const rule = classifyLoan(loan, rules);
+    if (rule) {
+      const b = buckets.find(x => x.bucket === rule.bucket);
+      if (b) { b.loanCount++; b.totalBalance += loan.currentBalance; }
+    }
+  }
+  return buckets;
+}
+
 function StatusBadge({ status }: { status: CovenantReading['status'] }) {
   const cfg = {
     compliant: { bg: 'bg-green-100 text-green-700 border-green-200', label: 'Compliant' },
@@ -85,11 +115,25 @@ export default function CovenantsPage() {
   const params = useParams();
   const searchParams = useSearchParams();
   const id = params.id as string;
+  useLoanBooks([id]);
   const [showReview, setShowReview] = useState(false);
   const tabFromUrl = searchParams.get('tab') as TabId | null;
   const [activeTab, setActiveTab] = useState<TabId>(tabFromUrl === 'early-warnings' ? 'early-warnings' : 'covenants');
   const [collectionSlider, setCollectionSlider] = useState(98.2);
   const [ewMetric, setEwMetric] = useState<'crar' | 'collectionEfficiency' | 'par30'>('crar');
+  const [statuses, setStatuses] = useState<Map<string, CovenantStatusRow>>(new Map());
+
+  // Only the statuses are needed here; readings come with the NBFI record
+  useEffect(() => {
+    let cancelled = false;
+    fetch(`/api/nbfis/${id}?view=covenants&limit=1`)
+      .then(res => res.ok ? res.json() : null)
+      .then((body: { statuses: CovenantStatusRow[] } | null) => {
+        if (!cancelled && body) setStatuses(new Map(body.statuses.map(s => [s.covenantId, s])));
+      })
+      .catch(() => { /* trend falls back to the alerts */ });
+    return () => { cancelled = true; };
+  }, [id]);
 
   const ewCharts = useMemo(() => ({
     crar: { label: 'CRAR Movement & Projection', data: formatChartData(ewData.crarTrend), threshold: ewData.crarTrend.threshold, domain: [12, 18] as [number, number] },
@@ -119,13 +163,6 @@ export default function CovenantsPage() {
   if (!user || !nbfi) return null;
 
   const ewAlerts: EarlyWarningAlert[] = nbfi.earlyWarnings || ewData.alerts;
-  const trendCards: { metric: string; current: number; unit: string; trend: 'deteriorating' | 'stable' | 'improving'; breachDate?: string }[] = [
-    { metric: 'CRAR', current: 14.7, unit: '%', trend: 'deteriorating', breachDate: '2025-06-30' },
-    { metric: 'Net NPA Ratio', current: 3.8, unit: '%', trend: 'deteriorating', breachDate: '2024-12-31' },
-    { metric: 'Collection Efficiency', current: 98.2, unit: '%', trend: 'deteriorating', breachDate: '2025-12-31' },
-    { metric: 'PAR 30', current: 5.2, unit: '%', trend: 'deteriorating', breachDate: '2025-06-30' },
-    { metric: 'Debt-to-Equity', current: 3.7, unit: 'x', trend: 'stable' },
-  ];
 
   const covenants: CovenantDef[] = nbfi.covenants || [];
   const readings: CovenantReading[] = nbfi.covenantReadings || [];
@@ -155,6 +192,27 @@ export default function CovenantsPage() {
     return map;
   }, [readings]);
 
+  // Latest value per covenant. The trend is the evaluation job's CovenantStatus trend, which every
+  // evaluated covenant has; an alert's trend and projected breach date cover the rest.
+  const trendCards: TrendCard[] = useMemo(() => {
+    const cards: TrendCard[] = [];
+    for (const c of covenants) {
+      const status = statuses.get(c.id);
+      const latest = latestReadings.get(c.id);
+      const current = latest?.value ?? status?.value;
+      if (current === undefined) continue;
+      const alert = ewAlerts.find(a => a.metric === c.metric);
+      cards.push({
+        metric: c.metric.replace(/\s*\(.*\)$/, ''),
+        current,
+        unit: c.format === 'percent' ? '%' : c.format === 'ratio' ? 'x' : '',
+        trend: status?.trend ?? alert?.trend ?? 'stable',
+        breachDate: alert?.predictedBreachDate,
+      });
+    }
+    return cards.length ? cards.slice(0, 5) : SAMPLE_TREND_CARDS;
+  }, [covenants, statuses, latestReadings, ewAlerts]);
+
   const breachedCovenants = useMemo(() => {
     return covenants.filter(c => latestReadings.get(c.id)?.status === 'breached');
   }, [covenants, latestReadings]);
@@ -175,26 +233,9 @@ export default function CovenantsPage() {
 
   const HISTORY_COLORS = ['#003366', '#0066cc', '#e67300', '#339966', '#cc3333', '#9933cc'];
 
-  const computeBuckets = (rules: ProvisioningRule[]) => {
-    const buckets = rules.map(r => ({
-      ...r,
-      loanCount: 0,
-      totalBalance: 0,
-    }));
-    for (const loan of loans) {
-      const rule = classifyLoan(loan, rules);
-      if (rule) {
-        const b = buckets.find(x => x.bucket === rule.bucket);
-        if (b) { b.loanCount++; b.totalBalance += loan.currentBalance; }
-      }
-    }
-    return buckets;
-  };
-
   const reviewBuckets = useMemo(() => {
     if (!provRules?.nbfi) return [];
-    return computeBuckets(provRules.nbfi);
-    // eslint-disable-next-line react-hooks/exhaustive-deps
+    return computeBuckets(provRules.nbfi, loans);
   }, [provRules, loans]);
 
   return (
@@ -445,7 +486,7 @@ export default function CovenantsPage() {
                     </tr>
                   </thead>
                   <tbody>
-                    {computeBuckets(rules).map(b => (
+                    {computeBuckets(rules, loans).map(b => (
                       <tr key={b.bucket} className="border-b border-gray-50">
                         <td className="px-3 py-2 font-medium">{BUCKET_LABELS[b.bucket]}</td>
                         <td className="px-3 py-2 font-mono">{b.dpdMin}–{b.dpdMax === 9999 ? '∞' : b.dpdMax}</td>
@@ -1,6 +1,6 @@
 'use client';
 
-import { useApp } from '@/context/AppContext';
+import { useApp, useLoanBooks } from '@/context/AppContext';
 import { useRouter, useParams } from 'next/navigation';
 import { useEffect, useMemo, useState } from 'react';
 import Sidebar from '@/components/Sidebar';
@@ -73,6 +73,7 @@ export default function EDAPage() {
   const router = useRouter();
   const params = useParams();
   const id = params.id as string;
+  useLoanBooks([id]);
   const allRows = useLoanData(id, loanBookData);
 
   const [geoFilter, setGeoFilter] = useState<string[]>([]);
@@ -1,7 +1,7 @@
 'use client';
 
 import React from 'react';
-import { useApp } from '@/context/AppContext';
+import { useApp, useLoanBooks } from '@/context/AppContext';
 import { useRouter, useParams } from 'next/navigation';
 import { useEffect, useState, useMemo, useCallback } from 'react';
 import Sidebar from '@/components/Sidebar';
@@ -9,7 +9,7 @@ import Link from 'next/link';
 import {
   DOC_TYPE_SCHEMAS, getSchema, getValidationTests,
   generateFeedHistory, generateErrors, getErrorTypeLabel,
-  type DocTypeSchema, type ValidationTest,
+  type DocTypeSchema, type FeedError, type FeedRecord, type ValidationTest,
 } from '@/lib/integrationSchemas';
 import {
   ArrowLeft, Server, CheckCircle2, AlertTriangle, XCircle, Loader2,
@@ -22,11 +22,46 @@ import {
 
 type DocTypeId = 'loan_book' | 'loan_performance_history' | 'financial_statements' | 'monthly_mis';
 
+/* Feed log — files received through the SFTP drop-zone (GET /api/nbfis/[id]/feeds) */
+
+interface FeedLog {
+  records: (FeedRecord & { docTypeId: string })[];
+  errors: (FeedError & { docTypeId: string })[];
+}
+
+function useFeedLog(nbfiId: string): FeedLog | null {
+  const [log, setLog] = useState<FeedLog | null>(null);
+  useEffect(() => {
+    let cancelled = false;
+    fetch(`/api/nbfis/${nbfiId}/feeds`)
+      .then(res => (res.ok ? res.json() : null))
+      .then((body: FeedLog | null) => { if (!cancelled && body) setLog(body); })
+      .catch(() => { /* API unavailable — demo history is shown */ });
+    return () => { cancelled = true; };
+  }, [nbfiId]);
+  return log;
+}
+
+// Doc types that have not received a file yet show the demo history
+function hasFeedRecords(log: FeedLog | null, docTypeId: string): boolean {
+  return !!log?.records.some(r => r.docTypeId === docTypeId);
+}
+
+function feedRecords(log: FeedLog | null, docTypeId: string, days: number): FeedRecord[] {
+  return hasFeedRecords(log, docTypeId) ? log!.records.filter(r => r.docTypeId === docTypeId) : generateFeedHistory(docTypeId, days);
+}
+
+function feedErrors(log: FeedLog | null, docTypeId: string): FeedError[] {
+  return hasFeedRecords(log, docTypeId) ? log!.errors.filter(e => e.docTypeId === docTypeId) : generateErrors(docTypeId);
+}
+
 export default function IntegrationPage() {
   const { user, getNBFI, loanBookData } = useApp();
   const router = useRouter();
   const params = useParams();
   const id = params.id as string;
+  useLoanBooks([id]);
+  const feedLog = useFeedLog(id);
   const [activeTab, setActiveTab] = useState<DocTypeId>('loan_book');
 
   useEffect(() => { if (!user) router.push('/'); }, [user, router]);
@@ -52,9 +87,9 @@ export default function IntegrationPage() {
           </p>
         </div>
 
-        <HealthOverview activeLoans={loans.length} />
+        <HealthOverview activeLoans={loans.length} feedLog={feedLog} />
         <DocTypeTabs active={activeTab} onChange={setActiveTab} />
-        <DocTypeContent docTypeId={activeTab} />
+        <DocTypeContent docTypeId={activeTab} feedLog={feedLog} />
       </main>
     </div>
   );
@@ -62,16 +97,14 @@ export default function IntegrationPage() {
 
 /* Health Overview Cards */
 
-function HealthOverview({ activeLoans }: { activeLoans: number }) {
+function HealthOverview({ activeLoans, feedLog }: { activeLoans: number; feedLog: FeedLog | null }) {
   const cards = DOC_TYPE_SCHEMAS.map(s => {
-    const hist = generateFeedHistory(s.id, 30);
+    const live = hasFeedRecords(feedLog, s.id);
+    const hist = feedRecords(feedLog, s.id, 30);
     const successRate = hist.length > 0 ? Math.round(hist.filter(h => h.status === 'success').length / hist.length * 100) : 0;
     const lastOk = hist.find(h => h.status === 'success');
-    const errorsLast7 = generateErrors(s.id).filter(e => {
-      const d = new Date(e.date);
-      const cutoff = new Date('2025-02-11');
-      return d >= cutoff;
-    }).length;
+    const cutoff = live ? new Date(Date.now() - 7 * 86_400_000) : new Date('2025-02-11');
+    const errorsLast7 = feedErrors(feedLog, s.id).filter(e => new Date(e.date) >= cutoff).length;
     return { schema: s, successRate, lastOk, errorsLast7 };
   });
 
@@ -159,7 +192,7 @@ function DocTypeTabs({ active, onChange }: { active: DocTypeId; onChange: (id: D
 
 /* Per-Doc-Type Content */
 
-function DocTypeContent({ docTypeId }: { docTypeId: DocTypeId }) {
+function DocTypeContent({ docTypeId, feedLog }: { docTypeId: DocTypeId; feedLog: FeedLog | null }) {
   const schema = getSchema(docTypeId);
   const isHistory = docTypeId === 'loan_performance_history';
   const [openSections, setOpenSections] = useState<Record<string, boolean>>({ config: true, mapping: false, testing: false, audit: false, errors: false });
@@ -202,10 +235,10 @@ function DocTypeContent({ docTypeId }: { docTypeId: DocTypeId }) {
         <SampleTestingSection docTypeId={docTypeId} schema={schema} />
       </CollapsibleSection>
       <CollapsibleSection title="Upload Audit Trail" icon={<Clock className="w-4 h-4" />} open={openSections.audit} onToggle={() => toggle('audit')}>
-        <AuditTrailSection docTypeId={docTypeId} />
+        <AuditTrailSection docTypeId={docTypeId} feedLog={feedLog} />
       </CollapsibleSection>
       <CollapsibleSection title="Error Reports" icon={<AlertTriangle className="w-4 h-4" />} open={openSections.errors} onToggle={() => toggle('errors')}>
-        <ErrorReportsSection docTypeId={docTypeId} />
+        <ErrorReportsSection docTypeId={docTypeId} feedLog={feedLog} />
       </CollapsibleSection>
     </div>
   );
@@ -538,8 +571,9 @@ function SampleTestingSection({ docTypeId, schema }: { docTypeId: DocTypeId; sch
 
 /* (iv) Upload Audit Trail */
 
-function AuditTrailSection({ docTypeId }: { docTypeId: DocTypeId }) {
-  const allRecords = useMemo(() => generateFeedHistory(docTypeId, 60), [docTypeId]);
+function AuditTrailSection({ docTypeId, feedLog }: { docTypeId: DocTypeId; feedLog: FeedLog | null }) {
+  const allRecords = useMemo(() => feedRecords(feedLog, docTypeId, 60), [feedLog, docTypeId]);
+  const uploadErrors = useMemo(() => feedErrors(feedLog, docTypeId), [feedLog, docTypeId]);
   const [page, setPage] = useState(0);
   const [sortAsc, setSortAsc] = useState(false);
   const [statusFilter, setStatusFilter] = useState<string>('all');
@@ -583,6 +617,7 @@ function AuditTrailSection({ docTypeId }: { docTypeId: DocTypeId }) {
               <th className="text-left py-2 px-2">Uploaded By</th>
               <th className="text-left py-2 px-2">File Name</th>
               <th className="text-right py-2 px-2">Rows</th>
+              <th className="text-right py-2 px-2">Throughput</th>
               <th className="text-left py-2 px-2">Status</th>
               <th className="text-right py-2 px-2">Errors</th>
               <th className="text-left py-2 px-2">Actions</th>
@@ -598,6 +633,9 @@ function AuditTrailSection({ docTypeId }: { docTypeId: DocTypeId }) {
                 <td className="py-2 px-2 text-xs text-gray-600">{r.uploadedBy}</td>
                 <td className="py-2 px-2 text-xs font-mono text-gray-600 max-w-[180px] truncate">{r.fileName}</td>
                 <td className="py-2 px-2 text-xs text-right text-gray-700">{r.rows > 0 ? r.rows.toLocaleString() : '\u2014'}</td>
+                <td className="py-2 px-2 text-xs text-right text-gray-500" title={r.durationMs != null ? `${(r.durationMs / 1000).toFixed(1)} s` : undefined}>
+                  {r.rowsPerSec ? `${r.rowsPerSec.toLocaleString()} rows/s` : '\u2014'}
+                </td>
                 <td className="py-2 px-2"><StatusBadge status={r.status} /></td>
                 <td className="py-2 px-2 text-xs text-right">{r.errorCount > 0 ? <span className="text-red-600 font-medium">{r.errorCount}</span> : <span className="text-gray-400">0</span>}</td>
                 <td className="py-2 px-2">
@@ -616,7 +654,17 @@ function AuditTrailSection({ docTypeId }: { docTypeId: DocTypeId }) {
       {viewingErrors && (
         <div className="p-3 bg-red-50 border border-red-200 rounded-lg">
           <p className="text-xs font-semibold text-red-700 mb-2">Errors for upload {viewingErrors}</p>
-          <p className="text-xs text-red-600">Connection timeout / schema validation failed. Retried at next scheduled interval.</p>
+          {uploadErrors.some(e => e.uploadId === viewingErrors) ? (
+            <ul className="space-y-1">
+              {uploadErrors.filter(e => e.uploadId === viewingErrors).map(e => (
+                <li key={e.id} className="text-xs text-red-600">
+                  <span className="font-medium">{getErrorTypeLabel(e.errorType)}</span> · <span className="font-mono">{e.field}</span> — {e.message}
+                </li>
+              ))}
+            </ul>
+          ) : (
+            <p className="text-xs text-red-600">Connection timeout / schema validation failed. Retried at next scheduled interval.</p>
+          )}
           <button onClick={() => setViewingErrors(null)} className="mt-2 text-xs text-red-700 hover:underline">Close</button>
         </div>
       )}
@@ -645,8 +693,8 @@ function StatusBadge({ status }: { status: 'success' | 'partial' | 'failed' }) {
 
 /* (v) Error Reports */
 
-function ErrorReportsSection({ docTypeId }: { docTypeId: DocTypeId }) {
-  const errors = useMemo(() => generateErrors(docTypeId), [docTypeId]);
+function ErrorReportsSection({ docTypeId, feedLog }: { docTypeId: DocTypeId; feedLog: FeedLog | null }) {
+  const errors = useMemo(() => feedErrors(feedLog, docTypeId), [feedLog, docTypeId]);
   const [expandedErr, setExpandedErr] = useState<string | null>(null);
 
   const chartData = useMemo(() => {
@@ -0,0 +1,18 @@
+'use client';
+
+import { useEffect } from 'react';
+import { useParams } from 'next/navigation';
+import { useApp } from '@/context/AppContext';
+
+// NBFIs hydrated from the summary list are fetched in full when one of their pages is opened
+export default function NBFILayout({ children }: { children: React.ReactNode }) {
+  const { ensureNBFI } = useApp();
+  const params = useParams();
+  const id = params.id as string;
+
+  useEffect(() => {
+    ensureNBFI(id);
+  }, [id, ensureNBFI]);
+
+  return <>{children}</>;
+}
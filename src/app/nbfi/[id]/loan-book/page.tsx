@@ -1,9 +1,10 @@
 'use client';
 
-import { useApp } from '@/context/AppContext';
+import { useApp, useLoanBooks } from '@/context/AppContext';
 import { useRouter, useParams } from 'next/navigation';
 import { useEffect, useState, useRef, useCallback } from 'react';
 import Sidebar from '@/components/Sidebar';
+import LoanTable from '@/components/LoanTable';
 import { MOCK_LOAN_BOOK } from '@/lib/mockLoanBook';
 import {
   ArrowLeft, Upload, Server, Building2, Globe,
@@ -12,6 +13,8 @@ import {
   Info, AlertTriangle, BookOpen,
 } from 'lucide-react';
 import { DOC_TYPE_SCHEMAS, getValidationTests } from '@/lib/integrationSchemas';
+import type { IngestResult } from '@/lib/loanTapeIngest';
+import type { TransitionEstimateResult } from '@/lib/transitionMatrix';
 import Link from 'next/link';
 
 const SFTP_STAGES = [
@@ -24,20 +27,6 @@ const SFTP_STAGES = [
   'Complete!',
 ];
 
-const UPLOAD_STAGES = [
-  'Reading file...',
-  'Detecting columns...',
-  'Awaiting mapping confirmation...',
-];
-
-const PROCESS_STAGES = [
-  'Validating mapped columns...',
-  'Parsing rows...',
-  'Computing DPD buckets...',
-  'Running format tests...',
-  'Complete!',
-];
-
 const REQUIRED_FIELDS = [
   'loanId', 'applicationId', 'dpdAsOfReportingDate', 'currentBalance',
   'loanDisbursedAmount', 'totalOverdueAmount', 'loanDisbursedDate',
@@ -76,36 +65,16 @@ const AUTO_MAPPING: Record<string, string> = {
   'residual_tenure_months': 'residualTenureMonths',
 };
 
-const FORMAT_TESTS = [
-  { name: 'All required columns present', pass: true },
-  { name: 'Loan ID is unique', pass: true },
-  { name: 'DPD is numeric (≥ 0)', pass: true },
-  { name: 'Balance fields are numeric', pass: true },
-  { name: 'Date format is valid (DD/MM/YYYY or ISO)', pass: true },
-  { name: 'Interest Rate within range (0-100%)', pass: true },
-  { name: 'Boolean fields (Written Off, Repossession) valid', pass: true },
-  { name: 'No null values in required fields', pass: false, detail: '2 rows with null Current Balance — auto-filled with 0' },
-];
-
-const HISTORY_UPLOAD_STAGES = [
-  'Reading file...',
-  'Detecting format (long / wide)...',
-  'Validating required columns...',
-  'Parsing reporting periods...',
-  'Checking period contiguity (no gaps)...',
-  'Validating monotonicity of write-off flags...',
-  'Computing DPD bucket distributions per period...',
-  'Flagging data quality issues...',
-  'Complete!',
-];
+type UploadProgress = { rowsRead: number; bytesRead: number; totalBytes: number };
 
 type Channel = 'sftp' | 'lender' | 'nbfi' | null;
 
 export default function LoanBookPage() {
-  const { user, getNBFI, setLoanBookData, setLoanBookMeta, loanBookData } = useApp();
+  const { user, getNBFI, setLoanBookData, setLoanBookMeta, uploadLoanTape, uploadLoanHistory, loanBookData } = useApp();
   const router = useRouter();
   const params = useParams();
   const id = params.id as string;
+  useLoanBooks([id]);
 
   const [expanded, setExpanded] = useState<Channel>(null);
 
@@ -115,14 +84,11 @@ export default function LoanBookPage() {
   const [sftpDone, setSftpDone] = useState(false);
 
   // Upload state
-  const [uploadStage, setUploadStage] = useState(-1);
-  const [uploadRunning, setUploadRunning] = useState(false);
-  const [uploadDone, setUploadDone] = useState(false);
-  const [showMapping, setShowMapping] = useState(false);
+  const [pendingFile, setPendingFile] = useState<File | null>(null);
   const [mappingConfirmed, setMappingConfirmed] = useState(false);
-  const [processStage, setProcessStage] = useState(-1);
-  const [processRunning, setProcessRunning] = useState(false);
-  const [showFormatTests, setShowFormatTests] = useState(false);
+  const [uploadProgress, setUploadProgress] = useState<UploadProgress | null>(null);
+  const [uploadResult, setUploadResult] = useState<IngestResult | null>(null);
+  const [uploadError, setUploadError] = useState<string | null>(null);
   const [columnMapping, setColumnMapping] = useState<Record<string, string>>({ ...AUTO_MAPPING });
   const fileInputRef = useRef<HTMLInputElement>(null);
 
@@ -130,8 +96,10 @@ export default function LoanBookPage() {
   const [histPhaseOpen, setHistPhaseOpen] = useState(true);
   const [histFormat, setHistFormat] = useState<'auto' | 'long' | 'wide'>('auto');
   const [histUploading, setHistUploading] = useState(false);
-  const [histStage, setHistStage] = useState(-1);
-  const [histDone, setHistDone] = useState(false);
+  const [histProgress, setHistProgress] = useState<UploadProgress | null>(null);
+  const [histResult, setHistResult] = useState<TransitionEstimateResult | null>(null);
+  const [histError, setHistError] = useState<string | null>(null);
+  const histDone = histResult !== null;
 
   // NBFI invite state
   const [inviteName, setInviteName] = useState('');
@@ -187,99 +155,71 @@ export default function LoanBookPage() {
     setTimeout(tick, 600);
   }, [loadData]);
 
-  const runUploadSimulation = useCallback(() => {
-    setUploadRunning(true);
-    setUploadStage(0);
-    setUploadDone(false);
-    setShowMapping(false);
+  // A dropped or selected file waits for the mapping to be confirmed, then streams to the server
+  const selectUploadFile = useCallback((file: File) => {
+    setPendingFile(file);
     setMappingConfirmed(false);
-    setProcessStage(-1);
-    setShowFormatTests(false);
-    let i = 0;
-    const tick = () => {
-      i++;
-      if (i < UPLOAD_STAGES.length) {
-        setUploadStage(i);
-        if (i === UPLOAD_STAGES.length - 1) {
-          setUploadRunning(false);
-          setShowMapping(true);
-        } else {
-          setTimeout(tick, 600);
-        }
-      }
-    };
-    setTimeout(tick, 600);
+    setUploadProgress(null);
+    setUploadResult(null);
+    setUploadError(null);
   }, []);
 
-  const confirmMapping = useCallback(() => {
+  const confirmMapping = useCallback(async () => {
+    if (!pendingFile) return;
+    const file = pendingFile;
     setMappingConfirmed(true);
-    setProcessRunning(true);
-    setProcessStage(0);
-    let i = 0;
-    const tick = () => {
-      i++;
-      if (i < PROCESS_STAGES.length) {
-        setProcessStage(i);
-        if (i === PROCESS_STAGES.length - 2) {
-          setShowFormatTests(true);
-        }
-        if (i === PROCESS_STAGES.length - 1) {
-          setProcessRunning(false);
-          setUploadDone(true);
-          loadData('lender_upload');
-        } else {
-          setTimeout(tick, 600);
-        }
-      }
-    };
-    setTimeout(tick, 600);
-  }, [loadData]);
+    setUploadProgress({ rowsRead: 0, bytesRead: 0, totalBytes: file.size });
+    const result = await uploadLoanTape(id, file, 'lender_upload', (p) =>
+      setUploadProgress({ rowsRead: p.rowsRead, bytesRead: p.bytesRead, totalBytes: file.size }));
+    setUploadProgress(null);
+    if (result.type !== 'done') { setUploadError(result.error); return; }
+    setUploadResult(result);
+    if (!result.ok) setUploadError('The tape was rejected — fix the failing checks below and upload it again.');
+  }, [id, pendingFile, uploadLoanTape]);
 
   const handleFileDrop = useCallback(
     (e: React.DragEvent) => {
       e.preventDefault();
       const file = e.dataTransfer.files[0];
-      if (file) runUploadSimulation();
+      if (file) selectUploadFile(file);
     },
-    [runUploadSimulation],
+    [selectUploadFile],
   );
 
   const handleFileSelect = useCallback(
     (e: React.ChangeEvent<HTMLInputElement>) => {
       const file = e.target.files?.[0];
-      if (file) runUploadSimulation();
+      if (file) selectUploadFile(file);
       e.target.value = '';
     },
-    [runUploadSimulation],
+    [selectUploadFile],
   );
 
-  const runHistoryUpload = useCallback(async () => {
+  const runHistoryUpload = useCallback(async (file: File) => {
     setHistUploading(true);
-    setHistStage(0);
-    setHistDone(false);
-    for (let i = 0; i < HISTORY_UPLOAD_STAGES.length; i++) {
-      await new Promise(r => setTimeout(r, 600 + Math.random() * 400));
-      setHistStage(i);
-    }
-    // Load data and tag as initial_history
-    setLoanBookData(id, MOCK_LOAN_BOOK);
+    setHistError(null);
+    setHistProgress({ rowsRead: 0, bytesRead: 0, totalBytes: file.size });
+    const result = await uploadLoanHistory(id, file, (p) =>
+      setHistProgress({ rowsRead: p.rowsRead, bytesRead: p.bytesRead, totalBytes: file.size }));
+    setHistUploading(false);
+    setHistProgress(null);
+    if (result.type !== 'done') { setHistError(result.error); return; }
     setLoanBookMeta(id, {
       source: 'initial_history',
       uploadedAt: new Date().toISOString(),
       uploadedBy: user?.name ?? 'System',
-      rowCount: MOCK_LOAN_BOOK.length * 24,
-      totalBalance: MOCK_LOAN_BOOK.reduce((s, r) => s + (r.currentBalance ?? 0), 0),
-      filename: 'loan_history_2022_2023.csv',
-      historyMonths: 24,
-      periodCount: 24,
-      dateRangeStart: '2022-01',
-      dateRangeEnd: '2023-12',
-      inputFormat: histFormat === 'auto' ? 'long' : histFormat,
+      rowCount: result.rowsRead,
+      totalBalance: nbfi?.loanBookMeta?.totalBalance ?? 0,
+      filename: file.name,
+      historyMonths: result.periodCount,
+      periodCount: result.periodCount,
+      dateRangeStart: result.periodStart ?? undefined,
+      dateRangeEnd: result.periodEnd ?? undefined,
+      inputFormat: result.format,
     });
-    setHistUploading(false);
-    setHistDone(true);
+    setHistResult(result);
     setHistPhaseOpen(false);
-  }, [id, histFormat, setLoanBookData, setLoanBookMeta, user]);
+  }, [id, nbfi, setLoanBookMeta, uploadLoanHistory, user]);
 
   const toggle = (ch: Channel) => setExpanded(prev => (prev === ch ? null : ch));
 
@@ -409,35 +349,32 @@ export default function LoanBookPage() {
                   <div
                     className="border-2 border-dashed border-blue-200 rounded-xl p-8 text-center bg-blue-50/30 hover:bg-blue-50 transition-colors"
                     onDragOver={e => e.preventDefault()}
-                    onDrop={e => { e.preventDefault(); runHistoryUpload(); }}
+                    onDrop={e => { e.preventDefault(); const f = e.dataTransfer.files[0]; if (f) runHistoryUpload(f); }}
                   >
                     <Upload className="w-8 h-8 text-blue-300 mx-auto mb-2" />
                     <p className="text-sm text-gray-700 mb-1">Drop your loan history file here</p>
                     <p className="text-xs text-gray-400 mb-3">CSV or XLSX · Long or Wide format · Max 200 MB</p>
                     <label className="cursor-pointer inline-flex items-center gap-2 bg-[#003366] text-white text-sm px-4 py-2 rounded-lg hover:bg-[#004d99]">
                       <Upload className="w-4 h-4" /> Browse file
-                      <input type="file" accept=".csv,.xlsx,.xls" className="hidden" onChange={() => runHistoryUpload()} />
+                      <input type="file" accept=".csv,.xlsx" className="hidden" onChange={e => { const f = e.target.files?.[0]; if (f) runHistoryUpload(f); e.target.value = ''; }} />
                     </label>
                   </div>
                 )}
 
-                {histUploading && (
+                {histUploading && histProgress && (
                   <div className="bg-gray-50 rounded-lg p-4">
-                    <div className="w-full bg-gray-200 rounded-full h-2 mb-3">
-                      <div className="bg-blue-500 h-2 rounded-full transition-all duration-500" style={{ width: ((histStage + 1) / HISTORY_UPLOAD_STAGES.length * 100) + '%' }} />
-                    </div>
-                    <ul className="space-y-1">
-                      {HISTORY_UPLOAD_STAGES.map((s, i) => (
-                        <li key={i} className={"flex items-center gap-2 text-xs " + (i < histStage ? 'text-green-600' : i === histStage ? 'text-blue-600 font-medium' : 'text-gray-400')}>
-                          {i < histStage ? <CheckCircle2 className="w-3.5 h-3.5" /> : i === histStage ? <Loader2 className="w-3.5 h-3.5 animate-spin" /> : <div className="w-3.5 h-3.5 rounded-full border border-gray-300" />}
-                          {s}
-                        </li>
-                      ))}
-                    </ul>
+                    <StreamProgress progress={histProgress} />
+                  </div>
+                )}
+
+                {histError && !histUploading && (
+                  <div className="flex items-start gap-2 p-3 bg-red-50 border border-red-200 rounded-lg text-xs text-red-700">
+                    <AlertTriangle className="w-4 h-4 mt-0.5 shrink-0" />
+                    <span>{histError}</span>
                   </div>
                 )}
 
-                {histDone && (
+                {histResult && (
                   <div className="bg-green-50 border border-green-200 rounded-lg p-4">
                     <div className="flex items-center gap-2 mb-3">
                       <CheckCircle2 className="w-5 h-5 text-green-500" />
@@ -445,10 +382,10 @@ export default function LoanBookPage() {
                     </div>
                     <div className="grid grid-cols-4 gap-2 mb-3">
                       {[
-                        { label: 'Reporting Periods', value: '24 months' },
-                        { label: 'Date Range', value: 'Jan 2022 – Dec 2023' },
-                        { label: 'Loan-Months', value: (MOCK_LOAN_BOOK.length * 24).toLocaleString() },
-                        { label: 'Format', value: histFormat === 'auto' ? 'Long (auto-detected)' : histFormat === 'wide' ? 'Wide' : 'Long' },
+                        { label: 'Reporting Periods', value: `${histResult.periodCount} months` },
+                        { label: 'Date Range', value: `${histResult.periodStart ?? '—'} – ${histResult.periodEnd ?? '—'}` },
+                        { label: 'Transitions', value: histResult.overall.observations.toLocaleString() },
+                        { label: 'Format', value: (histResult.format === 'wide' ? 'Wide' : 'Long') + (histFormat === 'auto' ? ' (auto-detected)' : '') },
                       ].map(m => (
                         <div key={m.label} className="bg-white rounded p-2 text-center border border-green-100">
                           <p className="text-sm font-bold text-green-700">{m.value}</p>
@@ -492,6 +429,13 @@ export default function LoanBookPage() {
           </div>
         )}
 
+        {/* ── Loan browser (server-paged, virtualised) ── */}
+        {hasData && (
+          <div className="mb-6">
+            <LoanTable nbfiId={id} height={420} />
+          </div>
+        )}
+
         <div className="mb-3">
           <h2 className="text-base font-semibold text-gray-700">Phase 2 — Ongoing Daily Loan Tape</h2>
           <p className="text-sm text-gray-500">Configure how the daily full-dump loan tape is delivered. These uploads power real-time monitoring and covenant tracking. File naming: <code className="text-xs bg-gray-100 px-1 rounded">loanbook_YYYYMMDD.csv</code></p>
@@ -559,27 +503,23 @@ export default function LoanBookPage() {
                   </span>
                 </p>
                 <p className="text-xs text-gray-400 mt-1">
-                  Supports .csv, .xlsx, .json
+                  Supports .csv, .xlsx
                 </p>
               </div>
               <input
                 ref={fileInputRef}
                 type="file"
-                accept=".csv,.json,.xlsx"
+                accept=".csv,.xlsx"
                 className="hidden"
                 onChange={handleFileSelect}
               />
 
-              {uploadStage >= 0 && !showMapping && (
-                <ProgressStages stages={UPLOAD_STAGES} current={uploadStage} />
-              )}
-
               {/* Column Mapping Step */}
-              {showMapping && !mappingConfirmed && (
+              {pendingFile && !mappingConfirmed && (
                 <div className="space-y-3">
                   <div className="flex items-center gap-2 mb-2">
                     <CheckCircle2 className="w-4 h-4 text-green-500" />
-                    <span className="text-sm text-green-700 font-medium">File parsed — {DETECTED_COLUMNS.length} columns detected</span>
+                    <span className="text-sm text-green-700 font-medium">{pendingFile.name} selected ({(pendingFile.size / 1e6).toFixed(1)} MB)</span>
                   </div>
                   <p className="text-xs font-semibold text-gray-500 uppercase tracking-wide">Column Mapping</p>
                   <p className="text-xs text-gray-500">Review and adjust how source columns map to platform fields. Auto-mapping has been applied.</p>
@@ -623,22 +563,29 @@ export default function LoanBookPage() {
                 </div>
               )}
 
-              {/* Processing after mapping */}
-              {mappingConfirmed && processStage >= 0 && (
+              {/* Streaming ingestion after mapping */}
+              {mappingConfirmed && uploadProgress && (
                 <div className="space-y-3">
                   <div className="flex items-center gap-2 mb-2">
-                    <CheckCircle2 className="w-4 h-4 text-green-500" />
-                    <span className="text-sm text-green-700 font-medium">Mapping confirmed</span>
+                    <Loader2 className="w-4 h-4 animate-spin text-[#003366]" />
+                    <span className="text-sm text-[#003366] font-medium">Ingesting {pendingFile?.name}</span>
                   </div>
-                  <ProgressStages stages={PROCESS_STAGES} current={processStage} />
+                  <StreamProgress progress={uploadProgress} />
+                </div>
+              )}
+
+              {uploadError && (
+                <div className="flex items-start gap-2 p-3 bg-red-50 border border-red-200 rounded-lg text-xs text-red-700">
+                  <AlertTriangle className="w-4 h-4 mt-0.5 shrink-0" />
+                  <span>{uploadError}</span>
                 </div>
               )}
 
               {/* Format Test Results */}
-              {showFormatTests && (
+              {uploadResult && (
                 <div className="mt-3 space-y-2">
                   <p className="text-xs font-semibold text-gray-500 uppercase tracking-wide">Format Validation Tests</p>
-                  {FORMAT_TESTS.map((t, i) => (
+                  {uploadResult.tests.map((t, i) => (
                     <div key={i} className={`flex items-start gap-2 p-2 rounded text-xs ${t.pass ? 'bg-green-50' : 'bg-amber-50'}`}>
                       {t.pass ? <CheckCircle2 className="w-4 h-4 text-green-500 mt-0.5 shrink-0" /> : <span className="text-amber-500 font-bold mt-0.5 shrink-0">⚠</span>}
                       <div>
@@ -650,9 +597,9 @@ export default function LoanBookPage() {
                 </div>
               )}
 
-              {uploadDone && (
+              {uploadResult?.ok && (
                 <p className="text-sm text-green-700 font-medium mt-2">
-                  ✓ Loan book loaded ({MOCK_LOAN_BOOK.length} rows) — all format tests passed
+                  ✓ Loan book loaded ({uploadResult.rowCount.toLocaleString()} loans, {uploadResult.rowsRejected.toLocaleString()} rows rejected)
                 </p>
               )}
             </div>
@@ -883,6 +830,21 @@ function ProgressStages({
   );
 }
 
+/* ─── Live counters from the upload route's NDJSON progress frames ─── */
+function StreamProgress({ progress }: { progress: UploadProgress }) {
+  const pct = progress.totalBytes ? Math.min(100, (progress.bytesRead / progress.totalBytes) * 100) : 0;
+  return (
+    <div>
+      <div className="w-full bg-gray-200 rounded-full h-2 mb-2">
+        <div className="bg-blue-500 h-2 rounded-full transition-all duration-300" style={{ width: pct + '%' }} />
+      </div>
+      <p className="text-xs text-gray-500">
+        {progress.rowsRead.toLocaleString()} rows read · {(progress.bytesRead / 1e6).toFixed(1)} of {(progress.totalBytes / 1e6).toFixed(1)} MB
+      </p>
+    </div>
+  );
+}
+
 /* ─── Read-only form field ─── */
 function Field({ label, value }: { label: string; value: string }) {
   return (
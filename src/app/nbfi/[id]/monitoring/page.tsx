@@ -1,15 +1,16 @@
 'use client';
 
-import { useApp } from '@/context/AppContext';
+import { useApp, useLoanBooks, useNbfiAnalytics, usePortfolioRollup } from '@/context/AppContext';
 import { useRouter, useParams } from 'next/navigation';
 import { useEffect, useState, useMemo } from 'react';
 import Sidebar from '@/components/Sidebar';
 import { LoanLevelRow } from '@/lib/types';
+import type { RollupGroup } from '@/lib/portfolioRollup';
 import {
   Activity, Users, Banknote, TrendingDown,
   Target, Layers, Building2, Download, X, AlertTriangle, Shield, Gauge, ArrowDownRight, FileCheck, Lock,
 } from 'lucide-react';
-import { getDpdBucket, DPD_BUCKETS } from '@/lib/types';
+import { DPD_BUCKETS } from '@/lib/types';
 import Link from 'next/link';
 import { TransactionAlertTimeline } from '@/components/NotificationBell';
 import {
@@ -17,37 +18,23 @@ import {
   ResponsiveContainer, LineChart, Line, Legend, Cell,
 } from 'recharts';
 import {
-  TRANSITION_MATRIX, TICKET_SIZES, ticketBucket,
-  computeFinancialSummary, computeECL, rollRateProjection,
-  computeVintageData, computeVintageCurves, computeStressIndicators,
-  generateTrendData, estimateLoss, computeCureRate, computeCNL, computeCDR,
-  computeHHI, hhiLabel, computeRepaymentVelocity, vpInterpretation,
-  computeBorrowingBase, computeEligibilityWaterfall, computeShadowReconciliation,
+  TRANSITION_MATRIX, TICKET_SIZES,
+  computeFinancialSummary, projectBucketBalances,
+  computeVintageData, computeVintageCurves, computeStressIndicators, buildGroupIndex, vintageKey,
+  generateTrendData, estimateLoss,
+  hhiLabel, vpInterpretation,
   type ScenarioKey, type EligibilityStep,
 } from '@/lib/rollRate';
+import { computePortfolioMetricsFromRows, type PortfolioMetrics } from '@/lib/portfolioKernel';
 import { TRANSACTION_MAP, TRANSACTION_NAMES, getNbfiIdForTransaction } from '@/lib/seedTransactions';
-import { applyPoolSelection, applyPoolSelectionForPortfolio } from '@/lib/poolSelection';
+import { applyPoolSelection, applyPoolSelectionForPortfolio, applyLoanFilters } from '@/lib/poolSelection';
 
 const COLORS = ['#003366', '#0066cc', '#0099ff', '#00ccff', '#66e0ff', '#339966', '#cc6633'];
 type MonScope = 'transaction' | 'nbfi' | 'portfolio';
 type LoanWithNbfi = LoanLevelRow & { _nbfiId?: string; _txId?: string };
 type TrendPeriod = '3M' | '6M' | '12M';
 
-function applyFilters<T extends LoanLevelRow>(
-  rows: T[],
-  filters: { product: string[]; geography: string[]; segment: string[]; dpdBuckets: string[]; ticketSize: string[] },
-): T[] {
-  return rows.filter(r => {
-    const bucket = getDpdBucket(r.dpdAsOfReportingDate);
-    const ticket = ticketBucket(r.loanDisbursedAmount ?? r.currentBalance);
-    if (filters.product.length && !filters.product.includes(r.product ?? 'Unknown')) return false;
-    if (filters.geography.length && !filters.geography.includes(r.geography ?? 'Unknown')) return false;
-    if (filters.segment.length && !filters.segment.includes(r.segment ?? 'Unknown')) return false;
-    if (filters.dpdBuckets.length && !filters.dpdBuckets.includes(bucket)) return false;
-    if (filters.ticketSize.length && !filters.ticketSize.includes(ticket)) return false;
-    return true;
-  });
-}
+const applyFilters = applyLoanFilters;
 
 function FilterPill({ label, selected, options, onChange }: { label: string; selected: string[]; options: string[]; onChange: (v: string[]) => void }) {
   const [open, setOpen] = useState(false);
@@ -91,6 +78,18 @@ function fmt(n: number): string {
 }
 function pct(n: number): string { return `${n.toFixed(1)}%`; }
 
+// computeFinancialSummary's shape, from rollup sums
+function rollupFinancials(t: RollupGroup) {
+  const grossLoss = t.writtenOffBalance;
+  return {
+    totalBal: t.balance, grossLoss, netLoss: grossLoss - t.recovery, recovery: t.recovery, provisions: t.provisions,
+    totalOverdue: t.overdue, avgInterest: t.avgInterest, writeOffCount: t.writtenOffCount,
+    writeOffRate: t.loanCount > 0 ? (t.writtenOffCount / t.loanCount) * 100 : 0,
+    recoveryRate: grossLoss > 0 ? (t.recovery / grossLoss) * 100 : 0,
+    overdueRatio: t.balance > 0 ? (t.overdue / t.balance) * 100 : 0,
+  };
+}
+
 export default function MonitoringPage() {
   const { user, getNBFI, loanBookData, nbfis, selectedPoolByNbfi } = useApp();
   const router = useRouter();
@@ -104,6 +103,32 @@ export default function MonitoringPage() {
   const [filterSegment, setFilterSegment] = useState<string[]>([]);
   const [filterDpdBuckets, setFilterDpdBuckets] = useState<string[]>([]);
   const [filterTicketSize, setFilterTicketSize] = useState<string[]>([]);
+  const [portfolioDrill, setPortfolioDrill] = useState(false);
+  const [scenario, setScenario] = useState<ScenarioKey>('base');
+
+  // Transaction scope is this NBFI's latest book: its analytics are computed (and cached) by
+  // GET /api/nbfis/[id]/analytics, so the loans are only downloaded for the NBFI and portfolio
+  // scopes, or when a CSV export asks for them.
+  const serverView = scope === 'transaction';
+  useLoanBooks(serverView ? [] : [id, ...(TRANSACTION_MAP[id] || [])]);
+  const analyticsQuery = {
+    filters: { product: filterProduct, geography: filterGeography, segment: filterSegment, dpdBuckets: filterDpdBuckets, ticketSize: filterTicketSize },
+    scenario,
+    trendMonths: trendPeriod === '3M' ? 3 : trendPeriod === '6M' ? 6 : 12,
+  };
+  const txHasPool = !!selectedPoolByNbfi[id]?.confirmedAt;
+  const overallAnalytics = useNbfiAnalytics(id, { ...analyticsQuery, pool: false }, serverView);
+  const packageAnalytics = useNbfiAnalytics(id, { ...analyticsQuery, pool: true }, serverView && txHasPool);
+
+  // Portfolio scope is answered from the materialised rollup. Every NBFI's loans are only loaded
+  // on request, or for views the rollup cells cannot express (segment / ticket size, security package).
+  const portfolioHasPool = Object.values(selectedPoolByNbfi).some(s => !!s.confirmedAt);
+  const needsPortfolioLoans = scope === 'portfolio'
+    && (portfolioDrill || filterSegment.length > 0 || filterTicketSize.length > 0 || (viewMode === 'security_package' && portfolioHasPool));
+  useLoanBooks(needsPortfolioLoans ? nbfis.flatMap(n => TRANSACTION_MAP[n.id] || [n.id]) : []);
+  const rollupView = scope === 'portfolio' && !needsPortfolioLoans;
+  const rollup = usePortfolioRollup(['nbfiId'], { geographies: filterGeography, products: filterProduct, dpdBuckets: filterDpdBuckets }, scope === 'portfolio');
+  const rollupTotals = rollupView ? rollup?.totals ?? null : null;
 
   useEffect(() => { if (!user) router.push('/'); }, [user, router]);
   const nbfi = getNBFI(id);
@@ -120,12 +145,13 @@ export default function MonitoringPage() {
 
   const allLoansTagged = useMemo((): LoanWithNbfi[] => {
     const out: LoanWithNbfi[] = [];
+    if (!needsPortfolioLoans) return out;
     for (const [txId, rows] of Object.entries(loanBookData)) {
       const nbfiId = getNbfiIdForTransaction(txId);
       for (const r of rows) out.push({ ...r, _nbfiId: nbfiId, _txId: txId });
     }
     return out;
-  }, [loanBookData]);
+  }, [loanBookData, needsPortfolioLoans]);
 
   const filterObj = useMemo(() => ({ product: filterProduct, geography: filterGeography, segment: filterSegment, dpdBuckets: filterDpdBuckets, ticketSize: filterTicketSize }), [filterProduct, filterGeography, filterSegment, filterDpdBuckets, filterTicketSize]);
   const sourceLoans = useMemo((): LoanLevelRow[] => scope === 'portfolio' ? allLoansTagged : scope === 'nbfi' ? nbfiLoans : txLoans, [scope, allLoansTagged, nbfiLoans, txLoans]);
@@ -133,59 +159,65 @@ export default function MonitoringPage() {
   const filteredTagged = useMemo(() => applyFilters(allLoansTagged, filterObj), [allLoansTagged, filterObj]);
 
   const securityPackageFiltered = useMemo((): LoanLevelRow[] => {
-    if (scope === 'portfolio') return applyPoolSelectionForPortfolio(applyFilters(allLoansTagged, filterObj), selectedPoolByNbfi);
-    return applyPoolSelection(applyFilters(sourceLoans, filterObj), selectedPoolByNbfi[id]);
+    if (scope === 'portfolio') return applyPoolSelectionForPortfolio(allLoansTagged, selectedPoolByNbfi, filterObj);
+    return applyPoolSelection(sourceLoans, selectedPoolByNbfi[id], filterObj);
   }, [scope, sourceLoans, allLoansTagged, filterObj, selectedPoolByNbfi, id]);
-  const hasConfirmedPool = scope === 'portfolio'
-    ? Object.values(selectedPoolByNbfi).some(s => !!s.confirmedAt)
-    : !!selectedPoolByNbfi[id]?.confirmedAt;
+  const hasConfirmedPool = scope === 'portfolio' ? portfolioHasPool : !!selectedPoolByNbfi[id]?.confirmedAt;
   const effectiveRows = viewMode === 'security_package' && hasConfirmedPool ? securityPackageFiltered : filtered;
   const activeFilterCount = [filterProduct, filterGeography, filterSegment, filterDpdBuckets, filterTicketSize].filter(a => a.length > 0).length;
   const allUnfiltered = scope === 'portfolio' ? allLoansTagged : scope === 'nbfi' ? nbfiLoans : txLoans;
-  const geoOptions = useMemo(() => [...new Set(allUnfiltered.map(r => r.geography || 'Unknown'))].sort(), [allUnfiltered]);
-  const prodOptions = useMemo(() => [...new Set(allUnfiltered.map(r => r.product || 'Unknown'))].sort(), [allUnfiltered]);
-  const segOptions = useMemo(() => [...new Set(allUnfiltered.map(r => r.segment || 'Unknown'))].sort(), [allUnfiltered]);
+  const rollupDims = scope === 'portfolio' ? rollup?.dimensions : serverView ? overallAnalytics?.dimensions : undefined;
+  const serverSegments = serverView ? overallAnalytics?.dimensions.segment : undefined;
+  const geoOptions = useMemo(() => rollupDims?.geography ?? [...new Set(allUnfiltered.map(r => r.geography || 'Unknown'))].sort(), [rollupDims, allUnfiltered]);
+  const prodOptions = useMemo(() => rollupDims?.product ?? [...new Set(allUnfiltered.map(r => r.product || 'Unknown'))].sort(), [rollupDims, allUnfiltered]);
+  // Segments are not a rollup dimension: offer those of the loans at hand until the portfolio's are loaded
+  const segOptions = useMemo(() => serverSegments ?? [...new Set((rollupView ? nbfiLoans : allUnfiltered).map(r => r.segment || 'Unknown'))].sort(), [serverSegments, rollupView, nbfiLoans, allUnfiltered]);
   const clearFilters = () => { setFilterProduct([]); setFilterGeography([]); setFilterSegment([]); setFilterDpdBuckets([]); setFilterTicketSize([]); };
 
+  const facilityAmt = scope === 'transaction' ? (nbfi?.fundingAmount ?? 0) : scope === 'nbfi' ? (nbfi?.fundingAmount ?? 0) : nbfis.reduce((s, n) => s + n.fundingAmount, 0);
+  // Server payload for the transaction scope (undefined while loading, null without a book)
+  const server = serverView ? (viewMode === 'security_package' && hasConfirmedPool ? packageAnalytics : overallAnalytics) : null;
+  // All additive portfolio metrics in one fused pass over a struct-of-arrays copy of the book
+  const metrics = useMemo(() => server?.metrics ?? computePortfolioMetricsFromRows(effectiveRows, facilityAmt), [server, effectiveRows, facilityAmt]);
+  const comparison = useMemo((): { overall: PortfolioMetrics; securityPackage: PortfolioMetrics } | null => {
+    if (!hasConfirmedPool || rollupView) return null;
+    if (serverView) return overallAnalytics && packageAnalytics ? { overall: overallAnalytics.metrics, securityPackage: packageAnalytics.metrics } : null;
+    return { overall: computePortfolioMetricsFromRows(filtered, facilityAmt), securityPackage: computePortfolioMetricsFromRows(securityPackageFiltered, facilityAmt) };
+  }, [hasConfirmedPool, rollupView, serverView, overallAnalytics, packageAnalytics, filtered, securityPackageFiltered, facilityAmt]);
+
   const kpi = useMemo(() => {
-    if (effectiveRows.length === 0) return null;
-    const totalBal = effectiveRows.reduce((s, r) => s + r.currentBalance, 0);
-    const p30 = effectiveRows.filter(r => r.dpdAsOfReportingDate > 30).length;
-    const p90 = effectiveRows.filter(r => r.dpdAsOfReportingDate > 90).length;
-    const nplBal = effectiveRows.filter(r => r.dpdAsOfReportingDate > 90).reduce((s, r) => s + r.currentBalance, 0);
+    if (rollupTotals) {
+      const t = rollupTotals;
+      if (t.loanCount === 0) return null;
+      const nbfiCount = (rollup?.groups ?? []).filter(g => g.loanCount > 0).length;
+      return { totalLoans: t.loanCount, totalBal: t.balance, nbfiCount, par30: (t.par30Count / t.loanCount) * 100, par90: (t.par90Count / t.loanCount) * 100, nplRatio: t.balance > 0 ? (t.par90Balance / t.balance) * 100 : 0 };
+    }
+    if (metrics.count === 0) return null;
     const nbfiCount = scope === 'portfolio' ? new Set((effectiveRows as LoanWithNbfi[]).map(r => r._nbfiId)).size : 1;
-    return { totalLoans: effectiveRows.length, totalBal, nbfiCount, par30: (p30 / effectiveRows.length) * 100, par90: (p90 / effectiveRows.length) * 100, nplRatio: totalBal > 0 ? (nplBal / totalBal) * 100 : 0 };
-  }, [effectiveRows, scope]);
+    return { totalLoans: metrics.count, totalBal: metrics.totalBalance, nbfiCount, par30: (metrics.par30Count / metrics.count) * 100, par90: (metrics.par90Count / metrics.count) * 100, nplRatio: metrics.totalBalance > 0 ? (metrics.nplBalance / metrics.totalBalance) * 100 : 0 };
+  }, [metrics, effectiveRows, scope, rollupTotals, rollup]);
 
-  const financials = useMemo(() => computeFinancialSummary(effectiveRows), [effectiveRows]);
-  const ecl = useMemo(() => computeECL(effectiveRows), [effectiveRows]);
-  const dpdDist = useMemo(() => {
-    const map: Record<string, number> = {};
-    DPD_BUCKETS.forEach(b => (map[b] = 0));
-    effectiveRows.forEach(r => { map[getDpdBucket(r.dpdAsOfReportingDate)] += r.currentBalance; });
-    return DPD_BUCKETS.map(b => ({ bucket: b, balance: map[b] }));
-  }, [effectiveRows]);
-  const rollRate = useMemo(() => rollRateProjection(effectiveRows), [effectiveRows]);
-  const vintageDataArr = useMemo(() => computeVintageData(effectiveRows), [effectiveRows]);
-  const vintageCurves = useMemo(() => computeVintageCurves(effectiveRows), [effectiveRows]);
-  const stressData = useMemo(() => computeStressIndicators(effectiveRows), [effectiveRows]);
-  const trendMonths = trendPeriod === '3M' ? 3 : trendPeriod === '6M' ? 6 : 12;
-  const trendData = useMemo(() => generateTrendData(effectiveRows, trendMonths), [effectiveRows, trendMonths]);
-
-  const rollScenario = useState<ScenarioKey>('base');
-  const [scenario, setScenario] = rollScenario;
-  const rollRateScenario = useMemo(() => rollRateProjection(effectiveRows, 3, scenario), [effectiveRows, scenario]);
-  const cureRate = useMemo(() => computeCureRate(effectiveRows), [effectiveRows]);
-  const cnl = useMemo(() => computeCNL(effectiveRows), [effectiveRows]);
-  const cdr = useMemo(() => computeCDR(effectiveRows), [effectiveRows]);
-  const geoHHI = useMemo(() => computeHHI(effectiveRows, r => r.geography || 'Unknown'), [effectiveRows]);
-  const prodHHI = useMemo(() => computeHHI(effectiveRows, r => r.product || 'Unknown'), [effectiveRows]);
-  const repayVelocity = useMemo(() => computeRepaymentVelocity(effectiveRows), [effectiveRows]);
+  const financials = useMemo(() => rollupTotals ? rollupFinancials(rollupTotals) : metrics.financialSummary, [rollupTotals, metrics]);
+  const ecl = rollupTotals ? { ecl12m: rollupTotals.ecl12m, eclLifetime: rollupTotals.expectedLoss, totalBal: rollupTotals.balance } : metrics.ecl;
+  const bucketBalances = rollupTotals ? rollupTotals.bucketBalances : metrics.bucketBalances;
+  const dpdDist = useMemo(() => DPD_BUCKETS.map(b => ({ bucket: b, balance: bucketBalances[b] ?? 0 })), [bucketBalances]);
+  const rollRate = useMemo(() => server?.rollRate ?? projectBucketBalances(bucketBalances), [server, bucketBalances]);
+  const vintageIndex = useMemo(() => buildGroupIndex(effectiveRows, r => vintageKey(r.loanDisbursedDate)), [effectiveRows]);
+  const vintageDataArr = useMemo(() => server?.vintages ?? computeVintageData(effectiveRows, vintageIndex), [server, effectiveRows, vintageIndex]);
+  const vintageCurves = useMemo(() => server?.vintageCurves ?? computeVintageCurves(effectiveRows, vintageIndex), [server, effectiveRows, vintageIndex]);
+  const stressData = useMemo(() => server?.stress ?? computeStressIndicators(effectiveRows), [server, effectiveRows]);
+  const trendData = useMemo(() => server?.trend ?? generateTrendData(effectiveRows, analyticsQuery.trendMonths), [server, effectiveRows, analyticsQuery.trendMonths]);
+  const rollRateScenario = useMemo(() => server?.rollRateScenario ?? projectBucketBalances(bucketBalances, 3, scenario), [server, bucketBalances, scenario]);
+  const cureRate = metrics.cureRate;
+  const cnl = metrics.cnl;
+  const cdr = metrics.cdr;
+  const geoHHI = metrics.geographyHHI;
+  const prodHHI = metrics.productHHI;
+  const repayVelocity = metrics.repaymentVelocity;
   const vpInfo = useMemo(() => vpInterpretation(repayVelocity.vp), [repayVelocity.vp]);
-  const facilityAmt = scope === 'transaction' ? (nbfi?.fundingAmount ?? 0) : scope === 'nbfi' ? (nbfi?.fundingAmount ?? 0) : nbfis.reduce((s, n) => s + n.fundingAmount, 0);
-  const borrowingBase = useMemo(() => computeBorrowingBase(effectiveRows, facilityAmt), [effectiveRows, facilityAmt]);
-  const eligibility = useMemo(() => computeEligibilityWaterfall(effectiveRows), [effectiveRows]);
-  const shadow = useMemo(() => computeShadowReconciliation(effectiveRows), [effectiveRows]);
+  const borrowingBase = metrics.borrowingBase;
+  const eligibility = metrics.eligibility;
+  const shadow = metrics.shadow;
 
   const nbfiGroups = useMemo(() => {
     const m: Record<string, LoanWithNbfi[]> = {};
@@ -204,8 +236,20 @@ export default function MonitoringPage() {
     });
   }, [scope, nbfiTxIds, loanBookData, filterObj]);
 
-  const riskRanking = useMemo(() => {
+  type RiskRow = { id: string; name: string; status: string; loans: number; bal: number; par90: number; nplRatio: number; lossRate: number; grossLoss: number; provisions: number; score: number };
+  const riskRanking = useMemo((): RiskRow[] => {
     if (scope !== 'portfolio') return [];
+    if (rollupView) {
+      return (rollup?.groups ?? []).map((g): RiskRow | null => {
+        const n = nbfis.find(x => x.id === g.key.nbfiId);
+        if (!n || g.loanCount === 0) return null;
+        const p90 = (g.par90Count / g.loanCount) * 100;
+        const npl = g.balance > 0 ? (g.par90Balance / g.balance) * 100 : 0;
+        const lossRate = g.balance > 0 ? (g.expectedLoss / g.balance) * 100 : 0;
+        const score = (npl * 0.4) + (p90 * 0.3) + (lossRate * 0.3);
+        return { id: n.id, name: n.name, status: n.status, loans: g.loanCount, bal: g.balance, par90: p90, nplRatio: npl, lossRate, grossLoss: g.writtenOffBalance, provisions: g.provisions, score };
+      }).filter(Boolean).sort((a, b) => (b?.score ?? 0) - (a?.score ?? 0)) as RiskRow[];
+    }
     return Object.entries(nbfiGroups).map(([nid, rows]) => {
       const n = nbfis.find(x => x.id === nid);
       if (!n || rows.length === 0) return null;
@@ -216,12 +260,31 @@ export default function MonitoringPage() {
       const fin = computeFinancialSummary(rows);
       const score = (npl * 0.4) + (p90 * 0.3) + (loss.rate * 100 * 0.3);
       return { id: nid, name: n.name, status: n.status, loans: rows.length, bal, par90: p90, nplRatio: npl, lossRate: loss.rate * 100, grossLoss: fin.grossLoss, provisions: fin.provisions, score };
-    }).filter(Boolean).sort((a, b) => (b?.score ?? 0) - (a?.score ?? 0)) as { id: string; name: string; status: string; loans: number; bal: number; par90: number; nplRatio: number; lossRate: number; grossLoss: number; provisions: number; score: number }[];
-  }, [scope, nbfiGroups, nbfis]);
+    }).filter(Boolean).sort((a, b) => (b?.score ?? 0) - (a?.score ?? 0)) as RiskRow[];
+  }, [scope, rollupView, rollup, nbfiGroups, nbfis]);
+
+  // Transaction scope holds no loans in the page: fetch the book for the export only
+  const exportRows = async (): Promise<LoanLevelRow[]> => {
+    if (!serverView) return effectiveRows;
+    const res = await fetch(`/api/nbfis/${id}/loan-book`).catch(() => null);
+    const book: LoanLevelRow[] = res?.ok ? ((await res.json()) as { rows: LoanLevelRow[] }).rows : [];
+    return viewMode === 'security_package' && hasConfirmedPool
+      ? applyPoolSelection(book, selectedPoolByNbfi[id], filterObj)
+      : applyFilters(book, filterObj);
+  };
 
-  const handleExport = () => {
+  const handleExport = async () => {
+    if (rollupView) {
+      const headers = ['nbfiId', 'loanCount', 'balance', 'par30Balance', 'par90Balance', 'overdue', 'writtenOffBalance', 'recovery', 'provisions', 'expectedLoss'] as const;
+      const csv = [headers.join(','), ...(rollup?.groups ?? []).map(g => headers.map(h => h === 'nbfiId' ? g.key.nbfiId ?? '' : String(g[h])).join(','))].join('\n');
+      const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' });
+      const url = URL.createObjectURL(blob);
+      const a = document.createElement('a'); a.href = url; a.download = `risk-portfolio-rollup-${new Date().toISOString().slice(0, 10)}.csv`; a.click(); URL.revokeObjectURL(url);
+      return;
+    }
     const headers = ['loanId', 'product', 'geography', 'segment', 'currentBalance', 'dpdAsOfReportingDate', 'totalOverdueAmount', 'interestRate', 'loanWrittenOff', 'recoveryAfterWriteoff'];
-    const csv = [headers.join(','), ...effectiveRows.map(r => headers.map(h => { const v = (r as unknown as Record<string, unknown>)[h]; return typeof v === 'string' && v.includes(',') ? `"${v}"` : String(v ?? ''); }).join(','))].join('\n');
+    const rows = await exportRows();
+    const csv = [headers.join(','), ...rows.map(r => headers.map(h => { const v = (r as unknown as Record<string, unknown>)[h]; return typeof v === 'string' && v.includes(',') ? `"${v}"` : String(v ?? ''); }).join(','))].join('\n');
     const blob = new Blob([csv], { type: 'text/csv;charset=utf-8;' });
     const url = URL.createObjectURL(blob);
     const a = document.createElement('a'); a.href = url; a.download = `risk-${scope}-${new Date().toISOString().slice(0, 10)}.csv`; a.click(); URL.revokeObjectURL(url);
@@ -261,7 +324,7 @@ export default function MonitoringPage() {
           <FilterPill label="DPD Bucket" options={[...DPD_BUCKETS]} selected={filterDpdBuckets} onChange={setFilterDpdBuckets} />
           <FilterPill label="Ticket Size" options={[...TICKET_SIZES]} selected={filterTicketSize} onChange={setFilterTicketSize} />
           {activeFilterCount > 0 && <button type="button" onClick={clearFilters} className="flex items-center gap-1 px-2 py-1 text-xs text-red-600 hover:bg-red-50 rounded-full"><X className="w-3 h-3" /> Clear all</button>}
-          <span className="ml-auto text-xs text-gray-400">{effectiveRows.length.toLocaleString()} loans{viewMode === 'security_package' && hasConfirmedPool ? ' (security package)' : ''}</span>
+          <span className="ml-auto text-xs text-gray-400">{(rollupView || server ? kpi?.totalLoans ?? 0 : effectiveRows.length).toLocaleString()} loans{viewMode === 'security_package' && hasConfirmedPool ? ' (security package)' : ''}</span>
         </div>
         {scope !== 'portfolio' && <div className="mb-5"><TransactionAlertTimeline nbfiId={id} /></div>}
         {scope === 'nbfi' && txBreakdown.length > 1 && (
@@ -280,9 +343,7 @@ export default function MonitoringPage() {
             <KpiCard label="PAR 90+" value={pct(kpi.par90)} icon={<Activity className="w-4 h-4 text-red-500" />} alert={kpi.par90 > 5} />
             <KpiCard label="NPL Ratio" value={pct(kpi.nplRatio)} icon={<Activity className="w-4 h-4 text-orange-500" />} alert={kpi.nplRatio > 5} />
           </div>
-          {hasConfirmedPool && (
-            <ComparisonChart overall={filtered} securityPackage={securityPackageFiltered} />
-          )}
+          {comparison && <ComparisonChart overall={comparison.overall} securityPackage={comparison.securityPackage} />}
           <div className="grid grid-cols-4 gap-3 mb-5">
             <MetricCard label="Gross Loss" value={fmt(financials.grossLoss)} sub={`${financials.writeOffCount} write-offs`} color="red" />
             <MetricCard label="Net Loss" value={fmt(financials.netLoss)} sub={`Recovery: ${pct(financials.recoveryRate)}`} color="red" />
@@ -291,7 +352,7 @@ export default function MonitoringPage() {
           </div>
           <div className="grid grid-cols-4 gap-3 mb-5">
             <MetricCard label="Total Overdue" value={fmt(financials.totalOverdue)} sub={`${pct(financials.overdueRatio)} of balance`} color="amber" />
-            <MetricCard label="Write-off Rate" value={pct(financials.writeOffRate)} sub={`${financials.writeOffCount} of ${effectiveRows.length}`} color="red" />
+            <MetricCard label="Write-off Rate" value={pct(financials.writeOffRate)} sub={`${financials.writeOffCount} of ${kpi.totalLoans}`} color="red" />
             <MetricCard label="Recovery Rate" value={pct(financials.recoveryRate)} sub={fmt(financials.recovery)} color="green" />
             <MetricCard label="ECL (12-month, IFRS 9)" value={fmt(ecl.ecl12m)} sub={`Lifetime: ${fmt(ecl.eclLifetime)}`} color="blue" />
           </div>
@@ -302,6 +363,14 @@ export default function MonitoringPage() {
                 <BarChart data={dpdDist}><CartesianGrid strokeDasharray="3 3" stroke="#f0f0f0" /><XAxis dataKey="bucket" tick={{ fontSize: 10 }} /><YAxis tick={{ fontSize: 10 }} tickFormatter={v => `${(v / 1e6).toFixed(0)}M`} /><Tooltip formatter={(val: unknown) => [fmt(Number(val))]} /><Bar dataKey="balance" radius={[4, 4, 0, 0]}>{dpdDist.map((d, i) => <Cell key={d.bucket} fill={COLORS[i % COLORS.length]} />)}</Bar></BarChart>
               </ResponsiveContainer>
             </div>
+            {rollupView ? (
+              <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-5 flex flex-col justify-center items-center text-center">
+                <Layers className="w-6 h-6 text-[#003366] mb-2" />
+                <h2 className="text-sm font-bold text-[#003366] mb-1">Loan-Level Analytics</h2>
+                <p className="text-xs text-gray-500 mb-4 max-w-sm">Portfolio totals come from the materialised rollup. Trend, vintage curves, stress indicators, borrowing base, concentration and reconciliation need every NBFI&apos;s individual loans.</p>
+                <button type="button" onClick={() => setPortfolioDrill(true)} className="px-4 py-2 bg-[#003366] text-white rounded-lg text-sm font-medium hover:bg-[#004d99]">Load loan-level analytics</button>
+              </div>
+            ) : (
             <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-5">
               <div className="flex items-center justify-between mb-3">
                 <h2 className="text-sm font-bold text-[#003366]">Performance Trend</h2>
@@ -310,7 +379,7 @@ export default function MonitoringPage() {
               <ResponsiveContainer width="100%" height={240}>
                 <LineChart data={trendData}><CartesianGrid strokeDasharray="3 3" stroke="#f0f0f0" /><XAxis dataKey="month" tick={{ fontSize: 9 }} /><YAxis tick={{ fontSize: 10 }} tickFormatter={v => `${v}%`} /><Tooltip formatter={(val: unknown) => [`${Number(val).toFixed(1)}%`]} /><Legend wrapperStyle={{ fontSize: 10 }} /><Line type="monotone" dataKey="par30" name="PAR 30+" stroke="#e67300" strokeWidth={2} dot={false} /><Line type="monotone" dataKey="par90" name="PAR 90+" stroke="#cc3333" strokeWidth={2} dot={false} /><Line type="monotone" dataKey="npl" name="NPL %" stroke="#9333ea" strokeWidth={2} dot={false} /><Line type="monotone" dataKey="collection" name="Collection %" stroke="#003366" strokeWidth={2} dot={false} /></LineChart>
               </ResponsiveContainer>
-            </div>
+            </div>)}
           </div>
           <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-5 mb-5">
             <div className="flex items-center justify-between mb-1">
@@ -319,7 +388,7 @@ export default function MonitoringPage() {
                 <button key={s} onClick={() => setScenario(s)} className={`px-2.5 py-1 rounded text-[10px] font-medium transition-colors ${scenario === s ? 'bg-[#003366] text-white' : 'bg-gray-100 text-gray-600 hover:bg-gray-200'}`}>{s.charAt(0).toUpperCase() + s.slice(1)}</button>
               ))}</div>
             </div>
-            <p className="text-[10px] text-gray-500 mb-3">Markov chain forward projection &mdash; {scenario} scenario over 3 months | Cure Rate: {cureRate.rate.toFixed(1)}%</p>
+            <p className="text-[10px] text-gray-500 mb-3">Markov chain forward projection &mdash; {scenario} scenario over 3 months {!rollupView && <>| Cure Rate: {cureRate.rate.toFixed(1)}%</>}</p>
             <div className="grid grid-cols-2 gap-5">
               <div className="overflow-x-auto">
                 <table className="w-full text-[11px]"><thead><tr className="bg-gray-50 border-b text-gray-500 uppercase"><th className="text-left px-2 py-1.5">From \ To</th>{DPD_BUCKETS.map(b => <th key={b} className="text-right px-2 py-1.5">{b}</th>)}</tr></thead>
@@ -330,6 +399,7 @@ export default function MonitoringPage() {
               </ResponsiveContainer>
             </div>
           </div>
+          {!rollupView && (<>
           <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-5 mb-5">
             <h2 className="text-sm font-bold text-[#003366] mb-1">Vintage Analysis &amp; CNL Curves</h2>
             <p className="text-[10px] text-gray-500 mb-3">Cohort-based loss analysis with Cumulative Net Loss curves by months-on-book</p>
@@ -438,6 +508,7 @@ export default function MonitoringPage() {
               </div>
             </div>
           </div>
+          </>)}
 
           {scope === 'portfolio' && riskRanking.length > 0 && (<>
             <div className="bg-white rounded-xl shadow-sm border border-gray-200 p-5 mb-5">
@@ -451,22 +522,21 @@ export default function MonitoringPage() {
               <div className="space-y-1.5">{riskRanking.slice(0, 10).map(r => (<div key={r.id} className="flex items-center gap-3"><span className="text-xs w-40 truncate font-medium text-gray-700">{r.name}</span><div className="flex-1 bg-gray-100 rounded-full h-5 overflow-hidden"><div className={`h-full rounded-full flex items-center justify-end pr-2 transition-all ${r.score > 15 ? 'bg-red-400' : r.score > 8 ? 'bg-amber-400' : 'bg-green-400'}`} style={{ width: `${Math.min(r.score * 3, 100)}%` }}><span className="text-[10px] text-white font-bold">{r.score.toFixed(1)}</span></div></div>{r.score > 15 && <AlertTriangle className="w-4 h-4 text-red-500 shrink-0" />}</div>))}</div>
             </div>
           </>)}
-        </>) : <div className="text-center py-20 text-gray-400">No loan data available for this view. Upload a loan book to see analytics.</div>}
+        </>) : <div className="text-center py-20 text-gray-400">{rollupView && !rollup ? 'Loading portfolio rollup…' : serverView && server === undefined ? 'Loading analytics…' : 'No loan data available for this view. Upload a loan book to see analytics.'}</div>}
       </main>
     </div>
   );
 }
 
-function ComparisonChart({ overall, securityPackage }: { overall: LoanLevelRow[]; securityPackage: LoanLevelRow[] }) {
-  const calc = (rows: LoanLevelRow[]) => {
-    if (rows.length === 0) return { loans: 0, balance: 0, par30: 0, par90: 0, npl: 0, ecl: 0 };
-    const bal = rows.reduce((s, r) => s + r.currentBalance, 0);
-    const p30 = (rows.filter(r => r.dpdAsOfReportingDate > 30).length / rows.length) * 100;
-    const p90 = (rows.filter(r => r.dpdAsOfReportingDate > 90).length / rows.length) * 100;
-    const nplBal = rows.filter(r => r.dpdAsOfReportingDate > 90).reduce((s, r) => s + r.currentBalance, 0);
-    const npl = bal > 0 ? (nplBal / bal) * 100 : 0;
-    const eclObj = computeECL(rows);
-    return { loans: rows.length, balance: bal, par30: p30, par90: p90, npl, ecl: bal > 0 ? (eclObj.ecl12m / bal) * 100 : 0 };
+function ComparisonChart({ overall, securityPackage }: { overall: PortfolioMetrics; securityPackage: PortfolioMetrics }) {
+  const calc = (m: PortfolioMetrics) => {
+    if (m.count === 0) return { loans: 0, balance: 0, par30: 0, par90: 0, npl: 0, ecl: 0 };
+    const bal = m.totalBalance;
+    return {
+      loans: m.count, balance: bal,
+      par30: (m.par30Count / m.count) * 100, par90: (m.par90Count / m.count) * 100,
+      npl: bal > 0 ? (m.nplBalance / bal) * 100 : 0, ecl: bal > 0 ? (m.ecl.ecl12m / bal) * 100 : 0,
+    };
   };
   const ov = calc(overall);
   const sp = calc(securityPackage);
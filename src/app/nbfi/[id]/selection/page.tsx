@@ -1,6 +1,6 @@
 'use client';
 
-import { useApp } from '@/context/AppContext';
+import { useApp, useLoanBooks } from '@/context/AppContext';
 import { useRouter, useParams } from 'next/navigation';
 import { useEffect, useMemo, useState } from 'react';
 import Sidebar from '@/components/Sidebar';
@@ -10,6 +10,7 @@ import type { LoanLevelRow, PoolSelectionState, SecuritisationStructure } from '
 import { getDpdBucket, DPD_BUCKETS } from '@/lib/types';
 import { generateMockLoanBook } from '@/lib/mockLoanBook';
 import { runWaterfall, runStressGrid } from '@/lib/securitisationWaterfall';
+import { getLoanIndex, poolFilterMask, selectRows, maskTotals } from '@/lib/loanIndex';
 
 const LOSS_RATES: Record<string, number> = {
   'Current': 0, '1-30': 0.01, '31-60': 0.10, '61-90': 0.25, '91-180': 0.50, '180+': 1.0,
@@ -36,6 +37,7 @@ export default function SelectionPage() {
   const router = useRouter();
   const params = useParams();
   const id = params.id as string;
+  useLoanBooks([id]);
 
   const nbfiInit = getNBFI(id);
   const rows = useLoanData(id, loanBookData);
@@ -75,24 +77,19 @@ export default function SelectionPage() {
   const toggleProduct = (p: string) => setSelectedProducts(prev => prev.includes(p) ? prev.filter(x => x !== p) : [...prev, p]);
   const toggleDpd = (b: string) => setSelectedDpdBuckets(prev => prev.includes(b) ? prev.filter(x => x !== b) : [...prev, b]);
 
-  const filtered = useMemo(() => {
-    return rows.filter(r => {
-      if (r.loanDisbursedAmount < loanAmountMin || r.loanDisbursedAmount > loanAmountMax) return false;
-      if (r.residualTenureMonths != null && (r.residualTenureMonths < tenureMin || r.residualTenureMonths > tenureMax)) return false;
-      if (r.interestRate < rateMin || r.interestRate > rateMax) return false;
-      if (selectedGeos.length > 0 && !selectedGeos.includes(r.geography || 'Unknown')) return false;
-      if (selectedProducts.length > 0 && !selectedProducts.includes(r.product || 'Unknown')) return false;
-      if (selectedDpdBuckets.length > 0 && !selectedDpdBuckets.includes(getDpdBucket(r.dpdAsOfReportingDate))) return false;
-      return true;
-    });
-  }, [rows, loanAmountMin, loanAmountMax, tenureMin, tenureMax, rateMin, rateMax, selectedGeos, selectedProducts, selectedDpdBuckets]);
-
-  const totalBalance = useMemo(() => filtered.reduce((s, r) => s + r.currentBalance, 0), [filtered]);
-  const excludedCount = rows.length - filtered.length;
-  const excludedBalance = useMemo(
-    () => rows.filter(r => !filtered.includes(r)).reduce((s, r) => s + r.currentBalance, 0),
-    [rows, filtered]
-  );
+  // Slider and chip changes re-evaluate bitmap intersections over the cached book index
+  const loanIndex = useMemo(() => getLoanIndex(rows), [rows]);
+  const filterMask = useMemo(() => poolFilterMask(loanIndex, {
+    loanAmountMin, loanAmountMax, tenureMin, tenureMax, rateMin, rateMax,
+    dpdBuckets: selectedDpdBuckets, geographies: selectedGeos, products: selectedProducts,
+  }), [loanIndex, loanAmountMin, loanAmountMax, tenureMin, tenureMax, rateMin, rateMax, selectedGeos, selectedProducts, selectedDpdBuckets]);
+  const filtered = useMemo(() => selectRows(loanIndex, filterMask), [loanIndex, filterMask]);
+  const bookTotals = useMemo(() => maskTotals(loanIndex, null), [loanIndex]);
+  const poolTotals = useMemo(() => maskTotals(loanIndex, filterMask), [loanIndex, filterMask]);
+
+  const totalBalance = poolTotals.balance;
+  const excludedCount = bookTotals.count - poolTotals.count;
+  const excludedBalance = bookTotals.balance - poolTotals.balance;
 
   const loss = useMemo(() => estimateLoss(filtered), [filtered]);
 
@@ -0,0 +1,241 @@
+'use client';
+
+import { useCallback, useEffect, useMemo, useRef, useState } from 'react';
+import { Search, ArrowUp, ArrowDown, Download } from 'lucide-react';
+import type { LoanLevelRow } from '@/lib/types';
+
+// Virtualised view over /api/nbfis/[id]/loans. Only the rows in the viewport are
+// rendered and at most MAX_PAGES pages are held in memory, so a 1M-loan tape
+// browses in constant memory. Adjacent pages are fetched by cursor; jumps (e.g.
+// dragging the scrollbar) use the offset parameter.
+
+const PAGE_SIZE = 200;
+const MAX_PAGES = 8;
+const ROW_HEIGHT = 28;
+
+export interface LoanColumn {
+  field: keyof LoanLevelRow & string;
+  label: string;
+  align?: 'left' | 'right';
+  width?: string;
+  format?: (v: unknown) => string;
+}
+
+const num = (v: unknown) => (typeof v === 'number' ? v.toLocaleString(undefined, { maximumFractionDigits: 2 }) : '');
+
+export const DEFAULT_LOAN_COLUMNS: LoanColumn[] = [
+  { field: 'loanId', label: 'Loan ID', width: '1.2fr' },
+  { field: 'borrowerName', label: 'Borrower', width: '1.5fr' },
+  { field: 'product', label: 'Product' },
+  { field: 'geography', label: 'Geography' },
+  { field: 'loanDisbursedDate', label: 'Disbursed' },
+  { field: 'currentBalance', label: 'Balance', align: 'right', format: num },
+  { field: 'interestRate', label: 'Rate %', align: 'right', format: num },
+  { field: 'dpdAsOfReportingDate', label: 'DPD', align: 'right', format: num },
+];
+
+interface PageResponse {
+  rows: LoanLevelRow[];
+  nextCursor: string | null;
+  total: number | null;
+}
+
+export default function LoanTable({
+  nbfiId,
+  columns = DEFAULT_LOAN_COLUMNS,
+  height = 480,
+  filters,
+}: {
+  nbfiId: string;
+  columns?: LoanColumn[];
+  height?: number;
+  filters?: { dpdBuckets?: string[]; geographies?: string[]; products?: string[] };
+}) {
+  const [sort, setSort] = useState<{ field: string; dir: 'asc' | 'desc' }[]>([]);
+  const [searchInput, setSearchInput] = useState('');
+  const [search, setSearch] = useState('');
+  const [total, setTotal] = useState<number | null>(null);
+  const [scrollTop, setScrollTop] = useState(0);
+  const [, setVersion] = useState(0); // bumped when a page lands
+
+  // Page cache (LRU by Map insertion order), page-start cursors, and in-flight page loads
+  const pages = useRef(new Map<number, LoanLevelRow[]>());
+  const cursors = useRef(new Map<number, string>());
+  const loading = useRef(new Set<number>());
+  const generation = useRef(0);
+  const scroller = useRef<HTMLDivElement>(null);
+
+  useEffect(() => {
+    const t = setTimeout(() => setSearch(searchInput.trim()), 250);
+    return () => clearTimeout(t);
+  }, [searchInput]);
+
+  const baseQuery = useMemo(() => {
+    const sp = new URLSearchParams();
+    sp.set('limit', String(PAGE_SIZE));
+    sp.set('fields', columns.map((c) => c.field).join(','));
+    if (sort.length) sp.set('sort', sort.map((s) => (s.dir === 'desc' ? '-' : '') + s.field).join(','));
+    if (search) sp.set('q', search);
+    if (filters?.dpdBuckets?.length) sp.set('dpdBuckets', filters.dpdBuckets.join(','));
+    if (filters?.geographies?.length) sp.set('geographies', filters.geographies.join(','));
+    if (filters?.products?.length) sp.set('products', filters.products.join(','));
+    return sp.toString();
+  }, [columns, sort, search, filters?.dpdBuckets, filters?.geographies, filters?.products]);
+
+  const exportQuery = useMemo(() => {
+    const sp = new URLSearchParams(baseQuery);
+    sp.delete('limit');
+    sp.delete('fields');
+    return sp.toString();
+  }, [baseQuery]);
+
+  const loadPage = useCallback(async (page: number, gen: number) => {
+    if (pages.current.has(page) || loading.current.has(page)) return;
+    loading.current.add(page);
+    const cursor = cursors.current.get(page);
+    const url = `/api/nbfis/${nbfiId}/loans?${baseQuery}${
+      cursor ? `&cursor=${encodeURIComponent(cursor)}` : page > 0 ? `&offset=${page * PAGE_SIZE}` : ''}`;
+    try {
+      const res = await fetch(url);
+      if (!res.ok || gen !== generation.current) return;
+      const body = (await res.json()) as PageResponse;
+      if (gen !== generation.current) return;
+      pages.current.set(page, body.rows);
+      while (pages.current.size > MAX_PAGES) pages.current.delete(pages.current.keys().next().value as number);
+      if (body.nextCursor) cursors.current.set(page + 1, body.nextCursor);
+      if (body.total != null) setTotal(body.total);
+      setVersion((v) => v + 1);
+    } catch {
+      /* transient fetch failure — the page is retried on the next scroll */
+    } finally {
+      loading.current.delete(page);
+    }
+  }, [nbfiId, baseQuery]);
+
+  // New query: drop everything and start from the top
+  useEffect(() => {
+    generation.current++;
+    pages.current.clear();
+    cursors.current.clear();
+    loading.current.clear();
+    setTotal(null);
+    setScrollTop(0);
+    if (scroller.current) scroller.current.scrollTop = 0;
+    loadPage(0, generation.current);
+  }, [loadPage]);
+
+  const visibleCount = Math.ceil(height / ROW_HEIGHT) + 1;
+  const first = Math.floor(scrollTop / ROW_HEIGHT);
+  const last = Math.min(first + visibleCount, total ?? first + visibleCount);
+
+  useEffect(() => {
+    const gen = generation.current;
+    for (let p = Math.floor(first / PAGE_SIZE); p <= Math.floor(Math.max(last - 1, 0) / PAGE_SIZE); p++) {
+      const rows = pages.current.get(p);
+      if (rows) {
+        // Refresh LRU position
+        pages.current.delete(p);
+        pages.current.set(p, rows);
+      } else {
+        loadPage(p, gen);
+      }
+    }
+  }, [first, last, loadPage]);
+
+  const toggleSort = (field: string, additive: boolean) => {
+    setSort((prev) => {
+      const cur = prev.find((s) => s.field === field);
+      const next = cur
+        ? cur.dir === 'asc' ? { field, dir: 'desc' as const } : null
+        : { field, dir: 'asc' as const };
+      // Shift-click adds a secondary sort key; a plain click replaces the sort
+      const rest = additive ? prev.filter((s) => s.field !== field) : [];
+      return next ? [...rest, next] : rest;
+    });
+  };
+
+  const template = columns.map((c) => c.width ?? '1fr').join(' ');
+  const rowAt = (i: number) => pages.current.get(Math.floor(i / PAGE_SIZE))?.[i % PAGE_SIZE];
+
+  return (
+    <div className="border border-gray-200 rounded-xl bg-white overflow-hidden">
+      <div className="flex items-center justify-between gap-3 px-4 py-2.5 border-b border-gray-100">
+        <div className="relative w-72">
+          <Search className="w-3.5 h-3.5 text-gray-400 absolute left-2.5 top-1/2 -translate-y-1/2" />
+          <input
+            value={searchInput}
+            onChange={(e) => setSearchInput(e.target.value)}
+            placeholder="Search loan ID or borrower (prefix)"
+            className="w-full text-xs border border-gray-200 rounded-lg pl-8 pr-2 py-1.5"
+          />
+        </div>
+        <div className="flex items-center gap-3">
+          <span className="text-xs text-gray-500">
+            {total == null ? 'Loading…' : `${total.toLocaleString()} loans`}
+            {sort.length > 0 && ' · shift-click a column to add a sort key'}
+          </span>
+          {/* Streamed server-side exports of the current view (all columns, same filters, sort and search) */}
+          {(['csv', 'xlsx'] as const).map((format) => (
+            <a
+              key={format}
+              href={`/api/nbfis/${nbfiId}/export?${exportQuery}&format=${format}${format === 'xlsx' ? '&sheets=loans,pool' : ''}`}
+              className="inline-flex items-center gap-1 text-xs font-medium text-[#003366] hover:underline"
+            >
+              <Download className="w-3 h-3" /> {format.toUpperCase()}
+            </a>
+          ))}
+        </div>
+      </div>
+
+      <div
+        className="grid bg-gray-50 border-b text-xs font-semibold text-gray-500 uppercase tracking-wider"
+        style={{ gridTemplateColumns: template }}
+      >
+        {columns.map((c) => {
+          const s = sort.find((x) => x.field === c.field);
+          return (
+            <button
+              key={c.field}
+              type="button"
+              onClick={(e) => toggleSort(c.field, e.shiftKey)}
+              className={`flex items-center gap-1 px-3 py-2 hover:text-[#003366] ${c.align === 'right' ? 'justify-end' : ''}`}
+            >
+              {c.label}
+              {s && (s.dir === 'asc' ? <ArrowUp className="w-3 h-3" /> : <ArrowDown className="w-3 h-3" />)}
+            </button>
+          );
+        })}
+      </div>
+
+      <div
+        ref={scroller}
+        className="overflow-y-auto relative"
+        style={{ height }}
+        onScroll={(e) => setScrollTop(e.currentTarget.scrollTop)}
+      >
+        <div style={{ height: (total ?? 0) * ROW_HEIGHT, position: 'relative' }}>
+          {Array.from({ length: Math.max(last - first, 0) }, (_, k) => {
+            const i = first + k;
+            const row = rowAt(i);
+            return (
+              <div
+                key={i}
+                className={`grid text-xs border-b border-gray-100 absolute left-0 right-0 ${i % 2 ? 'bg-gray-50/50' : ''}`}
+                style={{ gridTemplateColumns: template, top: i * ROW_HEIGHT, height: ROW_HEIGHT }}
+              >
+                {columns.map((c) => {
+                  const v = row ? (row as unknown as Record<string, unknown>)[c.field] : undefined;
+                  return (
+                    <div key={c.field} className={`px-3 py-1.5 truncate ${c.align === 'right' ? 'text-right font-mono' : ''} ${row ? 'text-gray-700' : 'text-gray-300'}`}>
+                      {row ? (c.format ? c.format(v) : String(v ?? '')) : '…'}
+                    </div>
+                  );
+                })}
+              </div>
+            );
+          })}
+        </div>
+      </div>
+    </div>
+  );
+}
@@ -20,25 +20,15 @@ export interface AppAlert {
   link?: string;
 }
 
+// Feed, document and system notifications (no server source yet). Covenant and early-warning
+// alerts come from /api/alerts, which serves the covenant evaluation job's EarlyWarning rows.
 const MOCK_ALERTS: AppAlert[] = [
-  {
-    id: 'a1', severity: 'critical', title: 'Covenant Breach — Apex Finance',
-    message: 'PAR 30+ ratio exceeded threshold (12.3% vs 10% limit). Immediate review required.',
-    timestamp: '2025-02-18T08:30:00Z', nbfiId: 'seed-1', nbfiName: 'Apex Finance',
-    category: 'covenant', read: false, link: '/nbfi/seed-1/covenants',
-  },
   {
     id: 'a2', severity: 'warning', title: 'Data Feed Delayed — Horizon MFI',
     message: 'Daily loan book upload not received. Last successful feed: 2025-02-16.',
     timestamp: '2025-02-18T07:00:00Z', nbfiId: 'seed-2', nbfiName: 'Horizon MFI',
     category: 'data_feed', read: false, link: '/nbfi/seed-2/integration',
   },
-  {
-    id: 'a3', severity: 'warning', title: 'Portfolio Deterioration — Apex Finance',
-    message: 'DPD 90+ balance increased 15% week-over-week. Vintage 2024-Q3 showing elevated losses.',
-    timestamp: '2025-02-17T16:00:00Z', nbfiId: 'seed-1', nbfiName: 'Apex Finance',
-    category: 'portfolio', read: false, link: '/nbfi/seed-1/eda',
-  },
   {
     id: 'a4', severity: 'info', title: 'Document Expiring — Apex Finance',
     message: 'Board resolution document expires in 14 days. Request renewal from NBFI.',
@@ -70,8 +60,73 @@ const SEVERITY_CONFIG = {
   success: { bg: 'bg-green-50', border: 'border-green-200', icon: CheckCircle2, iconColor: 'text-green-500', dot: 'bg-green-500' },
 };
 
+interface ServerAlert {
+  id: string;
+  nbfiId: string;
+  nbfiName: string;
+  severity: 'critical' | 'warning' | 'info';
+  metric: string;
+  message: string;
+  createdAt: string;
+}
+
+const SERVER_TITLES = { critical: 'Covenant Breach', warning: 'Early Warning', info: 'Covenant Watch' };
+const ALERT_POLL_MS = 5 * 60_000;
+
+function toAppAlert(a: ServerAlert): AppAlert {
+  return {
+    id: a.id,
+    severity: a.severity,
+    title: `${SERVER_TITLES[a.severity]} — ${a.nbfiName}`,
+    message: a.message,
+    timestamp: a.createdAt,
+    nbfiId: a.nbfiId,
+    nbfiName: a.nbfiName,
+    category: 'covenant',
+    read: a.severity === 'info',
+    link: `/nbfi/${a.nbfiId}/covenants?tab=early-warnings`,
+  };
+}
+
+// One poll shared by every mounted consumer (bell, dashboard strip, timelines)
+const alertStore: {
+  alerts: AppAlert[];
+  listeners: Set<(alerts: AppAlert[]) => void>;
+  timer: ReturnType<typeof setInterval> | null;
+} = { alerts: [], listeners: new Set(), timer: null };
+
+async function refreshAlerts() {
+  try {
+    const res = await fetch('/api/alerts');
+    if (!res.ok) return;
+    const body = (await res.json()) as { alerts: ServerAlert[] };
+    alertStore.alerts = body.alerts.map(toAppAlert);
+    alertStore.listeners.forEach(l => l(alertStore.alerts));
+  } catch {
+    /* offline — keep the last alerts */
+  }
+}
+
 export function useAlerts() {
-  const [alerts] = useState<AppAlert[]>(MOCK_ALERTS);
+  const [serverAlerts, setServerAlerts] = useState<AppAlert[]>(alertStore.alerts);
+  useEffect(() => {
+    alertStore.listeners.add(setServerAlerts);
+    if (!alertStore.timer) {
+      void refreshAlerts();
+      alertStore.timer = setInterval(refreshAlerts, ALERT_POLL_MS);
+    }
+    return () => {
+      alertStore.listeners.delete(setServerAlerts);
+      if (!alertStore.listeners.size && alertStore.timer) {
+        clearInterval(alertStore.timer);
+        alertStore.timer = null;
+      }
+    };
+  }, []);
+  const alerts = useMemo(
+    () => [...serverAlerts, ...MOCK_ALERTS].sort((a, b) => b.timestamp.localeCompare(a.timestamp)),
+    [serverAlerts],
+  );
   const unreadCount = useMemo(() => alerts.filter(a => !a.read).length, [alerts]);
   return { alerts, unreadCount };
 }
@@ -1,12 +1,20 @@
 'use client';
 
-import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
+import React, { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react';
 import {
   NBFIRecord, User, NBFIStatus, CommentaryEntry, FinancialData,
   LoanLevelRow, PoolSelectionState, CovenantDef, CovenantReading,
   DocumentRequirement, ProvisioningRule, EarlyWarningAlert,
   MonitoringData, LoanBookUploadMeta, TransactionType, SecuritisationStructure,
 } from '@/lib/types';
+import type { NbfiSummary } from '@/lib/dbHelpers';
+import type { PortfolioRollupResult, RollupDimension, RollupFilter } from '@/lib/portfolioRollup';
+import type { NbfiAnalytics } from '@/lib/serverAnalytics';
+import type { LoanFilters } from '@/lib/poolSelection';
+import type { ScenarioKey } from '@/lib/rollRate';
+import type { IngestProgress, IngestResult } from '@/lib/loanTapeIngest';
+import type { HistoryProgress, TransitionEstimateResult } from '@/lib/transitionMatrix';
+import { getClientLoanCache } from '@/lib/clientLoanCache';
 import { v4 as uuidv4 } from 'uuid';
 
 import inputTemplateData from '../../data/input-template.json';
@@ -16,6 +24,14 @@ import cashflowData from '../../data/cashflow.json';
 // ---------------------------------------------------------------------------
 // Types
 // ---------------------------------------------------------------------------
+// NDJSON frames streamed by the loan-book upload and loan-history routes
+export type UploadErrorFrame = { type: 'error'; error: string };
+export type LoanTapeFrame = ({ type: 'progress' } & IngestProgress) | ({ type: 'done' } & IngestResult) | UploadErrorFrame;
+export type LoanHistoryFrame =
+  | ({ type: 'progress' } & HistoryProgress)
+  | ({ type: 'done'; estimateId: string } & TransitionEstimateResult)
+  | UploadErrorFrame;
+
 interface AppState {
   user: User | null;
   nbfis: NBFIRecord[];
@@ -31,8 +47,13 @@ interface AppState {
   setRecommendation: (id: string, text: string) => void;
   setApproverComments: (id: string, text: string) => void;
   getNBFI: (id: string) => NBFIRecord | undefined;
+  nbfiSummaries: Record<string, NbfiSummary>;
+  ensureNBFI: (id: string) => Promise<void>;
   loanBookData: Record<string, LoanLevelRow[]>;
+  ensureLoanBook: (nbfiId: string) => Promise<void>;
   setLoanBookData: (nbfiId: string, rows: LoanLevelRow[]) => void;
+  uploadLoanTape: (nbfiId: string, file: File, source: LoanBookUploadMeta['source'], onProgress?: (p: IngestProgress) => void) => Promise<LoanTapeFrame>;
+  uploadLoanHistory: (nbfiId: string, file: File, onProgress?: (p: HistoryProgress) => void) => Promise<LoanHistoryFrame>;
   selectedPoolByNbfi: Record<string, PoolSelectionState>;
   setPoolSelection: (nbfiId: string, state: PoolSelectionState) => void;
   saveCovenantSetup: (id: string, covenants: CovenantDef[], documents: DocumentRequirement[], provisioningRules: { nbfi: ProvisioningRule[]; lender: ProvisioningRule[] }) => void;
@@ -57,7 +78,7 @@ const USERS: Record<string, User> = {
 // localStorage keys
 // ---------------------------------------------------------------------------
 const LS_NBFIS     = 'wl-nbfis';
-const LS_LOAN_BOOK = 'wl-loan-book';
+const LS_LOAN_BOOK = 'wl-loan-book';   // legacy: loan books now live in IndexedDB (clientLoanCache)
 const LS_POOL_SEL  = 'wl-pool-selections';
 const LS_ROLE      = 'wl-user-role';
 
@@ -71,7 +92,7 @@ function lsGet<T>(key: string, fallback: T): T {
 }
 
 function lsSet(key: string, value: unknown) {
-  try { localStorage.setItem(key, JSON.stringify(value)); } catch { /* ignore */ }
+  try { localStorage.setItem(key, JSON.stringify(value)); } catch (err) { console.warn(`[AppContext] localStorage write failed for ${key}:`, err); }
 }
 
 // ---------------------------------------------------------------------------
@@ -85,31 +106,127 @@ function apiCall(url: string, method: string, body?: unknown): void {
   }).catch(() => { /* API unavailable in serverless env — localStorage is authoritative */ });
 }
 
+// ---------------------------------------------------------------------------
+// Helper: conditional GET. Resolves to the parsed body, or null when the server
+// answered 304 (our copy is current) or the API is unavailable.
+// ---------------------------------------------------------------------------
+async function fetchIfChanged<T>(url: string, etags: Map<string, string>): Promise<T | null> {
+  try {
+    const prev = etags.get(url);
+    const res = await fetch(url, prev ? { headers: { 'If-None-Match': prev } } : undefined);
+    if (res.status === 304 || !res.ok) return null;
+    const tag = res.headers.get('ETag');
+    if (tag) etags.set(url, tag);
+    return (await res.json()) as T;
+  } catch {
+    return null;
+  }
+}
+
+// ---------------------------------------------------------------------------
+// Helper: POST a file as the raw request body to a streaming upload route and
+// read its NDJSON frames. Progress frames go to onFrame; resolves to the final
+// done / error frame (an error frame when the route or network fails outright).
+// ---------------------------------------------------------------------------
+async function postFileStream<F extends { type: string }>(
+  url: string,
+  file: File,
+  onFrame: (frame: F) => void,
+): Promise<F | UploadErrorFrame> {
+  try {
+    const res = await fetch(url, { method: 'POST', body: file, headers: { 'Content-Type': 'application/octet-stream' } });
+    if (!res.body || !res.headers.get('Content-Type')?.includes('ndjson')) {
+      const body = await res.json().catch(() => null) as { error?: string } | null;
+      return { type: 'error', error: body?.error ?? `Upload failed (HTTP ${res.status})` };
+    }
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buf = '';
+    let last: F | null = null;
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (value) buf += value;
+      let nl: number;
+      while ((nl = buf.indexOf('\n')) >= 0) {
+        const line = buf.slice(0, nl).trim();
+        buf = buf.slice(nl + 1);
+        if (!line) continue;
+        last = JSON.parse(line) as F;
+        if (last.type === 'progress') onFrame(last);
+      }
+      if (done) break;
+    }
+    return last && last.type !== 'progress' ? last : { type: 'error', error: 'Upload ended without a result' };
+  } catch (err) {
+    console.error(`[AppContext] upload to ${url} failed:`, err);
+    return { type: 'error', error: 'Upload failed — check your connection and try again' };
+  }
+}
+
+// Minimal NBFIRecord for an NBFI known only from the summary list; ensureNBFI replaces it with the detail
+function stubFromSummary(s: NbfiSummary): NBFIRecord {
+  return {
+    id: s.id,
+    name: s.name,
+    keyContacts: '',
+    fundingAmount: s.fundingAmount,
+    description: '',
+    status: s.status,
+    dateOnboarded: s.dateOnboarded,
+    setupCompleted: s.setupCompleted,
+    transactionType: s.transactionType,
+    commentary: [],
+  };
+}
+
+// A held loan book is current while it is the server's latest. Server books are versioned by
+// loanBookId; a local write (`local-<ms>`) stays current unless the server received a book after it.
+function isLatestBook(version: string | undefined, latest: NbfiSummary['loanBook'] | undefined): boolean {
+  if (!latest) return true;
+  if (!version) return false;
+  if (version === latest.id) return true;
+  const local = /^local-(\d+)$/.exec(version);
+  return !!local && Date.parse(latest.uploadedAt) <= Number(local[1]);
+}
+
 // ---------------------------------------------------------------------------
 // Provider
 // ---------------------------------------------------------------------------
 export function AppProvider({ children }: { children: React.ReactNode }) {
   const [user, setUser] = useState<User | null>(null);
   const [nbfis, setNbfisState] = useState<NBFIRecord[]>([]);
+  const [nbfiSummaries, setNbfiSummaries] = useState<Record<string, NbfiSummary>>({});
   const [loanBookData, setLoanBookDataState] = useState<Record<string, LoanLevelRow[]>>({});
   const [selectedPoolByNbfi, setSelectedPoolByNbfiState] = useState<Record<string, PoolSelectionState>>({});
   const [loading, setLoading] = useState(true);
 
+  // Lazy-hydration bookkeeping: ETags per URL, NBFIs still held as summary stubs,
+  // and in-flight loads so concurrent callers share one request
+  const etags = useRef(new Map<string, string>());
+  const stubIds = useRef(new Set<string>());
+  const inflight = useRef(new Map<string, Promise<void>>());
+  // Resolves once cached loan books have been restored from IndexedDB
+  const cacheReady = useRef<Promise<void>>(Promise.resolve());
+  // Resolves to the server's NBFI summaries (empty when the API is unavailable)
+  const summariesReady = useRef<Promise<Record<string, NbfiSummary>>>(Promise.resolve({}));
+  // Version (loanBookId, or local-<ms>) of each book held in loanBookData
+  const loanBookVersions = useRef<Record<string, string>>({});
+
   // Wrapped setters that also sync localStorage
   const setNbfis = useCallback((updater: NBFIRecord[] | ((prev: NBFIRecord[]) => NBFIRecord[])) => {
     setNbfisState((prev) => {
       const next = typeof updater === 'function' ? updater(prev) : updater;
-      lsSet(LS_NBFIS, next);
+      // Summary stubs are not persisted; they are re-fetched from the server
+      lsSet(LS_NBFIS, stubIds.current.size ? next.filter((n) => !stubIds.current.has(n.id)) : next);
       return next;
     });
   }, []);
 
   const setLoanBookData = useCallback((nbfiId: string, rows: LoanLevelRow[]) => {
-    setLoanBookDataState((prev) => {
-      const next = { ...prev, [nbfiId]: rows };
-      lsSet(LS_LOAN_BOOK, next);
-      return next;
-    });
+    const version = `local-${Date.now()}`;
+    loanBookVersions.current[nbfiId] = version;
+    setLoanBookDataState((prev) => ({ ...prev, [nbfiId]: rows }));
+    // Encoded and written by the cache worker, off the main thread
+    getClientLoanCache().put(nbfiId, version, rows).catch(() => { /* cache is best-effort */ });
     apiCall(`/api/nbfis/${nbfiId}/loan-book`, 'POST', { rows });
   }, []);
 
@@ -129,15 +246,154 @@ export function AppProvider({ children }: { children: React.ReactNode }) {
     if (savedRole && USERS[savedRole]) setUser(USERS[savedRole]);
 
     const savedNbfis     = lsGet<NBFIRecord[]>(LS_NBFIS, []);
-    const savedLoanBooks = lsGet<Record<string, LoanLevelRow[]>>(LS_LOAN_BOOK, {});
+    const legacyBooks    = lsGet<Record<string, LoanLevelRow[]>>(LS_LOAN_BOOK, {});
     const savedPools     = lsGet<Record<string, PoolSelectionState>>(LS_POOL_SEL, {});
 
     setNbfisState(savedNbfis);
-    setLoanBookDataState(savedLoanBooks);
+    setLoanBookDataState(legacyBooks);
     setSelectedPoolByNbfiState(savedPools);
     setLoading(false);
+
+    // Restore cached loan books; books from the old localStorage key move into the cache once
+    const cache = getClientLoanCache();
+    cacheReady.current = (async () => {
+      try {
+        const legacy = Object.entries(legacyBooks);
+        if (legacy.length) {
+          const version = `local-${Date.now()}`;
+          for (const [nbfiId] of legacy) loanBookVersions.current[nbfiId] = version;
+          await Promise.all(legacy.map(([nbfiId, rows]) => cache.put(nbfiId, version, rows)));
+          localStorage.removeItem(LS_LOAN_BOOK);
+        }
+        const cached = await cache.loadLatest();
+        for (const [nbfiId, { version }] of Object.entries(cached)) {
+          if (!(nbfiId in loanBookVersions.current)) loanBookVersions.current[nbfiId] = version;
+        }
+        setLoanBookDataState((prev) => {
+          const next = { ...prev };
+          for (const [nbfiId, { rows }] of Object.entries(cached)) if (!next[nbfiId]?.length) next[nbfiId] = rows;
+          return next;
+        });
+      } catch (err) {
+        console.error('[AppContext] loan cache unavailable:', err);
+      }
+    })();
+
+    // Then page through the server's lightweight summaries; detail and loans load on demand
+    summariesReady.current = (async () => {
+      const summaries: Record<string, NbfiSummary> = {};
+      let cursor: string | null = null;
+      do {
+        const url: string = `/api/nbfis${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`;
+        const page: { nbfis: NbfiSummary[]; nextCursor: string | null } | null = await fetchIfChanged(url, etags.current);
+        if (!page) break;
+        for (const n of page.nbfis) summaries[n.id] = n;
+        cursor = page.nextCursor;
+      } while (cursor);
+      if (!Object.keys(summaries).length) return summaries;
+      setNbfiSummaries(summaries);
+      setNbfisState((prev) => {
+        const known = new Set(prev.map((n) => n.id));
+        const stubs = Object.values(summaries).filter((s) => !known.has(s.id));
+        stubs.forEach((s) => stubIds.current.add(s.id));
+        return stubs.length ? [...prev, ...stubs.map(stubFromSummary)] : prev;
+      });
+      return summaries;
+    })();
   }, []);
 
+  // -------------------------------------------------------------------------
+  // On-demand detail / loan loading
+  // -------------------------------------------------------------------------
+  const once = useCallback((key: string, load: () => Promise<void>): Promise<void> => {
+    const existing = inflight.current.get(key);
+    if (existing) return existing;
+    const p = load().finally(() => inflight.current.delete(key));
+    inflight.current.set(key, p);
+    return p;
+  }, []);
+
+  const ensureNBFI = useCallback((id: string) => {
+    if (!stubIds.current.has(id)) return Promise.resolve();
+    return once(`nbfi:${id}`, async () => {
+      const detail = await fetchIfChanged<NBFIRecord & { poolSelection: PoolSelectionState | null }>(`/api/nbfis/${id}`, etags.current);
+      if (!detail) return;
+      const { poolSelection, ...record } = detail;
+      stubIds.current.delete(id);
+      setNbfis((prev) => prev.map((n) => n.id === id ? record : n));
+      if (poolSelection) setSelectedPoolByNbfiState((prev) => prev[id] ? prev : { ...prev, [id]: poolSelection });
+    });
+  }, [once, setNbfis]);
+
+  // Loans held locally are kept while they are the server's latest book (per the NBFI summary);
+  // otherwise fetch the latest book (revalidated by ETag)
+  const loanBookRef = useRef(loanBookData);
+  loanBookRef.current = loanBookData;
+  const ensureLoanBook = useCallback((nbfiId: string) => {
+    return once(`loans:${nbfiId}`, async () => {
+      await cacheReady.current;
+      const cache = getClientLoanCache();
+      const held = loanBookRef.current[nbfiId];
+      if (held?.length) {
+        const latest = (await summariesReady.current)[nbfiId]?.loanBook;
+        if (isLatestBook(loanBookVersions.current[nbfiId], latest)) {
+          cache.touch(nbfiId).catch(() => { /* best-effort */ });
+          return;
+        }
+      }
+      const body = await fetchIfChanged<{ rows: LoanLevelRow[]; loanBookId: string | null }>(`/api/nbfis/${nbfiId}/loan-book`, etags.current);
+      if (!body?.rows.length) return;
+      // Leave the book alone if it was replaced while the request was in flight
+      if (loanBookRef.current[nbfiId] !== held) return;
+      const version = body.loanBookId ?? `server-${Date.now()}`;
+      loanBookVersions.current[nbfiId] = version;
+      setLoanBookDataState((prev) => ({ ...prev, [nbfiId]: body.rows }));
+      cache.put(nbfiId, version, body.rows).catch(() => { /* best-effort */ });
+    });
+  }, [once]);
+
+  // Tapes stream to the server as the raw file, which parses, validates and stores them. Once a
+  // tape is accepted the stored book replaces the local copy and the upload meta the route recorded
+  // is mirrored locally.
+  const uploadLoanTape = useCallback(async (
+    nbfiId: string,
+    file: File,
+    source: LoanBookUploadMeta['source'],
+    onProgress?: (p: IngestProgress) => void,
+  ) => {
+    const qs = new URLSearchParams({ filename: file.name, source, userId: user?.id ?? 'system', userName: user?.name ?? 'System' });
+    const result = await postFileStream<LoanTapeFrame>(`/api/nbfis/${nbfiId}/loan-book/upload?${qs}`, file, (f) => {
+      if (f.type === 'progress') onProgress?.(f);
+    });
+    if (result.type !== 'done' || !result.ok) return result;
+
+    const meta: LoanBookUploadMeta = {
+      source,
+      uploadedAt: new Date().toISOString(),
+      uploadedBy: user?.name ?? 'System',
+      rowCount: result.rowCount,
+      totalBalance: result.totalBalance,
+      filename: file.name,
+      inputFormat: 'snapshot',
+    };
+    setNbfis((prev) => prev.map((n) => n.id === nbfiId ? { ...n, loanBookMeta: meta } : n));
+    const body = await fetchIfChanged<{ rows: LoanLevelRow[]; loanBookId: string | null }>(`/api/nbfis/${nbfiId}/loan-book`, etags.current);
+    if (body) {
+      const version = body.loanBookId ?? `server-${Date.now()}`;
+      loanBookVersions.current[nbfiId] = version;
+      setLoanBookDataState((prev) => ({ ...prev, [nbfiId]: body.rows }));
+      getClientLoanCache().put(nbfiId, version, body.rows).catch(() => { /* best-effort */ });
+    }
+    return result;
+  }, [user, setNbfis]);
+
+  const uploadLoanHistory = useCallback((nbfiId: string, file: File, onProgress?: (p: HistoryProgress) => void) => {
+    const qs = new URLSearchParams({ filename: file.name, userId: user?.id ?? 'system', userName: user?.name ?? 'System' });
+    return postFileStream<LoanHistoryFrame>(`/api/nbfis/${nbfiId}/loan-history?${qs}`, file, (f) => {
+      if (f.type === 'progress') onProgress?.(f);
+    });
+  }, [user]);
+
   // -------------------------------------------------------------------------
   // Auth
   // -------------------------------------------------------------------------
@@ -168,6 +424,7 @@ export function AppProvider({ children }: { children: React.ReactNode }) {
 
   const deleteNBFI = useCallback((id: string) => {
     setNbfis((prev) => prev.filter((n) => n.id !== id));
+    getClientLoanCache().remove(id).catch(() => { /* best-effort */ });
     apiCall(`/api/nbfis/${id}`, 'DELETE');
   }, [setNbfis]);
 
@@ -340,7 +597,8 @@ export function AppProvider({ children }: { children: React.ReactNode }) {
       addNBFI, deleteNBFI, updateNBFIStatus,
       loadFinancialData, updateFinancialValues,
       addCommentary, setRecommendation, setApproverComments, getNBFI,
-      loanBookData, setLoanBookData,
+      nbfiSummaries, ensureNBFI,
+      loanBookData, ensureLoanBook, setLoanBookData, uploadLoanTape, uploadLoanHistory,
       selectedPoolByNbfi, setPoolSelection,
       saveCovenantSetup, updateDocumentStatus, setLoanBookMeta,
       setTransactionType, setSecuritisationStructure,
@@ -355,3 +613,63 @@ export function useApp() {
   if (!ctx) throw new Error('useApp must be used within AppProvider');
   return ctx;
 }
+
+// Request the loan books a page needs; rows appear in loanBookData once loaded
+export function useLoanBooks(nbfiIds: (string | undefined)[]) {
+  const { ensureLoanBook } = useApp();
+  const key = nbfiIds.filter(Boolean).join(',');
+  useEffect(() => {
+    if (key) key.split(',').forEach((id) => { ensureLoanBook(id); });
+  }, [key, ensureLoanBook]);
+}
+
+// Grouped portfolio rollup (GET /api/portfolio/rollup); null until the first response.
+// Refetched when the query changes or a loan book lands in this session; unchanged results revalidate as 304.
+export function usePortfolioRollup(groupBy: RollupDimension[], filter: RollupFilter = {}, enabled: boolean = true) {
+  const { loanBookData } = useApp();
+  const [result, setResult] = useState<PortfolioRollupResult | null>(null);
+  const etags = useRef(new Map<string, string>());
+  const bodies = useRef(new Map<string, PortfolioRollupResult>());
+  const sp = new URLSearchParams({ groupBy: groupBy.join(',') });
+  for (const [k, v] of Object.entries(filter)) if (v?.length) sp.set(k, v.join(','));
+  const url = `/api/portfolio/rollup?${sp}`;
+  useEffect(() => {
+    if (!enabled) return;
+    let cancelled = false;
+    fetchIfChanged<PortfolioRollupResult>(url, etags.current).then((body) => {
+      if (body) bodies.current.set(url, body);
+      const latest = bodies.current.get(url);
+      if (latest && !cancelled) setResult(latest);
+    });
+    return () => { cancelled = true; };
+  }, [url, enabled, loanBookData]);
+  return enabled ? result : null;
+}
+
+// Server-computed analytics of one NBFI's latest loan book (GET /api/nbfis/[id]/analytics), so a page
+// can chart the book without downloading its loans. undefined until the first response; null when the
+// NBFI has no book (or the API is unavailable). Keeps the previous result while a changed query loads.
+export function useNbfiAnalytics(
+  nbfiId: string,
+  query: { filters: LoanFilters; scenario: ScenarioKey; pool: boolean; trendMonths: number },
+  enabled: boolean = true,
+): NbfiAnalytics | null | undefined {
+  const { loanBookData } = useApp();
+  const [result, setResult] = useState<NbfiAnalytics | null | undefined>(undefined);
+  const etags = useRef(new Map<string, string>());
+  const bodies = useRef(new Map<string, NbfiAnalytics>());
+  const sp = new URLSearchParams({ scenario: query.scenario, trendMonths: String(query.trendMonths) });
+  for (const [k, v] of Object.entries(query.filters)) if (v?.length) sp.set(k, v.join(','));
+  if (query.pool) sp.set('pool', '1');
+  const url = `/api/nbfis/${nbfiId}/analytics?${sp}`;
+  useEffect(() => {
+    if (!enabled) return;
+    let cancelled = false;
+    fetchIfChanged<NbfiAnalytics>(url, etags.current).then((body) => {
+      if (body) bodies.current.set(url, body);
+      if (!cancelled) setResult(bodies.current.get(url) ?? null);
+    });
+    return () => { cancelled = true; };
+  }, [url, enabled, loanBookData]);
+  return enabled ? result : null;
+}
@@ -0,0 +1,10 @@
+// Next.js server start-up hook
+export async function register() {
+  if (process.env.NEXT_RUNTIME !== 'nodejs') return;
+  // Periodic covenant / early-warning evaluation (COVENANT_EVAL_INTERVAL_MINUTES, default 60; 0 disables)
+  const { startCovenantScheduler } = await import('./lib/covenantEngine');
+  startCovenantScheduler();
+  // SFTP drop-zone ingestion (FEED_DROP_DIR, default data/sftp; FEED_POLL_SECONDS, default 60; 0 disables)
+  const { startFeedWatcher } = await import('./lib/feedIngest');
+  startFeedWatcher();
+}
@@ -0,0 +1,88 @@
+/**
+ * In-process LRU caches for server-side analytics.
+ * - loanRowsCache: parsed rows per LoanBook id. Books are immutable snapshots, so
+ *   entries never go stale; they only age out.
+ * - analyticsCache: computed analytics payloads keyed by
+ *   (nbfiId, loanBook id, pool selection, filter, scenario). Invalidated per NBFI
+ *   when a new book is uploaded or the pool selection changes.
+ */
+
+import type { LoanLevelRow } from './types';
+
+export class LruCache<V> {
+  private readonly map = new Map<string, V>();
+
+  constructor(private readonly maxEntries: number) {}
+
+  get(key: string): V | undefined {
+    const v = this.map.get(key);
+    if (v === undefined) return undefined;
+    // Refresh recency: Map iteration order is insertion order
+    this.map.delete(key);
+    this.map.set(key, v);
+    return v;
+  }
+
+  set(key: string, value: V): void {
+    if (this.map.has(key)) this.map.delete(key);
+    this.map.set(key, value);
+    while (this.map.size > this.maxEntries) {
+      const oldest = this.map.keys().next().value as string;
+      this.map.delete(oldest);
+    }
+  }
+
+  delete(key: string): boolean {
+    return this.map.delete(key);
+  }
+
+  deleteWhere(pred: (key: string) => boolean): number {
+    let n = 0;
+    for (const k of [...this.map.keys()]) {
+      if (pred(k)) { this.map.delete(k); n++; }
+    }
+    return n;
+  }
+
+  get size(): number {
+    return this.map.size;
+  }
+}
+
+// Deterministic JSON for cache keys — object keys sorted, arrays sorted when they are sets of strings
+export function stableKey(value: unknown): string {
+  if (value === null || value === undefined) return 'null';
+  if (Array.isArray(value)) {
+    const items = value.map(stableKey);
+    return `[${value.every((v) => typeof v === 'string') ? items.sort().join(',') : items.join(',')}]`;
+  }
+  if (typeof value === 'object') {
+    const entries = Object.entries(value as Record<string, unknown>)
+      .filter(([, v]) => v !== undefined)
+      .sort(([a], [b]) => a.localeCompare(b));
+    return `{${entries.map(([k, v]) => `${JSON.stringify(k)}:${stableKey(v)}`).join(',')}}`;
+  }
+  return JSON.stringify(value);
+}
+
+export function analyticsKey(nbfiId: string, parts: Record<string, unknown>): string {
+  return `${nbfiId}|${stableKey(parts)}`;
+}
+
+// Survive Next.js dev hot reloads, same pattern as the Prisma client in db.ts
+const globalForCache = globalThis as unknown as {
+  analyticsCache: LruCache<unknown> | undefined;
+  loanRowsCache: LruCache<LoanLevelRow[]> | undefined;
+};
+
+export const analyticsCache = globalForCache.analyticsCache ?? new LruCache<unknown>(500);
+export const loanRowsCache = globalForCache.loanRowsCache ?? new LruCache<LoanLevelRow[]>(8);
+
+if (process.env.NODE_ENV !== 'production') {
+  globalForCache.analyticsCache = analyticsCache;
+  globalForCache.loanRowsCache = loanRowsCache;
+}
+
+export function invalidateAnalytics(nbfiId: string): number {
+  return analyticsCache.deleteWhere((k) => k.startsWith(`${nbfiId}|`));
+}
@@ -0,0 +1,280 @@
+/**
+ * Browser-side loan-book cache backed by IndexedDB.
+ * Each (NBFI, book version) is stored once in loanCodec's columnar, gzip
+ * encoding. Encoding, compression and IndexedDB I/O run in a dedicated worker
+ * (clientLoanCache.worker.ts), so saving a large tape never blocks the UI.
+ * Books are evicted least-recently-viewed first once the store exceeds its
+ * size budget.
+ *
+ * Where Workers or IndexedDB are unavailable (SSR, private browsing), requests
+ * run inline or resolve empty, and the app falls back to fetching from the API.
+ */
+
+import type { LoanLevelRow } from './types';
+import { compressBytes, decodeLoanBook, decompressBytes, encodeLoanBook, canCompress } from './loanCodec';
+
+const DB_NAME = 'wl-loan-cache';
+const STORE = 'books';
+// Older versions of one NBFI's book kept alongside the latest
+const MAX_VERSIONS_PER_NBFI = 2;
+
+export const DEFAULT_CACHE_BUDGET_BYTES =
+  (Number(process.env.NEXT_PUBLIC_LOAN_CACHE_MB) || 100) * 1024 * 1024;
+
+interface StoredBook {
+  nbfiId: string;
+  version: string;
+  data: ArrayBuffer;
+  compressed: boolean;
+  size: number;
+  rowCount: number;
+  savedAt: number;
+  viewedAt: number;
+}
+
+export interface CachedBookInfo {
+  nbfiId: string;
+  version: string;
+  size: number;
+  rowCount: number;
+  savedAt: number;
+  viewedAt: number;
+}
+
+export type CacheRequest =
+  | { op: 'put'; nbfiId: string; version: string; rows: LoanLevelRow[]; budgetBytes: number }
+  | { op: 'loadLatest' }
+  | { op: 'touch'; nbfiId: string }
+  | { op: 'remove'; nbfiId: string }
+  | { op: 'list' };
+
+/* ================================================================
+   IndexedDB access (runs in the worker, or inline as a fallback)
+   ================================================================ */
+
+function req<T>(r: IDBRequest<T>): Promise<T> {
+  return new Promise((resolve, reject) => {
+    r.onsuccess = () => resolve(r.result);
+    r.onerror = () => reject(r.error);
+  });
+}
+
+function done(tx: IDBTransaction): Promise<void> {
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+    tx.onabort = () => reject(tx.error);
+  });
+}
+
+let dbPromise: Promise<IDBDatabase> | null = null;
+
+function openDb(): Promise<IDBDatabase> {
+  if (!dbPromise) {
+    dbPromise = new Promise((resolve, reject) => {
+      const open = indexedDB.open(DB_NAME, 1);
+      open.onupgradeneeded = () => {
+        const store = open.result.createObjectStore(STORE, { keyPath: ['nbfiId', 'version'] });
+        store.createIndex('byNbfi', 'nbfiId');
+        store.createIndex('byViewed', 'viewedAt');
+      };
+      open.onsuccess = () => resolve(open.result);
+      open.onerror = () => { dbPromise = null; reject(open.error); };
+    });
+  }
+  return dbPromise;
+}
+
+// Metadata only — values are read with a cursor but the payload is dropped immediately
+async function listBooks(db: IDBDatabase): Promise<CachedBookInfo[]> {
+  const tx = db.transaction(STORE, 'readonly');
+  const out: CachedBookInfo[] = [];
+  await new Promise<void>((resolve, reject) => {
+    const cur = tx.objectStore(STORE).openCursor();
+    cur.onsuccess = () => {
+      const c = cur.result;
+      if (!c) return resolve();
+      const { nbfiId, version, size, rowCount, savedAt, viewedAt } = c.value as StoredBook;
+      out.push({ nbfiId, version, size, rowCount, savedAt, viewedAt });
+      c.continue();
+    };
+    cur.onerror = () => reject(cur.error);
+  });
+  return out;
+}
+
+function latestPerNbfi(books: CachedBookInfo[]): Map<string, CachedBookInfo> {
+  const latest = new Map<string, CachedBookInfo>();
+  for (const b of books) {
+    const cur = latest.get(b.nbfiId);
+    if (!cur || b.savedAt > cur.savedAt) latest.set(b.nbfiId, b);
+  }
+  return latest;
+}
+
+// Drop surplus old versions, then least-recently-viewed books until under budget. `keep` is never evicted.
+async function evict(db: IDBDatabase, budgetBytes: number, keep: { nbfiId: string; version: string }) {
+  const books = await listBooks(db);
+  const doomed: CachedBookInfo[] = [];
+  const byNbfi = new Map<string, CachedBookInfo[]>();
+  for (const b of books) {
+    const list = byNbfi.get(b.nbfiId) ?? [];
+    list.push(b);
+    byNbfi.set(b.nbfiId, list);
+  }
+  for (const list of byNbfi.values()) {
+    list.sort((a, b) => b.savedAt - a.savedAt);
+    doomed.push(...list.slice(MAX_VERSIONS_PER_NBFI));
+  }
+  const dead = new Set(doomed);
+  let total = books.reduce((s, b) => s + (dead.has(b) ? 0 : b.size), 0);
+  for (const b of [...books].sort((a, b) => a.viewedAt - b.viewedAt)) {
+    if (total <= budgetBytes) break;
+    if (dead.has(b) || (b.nbfiId === keep.nbfiId && b.version === keep.version)) continue;
+    dead.add(b);
+    doomed.push(b);
+    total -= b.size;
+  }
+  if (!doomed.length) return;
+  const tx = db.transaction(STORE, 'readwrite');
+  for (const b of doomed) tx.objectStore(STORE).delete([b.nbfiId, b.version]);
+  await done(tx);
+}
+
+async function readRows(db: IDBDatabase, nbfiId: string, version: string): Promise<LoanLevelRow[] | null> {
+  const tx = db.transaction(STORE, 'readonly');
+  const b = await req(tx.objectStore(STORE).get([nbfiId, version])) as StoredBook | undefined;
+  if (!b) return null;
+  return decodeLoanBook(await decompressBytes(new Uint8Array(b.data), b.compressed));
+}
+
+async function touchLatest(db: IDBDatabase, nbfiId: string) {
+  const tx = db.transaction(STORE, 'readwrite');
+  const store = tx.objectStore(STORE);
+  const books = await req(store.index('byNbfi').getAll(nbfiId)) as StoredBook[];
+  const latest = books.sort((a, b) => b.savedAt - a.savedAt)[0];
+  if (latest) {
+    latest.viewedAt = Date.now();
+    store.put(latest);
+  }
+  await done(tx);
+}
+
+export async function handleCacheRequest(r: CacheRequest): Promise<unknown> {
+  if (typeof indexedDB === 'undefined') return r.op === 'loadLatest' ? {} : r.op === 'list' ? [] : null;
+  const db = await openDb();
+  switch (r.op) {
+    case 'put': {
+      const encoded = await compressBytes(encodeLoanBook(r.rows));
+      const now = Date.now();
+      const book: StoredBook = {
+        nbfiId: r.nbfiId,
+        version: r.version,
+        // Store an exact-length buffer, not the (possibly larger) backing buffer of a view
+        data: encoded.slice().buffer as ArrayBuffer,
+        compressed: canCompress,
+        size: encoded.byteLength,
+        rowCount: r.rows.length,
+        savedAt: now,
+        viewedAt: now,
+      };
+      const tx = db.transaction(STORE, 'readwrite');
+      tx.objectStore(STORE).put(book);
+      await done(tx);
+      await evict(db, r.budgetBytes, book);
+      return { size: book.size, rowCount: book.rowCount };
+    }
+    case 'loadLatest': {
+      const out: Record<string, { version: string; rows: LoanLevelRow[] }> = {};
+      for (const b of latestPerNbfi(await listBooks(db)).values()) {
+        const rows = await readRows(db, b.nbfiId, b.version);
+        if (rows) out[b.nbfiId] = { version: b.version, rows };
+      }
+      return out;
+    }
+    case 'touch':
+      await touchLatest(db, r.nbfiId);
+      return null;
+    case 'remove': {
+      const tx = db.transaction(STORE, 'readwrite');
+      const store = tx.objectStore(STORE);
+      const keys = await req(store.index('byNbfi').getAllKeys(r.nbfiId));
+      for (const k of keys) store.delete(k);
+      await done(tx);
+      return null;
+    }
+    case 'list':
+      return listBooks(db);
+  }
+}
+
+/* ================================================================
+   Main-thread client
+   ================================================================ */
+
+export class ClientLoanCache {
+  private worker: Worker | null = null;
+  private nextId = 1;
+  private readonly pending = new Map<number, { resolve: (v: unknown) => void; reject: (e: Error) => void }>();
+
+  constructor(readonly budgetBytes: number = DEFAULT_CACHE_BUDGET_BYTES) {
+    if (typeof Worker === 'undefined') return;
+    try {
+      this.worker = new Worker(new URL('./clientLoanCache.worker.ts', import.meta.url), { type: 'module' });
+      this.worker.onmessage = (e: MessageEvent<{ id: number; result?: unknown; error?: string }>) => {
+        const p = this.pending.get(e.data.id);
+        this.pending.delete(e.data.id);
+        if (!p) return;
+        if (e.data.error !== undefined) p.reject(new Error(e.data.error));
+        else p.resolve(e.data.result);
+      };
+      this.worker.onerror = (e) => {
+        console.error('[clientLoanCache] worker failed, running inline:', e.message);
+        this.worker = null;
+        for (const p of this.pending.values()) p.reject(new Error('loan cache worker failed'));
+        this.pending.clear();
+      };
+    } catch (err) {
+      console.error('[clientLoanCache] falling back to inline execution:', err);
+      this.worker = null;
+    }
+  }
+
+  private send<T>(r: CacheRequest): Promise<T> {
+    if (!this.worker) return handleCacheRequest(r) as Promise<T>;
+    const id = this.nextId++;
+    return new Promise<T>((resolve, reject) => {
+      this.pending.set(id, { resolve: resolve as (v: unknown) => void, reject });
+      this.worker!.postMessage({ id, request: r });
+    });
+  }
+
+  put(nbfiId: string, version: string, rows: LoanLevelRow[]): Promise<{ size: number; rowCount: number } | null> {
+    return this.send({ op: 'put', nbfiId, version, rows, budgetBytes: this.budgetBytes });
+  }
+
+  // Latest cached version of every NBFI's book
+  loadLatest(): Promise<Record<string, { version: string; rows: LoanLevelRow[] }>> {
+    return this.send({ op: 'loadLatest' });
+  }
+
+  // Mark a book as viewed so eviction keeps it longer
+  touch(nbfiId: string): Promise<void> {
+    return this.send({ op: 'touch', nbfiId });
+  }
+
+  remove(nbfiId: string): Promise<void> {
+    return this.send({ op: 'remove', nbfiId });
+  }
+
+  list(): Promise<CachedBookInfo[]> {
+    return this.send({ op: 'list' });
+  }
+}
+
+let instance: ClientLoanCache | null = null;
+
+export function getClientLoanCache(): ClientLoanCache {
+  if (!instance) instance = new ClientLoanCache();
+  return instance;
+}
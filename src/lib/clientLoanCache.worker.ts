@@ -0,0 +1,16 @@
+// Web Worker entry for the IndexedDB loan-book cache (see clientLoanCache.ts)
+import { handleCacheRequest, type CacheRequest } from './clientLoanCache';
+
+const ctx = self as unknown as {
+  onmessage: ((e: MessageEvent<{ id: number; request: CacheRequest }>) => void) | null;
+  postMessage: (msg: unknown) => void;
+};
+
+ctx.onmessage = async (e) => {
+  const { id, request } = e.data;
+  try {
+    ctx.postMessage({ id, result: await handleCacheRequest(request) });
+  } catch (err) {
+    ctx.postMessage({ id, error: err instanceof Error ? err.message : String(err) });
+  }
+};
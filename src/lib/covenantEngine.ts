@@ -0,0 +1,473 @@
+/**
+ * Covenant and early-warning evaluation.
+ * Computes covenant readings for every NBFI from three sources: its latest
+ * loan book aggregates, its spread financials (NBFI output), and its
+ * monitoring data. Each covenant then gets a latest-status row (CovenantStatus)
+ * and, where its reading history is trending towards or through the threshold,
+ * an early-warning alert (EarlyWarning).
+ * The evaluation runs in batches of NBFIs: reads first, then one transaction of
+ * bulk writes per batch. Dashboards and the notification bell read the
+ * precomputed rows instead of rescanning reading history.
+ */
+
+import type { Prisma } from '@/generated/prisma/client';
+import { db } from './db';
+import { readBookAggregates } from './loanStore';
+import type { BookAggregates } from './loanDelta';
+import type {
+  CovenantDef, CovenantReading, EarlyWarningAlert, FinancialData, MonitoringData, NBFIOutputRow,
+} from './types';
+
+type CovenantClient = Prisma.TransactionClient;
+
+// NBFIs evaluated per read/write batch
+export const COVENANT_EVAL_BATCH = 25;
+// Compliant readings within this fraction of the threshold are flagged 'watch'
+export const WATCH_BAND = 0.05;
+// Readings used for the trend fit
+const TREND_WINDOW = 6;
+// A projected move smaller than this fraction of the threshold per quarter counts as stable
+const STABLE_BAND = 0.01;
+// Projected breaches further out than this are not alerted on
+const BREACH_HORIZON_DAYS = 365;
+const WARNING_HORIZON_DAYS = 180;
+const DAY_MS = 86_400_000;
+
+/* ================================================================
+   Metric sources
+   ================================================================ */
+
+export interface MetricInputs {
+  aggregates: BookAggregates | null;
+  bookDate: string | null;        // YYYY-MM-DD of the latest loan book
+  financials: FinancialData | null;
+  monitoring: MonitoringData | null;
+  provisioning: { dpdMin: number; dpdMax: number; provisionPercent: number }[];
+}
+
+interface MetricValue {
+  value: number;
+  date: string;
+}
+
+// Lowest DPD in each loan-book bucket
+const BUCKET_MIN_DPD: Record<string, number> = {
+  Current: 0, '1-30': 1, '31-60': 31, '61-90': 61, '91-180': 91, '180+': 181,
+};
+
+const round2 = (x: number) => Math.round(x * 100) / 100;
+
+function portfolioAtRisk(days: number) {
+  return (i: MetricInputs): MetricValue | null => {
+    const agg = i.aggregates;
+    if (!agg || !i.bookDate || agg.totalBalance <= 0) return null;
+    let atRisk = 0;
+    for (const [bucket, bal] of Object.entries(agg.bucketBalances)) {
+      if ((BUCKET_MIN_DPD[bucket] ?? 0) > days) atRisk += bal;
+    }
+    return { value: round2((atRisk / agg.totalBalance) * 100), date: i.bookDate };
+  };
+}
+
+// (NPA − provisions held against it) / (book − all provisions), provisions from the NBFI's own policy
+function netNpa(i: MetricInputs): MetricValue | null {
+  const agg = i.aggregates;
+  if (!agg || !i.bookDate || agg.totalBalance <= 0) return null;
+  let npa = 0, npaProvision = 0, provision = 0;
+  for (const [bucket, bal] of Object.entries(agg.bucketBalances)) {
+    const dpd = BUCKET_MIN_DPD[bucket] ?? 0;
+    const rule = i.provisioning.find((r) => dpd >= r.dpdMin && dpd <= r.dpdMax);
+    const p = bal * ((rule?.provisionPercent ?? 0) / 100);
+    provision += p;
+    if (dpd > 90) { npa += bal; npaProvision += p; }
+  }
+  const net = agg.totalBalance - provision;
+  return net > 0 ? { value: round2(((npa - npaProvision) / net) * 100), date: i.bookDate } : null;
+}
+
+function financialRow(f: FinancialData, key: string): number | null {
+  const rows: NBFIOutputRow[] = [
+    ...f.nbfiOutput.balanceSheet.rows, ...f.nbfiOutput.incomeStatement.rows, ...f.nbfiOutput.cashflowSummary.rows,
+  ];
+  const v = rows.find((r) => r.key === key)?.values[0];
+  return typeof v === 'number' ? v : null;
+}
+
+function financialDate(f: FinancialData): string | null {
+  return f.nbfiOutput.periods[0]?.date ?? null;
+}
+
+function fromFinancials(compute: (get: (key: string) => number) => number | null) {
+  return (i: MetricInputs): MetricValue | null => {
+    const f = i.financials;
+    const date = f && financialDate(f);
+    if (!f || !date) return null;
+    const v = compute((key) => financialRow(f, key) ?? 0);
+    return v != null && Number.isFinite(v) ? { value: round2(v), date } : null;
+  };
+}
+
+// Tier capital (equity less intangibles and deferred tax) over assets excluding cash and investments
+const crar = fromFinancials((get) => {
+  const rwa = get('total_assets_o') - get('cash_bal') - get('investments');
+  return rwa > 0 ? ((get('total_equity_o') - get('intangibles') - get('dta')) / rwa) * 100 : null;
+});
+
+const debtToEquity = fromFinancials((get) => {
+  const equity = get('total_equity_o');
+  return equity > 0 ? (get('borrowings') + get('related_payable') + get('lease_liab')) / equity : null;
+});
+
+// Liquid assets over short-term liabilities
+const liquidityCoverage = fromFinancials((get) => {
+  const outflows = get('trade_payable') + get('related_payable') + get('tax_payable') + get('lease_liab');
+  return outflows > 0 ? ((get('cash_bal') + get('investments')) / outflows) * 100 : null;
+});
+
+function collectionEfficiency(i: MetricInputs): MetricValue | null {
+  const v = i.monitoring?.collectionEfficiency;
+  return typeof v === 'number' && i.bookDate ? { value: v, date: i.bookDate } : null;
+}
+
+// Any other metric whose name matches a numeric row of the BCC summary (Current Ratio, Interest Cover, ...)
+function fromBccSummary(metric: string, i: MetricInputs): MetricValue | null {
+  const f = i.financials;
+  const date = f && financialDate(f);
+  if (!f || !date) return null;
+  const name = metric.toLowerCase();
+  const row = f.nbfiOutput.bccSummary.find((r) => {
+    const label = r.label.toLowerCase().replace(/\s*\(.*?\)\s*/g, '').trim();
+    return label.length > 3 && name.includes(label);
+  });
+  const v = row?.values[0];
+  return typeof v === 'number' ? { value: v, date } : null;
+}
+
+const METRICS: { match: RegExp; compute: (i: MetricInputs) => MetricValue | null }[] = [
+  { match: /\bpar\s*30\b/i, compute: portfolioAtRisk(30) },
+  { match: /\bpar\s*60\b/i, compute: portfolioAtRisk(60) },
+  { match: /\bpar\s*90\b|gross npa/i, compute: portfolioAtRisk(90) },
+  { match: /net npa/i, compute: netNpa },
+  { match: /crar|capital adequacy/i, compute: crar },
+  { match: /debt.to.equity|gearing/i, compute: debtToEquity },
+  { match: /liquidity coverage/i, compute: liquidityCoverage },
+  { match: /collection efficiency/i, compute: collectionEfficiency },
+];
+
+// Current value of a covenant metric, or null when it cannot be derived from the NBFI's data
+export function computeMetric(metric: string, inputs: MetricInputs): MetricValue | null {
+  const m = METRICS.find((x) => x.match.test(metric));
+  return m ? m.compute(inputs) : fromBccSummary(metric, inputs);
+}
+
+/* ================================================================
+   Status and trend
+   ================================================================ */
+
+type CovenantRule = Pick<CovenantDef, 'operator' | 'threshold'>;
+
+function passes(c: CovenantRule, v: number): boolean {
+  switch (c.operator) {
+    case '>=': return v >= c.threshold;
+    case '>': return v > c.threshold;
+    case '<=': return v <= c.threshold;
+    case '<': return v < c.threshold;
+  }
+}
+
+export function covenantStatus(c: CovenantRule, value: number): CovenantReading['status'] {
+  if (!passes(c, value)) return 'breached';
+  const headroom = Math.abs(value - c.threshold) / Math.max(Math.abs(c.threshold), 1e-9);
+  return headroom < WATCH_BAND ? 'watch' : 'compliant';
+}
+
+export interface CovenantTrend {
+  trend: EarlyWarningAlert['trend'];
+  slopePerDay: number;
+  predictedBreachDate: string | null;  // projected crossing, or the start of the current breach run
+  breachRun: number;                   // consecutive breached readings up to the latest
+}
+
+const toDay = (date: string) => Date.parse(date.slice(0, 10)) / DAY_MS;
+const fromDay = (day: number) => new Date(Math.round(day) * DAY_MS).toISOString().slice(0, 10);
+
+// Least-squares trend over the latest readings (history sorted by date ascending)
+export function covenantTrend(c: CovenantRule, history: { value: number; date: string }[]): CovenantTrend {
+  const recent = history.slice(-TREND_WINDOW);
+  const last = recent[recent.length - 1];
+  let breachRun = 0;
+  for (let k = history.length - 1; k >= 0 && !passes(c, history[k].value); k--) breachRun++;
+
+  let slope = 0;
+  if (recent.length >= 2) {
+    const xs = recent.map((r) => toDay(r.date));
+    const mx = xs.reduce((s, x) => s + x, 0) / xs.length;
+    const my = recent.reduce((s, r) => s + r.value, 0) / recent.length;
+    let sxy = 0, sxx = 0;
+    for (let k = 0; k < recent.length; k++) {
+      sxy += (xs[k] - mx) * (recent[k].value - my);
+      sxx += (xs[k] - mx) ** 2;
+    }
+    slope = sxx > 0 ? sxy / sxx : 0;
+  }
+
+  const adverse = c.operator.startsWith('>') ? -slope : slope;
+  const quarterlyMove = (Math.abs(slope) * 91) / Math.max(Math.abs(c.threshold), 1e-9);
+  const trend: CovenantTrend['trend'] = quarterlyMove < STABLE_BAND ? 'stable' : adverse > 0 ? 'deteriorating' : 'improving';
+
+  let predictedBreachDate: string | null = null;
+  if (last && breachRun > 0) {
+    predictedBreachDate = history[history.length - breachRun].date;
+  } else if (last && trend === 'deteriorating') {
+    const days = (c.threshold - last.value) / slope;
+    if (days > 0 && days <= BREACH_HORIZON_DAYS) predictedBreachDate = fromDay(toDay(last.date) + days);
+  }
+  return { trend, slopePerDay: slope, predictedBreachDate, breachRun };
+}
+
+/* ================================================================
+   Per-NBFI evaluation (pure)
+   ================================================================ */
+
+export interface CovenantEvaluation {
+  nbfiId: string;
+  readings: { covenantId: string; value: number; date: string; status: CovenantReading['status'] }[];
+  statuses: {
+    covenantId: string; value: number; date: string; status: CovenantReading['status'];
+    previousValue: number | null; trend: CovenantTrend['trend'];
+  }[];
+  alerts: (EarlyWarningAlert & { covenantId: string })[];
+}
+
+type CovenantWithFormat = CovenantRule & Pick<CovenantDef, 'id' | 'metric' | 'format'>;
+
+function fmt(v: number, format: string) {
+  const s = String(round2(v));
+  return format === 'percent' ? `${s}%` : format === 'ratio' ? `${s}x` : s;
+}
+
+function earlyWarning(
+  c: CovenantWithFormat,
+  latest: { value: number; date: string },
+  status: CovenantReading['status'],
+  t: CovenantTrend,
+): (EarlyWarningAlert & { covenantId: string }) | null {
+  const value = fmt(latest.value, c.format);
+  const limit = `${c.operator} ${fmt(c.threshold, c.format)}`;
+  const projection = t.trend === 'deteriorating'
+    ? ` Trend projects ${fmt(latest.value + t.slopePerDay * 182, c.format)} in six months if it continues.`
+    : '';
+  const base = { id: `ew-${c.id}`, covenantId: c.id, metric: c.metric, trend: t.trend };
+
+  if (status === 'breached') {
+    const run = t.breachRun > 1 ? ` for ${t.breachRun} consecutive readings` : '';
+    return {
+      ...base, severity: 'critical', predictedBreachDate: t.predictedBreachDate ?? latest.date,
+      message: `${c.metric} is in breach of the ${limit} covenant${run}, currently at ${value}.${projection}`,
+    };
+  }
+  if (t.predictedBreachDate) {
+    const days = toDay(t.predictedBreachDate) - toDay(latest.date);
+    return {
+      ...base, severity: days <= WARNING_HORIZON_DAYS ? 'warning' : 'info', predictedBreachDate: t.predictedBreachDate,
+      message: `${c.metric} is at ${value} against a ${limit} covenant and is projected to breach by ${t.predictedBreachDate} on the current trend.`,
+    };
+  }
+  if (status === 'watch') {
+    return {
+      ...base, severity: 'info',
+      message: `${c.metric} is at ${value}, within ${WATCH_BAND * 100}% of the ${limit} covenant.`,
+    };
+  }
+  return null;
+}
+
+// New readings, latest statuses and alerts for one NBFI. `history` is its stored readings per covenant, date ascending.
+export function evaluateCovenants(
+  nbfiId: string,
+  covenants: CovenantWithFormat[],
+  history: Map<string, { value: number; date: string }[]>,
+  inputs: MetricInputs,
+): CovenantEvaluation {
+  const out: CovenantEvaluation = { nbfiId, readings: [], statuses: [], alerts: [] };
+  for (const c of covenants) {
+    let series = history.get(c.id) ?? [];
+    const current = computeMetric(c.metric, inputs);
+    if (current) {
+      const status = covenantStatus(c, current.value);
+      out.readings.push({ covenantId: c.id, value: current.value, date: current.date, status });
+      // The new reading replaces any stored one for the same date
+      series = [...series.filter((r) => r.date !== current.date), current].sort((a, b) => a.date.localeCompare(b.date));
+    }
+    const latest = series[series.length - 1];
+    if (!latest) continue;
+
+    const status = covenantStatus(c, latest.value);
+    const t = covenantTrend(c, series);
+    out.statuses.push({
+      covenantId: c.id,
+      value: latest.value,
+      date: latest.date,
+      status,
+      previousValue: series.length > 1 ? series[series.length - 2].value : null,
+      trend: t.trend,
+    });
+    const alert = earlyWarning(c, latest, status, t);
+    if (alert) out.alerts.push(alert);
+  }
+  return out;
+}
+
+/* ================================================================
+   Batch job
+   ================================================================ */
+
+export async function writeEvaluations(client: CovenantClient, evals: CovenantEvaluation[]) {
+  const readings = evals.flatMap((e) => e.readings.map((r) => ({ ...r, nbfiId: e.nbfiId })));
+  const statuses = evals.flatMap((e) => e.statuses.map((s) => ({ ...s, nbfiId: e.nbfiId })));
+  const alerts = evals.flatMap((e) => e.alerts.map((a) => ({
+    id: `${e.nbfiId}:${a.id}`,
+    nbfiId: e.nbfiId,
+    covenantId: a.covenantId,
+    metric: a.metric,
+    severity: a.severity,
+    message: a.message,
+    predictedBreachDate: a.predictedBreachDate ?? null,
+    trend: a.trend,
+  })));
+  const nbfiIds = evals.map((e) => e.nbfiId);
+
+  if (readings.length) {
+    await client.covenantReading.deleteMany({
+      where: { OR: readings.map((r) => ({ covenantId: r.covenantId, date: r.date })) },
+    });
+    await client.covenantReading.createMany({
+      data: readings.map((r) => ({ id: `${r.covenantId}:${r.date}`, ...r })),
+    });
+  }
+  await client.covenantStatus.deleteMany({ where: { nbfiId: { in: nbfiIds } } });
+  if (statuses.length) await client.covenantStatus.createMany({ data: statuses });
+  await client.earlyWarning.deleteMany({ where: { nbfiId: { in: nbfiIds } } });
+  if (alerts.length) await client.earlyWarning.createMany({ data: alerts });
+}
+
+async function loadInputs(client: CovenantClient, nbfi: {
+  id: string;
+  financialData: string | null;
+  monitoringData: string | null;
+  provRules: { dpdMin: number; dpdMax: number; provisionPercent: number }[];
+}): Promise<MetricInputs> {
+  const book = await client.loanBook.findFirst({
+    where: { nbfiId: nbfi.id, status: 'ready' },
+    orderBy: { uploadedAt: 'desc' },
+    select: { id: true, uploadedAt: true },
+  });
+  return {
+    aggregates: book ? await readBookAggregates(client, book.id) : null,
+    bookDate: book ? book.uploadedAt.toISOString().slice(0, 10) : null,
+    financials: nbfi.financialData ? (JSON.parse(nbfi.financialData) as FinancialData) : null,
+    monitoring: nbfi.monitoringData ? (JSON.parse(nbfi.monitoringData) as MonitoringData) : null,
+    provisioning: nbfi.provRules,
+  };
+}
+
+export interface EvaluationSummary {
+  nbfis: number;
+  readings: number;
+  breached: number;
+  alerts: number;
+  ms: number;
+}
+
+// Evaluate the given NBFIs (default: every NBFI with covenants), COVENANT_EVAL_BATCH at a time
+export async function runCovenantEvaluation(nbfiIds?: string[]): Promise<EvaluationSummary> {
+  const t0 = Date.now();
+  const summary: EvaluationSummary = { nbfis: 0, readings: 0, breached: 0, alerts: 0, ms: 0 };
+  let cursor: string | undefined;
+  for (;;) {
+    const batch = await db.nbfi.findMany({
+      where: { covenantDefs: { some: {} }, ...(nbfiIds ? { id: { in: nbfiIds } } : {}) },
+      orderBy: { id: 'asc' },
+      take: COVENANT_EVAL_BATCH,
+      ...(cursor ? { cursor: { id: cursor }, skip: 1 } : {}),
+      select: {
+        id: true,
+        financialData: true,
+        monitoringData: true,
+        covenantDefs: { select: { id: true, metric: true, operator: true, threshold: true, format: true } },
+        provRules: { where: { policyType: 'nbfi' }, select: { dpdMin: true, dpdMax: true, provisionPercent: true } },
+      },
+    });
+    if (!batch.length) break;
+    cursor = batch[batch.length - 1].id;
+
+    const history = await db.covenantReading.findMany({
+      where: { nbfiId: { in: batch.map((n) => n.id) } },
+      orderBy: [{ nbfiId: 'asc' }, { covenantId: 'asc' }, { date: 'asc' }],
+      select: { covenantId: true, value: true, date: true },
+    });
+    const byCovenant = new Map<string, { value: number; date: string }[]>();
+    for (const r of history) {
+      const list = byCovenant.get(r.covenantId);
+      if (list) list.push(r);
+      else byCovenant.set(r.covenantId, [r]);
+    }
+
+    const evals: CovenantEvaluation[] = [];
+    for (const n of batch) {
+      evals.push(evaluateCovenants(n.id, n.covenantDefs as CovenantWithFormat[], byCovenant, await loadInputs(db, n)));
+    }
+    await db.$transaction((tx) => writeEvaluations(tx, evals), { timeout: 60000 });
+
+    summary.nbfis += batch.length;
+    for (const e of evals) {
+      summary.readings += e.readings.length;
+      summary.breached += e.statuses.filter((s) => s.status === 'breached').length;
+      summary.alerts += e.alerts.length;
+    }
+    if (batch.length < COVENANT_EVAL_BATCH) break;
+  }
+  summary.ms = Date.now() - t0;
+  return summary;
+}
+
+/* ================================================================
+   Scheduling
+   ================================================================ */
+
+const globalForJob = globalThis as unknown as {
+  covenantJob: { timer?: ReturnType<typeof setInterval>; pending: Set<string>; debounce?: ReturnType<typeof setTimeout>; running?: Promise<unknown> } | undefined;
+};
+const job = globalForJob.covenantJob ?? { pending: new Set<string>() };
+globalForJob.covenantJob = job;
+
+// Runs after the current evaluation (if any) finishes, so runs never overlap
+function enqueue(nbfiIds?: string[]) {
+  const run = (job.running ?? Promise.resolve())
+    .then(() => runCovenantEvaluation(nbfiIds))
+    .catch((err) => console.error('[covenant evaluation]', err));
+  job.running = run;
+  return run;
+}
+
+// Re-evaluate one NBFI soon after its data changed; bursts of changes coalesce into one run
+export function queueCovenantEvaluation(nbfiId: string, delayMs: number = 2000) {
+  job.pending.add(nbfiId);
+  if (job.debounce) clearTimeout(job.debounce);
+  job.debounce = setTimeout(() => {
+    const ids = [...job.pending];
+    job.pending.clear();
+    job.debounce = undefined;
+    void enqueue(ids);
+  }, delayMs);
+}
+
+// Full evaluation every `intervalMinutes` (COVENANT_EVAL_INTERVAL_MINUTES, default 60; 0 disables)
+export function startCovenantScheduler(
+  intervalMinutes: number = Number(process.env.COVENANT_EVAL_INTERVAL_MINUTES ?? 60),
+) {
+  if (job.timer || !(intervalMinutes > 0)) return;
+  job.timer = setInterval(() => void enqueue(), intervalMinutes * 60_000);
+  job.timer.unref?.();
+  void enqueue();
+}
@@ -1,18 +1,48 @@
 import { PrismaClient } from '@/generated/prisma/client';
 import { PrismaBetterSqlite3 } from '@prisma/adapter-better-sqlite3';
 import path from 'path';
+import { performance } from 'perf_hooks';
+import { recordDbQuery } from './instrumentation';
 
 const dbPath = path.join(process.cwd(), 'prisma', 'dev.db');
 
 function createPrismaClient() {
   const adapter = new PrismaBetterSqlite3({ url: `file:${dbPath}` });
-  return new PrismaClient({ adapter });
+  // Every query is timed into the request's db span and the slow-query log (instrumentation.ts)
+  return new PrismaClient({ adapter }).$extends({
+    query: {
+      async $allOperations({ model, operation, args, query }) {
+        const t0 = performance.now();
+        try {
+          return await query(args);
+        } finally {
+          recordDbQuery(model ?? '$raw', operation, performance.now() - t0, args);
+        }
+      },
+    },
+  });
+}
+
+// Connection tuning, applied once per client. WAL lets the API read while an ingest or
+// the covenant job writes. Under WAL, synchronous=NORMAL can lose the last commits on
+// power loss but never corrupts the file. The larger page cache keeps the detail
+// routes' index scans in memory.
+async function tuneSqlite(client: ReturnType<typeof createPrismaClient>) {
+  try {
+    await client.$queryRawUnsafe('PRAGMA journal_mode = WAL');
+    await client.$executeRawUnsafe('PRAGMA synchronous = NORMAL');
+    await client.$executeRawUnsafe('PRAGMA cache_size = -65536');   // KiB, i.e. 64 MB
+    await client.$executeRawUnsafe('PRAGMA temp_store = MEMORY');
+  } catch (err) {
+    console.warn('[db] SQLite pragmas not applied', err);
+  }
 }
 
 // Prevent multiple instances in development (Next.js hot reload)
-const globalForPrisma = globalThis as unknown as { prisma: PrismaClient | undefined };
+const globalForPrisma = globalThis as unknown as { prisma: ReturnType<typeof createPrismaClient> | undefined };
 
 export const db = globalForPrisma.prisma ?? createPrismaClient();
+if (!globalForPrisma.prisma) void tuneSqlite(db);
 
 if (process.env.NODE_ENV !== 'production') {
   globalForPrisma.prisma = db;
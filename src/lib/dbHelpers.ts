@@ -2,6 +2,12 @@
  * Helpers to convert between Prisma DB rows and the NBFIRecord / AppContext types.
  * The Prisma schema stores nested/JSON data as String columns (SQLite has no JSON type).
  * These helpers parse/stringify as needed.
+ *
+ * Each read path has its own query shape: NBFI_SUMMARY_SELECT (list views),
+ * NBFI_DETAIL_INCLUDE (one full NBFIRecord), NBFI_COVENANTS_SELECT and
+ * NBFI_DOCUMENTS_SELECT. Shapes select only the columns their converter reads.
+ * The JSON columns are not decoded for responses: nbfiRecordJson splices the
+ * stored text into the serialised record.
  */
 
 import type {
@@ -11,72 +17,116 @@ import type {
   CovenantDef,
   CovenantReading,
   DocumentRequirement,
+  EarlyWarningAlert,
   ProvisioningRule,
 } from './types';
 
 // --------------------------------------------------------------------------
-// Types for the full Prisma include result we use throughout the API
+// Query shapes. Relations select only the fields the converters below read.
 // --------------------------------------------------------------------------
-type PrismaSubmission = {
-  id: string;
-  documentId: string;
-  date: string;
-  filename: string;
-  uploadedBy: string;
-};
+const COVENANT_DEF_SELECT = {
+  id: true,
+  metric: true,
+  operator: true,
+  threshold: true,
+  frequency: true,
+  format: true,
+} as const;
 
-type PrismaDocument = {
-  id: string;
-  nbfiId: string;
-  name: string;
-  frequency: string;
-  nextDueDate: string;
-  status: string;
-  submittedDate: string | null;
-  submittedBy: string | null;
-  submissions: PrismaSubmission[];
-};
+// Covered by the CovenantReading (nbfiId, date, id, covenantId, value, status) index
+export const COVENANT_READING_SELECT = {
+  id: true,
+  covenantId: true,
+  value: true,
+  date: true,
+  status: true,
+} as const;
+
+const EARLY_WARNING_SELECT = {
+  id: true,
+  metric: true,
+  severity: true,
+  message: true,
+  predictedBreachDate: true,
+  trend: true,
+} as const;
+
+const DOCUMENT_SELECT = {
+  id: true,
+  name: true,
+  frequency: true,
+  nextDueDate: true,
+  status: true,
+  submittedDate: true,
+  submittedBy: true,
+  submissions: { select: { date: true, filename: true, uploadedBy: true } },
+} as const;
+
+// The full NBFIRecord. Readings are loaded once, at the top level; the
+// definitions no longer include them a second time.
+export const NBFI_DETAIL_INCLUDE = {
+  commentaries: { select: { id: true, author: true, role: true, text: true, timestamp: true } },
+  covenantDefs: { select: COVENANT_DEF_SELECT },
+  covenantReadings: { select: COVENANT_READING_SELECT, orderBy: [{ date: 'asc' }, { id: 'asc' }] },
+  earlyWarningAlerts: { select: EARLY_WARNING_SELECT, orderBy: { createdAt: 'desc' } },
+  documents: { select: DOCUMENT_SELECT },
+  provRules: { select: { policyType: true, bucket: true, dpdMin: true, dpdMax: true, provisionPercent: true } },
+  poolSelection: { select: { excludedSegments: true, filterSnapshot: true, confirmedAt: true } },
+} as const;
+
+// Covenant definitions with their latest status; the reading history is paged separately
+export const NBFI_COVENANTS_SELECT = {
+  id: true,
+  covenantDefs: { select: COVENANT_DEF_SELECT },
+  covenantStatuses: { select: { covenantId: true, value: true, date: true, status: true, previousValue: true, trend: true } },
+  earlyWarningAlerts: { select: EARLY_WARNING_SELECT, orderBy: { createdAt: 'desc' } },
+} as const;
+
+export const NBFI_DOCUMENTS_SELECT = {
+  id: true,
+  documents: { select: DOCUMENT_SELECT },
+} as const;
 
+// --------------------------------------------------------------------------
+// Row types for the shapes above
+// --------------------------------------------------------------------------
 type PrismaCovenantDef = {
   id: string;
-  nbfiId: string;
   metric: string;
   operator: string;
   threshold: number;
   frequency: string;
   format: string;
-  readings: PrismaCovenantReading[];
 };
 
 type PrismaCovenantReading = {
-  id: string;
-  nbfiId: string;
   covenantId: string;
   value: number;
   date: string;
   status: string;
 };
 
-type PrismaCommentary = {
+type PrismaEarlyWarning = {
   id: string;
-  nbfiId: string;
-  author: string;
-  role: string;
-  text: string;
-  timestamp: string;
+  metric: string;
+  severity: string;
+  message: string;
+  predictedBreachDate: string | null;
+  trend: string;
 };
 
-type PrismaProvRule = {
+type PrismaDocument = {
   id: string;
-  nbfiId: string;
-  policyType: string;
-  bucket: string;
-  dpdMin: number;
-  dpdMax: number;
-  provisionPercent: number;
+  name: string;
+  frequency: string;
+  nextDueDate: string;
+  status: string;
+  submittedDate: string | null;
+  submittedBy: string | null;
+  submissions: { date: string; filename: string; uploadedBy: string }[];
 };
 
-export type PrismaNbfiFull = {
+export type PrismaNbfiDetail = {
   id: string;
   name: string;
   keyContacts: string;
@@ -93,25 +143,20 @@ export type PrismaNbfiFull = {
   monitoringData: string | null;
   earlyWarnings: string | null;
   financialData: string | null;
-  commentaries: PrismaCommentary[];
+  commentaries: { id: string; author: string; role: string; text: string; timestamp: string }[];
   covenantDefs: PrismaCovenantDef[];
   covenantReadings: PrismaCovenantReading[];
+  earlyWarningAlerts: PrismaEarlyWarning[];
   documents: PrismaDocument[];
-  provRules: PrismaProvRule[];
-  poolSelection: {
-    id: string;
-    nbfiId: string;
-    excludedSegments: string;
-    filterSnapshot: string;
-    confirmedAt: string | null;
-  } | null;
+  provRules: { policyType: string; bucket: string; dpdMin: number; dpdMax: number; provisionPercent: number }[];
+  poolSelection: { excludedSegments: string; filterSnapshot: string; confirmedAt: string | null } | null;
 };
 
 // --------------------------------------------------------------------------
-// Convert Prisma row → NBFIRecord (AppContext shape)
+// Relation converters, shared by the detail record and the narrower views
 // --------------------------------------------------------------------------
-export function toNBFIRecord(n: PrismaNbfiFull): NBFIRecord {
-  const covenants: CovenantDef[] = n.covenantDefs.map((c) => ({
+export function toCovenantDefs(defs: PrismaCovenantDef[]): CovenantDef[] {
+  return defs.map((c) => ({
     id: c.id,
     metric: c.metric,
     operator: c.operator as CovenantDef['operator'],
@@ -119,15 +164,30 @@ export function toNBFIRecord(n: PrismaNbfiFull): NBFIRecord {
     frequency: c.frequency as CovenantDef['frequency'],
     format: c.format as CovenantDef['format'],
   }));
+}
 
-  const covenantReadings: CovenantReading[] = n.covenantReadings.map((r) => ({
+export function toCovenantReadings(readings: PrismaCovenantReading[]): CovenantReading[] {
+  return readings.map((r) => ({
     covenantId: r.covenantId,
     value: r.value,
     date: r.date,
     status: r.status as CovenantReading['status'],
   }));
+}
+
+export function toEarlyWarnings(alerts: PrismaEarlyWarning[]): EarlyWarningAlert[] {
+  return alerts.map((a) => ({
+    id: a.id,
+    metric: a.metric,
+    severity: a.severity as EarlyWarningAlert['severity'],
+    message: a.message,
+    predictedBreachDate: a.predictedBreachDate ?? undefined,
+    trend: a.trend as EarlyWarningAlert['trend'],
+  }));
+}
 
-  const documents: DocumentRequirement[] = n.documents.map((d) => ({
+export function toDocuments(docs: PrismaDocument[]): DocumentRequirement[] {
+  return docs.map((d) => ({
     id: d.id,
     name: d.name,
     frequency: d.frequency as DocumentRequirement['frequency'],
@@ -141,14 +201,26 @@ export function toNBFIRecord(n: PrismaNbfiFull): NBFIRecord {
       uploadedBy: s.uploadedBy,
     })),
   }));
+}
 
-  const nbfiProvRules = n.provRules
-    .filter((r) => r.policyType === 'nbfi')
-    .map((r) => ({ bucket: r.bucket as ProvisioningRule['bucket'], dpdMin: r.dpdMin, dpdMax: r.dpdMax, provisionPercent: r.provisionPercent }));
+// --------------------------------------------------------------------------
+// Convert Prisma row → NBFIRecord (AppContext shape)
+// --------------------------------------------------------------------------
 
-  const lenderProvRules = n.provRules
-    .filter((r) => r.policyType === 'lender')
-    .map((r) => ({ bucket: r.bucket as ProvisioningRule['bucket'], dpdMin: r.dpdMin, dpdMax: r.dpdMax, provisionPercent: r.provisionPercent }));
+// Stored as JSON text and passed through to NBFIRecord unchanged
+const JSON_COLUMNS = ['loanBookMeta', 'securitisationStructure', 'monitoringData', 'financialData'] as const;
+
+// Everything except the JSON_COLUMNS
+function baseRecord(n: PrismaNbfiDetail): NBFIRecord {
+  const covenants = toCovenantDefs(n.covenantDefs);
+  const covenantReadings = toCovenantReadings(n.covenantReadings);
+  const documents = toDocuments(n.documents);
+
+  const toRule = (r: PrismaNbfiDetail['provRules'][number]): ProvisioningRule => ({
+    bucket: r.bucket as ProvisioningRule['bucket'], dpdMin: r.dpdMin, dpdMax: r.dpdMax, provisionPercent: r.provisionPercent,
+  });
+  const nbfiProvRules = n.provRules.filter((r) => r.policyType === 'nbfi').map(toRule);
+  const lenderProvRules = n.provRules.filter((r) => r.policyType === 'lender').map(toRule);
 
   const record: NBFIRecord = {
     id: n.id,
@@ -177,15 +249,74 @@ export function toNBFIRecord(n: PrismaNbfiFull): NBFIRecord {
   if (nbfiProvRules.length || lenderProvRules.length) {
     record.provisioningRules = { nbfi: nbfiProvRules, lender: lenderProvRules };
   }
-  if (n.loanBookMeta) record.loanBookMeta = JSON.parse(n.loanBookMeta);
-  if (n.securitisationStructure) record.securitisationStructure = JSON.parse(n.securitisationStructure);
-  if (n.monitoringData) record.monitoringData = JSON.parse(n.monitoringData);
-  if (n.earlyWarnings) record.earlyWarnings = JSON.parse(n.earlyWarnings);
-  if (n.financialData) record.financialData = JSON.parse(n.financialData);
+  if (n.earlyWarningAlerts.length) {
+    // Alerts computed by the covenant evaluation job (covenantEngine.ts)
+    record.earlyWarnings = toEarlyWarnings(n.earlyWarningAlerts);
+  } else if (n.earlyWarnings) {
+    // Legacy column: either EarlyWarningAlert[] or { alerts: EarlyWarningAlert[] }
+    const legacy = JSON.parse(n.earlyWarnings) as EarlyWarningAlert[] | { alerts: EarlyWarningAlert[] };
+    record.earlyWarnings = Array.isArray(legacy) ? legacy : legacy.alerts;
+  }
+  return record;
+}
+
+// Define `key` as a property that parses `raw` on first read and then keeps the value
+function defineLazyJson(target: object, key: string, raw: string) {
+  const settle = (value: unknown) =>
+    Object.defineProperty(target, key, { value, enumerable: true, writable: true, configurable: true });
+  Object.defineProperty(target, key, {
+    enumerable: true,
+    configurable: true,
+    get() {
+      const value = JSON.parse(raw);
+      settle(value);
+      return value;
+    },
+    set: settle,
+  });
+}
 
+// NBFIRecord for server-side use. The JSON columns are decoded on first access,
+// so callers that only read relations or scalars never parse them.
+export function toNBFIRecord(n: PrismaNbfiDetail): NBFIRecord {
+  const record = baseRecord(n);
+  for (const key of JSON_COLUMNS) {
+    const raw = n[key];
+    if (raw) defineLazyJson(record, key, raw);
+  }
   return record;
 }
 
+// A JSON column's text, fit to splice into a response. What JSON.stringify wrote for an
+// object or array is used as-is; anything else (blank, padded, a bare scalar, a
+// truncated write) is parsed and re-serialised, and left out if it does not parse.
+function columnJson(n: PrismaNbfiDetail, key: (typeof JSON_COLUMNS)[number]): string | null {
+  const raw = n[key];
+  if (!raw) return null;
+  const open = raw[0];
+  const close = raw[raw.length - 1];
+  if ((open === '{' && close === '}') || (open === '[' && close === ']')) return raw;
+  try {
+    return JSON.stringify(JSON.parse(raw)) ?? null;
+  } catch (err) {
+    console.error(`[nbfiRecordJson] ${n.id}.${key} is not valid JSON, omitted:`, err);
+    return null;
+  }
+}
+
+// The serialised NBFIRecord (plus `extra` fields) for a response body. The JSON
+// columns already hold JSON text written by JSON.stringify, so they are spliced
+// in as-is (see columnJson) instead of being parsed and re-serialised.
+export function nbfiRecordJson(n: PrismaNbfiDetail, extra: Record<string, unknown> = {}): string {
+  const head = JSON.stringify({ ...baseRecord(n), ...extra });
+  const columns: string[] = [];
+  for (const key of JSON_COLUMNS) {
+    const json = columnJson(n, key);
+    if (json !== null) columns.push(`"${key}":${json}`);
+  }
+  return columns.length ? `${head.slice(0, -1)},${columns.join(',')}}` : head;
+}
+
 // --------------------------------------------------------------------------
 // Convert Prisma PoolSelection → PoolSelectionState
 // --------------------------------------------------------------------------
@@ -202,26 +333,130 @@ export function toPoolSelectionState(ps: {
 }
 
 // --------------------------------------------------------------------------
-// The standard Prisma include object for full NBFI queries
+// Cursor pagination: `limit` and `cursor` (the id of the last row on the previous
+// page) from the query string, turned into findMany arguments and a page body
 // --------------------------------------------------------------------------
-export const NBFI_INCLUDE = {
-  commentaries: true,
-  covenantDefs: {
-    include: { readings: true },
-  },
-  covenantReadings: true,
-  documents: {
-    include: { submissions: true },
+export function cursorPageArgs(sp: URLSearchParams, defaultLimit: number, maxLimit: number) {
+  const limit = Math.min(Math.max(Number(sp.get('limit')) || defaultLimit, 1), maxLimit);
+  const cursor = sp.get('cursor');
+  return {
+    limit,
+    args: { take: limit + 1, ...(cursor ? { cursor: { id: cursor }, skip: 1 } : {}) },
+  };
+}
+
+export function cursorPage<T extends { id: string }>(rows: T[], limit: number): { items: T[]; nextCursor: string | null } {
+  const items = rows.slice(0, limit);
+  return { items, nextCursor: rows.length > limit ? items[items.length - 1].id : null };
+}
+
+// --------------------------------------------------------------------------
+// Lightweight NBFI summary for list views and startup hydration.
+// Counts and totals come from LoanBook.rowCount / totalBalance and the
+// precomputed CovenantStatus rows, so no loans, readings or JSON columns are read.
+// --------------------------------------------------------------------------
+export const NBFI_SUMMARY_SELECT = {
+  id: true,
+  name: true,
+  fundingAmount: true,
+  status: true,
+  dateOnboarded: true,
+  setupCompleted: true,
+  transactionType: true,
+  updatedAt: true,
+  covenantStatuses: { select: { status: true, date: true } },
+  earlyWarningAlerts: { select: { severity: true } },
+  loanBooks: {
+    where: { status: 'ready' },
+    orderBy: { uploadedAt: 'desc' },
+    take: 1,
+    select: { id: true, uploadedAt: true, rowCount: true, totalBalance: true },
   },
-  provRules: true,
-  poolSelection: true,
+  _count: { select: { documents: true, covenantDefs: true } },
 } as const;
 
+export interface NbfiSummary {
+  id: string;
+  name: string;
+  fundingAmount: number;
+  status: NBFIRecord['status'];
+  dateOnboarded: string;
+  setupCompleted: boolean;
+  transactionType?: NBFIRecord['transactionType'];
+  updatedAt: string;
+  documentCount: number;
+  covenantCount: number;
+  covenantStatus: CovenantReading['status'] | null;  // worst latest reading across covenants
+  covenantsBreached: number;
+  covenantsWatch: number;
+  covenantsCompliant: number;
+  latestReadingDate: string | null;
+  alerts: { critical: number; warning: number; info: number };
+  loanBook: { id: string; uploadedAt: string; rowCount: number; totalBalance: number } | null;
+}
+
+const COVENANT_SEVERITY: Record<string, number> = { compliant: 0, watch: 1, breached: 2 };
+
+export function toNbfiSummary(n: {
+  id: string;
+  name: string;
+  fundingAmount: number;
+  status: string;
+  dateOnboarded: string;
+  setupCompleted: boolean;
+  transactionType: string | null;
+  updatedAt: Date;
+  covenantStatuses: { status: string; date: string }[];
+  earlyWarningAlerts: { severity: string }[];
+  loanBooks: { id: string; uploadedAt: Date; rowCount: number; totalBalance: number }[];
+  _count: { documents: number; covenantDefs: number };
+}): NbfiSummary {
+  let covenantStatus: CovenantReading['status'] | null = null;
+  let covenantsBreached = 0, covenantsWatch = 0, covenantsCompliant = 0;
+  let latestReadingDate: string | null = null;
+  for (const r of n.covenantStatuses) {
+    if (r.status === 'breached') covenantsBreached++;
+    else if (r.status === 'watch') covenantsWatch++;
+    else covenantsCompliant++;
+    if (covenantStatus === null || (COVENANT_SEVERITY[r.status] ?? 0) > COVENANT_SEVERITY[covenantStatus]) {
+      covenantStatus = r.status as CovenantReading['status'];
+    }
+    if (!latestReadingDate || r.date > latestReadingDate) latestReadingDate = r.date;
+  }
+  const alerts = { critical: 0, warning: 0, info: 0 };
+  for (const a of n.earlyWarningAlerts) {
+    if (a.severity in alerts) alerts[a.severity as keyof typeof alerts]++;
+  }
+  const book = n.loanBooks[0];
+  return {
+    id: n.id,
+    name: n.name,
+    fundingAmount: n.fundingAmount,
+    status: n.status as NBFIRecord['status'],
+    dateOnboarded: n.dateOnboarded,
+    setupCompleted: n.setupCompleted,
+    transactionType: (n.transactionType as NBFIRecord['transactionType']) ?? undefined,
+    updatedAt: n.updatedAt.toISOString(),
+    documentCount: n._count.documents,
+    covenantCount: n._count.covenantDefs,
+    covenantStatus,
+    covenantsBreached,
+    covenantsWatch,
+    covenantsCompliant,
+    latestReadingDate,
+    alerts,
+    loanBook: book
+      ? { id: book.id, uploadedAt: book.uploadedAt.toISOString(), rowCount: book.rowCount, totalBalance: book.totalBalance }
+      : null,
+  };
+}
+
 // --------------------------------------------------------------------------
-// Parse loan book rows from DB
+// Parse loan book rows from a legacy JSON blob (columnar books are read via loanStore)
 // --------------------------------------------------------------------------
-export function parseLoanRows(loanBooks: { rows: string }[]): LoanLevelRow[] {
+export function parseLoanRows(loanBooks: { rows: string | null }[]): LoanLevelRow[] {
   if (!loanBooks.length) return [];
   // Use the most recent loan book
-  return JSON.parse(loanBooks[loanBooks.length - 1].rows) as LoanLevelRow[];
+  const latest = loanBooks[loanBooks.length - 1].rows;
+  return latest ? (JSON.parse(latest) as LoanLevelRow[]) : [];
 }
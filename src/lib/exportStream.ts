@@ -0,0 +1,337 @@
+/**
+ * Streaming exports.
+ * Workbooks are written with ExcelJS's streaming WorkbookWriter straight into
+ * the HTTP response. Each row is committed as soon as it is added, so only the
+ * current row and the zip deflater's window stay in memory. Loan tapes arrive
+ * a keyset page at a time (iterateLoanPages in loanQuery.ts), and the writer
+ * waits for the client to drain before it reads the next page. A 1M-row book
+ * therefore streams in constant memory. CSV is the same tape as plain text.
+ *
+ * Loan sheets use the LoanLevelRow field names as headers, so an exported tape
+ * re-imports through the loan-book upload unchanged.
+ */
+
+import { PassThrough, Readable } from 'stream';
+import { once } from 'events';
+import ExcelJS from 'exceljs';
+import type { FinancialData, LoanLevelRow } from './types';
+import { DPD_BUCKETS } from './types';
+import { LOAN_FIELDS, type LoanField } from './loanStore';
+import { LENDER_PROVISION_RATES, LOSS_RATES } from './rollRate';
+import type { BookAggregates } from './loanDelta';
+import type { RollupGroup } from './portfolioRollup';
+
+export const XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet';
+export const CSV_CONTENT_TYPE = 'text/csv; charset=utf-8';
+
+const NUM_FMT = '#,##0.00';
+
+type SheetWriter = ExcelJS.Worksheet;
+
+export function attachmentHeaders(filename: string, contentType: string): Record<string, string> {
+  return {
+    'Content-Type': contentType,
+    'Content-Disposition': `attachment; filename="${filename.replace(/["\r\n]/g, '')}"`,
+    'Cache-Control': 'no-store',
+  };
+}
+
+/* ================================================================
+   Workbook writer
+   ================================================================ */
+
+export class XlsxExport {
+  readonly workbook: ExcelJS.stream.xlsx.WorkbookWriter;
+  readonly stream: ReadableStream<Uint8Array>;
+  private readonly out = new PassThrough();
+
+  constructor() {
+    this.workbook = new ExcelJS.stream.xlsx.WorkbookWriter({ stream: this.out, useStyles: true, useSharedStrings: false });
+    this.stream = Readable.toWeb(this.out) as unknown as ReadableStream<Uint8Array>;
+  }
+
+  // Wait while the client is behind, so pages are not read faster than they are sent
+  async drain(): Promise<void> {
+    if (this.out.writableNeedDrain) await once(this.out, 'drain');
+  }
+
+  async finish(): Promise<void> {
+    await this.workbook.commit();
+  }
+
+  fail(err: unknown): void {
+    this.out.destroy(err instanceof Error ? err : new Error(String(err)));
+  }
+
+  // Run `build` in the background and hand back the response body; failures abort the download
+  static run(label: string, build: (x: XlsxExport) => Promise<void>): ReadableStream<Uint8Array> {
+    const x = new XlsxExport();
+    (async () => {
+      try {
+        await build(x);
+        await x.finish();
+      } catch (err) {
+        console.error(label, err);
+        x.fail(err);
+      }
+    })();
+    return x.stream;
+  }
+}
+
+/* ================================================================
+   Financial spreads (NBFI, Input Template, Cash Flow Statement)
+   ================================================================ */
+
+export function writeSpreadsSheets(wb: ExcelJS.stream.xlsx.WorkbookWriter, data: Partial<FinancialData>) {
+  // ---- Tab 1: NBFI ----
+  const nbfiOutput = data.nbfiOutput;
+  if (nbfiOutput) {
+    const nbfiSheet = wb.addWorksheet('NBFI');
+    nbfiSheet.columns = [
+      { header: '', key: 'label', width: 45, style: { alignment: { wrapText: true } } },
+      { header: '', key: 'val1', width: 18, style: { numFmt: NUM_FMT } },
+      { header: '', key: 'pct1', width: 12 },
+      { header: '', key: 'val2', width: 18, style: { numFmt: NUM_FMT } },
+      { header: '', key: 'pct2', width: 12 },
+    ];
+    const add = (values: ExcelJS.CellValue[], font?: Partial<ExcelJS.Font>, height?: number) => {
+      const r = nbfiSheet.addRow(values);
+      if (font) r.font = font;
+      if (height) r.height = height;
+      r.commit();
+    };
+
+    const periods = nbfiOutput.periods || [];
+    add(['Statement Type', periods[0]?.type || 'Audited', '%Ann.', periods[1]?.type || 'Audited', '%Ann.']);
+    add(['Auditors', '', 'Chg', '', 'Chg']);
+    add(['Opinion', '', '', '', '']);
+    add(['Statement Date (dd/mm/yyyy)', periods[0]?.date || '', '', periods[1]?.date || '', '']);
+    add(['Period (Months)', periods[0]?.months || 12, '', periods[1]?.months || 12, '']);
+    add(["Amounts in KES '000"]);
+    add([]);
+
+    for (const section of [nbfiOutput.balanceSheet, nbfiOutput.incomeStatement, nbfiOutput.cashflowSummary].filter(Boolean)) {
+      add([section.title], { bold: true, size: 11 });
+      if (section.title === 'INCOME STATEMENT') add([]);
+      for (const row of section.rows || []) {
+        add(
+          [row.label, row.values?.[0] ?? '', row.pctChanges?.[0] ?? '', row.values?.[1] ?? '', row.pctChanges?.[1] ?? ''],
+          row.isHeader || row.isTotal ? { bold: true } : undefined,
+        );
+      }
+      add([]);
+    }
+
+    add([], undefined, 10);
+    add(['BCC SUMMARY'], { bold: true, size: 11 });
+    add(["Indicator (KES '000)", periods[0]?.date || '', '%Ann. Chg', periods[1]?.date || '', '%Ann. Chg'], { bold: true });
+    for (const row of nbfiOutput.bccSummary || []) {
+      add([row.label, row.values?.[0] ?? '', row.pctChanges?.[0] ?? '', row.values?.[1] ?? '', row.pctChanges?.[1] ?? '']);
+    }
+    nbfiSheet.commit();
+  }
+
+  // ---- Tab 2: Input Template ----
+  const inputData = data.inputTemplate;
+  if (inputData) {
+    const inputSheet = wb.addWorksheet('Input Template');
+    inputSheet.columns = [
+      { header: 'Sl. No.', key: 'sl', width: 8 },
+      { header: 'Particulars', key: 'label', width: 50 },
+      { header: 'Current Period', key: 'val1', width: 18, style: { numFmt: NUM_FMT } },
+      { header: 'Previous Period', key: 'val2', width: 18, style: { numFmt: NUM_FMT } },
+    ];
+    inputSheet.addRow(['', `Name of the Organisation: ${inputData.orgName || 'Sample NBFI Ltd'}`]).commit();
+    inputSheet.addRow([]).commit();
+    for (const section of [inputData.partA?.balanceSheet, inputData.partA?.profitAndLoss].filter((x): x is NonNullable<typeof x> => !!x)) {
+      const title = inputSheet.addRow(['', section.title]);
+      title.font = { bold: true };
+      title.commit();
+      inputSheet.addRow([]).commit();
+      for (const row of section.rows || []) {
+        const r = inputSheet.addRow(['', row.label, row.values?.[0] ?? '', row.values?.[1] ?? '']);
+        if (row.isHeader || row.isTotal) r.font = { bold: true };
+        if (row.indent > 0) r.getCell(2).alignment = { indent: row.indent * 2 };
+        r.commit();
+      }
+      inputSheet.addRow([]).commit();
+    }
+    inputSheet.commit();
+  }
+
+  // ---- Tab 3: Cash Flow Statement ----
+  const cfData = data.cashFlow;
+  if (cfData) {
+    const cfSheet = wb.addWorksheet('Cash Flow Statement');
+    cfSheet.columns = [
+      { header: '', key: 'sl', width: 5 },
+      { header: 'Particulars', key: 'label', width: 55 },
+      { header: cfData.periods?.[0]?.date || 'Period 1', key: 'val1', width: 18, style: { numFmt: NUM_FMT } },
+      { header: cfData.periods?.[1]?.date || 'Period 2', key: 'val2', width: 18, style: { numFmt: NUM_FMT } },
+    ];
+    for (const section of cfData.sections || []) {
+      const title = cfSheet.addRow(['', section.title]);
+      title.font = { bold: true };
+      title.commit();
+      for (const row of section.rows || []) {
+        const r = cfSheet.addRow(['', row.label, row.values?.[0] ?? '', row.values?.[1] ?? '']);
+        if (row.isHeader || row.isTotal) r.font = { bold: true };
+        if (row.indent > 0) r.getCell(2).alignment = { indent: row.indent * 2 };
+        r.commit();
+      }
+      cfSheet.addRow([]).commit();
+    }
+    cfSheet.commit();
+  }
+}
+
+/* ================================================================
+   Tables and loan tapes
+   ================================================================ */
+
+export interface ExportColumn {
+  key: string;
+  header: string;
+  width?: number;
+  numeric?: boolean;
+}
+
+const NUMERIC_LOAN_FIELDS = new Set<LoanField>([
+  'dpdAsOfReportingDate', 'currentBalance', 'loanDisbursedAmount', 'totalOverdueAmount',
+  'interestRate', 'recoveryAfterWriteoff', 'residualTenureMonths',
+]);
+
+export function loanColumns(fields: readonly LoanField[] = LOAN_FIELDS): ExportColumn[] {
+  return fields.map((f) => ({ key: f, header: f, width: Math.max(12, f.length + 2), numeric: NUMERIC_LOAN_FIELDS.has(f) }));
+}
+
+function startSheet(wb: ExcelJS.stream.xlsx.WorkbookWriter, name: string, columns: ExportColumn[]): SheetWriter {
+  const sheet = wb.addWorksheet(name);
+  sheet.columns = columns.map((c) => ({
+    header: c.header, key: c.key, width: c.width ?? 16, style: c.numeric ? { numFmt: NUM_FMT } : {},
+  }));
+  sheet.getRow(1).font = { bold: true };
+  return sheet;
+}
+
+// A small in-memory table (analytics results) as one sheet
+export function writeTableSheet(
+  wb: ExcelJS.stream.xlsx.WorkbookWriter,
+  name: string,
+  columns: ExportColumn[],
+  rows: Record<string, unknown>[],
+) {
+  const sheet = startSheet(wb, name, columns);
+  for (const row of rows) sheet.addRow(row).commit();
+  sheet.commit();
+}
+
+// Rows from an async page source, committed page by page; returns the number of rows written
+export async function writeRowsSheet(
+  x: XlsxExport,
+  name: string,
+  columns: ExportColumn[],
+  pages: AsyncIterable<LoanLevelRow[]>,
+): Promise<number> {
+  const sheet = startSheet(x.workbook, name, columns);
+  let n = 0;
+  for await (const page of pages) {
+    for (const row of page) sheet.addRow(row as unknown as Record<string, unknown>).commit();
+    n += page.length;
+    await x.drain();
+  }
+  sheet.commit();
+  return n;
+}
+
+/* ================================================================
+   CSV
+   ================================================================ */
+
+function csvCell(v: unknown): string {
+  if (v == null) return '';
+  const s = String(v);
+  return /[",\r\n]/.test(s) ? `"${s.replace(/"/g, '""')}"` : s;
+}
+
+// Pull-based: the next page is only read when the client has taken the previous one
+export function csvStream(columns: ExportColumn[], pages: AsyncIterable<LoanLevelRow[]>): ReadableStream<Uint8Array> {
+  const enc = new TextEncoder();
+  const it = pages[Symbol.asyncIterator]();
+  let header = true;
+  return new ReadableStream<Uint8Array>({
+    async pull(controller) {
+      if (header) {
+        header = false;
+        controller.enqueue(enc.encode(columns.map((c) => csvCell(c.header)).join(',') + '\n'));
+        return;
+      }
+      const next = await it.next();
+      if (next.done) { controller.close(); return; }
+      let chunk = '';
+      for (const row of next.value) {
+        const rec = row as unknown as Record<string, unknown>;
+        chunk += columns.map((c) => csvCell(rec[c.key])).join(',') + '\n';
+      }
+      controller.enqueue(enc.encode(chunk));
+    },
+    async cancel() {
+      await it.return?.();
+    },
+  });
+}
+
+/* ================================================================
+   Analytics tables
+   ================================================================ */
+
+// DPD summary and vintages from the book's stored aggregates, plus its rollup cells
+export function writeAnalyticsSheets(
+  wb: ExcelJS.stream.xlsx.WorkbookWriter,
+  agg: BookAggregates,
+  cells: RollupGroup[],
+) {
+  const total = agg.totalBalance || 1;
+  writeTableSheet(wb, 'DPD Summary', [
+    { key: 'bucket', header: 'DPD Bucket' },
+    { key: 'loans', header: 'Loans', numeric: true },
+    { key: 'balance', header: 'Balance', numeric: true },
+    { key: 'share', header: 'Share of Balance %', numeric: true },
+    { key: 'expectedLoss', header: 'Expected Loss', numeric: true },
+    { key: 'provision', header: 'Lender Provision', numeric: true },
+  ], DPD_BUCKETS.map((b) => {
+    const balance = agg.bucketBalances[b] ?? 0;
+    return {
+      bucket: b,
+      loans: agg.bucketCounts[b] ?? 0,
+      balance,
+      share: (balance / total) * 100,
+      expectedLoss: balance * (LOSS_RATES[b] ?? 0),
+      provision: balance * (LENDER_PROVISION_RATES[b] ?? 0),
+    };
+  }));
+
+  writeTableSheet(wb, 'Vintages', [
+    { key: 'vintage', header: 'Vintage' },
+    { key: 'count', header: 'Loans', numeric: true },
+    { key: 'disbursed', header: 'Disbursed', numeric: true },
+    { key: 'balance', header: 'Balance', numeric: true },
+  ], Object.entries(agg.vintages).sort(([a], [b]) => a.localeCompare(b)).map(([vintage, v]) => ({ vintage, ...v })));
+
+  writeTableSheet(wb, 'Portfolio Rollup', [
+    { key: 'dpdBucket', header: 'DPD Bucket' },
+    { key: 'geography', header: 'Geography' },
+    { key: 'product', header: 'Product' },
+    { key: 'vintage', header: 'Vintage' },
+    { key: 'loanCount', header: 'Loans', numeric: true },
+    { key: 'balance', header: 'Balance', numeric: true },
+    { key: 'disbursed', header: 'Disbursed', numeric: true },
+    { key: 'overdue', header: 'Overdue', numeric: true },
+    { key: 'par30Balance', header: 'PAR 30+ Balance', numeric: true },
+    { key: 'par90Balance', header: 'PAR 90+ Balance', numeric: true },
+    { key: 'writtenOffBalance', header: 'Written Off', numeric: true },
+    { key: 'avgInterest', header: 'Avg Rate %', numeric: true },
+    { key: 'expectedLoss', header: 'Expected Loss', numeric: true },
+  ], cells.map((g) => ({ ...g.key, ...g })));
+}
@@ -0,0 +1,574 @@
+/**
+ * SFTP feed ingestion.
+ * The lender's SFTP server delivers files under the paths listed in each doc type's
+ * sftpConfig. Locally the drop-zone is a directory tree with one folder per NBFI:
+ *
+ *   $FEED_DROP_DIR/<nbfiId>/exports/loanbook/loanbook_20260131.csv
+ *   $FEED_DROP_DIR/<nbfiId>/exports/loanhistory/loan_history_2025Q4.csv
+ *   $FEED_DROP_DIR/<nbfiId>/exports/financials/ ...   /exports/mis/ ...
+ *
+ * A scan hashes each new file and claims it in the FeedFile table by (nbfiId, sha256).
+ * A re-dropped or renamed copy of a file already received is skipped. Claimed files
+ * stream through their doc type's ingestion path:
+ *   loan_book                 ingestLoanTape (delta snapshot), validated by LoanTapeValidator
+ *   loan_performance_history  estimateTransitionMatrices + saveTransitionEstimate
+ *   financial_statements,
+ *   monthly_mis               header mapping and field-type checks against the schema
+ *                             (recorded only — spreads are loaded by the analyst)
+ * Files run concurrently, up to FEED_CONCURRENCY (default 4). Files of the same NBFI and
+ * doc type run one after another in name order, because each loan tape is stored as a
+ * delta on the previous one. Rows, timing and validation issues for each file land on
+ * its FeedFile row. A handler that throws on the file's content (a corrupt workbook, a
+ * parser error) is a verdict: the file is marked 'failed' and not read again. A transient
+ * error (a locked database, a full disk...) parks the claim in 'retry' for the next scan,
+ * up to FEED_MAX_ATTEMPTS (default 3) attempts; a claim left 'processing' for
+ * FEED_CLAIM_STALE_MINUTES (default 30) by a process that stopped mid-file is released
+ * the same way. The integration page reads them through GET /api/nbfis/[id]/feeds.
+ */
+
+import { createHash } from 'crypto';
+import { createReadStream, watch, type FSWatcher } from 'fs';
+import { readdir, stat } from 'fs/promises';
+import path from 'path';
+import { performance } from 'perf_hooks';
+import { Readable } from 'stream';
+import type { FeedFile } from '@/generated/prisma/client';
+import { db } from './db';
+import { invalidateAnalytics } from './analyticsCache';
+import {
+  DOC_TYPE_SCHEMAS, getSchema, getValidationTests,
+  type FeedError, type FeedIssue, type FeedRecord, type ValidationTest,
+} from './integrationSchemas';
+import {
+  ingestLoanTape, parseCsvRecords, parseXlsxRecords, recordLoanBookUpload, resolveColumnMapping,
+  type TapeFormat,
+} from './loanTapeIngest';
+import {
+  estimateTransitionMatrices, saveTransitionEstimate, type TransitionEstimateResult,
+} from './transitionMatrix';
+
+export const FEED_DROP_DIR = process.env.FEED_DROP_DIR || path.join(process.cwd(), 'data', 'sftp');
+const FEED_CONCURRENCY = Math.max(1, Number(process.env.FEED_CONCURRENCY) || 4);
+// Files modified more recently than this are assumed to still be uploading
+const SETTLE_MS = 2000;
+// A 'processing' claim older than this belongs to a process that died mid-file
+const CLAIM_STALE_MS = (Number(process.env.FEED_CLAIM_STALE_MINUTES) || 30) * 60_000;
+// Attempts at a file that keeps hitting transient errors before it is marked 'failed'
+const FEED_MAX_ATTEMPTS = Math.max(1, Number(process.env.FEED_MAX_ATTEMPTS) || 3);
+const FEED_FILE_RE = /\.(csv|xlsx)$/i;
+const FEED_USER = { userId: 'sftp', userName: 'System (SFTP)' };
+
+export interface DroppedFile {
+  nbfiId: string;
+  docTypeId: string;
+  path: string;
+  fileName: string;
+  bytes: number;
+  mtimeMs: number;
+}
+
+export interface FeedFileOutcome {
+  nbfiId: string;
+  docTypeId: string;
+  fileName: string;
+  status: 'success' | 'partial' | 'failed' | 'skipped';
+  rowsRead: number;
+  durationMs: number;
+}
+
+export interface FeedScanSummary {
+  files: number;
+  processed: number;
+  skipped: number;
+  failed: number;
+  rows: number;
+  ms: number;
+  outcomes: FeedFileOutcome[];
+}
+
+// What each doc-type handler reports back for the FeedFile row
+interface FileResult {
+  rowsRead: number;
+  rowsAccepted: number;
+  rowsRejected: number;
+  periods?: number;
+  tests: ValidationTest[];
+  issues: FeedIssue[];
+  resultId: string | null;
+  ok: boolean;
+}
+
+/* ================================================================
+   Drop-zone discovery
+   ================================================================ */
+
+async function listDir(dir: string) {
+  try {
+    return await readdir(dir, { withFileTypes: true });
+  } catch (err) {
+    if ((err as NodeJS.ErrnoException).code === 'ENOENT') return [];
+    throw err;
+  }
+}
+
+// Settled CSV / XLSX files under every known NBFI's doc-type folders, oldest name first
+export async function listDroppedFiles(root: string = FEED_DROP_DIR): Promise<DroppedFile[]> {
+  const dirs = (await listDir(root)).filter((d) => d.isDirectory()).map((d) => d.name);
+  if (!dirs.length) return [];
+  const known = new Set((await db.nbfi.findMany({ where: { id: { in: dirs } }, select: { id: true } })).map((n) => n.id));
+
+  const files: DroppedFile[] = [];
+  const now = Date.now();
+  for (const nbfiId of dirs) {
+    if (!known.has(nbfiId)) continue;
+    for (const schema of DOC_TYPE_SCHEMAS) {
+      const dir = path.join(root, nbfiId, schema.sftpConfig.path);
+      for (const entry of await listDir(dir)) {
+        if (!entry.isFile() || entry.name.startsWith('.') || !FEED_FILE_RE.test(entry.name)) continue;
+        const full = path.join(dir, entry.name);
+        const st = await stat(full);
+        if (now - st.mtimeMs < SETTLE_MS) continue;
+        files.push({ nbfiId, docTypeId: schema.id, path: full, fileName: entry.name, bytes: st.size, mtimeMs: st.mtimeMs });
+      }
+    }
+  }
+  return files.sort((a, b) => a.fileName.localeCompare(b.fileName));
+}
+
+export function sha256File(file: string): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const hash = createHash('sha256');
+    createReadStream(file)
+      .on('error', reject)
+      .on('data', (chunk) => hash.update(chunk))
+      .on('end', () => resolve(hash.digest('hex')));
+  });
+}
+
+function fileBody(file: string): ReadableStream<Uint8Array> {
+  return Readable.toWeb(createReadStream(file)) as unknown as ReadableStream<Uint8Array>;
+}
+
+/* ================================================================
+   Doc-type handlers
+   ================================================================ */
+
+async function ingestLoanBookFeed(file: DroppedFile, format: TapeFormat): Promise<FileResult> {
+  const result = await ingestLoanTape(file.nbfiId, fileBody(file.path), { format, mode: 'delta', totalBytes: file.bytes });
+  if (result.ok) {
+    await recordLoanBookUpload(file.nbfiId, result, { filename: file.fileName, source: 'sftp', ...FEED_USER });
+  }
+  return {
+    rowsRead: result.rowsRead,
+    rowsAccepted: result.rowsRead - result.rowsRejected,
+    rowsRejected: result.rowsRejected,
+    tests: result.tests,
+    issues: result.issues,
+    resultId: result.loanBookId,
+    ok: result.ok,
+  };
+}
+
+// The checks on getValidationTests('loan_performance_history') that the estimate can answer
+function historyChecks(result: TransitionEstimateResult): { tests: ValidationTest[]; issues: FeedIssue[] } {
+  const templates = getValidationTests('loan_performance_history');
+  const issues: FeedIssue[] = [];
+  const test = (i: number, pass: boolean, detail: string) => ({ name: templates[i].name, pass, detail: pass ? undefined : detail, severity: templates[i].severity });
+  const tests = [
+    test(2, result.periodCount >= 6, `Only ${result.periodCount} periods found`),
+    test(3, result.periodCount >= 12, `Only ${result.periodCount} periods found — 12–36 recommended`),
+    test(4, result.skipped === 0, `${result.skipped.toLocaleString()} observations do not extend a loan's contiguous monthly run`),
+  ];
+  if (result.overall.observations === 0) {
+    issues.push({ errorType: 'schema_mismatch', field: 'reportingDate', rowCount: result.rowsRead, message: 'No consecutive monthly observations found', severity: 'error', sampleRows: [] });
+  }
+  if (result.periodCount < 6) {
+    issues.push({ errorType: 'sequence_gap', field: 'reportingDate', rowCount: 0, message: `${result.periodCount} reporting periods found — at least 6 required`, severity: 'error', sampleRows: [] });
+  }
+  if (result.skipped > 0) {
+    issues.push({ errorType: 'sequence_gap', field: 'reportingDate', rowCount: result.skipped, message: tests[2].detail!, severity: 'warning', sampleRows: [] });
+  }
+  return { tests, issues };
+}
+
+async function ingestLoanHistoryFeed(file: DroppedFile, format: TapeFormat): Promise<FileResult> {
+  const result = await estimateTransitionMatrices(fileBody(file.path), { format, totalBytes: file.bytes });
+  const { tests, issues } = historyChecks(result);
+  const ok = result.overall.observations > 0;
+  let resultId: string | null = null;
+  if (ok) {
+    const saved = await saveTransitionEstimate(db, file.nbfiId, result, file.fileName);
+    resultId = saved.id;
+    await db.auditLog.create({
+      data: {
+        nbfiId: file.nbfiId,
+        ...FEED_USER,
+        action: 'loan_history_uploaded',
+        notes: `${result.rowsRead} ${result.format}-format rows from ${file.fileName} (SFTP): ${result.overall.observations} transitions over ${result.periodCount} periods`,
+      },
+    });
+    invalidateAnalytics(file.nbfiId);
+  }
+  return {
+    rowsRead: result.rowsRead,
+    rowsAccepted: result.rowsRead - result.skipped,
+    rowsRejected: result.skipped,
+    periods: result.periodCount,
+    tests,
+    issues,
+    resultId,
+    ok,
+  };
+}
+
+// Statement feeds: first three getValidationTests entries are (required fields, period date, numeric values)
+type StatementRule = 'columns' | 'blank' | 'date' | 'numeric';
+const STATEMENT_RULES: Record<StatementRule, { test: number; errorType: FeedIssue['errorType']; label: string }> = {
+  columns: { test: 0, errorType: 'schema_mismatch', label: 'missing required column' },
+  blank: { test: 0, errorType: 'missing_field', label: 'blank required value' },
+  date: { test: 1, errorType: 'invalid_format', label: 'invalid date' },
+  numeric: { test: 2, errorType: 'invalid_format', label: 'non-numeric value' },
+};
+const PERIOD_RE = /^\d{4}-\d{2}(-\d{2})?$/;
+
+async function validateStatementFeed(file: DroppedFile, format: TapeFormat): Promise<FileResult> {
+  const schema = getSchema(file.docTypeId);
+  const templates = getValidationTests(file.docTypeId);
+  const body = fileBody(file.path);
+  const records = format === 'xlsx' ? parseXlsxRecords(body) : parseCsvRecords(body);
+  const failures = new Map<StatementRule, { count: number; field: string; sample: string; rows: number[] }>();
+  const fail = (rule: StatementRule, field: string, row: number, sample: string) => {
+    const f = failures.get(rule);
+    if (!f) failures.set(rule, { count: 1, field, sample, rows: [row] });
+    else {
+      f.count++;
+      if (f.rows.length < 5) f.rows.push(row);
+    }
+  };
+
+  const fieldsByKey = new Map(schema.fields.map((f) => [f.key, f]));
+  let mapping: (string | null)[] | null = null;
+  let rowsRead = 0;
+  let rowsRejected = 0;
+  for await (const record of records) {
+    if (!mapping) {
+      // Statement templates use the field labels as headers; autoMapping is keyed by label for these doc types
+      mapping = (resolveColumnMapping(record, schema) as (string | null)[])
+        .map((key, c) => key ?? schema.autoMapping[(record[c] ?? '').trim()] ?? null);
+      const mapped = new Set(mapping);
+      const missing = schema.fields.filter((f) => f.required && !mapped.has(f.key)).map((f) => f.label);
+      if (missing.length) {
+        fail('columns', 'header', 1, missing.join(', '));
+        break;
+      }
+      continue;
+    }
+    rowsRead++;
+    const rowNum = rowsRead + 1;
+    let rejected = false;
+    mapping.forEach((key, c) => {
+      const field = key ? fieldsByKey.get(key) : undefined;
+      if (!field) return;
+      const v = (record[c] ?? '').trim();
+      if (!v) {
+        if (field.required) { fail('blank', field.key, rowNum, field.key); rejected = true; }
+        return;
+      }
+      if ((field.type === 'number' || field.type === 'percent') && !Number.isFinite(Number(v.replace(/,/g, '')))) {
+        fail('numeric', field.key, rowNum, `${field.key}=${v}`);
+        rejected = true;
+      } else if (field.type === 'date' && (!PERIOD_RE.test(v) || Number.isNaN(Date.parse(v)))) {
+        fail('date', field.key, rowNum, `${field.key}=${v}`);
+        rejected = true;
+      }
+    });
+    if (rejected) rowsRejected++;
+  }
+
+  const rules = Object.keys(STATEMENT_RULES) as StatementRule[];
+  const tests: ValidationTest[] = [0, 1, 2].map((i) => {
+    const rule = rules.find((r) => STATEMENT_RULES[r].test === i && failures.has(r));
+    if (!rule) return { name: templates[i].name, pass: true, severity: templates[i].severity };
+    const f = failures.get(rule)!;
+    return { name: templates[i].name, pass: false, detail: `${f.count.toLocaleString()} × ${STATEMENT_RULES[rule].label} (${f.sample})`, severity: templates[i].severity };
+  });
+  const issues: FeedIssue[] = rules.flatMap((rule) => {
+    const f = failures.get(rule);
+    if (!f) return [];
+    const { errorType, label, test } = STATEMENT_RULES[rule];
+    return [{
+      errorType,
+      field: f.field,
+      rowCount: rule === 'columns' ? 0 : f.count,
+      message: rule === 'columns' ? `Required columns not found: ${f.sample}` : `${f.count.toLocaleString()} × ${label} (first: ${f.sample})`,
+      severity: templates[test].severity,
+      sampleRows: rule === 'columns' ? [] : f.rows,
+    }];
+  });
+  return {
+    rowsRead,
+    rowsAccepted: rowsRead - rowsRejected,
+    rowsRejected,
+    tests,
+    issues,
+    resultId: null,
+    ok: !failures.has('columns') && rowsRead > rowsRejected,
+  };
+}
+
+const HANDLERS: Record<string, (file: DroppedFile, format: TapeFormat) => Promise<FileResult>> = {
+  loan_book: ingestLoanBookFeed,
+  loan_performance_history: ingestLoanHistoryFeed,
+  financial_statements: validateStatementFeed,
+  monthly_mis: validateStatementFeed,
+};
+
+/* ================================================================
+   Per-file driver
+   ================================================================ */
+
+function isUniqueViolation(err: unknown): boolean {
+  return (err as { code?: string })?.code === 'P2002';
+}
+
+// Prisma connection / pool / write-conflict codes, SQLite lock and I/O codes, and fs errors
+// that say nothing about the file's content. Anything else a handler throws is a verdict.
+const TRANSIENT_CODE_RE = /^(P1\d{3}|P2024|P2034|SQLITE_(BUSY|LOCKED|FULL|IOERR|CANTOPEN)\w*|EBUSY|EAGAIN|EMFILE|ENFILE|ENOSPC|EIO|ETIMEDOUT)$/;
+
+export function isTransientError(err: unknown): boolean {
+  for (let e = err as { code?: unknown; name?: unknown; cause?: unknown } | undefined, depth = 0; e && depth < 5; e = e.cause as typeof e, depth++) {
+    if (typeof e.code === 'string' && TRANSIENT_CODE_RE.test(e.code)) return true;
+    if (e.name === 'PrismaClientInitializationError') return true;
+  }
+  return false;
+}
+
+// FeedFile fields for a file that will not be read again
+function failedFile(message: string) {
+  const issue: FeedIssue = { errorType: 'schema_mismatch', field: 'file', rowCount: 0, message, severity: 'error', sampleRows: [] };
+  return { status: 'failed', errorCount: 1, tests: '[]', issues: JSON.stringify([issue]), completedAt: new Date() };
+}
+
+// Takes the (nbfiId, checksum) claim: a new row, or a 'retry' row with attempts left.
+// Returns null when the file was already received or another scan holds it.
+async function claimFeedFile(file: DroppedFile, checksum: string): Promise<{ id: string; attempts: number } | null> {
+  try {
+    return await db.feedFile.create({
+      data: { nbfiId: file.nbfiId, docTypeId: file.docTypeId, fileName: file.fileName, checksum, status: 'processing', bytes: file.bytes, claimedAt: new Date() },
+      select: { id: true, attempts: true },
+    });
+  } catch (err) {
+    if (!isUniqueViolation(err)) throw err;
+  }
+  // The conditional update is the claim, so two scans cannot both take the retry
+  const { count } = await db.feedFile.updateMany({
+    where: { nbfiId: file.nbfiId, checksum, status: 'retry', attempts: { lt: FEED_MAX_ATTEMPTS } },
+    data: { status: 'processing', attempts: { increment: 1 }, fileName: file.fileName, bytes: file.bytes, claimedAt: new Date() },
+  });
+  if (!count) return null;
+  return db.feedFile.findUnique({ where: { nbfiId_checksum: { nbfiId: file.nbfiId, checksum } }, select: { id: true, attempts: true } });
+}
+
+export async function ingestFeedFile(file: DroppedFile): Promise<FeedFileOutcome> {
+  const outcome: FeedFileOutcome = { nbfiId: file.nbfiId, docTypeId: file.docTypeId, fileName: file.fileName, status: 'skipped', rowsRead: 0, durationMs: 0 };
+  const checksum = await sha256File(file.path);
+  // The unique (nbfiId, checksum) claim is the idempotency check — and stops two scans taking the same file
+  const claim = await claimFeedFile(file, checksum);
+  if (!claim) return outcome;
+  const claimId = claim.id;
+
+  const t0 = performance.now();
+  const format: TapeFormat = /\.xlsx$/i.test(file.fileName) ? 'xlsx' : 'csv';
+  let result: FileResult;
+  try {
+    result = await HANDLERS[file.docTypeId](file, format);
+  } catch (err) {
+    const durationMs = Math.round(performance.now() - t0);
+    if (isTransientError(err) && claim.attempts < FEED_MAX_ATTEMPTS) {
+      // Not a verdict on the file: park the claim so the next scan retries it
+      await db.feedFile.update({ where: { id: claimId }, data: { status: 'retry', durationMs } }).catch(() => undefined);
+      throw err;
+    }
+    // The file cannot be read (or kept failing): record it as failed so it is not picked up again
+    console.error('[feed ingest]', file.path, err);
+    const message = err instanceof Error ? err.message : String(err);
+    await db.feedFile.update({
+      where: { id: claimId },
+      data: {
+        ...failedFile(isTransientError(err) ? `Gave up after ${claim.attempts} attempts: ${message}` : `Could not read file: ${message}`),
+        durationMs,
+      },
+    });
+    return { ...outcome, status: 'failed', durationMs };
+  }
+  const durationMs = Math.round(performance.now() - t0);
+  const status = !result.ok ? 'failed'
+    : result.rowsRejected > 0 || result.issues.some((i) => i.severity === 'error') ? 'partial'
+    : 'success';
+
+  await db.feedFile.update({
+    where: { id: claimId },
+    data: {
+      status,
+      rowsRead: result.rowsRead,
+      rowsAccepted: result.rowsAccepted,
+      rowsRejected: result.rowsRejected,
+      periods: result.periods ?? null,
+      errorCount: result.issues.length,
+      durationMs,
+      tests: JSON.stringify(result.tests),
+      issues: JSON.stringify(result.issues),
+      resultId: result.resultId,
+      completedAt: new Date(),
+    },
+  });
+  return { ...outcome, status, rowsRead: result.rowsRead, durationMs };
+}
+
+/* ================================================================
+   Scan — bounded concurrency across (NBFI, doc type) queues
+   ================================================================ */
+
+// Runs `fn` over `items` with at most `limit` calls in flight
+export async function runBounded<T>(items: T[], limit: number, fn: (item: T) => Promise<void>) {
+  let next = 0;
+  const lane = async () => {
+    while (next < items.length) await fn(items[next++]);
+  };
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, lane));
+}
+
+// Release claims a stopped process left 'processing', so their files are ingested again —
+// or marked 'failed' once they have used FEED_MAX_ATTEMPTS. Live claims are younger than
+// CLAIM_STALE_MS and are left alone.
+export async function releaseStaleClaims(maxAgeMs: number = CLAIM_STALE_MS): Promise<number> {
+  const stale = { status: 'processing', claimedAt: { lt: new Date(Date.now() - maxAgeMs) } };
+  const [released, exhausted] = await db.$transaction([
+    db.feedFile.updateMany({ where: { ...stale, attempts: { lt: FEED_MAX_ATTEMPTS } }, data: { status: 'retry' } }),
+    db.feedFile.updateMany({ where: stale, data: failedFile(`Processing stopped ${FEED_MAX_ATTEMPTS} times before the file finished`) }),
+  ]);
+  const count = released.count + exhausted.count;
+  if (count) console.warn(`[feed ingest] released ${count} stale 'processing' claim${count === 1 ? '' : 's'}${exhausted.count ? ` (${exhausted.count} out of attempts, marked failed)` : ''}`);
+  return count;
+}
+
+export async function scanFeedDropZone(
+  root: string = FEED_DROP_DIR,
+  concurrency: number = FEED_CONCURRENCY,
+): Promise<FeedScanSummary> {
+  const t0 = Date.now();
+  await releaseStaleClaims();
+  const files = (await listDroppedFiles(root)).filter((f) => worker.seen.get(f.path) !== `${f.bytes}:${f.mtimeMs}`);
+
+  const queues = new Map<string, DroppedFile[]>();
+  for (const f of files) {
+    const key = `${f.nbfiId}/${f.docTypeId}`;
+    const q = queues.get(key);
+    if (q) q.push(f);
+    else queues.set(key, [f]);
+  }
+
+  const outcomes: FeedFileOutcome[] = [];
+  await runBounded([...queues.values()], concurrency, async (queue) => {
+    for (const f of queue) {
+      try {
+        outcomes.push(await ingestFeedFile(f));
+        worker.seen.set(f.path, `${f.bytes}:${f.mtimeMs}`);
+      } catch (err) {
+        // Claim, handler or bookkeeping failed — leave the file unseen so the next scan retries it
+        console.error('[feed ingest]', f.path, err);
+      }
+    }
+  });
+
+  return {
+    files: files.length,
+    processed: outcomes.filter((o) => o.status !== 'skipped').length,
+    skipped: outcomes.filter((o) => o.status === 'skipped').length,
+    failed: outcomes.filter((o) => o.status === 'failed').length,
+    rows: outcomes.reduce((s, o) => s + o.rowsRead, 0),
+    ms: Date.now() - t0,
+    outcomes,
+  };
+}
+
+/* ================================================================
+   Integration page views
+   ================================================================ */
+
+export function toFeedRecord(f: FeedFile): FeedRecord {
+  const iso = f.receivedAt.toISOString();
+  return {
+    id: f.id,
+    date: iso.slice(0, 10),
+    time: iso.slice(11, 16),
+    source: f.source === 'sftp' ? 'sftp' : f.source === 'portal' ? 'portal' : 'manual',
+    uploadedBy: f.source === 'sftp' ? FEED_USER.userName : 'Batch import',
+    fileName: f.fileName,
+    rows: f.rowsAccepted,
+    periods: f.periods ?? undefined,
+    status: f.status as FeedRecord['status'],
+    errorCount: f.errorCount,
+    bytes: f.bytes,
+    durationMs: f.durationMs,
+    rowsPerSec: f.durationMs > 0 ? Math.round(f.rowsRead / (f.durationMs / 1000)) : undefined,
+  };
+}
+
+export function toFeedErrors(f: FeedFile): FeedError[] {
+  const issues: FeedIssue[] = f.issues ? JSON.parse(f.issues) : [];
+  const date = f.receivedAt.toISOString().slice(0, 10);
+  return issues.map((issue, i) => ({ id: `${f.id}-${i}`, uploadId: f.id, date, ...issue }));
+}
+
+/* ================================================================
+   Watcher
+   ================================================================ */
+
+const globalForFeeds = globalThis as unknown as {
+  feedWorker: {
+    timer?: ReturnType<typeof setInterval>;
+    watcher?: FSWatcher;
+    debounce?: ReturnType<typeof setTimeout>;
+    running?: Promise<unknown>;
+    seen: Map<string, string>;   // path → "bytes:mtime" of files already handled by this process
+  } | undefined;
+};
+const worker = globalForFeeds.feedWorker ?? { seen: new Map<string, string>() };
+globalForFeeds.feedWorker = worker;
+
+// Runs after the current scan (if any) finishes, so scans never overlap
+function enqueueScan() {
+  const run = (worker.running ?? Promise.resolve())
+    .then(() => scanFeedDropZone())
+    .then((s) => {
+      if (s.processed) console.log(`[feed ingest] ${s.processed} files (${s.failed} failed, ${s.skipped} already received), ${s.rows} rows in ${s.ms} ms`);
+    })
+    .catch((err) => console.error('[feed ingest]', err));
+  worker.running = run;
+  return run;
+}
+
+// Poll the drop-zone every `intervalSeconds` (FEED_POLL_SECONDS, default 60; 0 disables)
+// and also scan shortly after the file watcher sees a change
+export function startFeedWatcher(
+  intervalSeconds: number = Number(process.env.FEED_POLL_SECONDS ?? 60),
+  root: string = FEED_DROP_DIR,
+) {
+  if (worker.timer || !(intervalSeconds > 0)) return;
+  worker.timer = setInterval(() => void enqueueScan(), intervalSeconds * 1000);
+  worker.timer.unref?.();
+  try {
+    worker.watcher = watch(root, { recursive: true, persistent: false }, () => {
+      if (worker.debounce) clearTimeout(worker.debounce);
+      worker.debounce = setTimeout(() => {
+        worker.debounce = undefined;
+        void enqueueScan();
+      }, SETTLE_MS + 500);
+    });
+    worker.watcher.on('error', () => worker.watcher?.close());
+  } catch {
+    /* drop-zone not created yet — polling picks it up */
+  }
+  void enqueueScan();
+}
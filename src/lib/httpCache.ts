@@ -0,0 +1,47 @@
+/**
+ * ETag / conditional-GET helpers for the read APIs.
+ * Routes derive a validator either from something that already versions the
+ * data (an immutable LoanBook id) or, failing that, from a hash of the
+ * response body. When If-None-Match matches they answer 304, so the client
+ * can revalidate its copy without downloading it again.
+ */
+
+import { createHash } from 'crypto';
+import { NextRequest, NextResponse } from 'next/server';
+import { span } from './instrumentation';
+
+export function etagOf(...parts: (string | number | null | undefined)[]): string {
+  const h = createHash('sha1');
+  for (const p of parts) h.update(String(p ?? '')).update('\0');
+  return `W/"${h.digest('base64url').slice(0, 27)}"`;
+}
+
+export function matchesEtag(req: NextRequest, etag: string): boolean {
+  const header = req.headers.get('if-none-match');
+  if (!header) return false;
+  if (header.trim() === '*') return true;
+  // Weak comparison: W/ prefixes are ignored on both sides
+  const strip = (t: string) => t.trim().replace(/^W\//, '');
+  return header.split(',').some((t) => strip(t) === strip(etag));
+}
+
+// private: responses are per-user views; no-cache: always revalidate, never serve stale
+const CACHE_CONTROL = 'private, no-cache';
+
+export function notModified(etag: string): NextResponse {
+  return new NextResponse(null, { status: 304, headers: { ETag: etag, 'Cache-Control': CACHE_CONTROL } });
+}
+
+// JSON response with an ETag, or 304 when the client already holds this version
+export function jsonWithEtag(req: NextRequest, body: unknown, etag?: string): NextResponse {
+  return jsonTextWithEtag(req, span('json', () => JSON.stringify(body)), etag);
+}
+
+// Same, for a body that is already serialised (see nbfiRecordJson in dbHelpers.ts)
+export function jsonTextWithEtag(req: NextRequest, json: string, etag?: string): NextResponse {
+  const tag = etag ?? etagOf(json);
+  if (matchesEtag(req, tag)) return notModified(tag);
+  return new NextResponse(json, {
+    headers: { 'Content-Type': 'application/json', ETag: tag, 'Cache-Control': CACHE_CONTROL },
+  });
+}
@@ -0,0 +1,255 @@
+/**
+ * Request-level performance instrumentation.
+ * API route handlers are wrapped in withRouteMetrics, which runs each request
+ * inside an AsyncLocalStorage context. The Prisma client (db.ts), the JSON
+ * helpers and the analytics entry points add their elapsed time to that context
+ * as `db`, `json` and `compute` spans. When the request finishes, its latency,
+ * span totals, payload sizes and heap growth land in process-wide histograms.
+ * The same breakdown is returned as a Server-Timing header, so the browser's
+ * network panel shows where a slow call spent its time.
+ *
+ * GET /api/metrics renders the registry in the Prometheus text format.
+ * Queries slower than SLOW_QUERY_MS (default 250) are logged with the route
+ * that issued them.
+ */
+
+import { AsyncLocalStorage } from 'async_hooks';
+import { performance } from 'perf_hooks';
+import { workerPoolStats } from './workerPool';
+
+export type SpanKind = 'db' | 'json' | 'compute';
+const SPAN_KINDS: SpanKind[] = ['db', 'json', 'compute'];
+
+const SLOW_QUERY_MS = Number(process.env.SLOW_QUERY_MS ?? 250);
+
+/* ================================================================
+   Registry
+   ================================================================ */
+
+type Labels = Record<string, string>;
+
+function labelKey(labels: Labels): string {
+  return Object.entries(labels)
+    .map(([k, v]) => `${k}="${v.replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n')}"`)
+    .join(',');
+}
+
+class Histogram {
+  private readonly series = new Map<string, { counts: number[]; sum: number; count: number }>();
+
+  constructor(readonly name: string, readonly help: string, readonly buckets: number[]) {}
+
+  observe(labels: Labels, value: number) {
+    const key = labelKey(labels);
+    let s = this.series.get(key);
+    if (!s) this.series.set(key, (s = { counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 }));
+    for (let i = 0; i < this.buckets.length; i++) if (value <= this.buckets[i]) s.counts[i]++;
+    s.sum += value;
+    s.count++;
+  }
+
+  render(): string[] {
+    const out = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} histogram`];
+    for (const [key, s] of this.series) {
+      const sep = key ? ',' : '';
+      this.buckets.forEach((b, i) => out.push(`${this.name}_bucket{${key}${sep}le="${b}"} ${s.counts[i]}`));
+      out.push(`${this.name}_bucket{${key}${sep}le="+Inf"} ${s.count}`);
+      out.push(`${this.name}_sum{${key}} ${s.sum}`);
+      out.push(`${this.name}_count{${key}} ${s.count}`);
+    }
+    return out;
+  }
+}
+
+class Counter {
+  private readonly series = new Map<string, number>();
+
+  constructor(readonly name: string, readonly help: string) {}
+
+  inc(labels: Labels, by = 1) {
+    const key = labelKey(labels);
+    this.series.set(key, (this.series.get(key) ?? 0) + by);
+  }
+
+  render(): string[] {
+    const out = [`# HELP ${this.name} ${this.help}`, `# TYPE ${this.name} counter`];
+    for (const [key, v] of this.series) out.push(`${this.name}{${key}} ${v}`);
+    return out;
+  }
+}
+
+const SECONDS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60];
+const QUERY_SECONDS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10];
+const BYTES = [1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9];
+
+function createRegistry() {
+  return {
+    requestDuration: new Histogram('ncba_http_request_duration_seconds', 'API request latency until the response starts', SECONDS),
+    requestSpan: new Histogram('ncba_http_request_span_seconds', 'Time per request spent in database queries, JSON (de)serialisation and compute', SECONDS),
+    requestQueries: new Histogram('ncba_http_request_db_queries', 'Database queries issued per request', [1, 2, 5, 10, 25, 50, 100, 500, 1000]),
+    requestBytes: new Histogram('ncba_http_request_bytes', 'Request body size', BYTES),
+    responseBytes: new Histogram('ncba_http_response_bytes', 'Response body size, counted as it streams', BYTES),
+    heapDelta: new Histogram('ncba_http_request_heap_growth_bytes', 'Heap growth between request start and response start', [1e5, 1e6, 1e7, 1e8, 5e8, 1e9, 4e9]),
+    queryDuration: new Histogram('ncba_db_query_duration_seconds', 'Prisma query latency', QUERY_SECONDS),
+    slowQueries: new Counter('ncba_db_slow_queries_total', 'Prisma queries slower than SLOW_QUERY_MS'),
+    startedAt: Date.now(),
+  };
+}
+
+// Survives Next.js hot reload like the Prisma client does
+const globalForMetrics = globalThis as unknown as { metricsRegistry: ReturnType<typeof createRegistry> | undefined };
+const registry = globalForMetrics.metricsRegistry ?? (globalForMetrics.metricsRegistry = createRegistry());
+
+/* ================================================================
+   Request context and spans
+   ================================================================ */
+
+interface RequestMetrics {
+  route: string;
+  spans: Record<SpanKind, number>;   // ms
+  queries: number;
+}
+
+const requestContext = new AsyncLocalStorage<RequestMetrics>();
+
+function addSpan(kind: SpanKind, ms: number) {
+  const ctx = requestContext.getStore();
+  if (ctx) ctx.spans[kind] += ms;
+}
+
+// Time `fn` as a span of the current request (a no-op outside one). Database time
+// recorded while a compute or JSON span runs is subtracted, so spans do not overlap.
+export function span<T>(kind: Exclude<SpanKind, 'db'>, fn: () => T): T {
+  const ctx = requestContext.getStore();
+  if (!ctx) return fn();
+  const t0 = performance.now();
+  const db0 = ctx.spans.db;
+  const done = () => addSpan(kind, Math.max(0, performance.now() - t0 - (ctx.spans.db - db0)));
+  const result = fn();
+  if (result instanceof Promise) return result.finally(done) as unknown as T;
+  done();
+  return result;
+}
+
+// Called by the Prisma query extension in db.ts for every query
+export function recordDbQuery(model: string, operation: string, ms: number, args: unknown) {
+  const ctx = requestContext.getStore();
+  if (ctx) {
+    ctx.spans.db += ms;
+    ctx.queries++;
+  }
+  registry.queryDuration.observe({ model, operation }, ms / 1000);
+  if (ms >= SLOW_QUERY_MS) {
+    registry.slowQueries.inc({ model, operation });
+    let detail = '';
+    try { detail = JSON.stringify(args)?.slice(0, 500) ?? ''; } catch { /* circular or BigInt args */ }
+    console.warn(`[slow query] ${model}.${operation} ${ms.toFixed(0)} ms${ctx ? ` (${ctx.route})` : ''} ${detail}`);
+  }
+}
+
+// Counts bytes as the body streams out and reports the total once it has been sent
+function countingBody(body: ReadableStream<Uint8Array>, onDone: (bytes: number) => void): ReadableStream<Uint8Array> {
+  let bytes = 0;
+  return body.pipeThrough(new TransformStream<Uint8Array, Uint8Array>({
+    transform(chunk, controller) {
+      bytes += chunk.byteLength;
+      controller.enqueue(chunk);
+    },
+    flush() {
+      onDone(bytes);
+    },
+  }));
+}
+
+// Wrap a route handler: `export const GET = withRouteMetrics('/api/nbfis/[id]', async (req, ctx) => { ... })`
+export function withRouteMetrics<A extends unknown[]>(
+  route: string,
+  handler: (...args: A) => Promise<Response>,
+): (...args: A) => Promise<Response> {
+  return async (...args: A) => {
+    const req = args[0] instanceof Request ? args[0] : undefined;
+    const method = req?.method ?? 'GET';
+    const ctx: RequestMetrics = { route, spans: { db: 0, json: 0, compute: 0 }, queries: 0 };
+    const heapBefore = process.memoryUsage().heapUsed;
+    const t0 = performance.now();
+
+    let requestBytes = Number(req?.headers.get('content-length')) || 0;
+    if (req) {
+      // Parse bodies inside a json span; reading the stream itself is not counted
+      const readText = req.text.bind(req);
+      req.json = async () => {
+        const text = await readText();
+        if (!requestBytes) requestBytes = Buffer.byteLength(text);
+        return span('json', () => JSON.parse(text));
+      };
+    }
+
+    let status = 500;
+    try {
+      const res = await requestContext.run(ctx, () => handler(...args));
+      status = res.status;
+      const totalMs = performance.now() - t0;
+      const headers = new Headers(res.headers);
+      headers.append('Server-Timing', [
+        ...SPAN_KINDS.map((k) => `${k};dur=${ctx.spans[k].toFixed(1)}`),
+        `total;dur=${totalMs.toFixed(1)}`,
+      ].join(', '));
+      const body = res.body
+        ? countingBody(res.body, (bytes) => registry.responseBytes.observe({ route, method }, bytes))
+        : null;
+      if (!res.body) registry.responseBytes.observe({ route, method }, 0);
+      return new Response(body, { status: res.status, statusText: res.statusText, headers });
+    } finally {
+      const labels = { route, method };
+      registry.requestDuration.observe({ ...labels, status: String(status) }, (performance.now() - t0) / 1000);
+      for (const k of SPAN_KINDS) registry.requestSpan.observe({ ...labels, span: k }, ctx.spans[k] / 1000);
+      registry.requestQueries.observe(labels, ctx.queries);
+      registry.requestBytes.observe(labels, requestBytes);
+      registry.heapDelta.observe(labels, Math.max(0, process.memoryUsage().heapUsed - heapBefore));
+    }
+  };
+}
+
+/* ================================================================
+   Exposition
+   ================================================================ */
+
+function gauge(name: string, help: string, value: number): string[] {
+  return [`# HELP ${name} ${help}`, `# TYPE ${name} gauge`, `${name} ${value}`];
+}
+
+// One series per worker pool; ncba_worker_pool_inline 1 means its tasks run on the request thread
+function workerPoolMetrics(): string[] {
+  const stats = workerPoolStats();
+  const series = (name: string, help: string, type: string, value: (s: (typeof stats)[number]) => number) => [
+    `# HELP ${name} ${help}`, `# TYPE ${name} ${type}`,
+    ...stats.map((s) => `${name}{${labelKey({ pool: s.name })}} ${value(s)}`),
+  ];
+  return [
+    ...series('ncba_worker_pool_workers', 'Live worker threads per pool', 'gauge', (s) => s.workers),
+    ...series('ncba_worker_pool_inline', 'Pool runs its tasks inline because its workers could not start', 'gauge', (s) => Number(s.failed)),
+    ...series('ncba_worker_pool_inline_tasks_total', 'Tasks a pool ran inline on the main thread', 'counter', (s) => s.inlineTasks),
+  ];
+}
+
+export const METRICS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8';
+
+export function renderMetrics(): string {
+  const mem = process.memoryUsage();
+  return [
+    ...registry.requestDuration.render(),
+    ...registry.requestSpan.render(),
+    ...registry.requestQueries.render(),
+    ...registry.requestBytes.render(),
+    ...registry.responseBytes.render(),
+    ...registry.heapDelta.render(),
+    ...registry.queryDuration.render(),
+    ...registry.slowQueries.render(),
+    ...workerPoolMetrics(),
+    ...gauge('ncba_process_heap_used_bytes', 'V8 heap in use', mem.heapUsed),
+    ...gauge('ncba_process_heap_total_bytes', 'V8 heap reserved', mem.heapTotal),
+    ...gauge('ncba_process_external_bytes', 'Memory held by C++ objects bound to JS (Buffers, typed arrays)', mem.external),
+    ...gauge('ncba_process_resident_memory_bytes', 'Resident set size', mem.rss),
+    ...gauge('ncba_process_uptime_seconds', 'Seconds since the metrics registry was created', (Date.now() - registry.startedAt) / 1000),
+  ].join('\n') + '\n';
+}
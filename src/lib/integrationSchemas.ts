@@ -431,6 +431,9 @@ export interface FeedRecord {
   periods?: number;
   status: 'success' | 'partial' | 'failed';
   errorCount: number;
+  bytes?: number;         // drop-zone ingestion only
+  durationMs?: number;
+  rowsPerSec?: number;
 }
 
 function seededRand(seed: number): () => number {
@@ -494,6 +497,9 @@ export interface FeedError {
   sampleRows: number[];
 }
 
+// A FeedError before it is tied to an upload — what the ingestion validators report per rule
+export type FeedIssue = Omit<FeedError, 'id' | 'uploadId' | 'date'>;
+
 const ERROR_TYPES: { type: FeedError['errorType']; label: string }[] = [
   { type: 'missing_field', label: 'Missing Required Field' },
   { type: 'invalid_format', label: 'Invalid Format' },
@@ -0,0 +1,235 @@
+/**
+ * Loan-level cash-flow projection for the securitisation waterfall.
+ * Each loan amortises on its own level-payment schedule, using its balance,
+ * rate and residualTenureMonths. Defaults and prepayments come from
+ * per-DPD-bucket annual vectors. Period totals feed allocateWaterfall() in
+ * securitisationWaterfall.ts, in place of the single-loan pool average.
+ *
+ * The tape is held as typed arrays and projected period by period in place,
+ * so memory is O(loans + periods). A 500k-loan, 36-period run is ~18M
+ * loan-steps. Tapes can be chunked across the worker pool; chunk results are
+ * just per-period sums, so they add up exactly.
+ */
+
+import { Worker } from 'worker_threads';
+import type { LoanLevelRow, SecuritisationStructure } from './types';
+import { DPD_BUCKETS, getDpdBucket } from './types';
+import { WorkerPool } from './workerPool';
+import {
+  allocateWaterfall, emptyCashflows, prepareWaterfall, waterfallResult,
+  type PoolCashflows, type WaterfallResult,
+} from './securitisationWaterfall';
+
+// Loans per worker task
+export const CASHFLOW_CHUNK_LOANS = 50_000;
+
+export interface LoanTape {
+  length: number;
+  balance: Float64Array;
+  monthlyRate: Float64Array;
+  term: Int32Array;       // remaining months
+  bucket: Uint8Array;     // index into DPD_BUCKETS
+}
+
+// Annual rates in %, per DPD bucket
+export interface CashflowAssumptions {
+  defaultRates: Record<string, number>;
+  prepayRates: Record<string, number>;
+  severity?: number;       // loss given default, % of defaulted balance (default 100)
+  defaultTenure?: number;  // months, for loans without residualTenureMonths (default 12)
+}
+
+export function toLoanTape(rows: LoanLevelRow[], defaultTenure: number = 12): LoanTape {
+  const n = rows.length;
+  const tape: LoanTape = {
+    length: n,
+    balance: new Float64Array(n),
+    monthlyRate: new Float64Array(n),
+    term: new Int32Array(n),
+    bucket: new Uint8Array(n),
+  };
+  for (let i = 0; i < n; i++) {
+    const r = rows[i];
+    tape.balance[i] = r.currentBalance > 0 ? r.currentBalance : 0;
+    tape.monthlyRate[i] = (r.interestRate || 0) / 100 / 12;
+    tape.term[i] = Math.max(1, Math.round(r.residualTenureMonths ?? defaultTenure));
+    tape.bucket[i] = Math.max(0, (DPD_BUCKETS as readonly string[]).indexOf(getDpdBucket(r.dpdAsOfReportingDate)));
+  }
+  return tape;
+}
+
+export function sliceTape(tape: LoanTape, start: number, end: number): LoanTape {
+  return {
+    length: end - start,
+    balance: tape.balance.slice(start, end),
+    monthlyRate: tape.monthlyRate.slice(start, end),
+    term: tape.term.slice(start, end),
+    bucket: tape.bucket.slice(start, end),
+  };
+}
+
+// Flat vectors: every bucket gets the same annual default and prepay rate (matches the pool-average inputs)
+export function flatAssumptions(lossRate: number, prepayRate: number): CashflowAssumptions {
+  const defaultRates: Record<string, number> = {};
+  const prepayRates: Record<string, number> = {};
+  for (const b of DPD_BUCKETS) { defaultRates[b] = lossRate; prepayRates[b] = prepayRate; }
+  return { defaultRates, prepayRates };
+}
+
+/* ================================================================
+   Kernel
+   ================================================================ */
+
+export interface CashflowChunk {
+  tape: LoanTape;
+  periods: number;
+  monthlyDefault: number[];   // per bucket
+  monthlyPrepay: number[];    // per bucket
+  severity: number;           // 0..1
+}
+
+// Projects the chunk in place (tape.balance is consumed) and returns per-period sums
+export function projectCashflowChunk(c: CashflowChunk): PoolCashflows {
+  const { tape, periods, monthlyDefault, monthlyPrepay, severity } = c;
+  const cf = emptyCashflows(periods);
+  const { balance, monthlyRate, term, bucket } = tape;
+  const mdr = Float64Array.from(monthlyDefault);
+  const smm = Float64Array.from(monthlyPrepay);
+
+  for (let m = 0; m < periods; m++) {
+    let interest = 0, scheduled = 0, prepay = 0, recoveries = 0, losses = 0;
+    for (let i = 0; i < tape.length; i++) {
+      let bal = balance[i];
+      if (bal <= 0) continue;
+      const r = monthlyRate[i];
+      const b = bucket[i];
+
+      // Defaults come off the opening balance: `severity` of it is lost, the rest recovered.
+      // The survivors pay interest and their scheduled instalment.
+      const defaulted = bal * mdr[b];
+      const lost = defaulted * severity;
+      bal -= defaulted;
+      losses += lost;
+      recoveries += defaulted - lost;
+
+      const n = term[i] - m;
+      const int = bal * r;
+      let prin: number;
+      if (n <= 1) prin = bal; // final instalment (or past maturity): balloon the remainder
+      else if (r > 0) prin = Math.min(bal, (bal * r) / (1 - Math.pow(1 + r, -n)) - int);
+      else prin = bal / n;
+      bal -= prin;
+
+      const pre = bal * smm[b];
+      bal -= pre;
+
+      interest += int;
+      scheduled += prin;
+      prepay += pre;
+      balance[i] = bal;
+    }
+    cf.interest[m] = interest;
+    cf.scheduledPrincipal[m] = scheduled;
+    cf.prepayment[m] = prepay;
+    cf.recoveries[m] = recoveries;
+    cf.losses[m] = losses;
+  }
+  return cf;
+}
+
+function addCashflows(into: PoolCashflows, part: PoolCashflows) {
+  for (let m = 0; m < into.periods; m++) {
+    into.interest[m] += part.interest[m];
+    into.scheduledPrincipal[m] += part.scheduledPrincipal[m];
+    into.prepayment[m] += part.prepayment[m];
+    into.recoveries[m] += part.recoveries[m];
+    into.losses[m] += part.losses[m];
+  }
+}
+
+/* ================================================================
+   Orchestration
+   ================================================================ */
+
+type CashflowPool = WorkerPool<CashflowChunk, PoolCashflows>;
+const globalForPool = globalThis as unknown as { cashflowPool: CashflowPool | undefined };
+
+export function getCashflowPool(): CashflowPool {
+  if (!globalForPool.cashflowPool) {
+    globalForPool.cashflowPool = new WorkerPool<CashflowChunk, PoolCashflows>(
+      'loanCashflow',
+      () => new Worker(new URL('./loanCashflow.worker.ts', import.meta.url)),
+      projectCashflowChunk,
+    );
+  }
+  return globalForPool.cashflowPool;
+}
+
+function monthlyVectors(a: CashflowAssumptions) {
+  return {
+    monthlyDefault: DPD_BUCKETS.map((b) => 1 - Math.pow(1 - Math.min(a.defaultRates[b] ?? 0, 100) / 100, 1 / 12)),
+    monthlyPrepay: DPD_BUCKETS.map((b) => (a.prepayRates[b] ?? 0) / 100 / 12),
+    severity: (a.severity ?? 100) / 100,
+  };
+}
+
+// Period cash flows for the whole tape. With `pool`, chunks run on the worker pool; otherwise inline.
+// The tape is not modified — each chunk projects a copy of its balances.
+export async function projectLoanCashflows(
+  tape: LoanTape,
+  periods: number,
+  assumptions: CashflowAssumptions,
+  pool?: CashflowPool,
+): Promise<PoolCashflows> {
+  const vectors = monthlyVectors(assumptions);
+  const total = emptyCashflows(periods);
+  const jobs: Promise<void>[] = [];
+  for (let start = 0; start < tape.length; start += CASHFLOW_CHUNK_LOANS) {
+    const chunk: CashflowChunk = {
+      tape: sliceTape(tape, start, Math.min(start + CASHFLOW_CHUNK_LOANS, tape.length)),
+      periods,
+      ...vectors,
+    };
+    if (pool) jobs.push(pool.run(chunk).then((part) => addCashflows(total, part)));
+    else addCashflows(total, projectCashflowChunk(chunk));
+  }
+  await Promise.all(jobs);
+  return total;
+}
+
+export interface LoanLevelWaterfall {
+  result: WaterfallResult;
+  cashflows: PoolCashflows;
+  loanCount: number;
+}
+
+// Loan-level counterpart of runWaterfall; lossRate / prepayRate on the result are the realised annualised rates
+export async function runLoanLevelWaterfall(
+  rows: LoanLevelRow[] | LoanTape,
+  structure: SecuritisationStructure,
+  assumptions: CashflowAssumptions,
+  periods: number = 12,
+  opts: { workers?: boolean } = {},
+): Promise<LoanLevelWaterfall> {
+  const tape = Array.isArray(rows) ? toLoanTape(rows, assumptions.defaultTenure) : rows;
+  let poolBalance = 0, weightedRate = 0;
+  for (let i = 0; i < tape.length; i++) {
+    poolBalance += tape.balance[i];
+    weightedRate += tape.balance[i] * tape.monthlyRate[i];
+  }
+  const avgRate = poolBalance > 0 ? (weightedRate / poolBalance) * 12 * 100 : 0;
+
+  const cashflows = await projectLoanCashflows(tape, periods, assumptions, opts.workers ? getCashflowPool() : undefined);
+  const w = prepareWaterfall(poolBalance, avgRate, structure, periods);
+  const totals = allocateWaterfall(w, cashflows);
+
+  const years = periods / 12;
+  let prepaid = 0;
+  for (let m = 0; m < periods; m++) prepaid += cashflows.prepayment[m];
+  const realised = (x: number) => poolBalance > 0 ? Math.round((x / poolBalance / years) * 10000) / 100 : 0;
+  return {
+    result: waterfallResult(w, totals, realised(totals.totalLosses), realised(prepaid)),
+    cashflows,
+    loanCount: tape.length,
+  };
+}
@@ -0,0 +1,12 @@
+// worker_threads entry for the loan-level cash-flow pool (see loanCashflow.ts / workerPool.ts)
+import { serveWorkerTasks } from './workerPool';
+import { projectCashflowChunk, type CashflowChunk } from './loanCashflow';
+import type { PoolCashflows } from './securitisationWaterfall';
+
+serveWorkerTasks<CashflowChunk, PoolCashflows>((task) => {
+  const cf = projectCashflowChunk(task);
+  return {
+    result: cf,
+    transfer: [cf.interest.buffer, cf.scheduledPrincipal.buffer, cf.prepayment.buffer, cf.recoveries.buffer, cf.losses.buffer],
+  };
+});
@@ -0,0 +1,193 @@
+/**
+ * Compact columnar binary encoding for loan books, used by the client-side
+ * IndexedDB cache (clientLoanCache.ts).
+ * Each field becomes one typed column:
+ * - integers → Int32
+ * - other numbers → Float64, with NaN marking a missing value
+ * - booleans → Uint8, with 2 marking a missing value
+ * - strings → dictionary indices (Uint8 / Uint16 / Uint32, whichever fits)
+ * - anything else → a dictionary of JSON strings
+ * The buffer is optionally gzip-compressed with CompressionStream. Encoding
+ * runs in the cache worker, so none of this touches the main thread.
+ *
+ * Layout: 'LNB1' | u32 header length | header JSON | pad to 8 | column bytes
+ */
+
+import type { LoanLevelRow } from './types';
+
+const MAGIC = 0x31424e4c; // 'LNB1' little-endian
+
+type ColumnKind = 'i32' | 'f64' | 'bool' | 'str' | 'json';
+
+interface ColumnHeader {
+  field: string;
+  kind: ColumnKind;
+  width?: 1 | 2 | 4;      // index width for str / json columns
+  dict?: string[];
+  offset: number;         // byte offset from the start of the column area
+  byteLength: number;
+}
+
+interface BookHeader {
+  rows: number;
+  columns: ColumnHeader[];
+}
+
+function kindOf(rows: Record<string, unknown>[], field: string): ColumnKind {
+  let kind: ColumnKind | null = null;
+  let missing = false;
+  for (const r of rows) {
+    const v = r[field];
+    if (v === undefined || v === null) { missing = true; continue; }
+    let k: ColumnKind;
+    if (typeof v === 'number') k = Number.isInteger(v) && v >= -0x80000000 && v <= 0x7fffffff ? 'i32' : 'f64';
+    else if (typeof v === 'boolean') k = 'bool';
+    else if (typeof v === 'string') k = 'str';
+    else return 'json';
+    if (kind === null || kind === k) kind = k;
+    else if ((kind === 'i32' && k === 'f64') || (kind === 'f64' && k === 'i32')) kind = 'f64';
+    else return 'json';
+  }
+  // Int32 has no spare value for "missing", so sparse integer columns widen to Float64
+  if (kind === 'i32' && missing) return 'f64';
+  return kind ?? 'json';
+}
+
+function indexArray(width: 1 | 2 | 4, n: number) {
+  return width === 1 ? new Uint8Array(n) : width === 2 ? new Uint16Array(n) : new Uint32Array(n);
+}
+
+// Missing values take the last index of the chosen width
+function dictColumn(rows: Record<string, unknown>[], field: string, json: boolean) {
+  const dict: string[] = [];
+  const ids = new Map<string, number>();
+  const raw = new Uint32Array(rows.length);
+  let anyMissing = false;
+  for (let i = 0; i < rows.length; i++) {
+    const v = rows[i][field];
+    if (v === undefined || v === null) { raw[i] = 0xffffffff; anyMissing = true; continue; }
+    const s = json ? JSON.stringify(v) : (v as string);
+    let id = ids.get(s);
+    if (id === undefined) { id = dict.length; dict.push(s); ids.set(s, id); }
+    raw[i] = id;
+  }
+  const need = dict.length + (anyMissing ? 1 : 0);
+  const width: 1 | 2 | 4 = need <= 0xff ? 1 : need <= 0xffff ? 2 : 4;
+  const missingId = width === 1 ? 0xff : width === 2 ? 0xffff : 0xffffffff;
+  const out = indexArray(width, rows.length);
+  for (let i = 0; i < rows.length; i++) out[i] = raw[i] === 0xffffffff ? missingId : raw[i];
+  return { dict, width, bytes: new Uint8Array(out.buffer) };
+}
+
+export function encodeLoanBook(rows: LoanLevelRow[]): Uint8Array {
+  const recs = rows as unknown as Record<string, unknown>[];
+  const fields = new Set<string>();
+  for (const r of recs) for (const k of Object.keys(r)) fields.add(k);
+
+  const columns: ColumnHeader[] = [];
+  const chunks: Uint8Array[] = [];
+  let offset = 0;
+  for (const field of fields) {
+    const kind = kindOf(recs, field);
+    let bytes: Uint8Array;
+    const col: ColumnHeader = { field, kind, offset, byteLength: 0 };
+    if (kind === 'i32') {
+      const a = new Int32Array(recs.length);
+      for (let i = 0; i < recs.length; i++) a[i] = recs[i][field] as number;
+      bytes = new Uint8Array(a.buffer);
+    } else if (kind === 'f64') {
+      const a = new Float64Array(recs.length);
+      for (let i = 0; i < recs.length; i++) {
+        const v = recs[i][field];
+        a[i] = v === undefined || v === null ? NaN : (v as number);
+      }
+      bytes = new Uint8Array(a.buffer);
+    } else if (kind === 'bool') {
+      bytes = new Uint8Array(recs.length);
+      for (let i = 0; i < recs.length; i++) {
+        const v = recs[i][field];
+        bytes[i] = v === undefined || v === null ? 2 : v ? 1 : 0;
+      }
+    } else {
+      const d = dictColumn(recs, field, kind === 'json');
+      col.dict = d.dict;
+      col.width = d.width;
+      bytes = d.bytes;
+    }
+    col.byteLength = bytes.byteLength;
+    // Keep every column 8-byte aligned so decode can view it without copying
+    const padded = (bytes.byteLength + 7) & ~7;
+    offset += padded;
+    chunks.push(bytes, new Uint8Array(padded - bytes.byteLength));
+    columns.push(col);
+  }
+
+  const header = new TextEncoder().encode(JSON.stringify({ rows: recs.length, columns } satisfies BookHeader));
+  const start = (8 + header.byteLength + 7) & ~7;
+  const out = new Uint8Array(start + offset);
+  const view = new DataView(out.buffer);
+  view.setUint32(0, MAGIC, true);
+  view.setUint32(4, header.byteLength, true);
+  out.set(header, 8);
+  let pos = start;
+  for (const c of chunks) { out.set(c, pos); pos += c.byteLength; }
+  return out;
+}
+
+export function decodeLoanBook(buf: Uint8Array): LoanLevelRow[] {
+  // Copy to an aligned buffer if the caller handed us a view at an odd offset
+  const bytes = buf.byteOffset % 8 === 0 ? buf : buf.slice();
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  if (view.getUint32(0, true) !== MAGIC) throw new Error('Not an encoded loan book');
+  const headerLen = view.getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(bytes.subarray(8, 8 + headerLen))) as BookHeader;
+  const start = bytes.byteOffset + ((8 + headerLen + 7) & ~7);
+
+  const n = header.rows;
+  const rows: Record<string, unknown>[] = new Array(n);
+  for (let i = 0; i < n; i++) rows[i] = {};
+
+  for (const c of header.columns) {
+    const at = start + c.offset;
+    if (c.kind === 'i32') {
+      const a = new Int32Array(bytes.buffer, at, n);
+      for (let i = 0; i < n; i++) rows[i][c.field] = a[i];
+    } else if (c.kind === 'f64') {
+      const a = new Float64Array(bytes.buffer, at, n);
+      for (let i = 0; i < n; i++) if (!Number.isNaN(a[i])) rows[i][c.field] = a[i];
+    } else if (c.kind === 'bool') {
+      const a = new Uint8Array(bytes.buffer, at, n);
+      for (let i = 0; i < n; i++) if (a[i] !== 2) rows[i][c.field] = a[i] === 1;
+    } else {
+      const width = c.width ?? 4;
+      const a = width === 1 ? new Uint8Array(bytes.buffer, at, n)
+        : width === 2 ? new Uint16Array(bytes.buffer, at, n)
+        : new Uint32Array(bytes.buffer, at, n);
+      const dict = c.kind === 'json' ? c.dict!.map((s) => JSON.parse(s) as unknown) : c.dict!;
+      for (let i = 0; i < n; i++) {
+        const id = a[i];
+        if (id < dict.length) rows[i][c.field] = dict[id];
+      }
+    }
+  }
+  return rows as unknown as LoanLevelRow[];
+}
+
+/* ================================================================
+   Compression (gzip via CompressionStream where the runtime has it)
+   ================================================================ */
+
+export const canCompress = typeof CompressionStream !== 'undefined';
+
+async function pipe(bytes: Uint8Array, stream: CompressionStream | DecompressionStream): Promise<Uint8Array> {
+  const out = new Response(new Blob([bytes as BlobPart]).stream().pipeThrough(stream));
+  return new Uint8Array(await out.arrayBuffer());
+}
+
+export async function compressBytes(bytes: Uint8Array): Promise<Uint8Array> {
+  return canCompress ? pipe(bytes, new CompressionStream('gzip')) : bytes;
+}
+
+export async function decompressBytes(bytes: Uint8Array, compressed: boolean): Promise<Uint8Array> {
+  return compressed ? pipe(bytes, new DecompressionStream('gzip')) : bytes;
+}
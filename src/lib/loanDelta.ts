@@ -0,0 +1,165 @@
+/**
+ * Incremental loan-book deltas.
+ * A daily tape is diffed against the previous snapshot by loanId; only new,
+ * changed and closed loans are stored, and the snapshot's aggregates are
+ * carried forward by subtracting each replaced loan's contribution and adding
+ * the new one, instead of re-scanning the book. The portfolio rollup cells
+ * (portfolioRollup.ts) are carried forward the same way.
+ */
+
+import type { LoanLevelRow } from './types';
+import { DPD_BUCKETS, getDpdBucket } from './types';
+import { vintageKey } from './rollRate';
+import { LOAN_FIELDS, toLoanData } from './loanStore';
+import { applyToRollup, cloneRollup, computeRollup, type RollupCells } from './portfolioRollup';
+
+// Deltas allowed before the next upload is stored as a full snapshot again,
+// bounding the number of books a reader has to replay
+export const DELTA_MAX_CHAIN = 30;
+
+/* ================================================================
+   Cached aggregates
+   ================================================================ */
+
+export interface BookAggregates {
+  rowCount: number;
+  totalBalance: number;
+  overdueBalance: number;
+  writtenOffBalance: number;
+  bucketBalances: Record<string, number>;
+  bucketCounts: Record<string, number>;
+  vintages: Record<string, { count: number; balance: number; disbursed: number }>;
+}
+
+export function emptyAggregates(): BookAggregates {
+  const bucketBalances: Record<string, number> = {};
+  const bucketCounts: Record<string, number> = {};
+  for (const b of DPD_BUCKETS) { bucketBalances[b] = 0; bucketCounts[b] = 0; }
+  return { rowCount: 0, totalBalance: 0, overdueBalance: 0, writtenOffBalance: 0, bucketBalances, bucketCounts, vintages: {} };
+}
+
+// Add (sign = 1) or remove (sign = -1) one loan's contribution
+export function applyToAggregates(agg: BookAggregates, r: LoanLevelRow, sign: 1 | -1) {
+  const bal = r.currentBalance * sign;
+  const bucket = getDpdBucket(r.dpdAsOfReportingDate);
+  agg.rowCount += sign;
+  agg.totalBalance += bal;
+  agg.overdueBalance += r.totalOverdueAmount * sign;
+  if (r.loanWrittenOff) agg.writtenOffBalance += bal;
+  agg.bucketBalances[bucket] = (agg.bucketBalances[bucket] ?? 0) + bal;
+  agg.bucketCounts[bucket] = (agg.bucketCounts[bucket] ?? 0) + sign;
+  const vk = vintageKey(r.loanDisbursedDate);
+  const v = agg.vintages[vk] ?? (agg.vintages[vk] = { count: 0, balance: 0, disbursed: 0 });
+  v.count += sign;
+  v.balance += bal;
+  v.disbursed += r.loanDisbursedAmount * sign;
+  if (v.count === 0) delete agg.vintages[vk];
+}
+
+export function computeAggregates(rows: LoanLevelRow[]): BookAggregates {
+  const agg = emptyAggregates();
+  for (const r of rows) applyToAggregates(agg, r, 1);
+  return agg;
+}
+
+// Covenant-style ratios derived from the aggregates alone
+export function aggregateRatios(agg: BookAggregates) {
+  const t = agg.totalBalance || 1;
+  const b = agg.bucketBalances;
+  const par30 = (b['31-60'] ?? 0) + (b['61-90'] ?? 0) + (b['91-180'] ?? 0) + (b['180+'] ?? 0);
+  const par90 = (b['91-180'] ?? 0) + (b['180+'] ?? 0);
+  return {
+    par30: (par30 / t) * 100,
+    par90: (par90 / t) * 100,
+    overdueRatio: (agg.overdueBalance / t) * 100,
+    writtenOffRatio: (agg.writtenOffBalance / t) * 100,
+  };
+}
+
+/* ================================================================
+   Diffing
+   ================================================================ */
+
+// Compare in stored (normalised) form so re-parsed values that round-trip identically count as unchanged
+export function loanRowChanged(prev: LoanLevelRow, next: LoanLevelRow): boolean {
+  const a = toLoanData(prev, '', '') as Record<string, unknown>;
+  const b = toLoanData(next, '', '') as Record<string, unknown>;
+  for (const f of LOAN_FIELDS) if (a[f] !== b[f]) return true;
+  return false;
+}
+
+export interface DeltaStats {
+  added: number;
+  changed: number;
+  unchanged: number;
+  closed: number;
+}
+
+/**
+ * Streams a new tape against the previous snapshot.
+ * accept() returns the row when it must be stored, null when unchanged;
+ * closed() returns the previous loans missing from the new tape.
+ * Every row must carry a distinct, non-empty loanId: accept() throws otherwise,
+ * since a second row for the same loan would remove the old one from the
+ * aggregates twice.
+ */
+export class LoanDeltaBuilder {
+  readonly aggregates: BookAggregates;
+  readonly rollup: RollupCells;
+  readonly stats: DeltaStats = { added: 0, changed: 0, unchanged: 0, closed: 0 };
+  private readonly prev = new Map<string, LoanLevelRow>();
+  private readonly seen = new Set<string>();
+
+  constructor(prevRows: LoanLevelRow[], prevAggregates?: BookAggregates | null, prevRollup?: RollupCells | null) {
+    for (const r of prevRows) this.prev.set(String(r.loanId), r);
+    this.aggregates = prevAggregates ? (JSON.parse(JSON.stringify(prevAggregates)) as BookAggregates) : computeAggregates(prevRows);
+    this.rollup = prevRollup ? cloneRollup(prevRollup) : computeRollup(prevRows);
+  }
+
+  private apply(r: LoanLevelRow, sign: 1 | -1) {
+    applyToAggregates(this.aggregates, r, sign);
+    applyToRollup(this.rollup, r, sign);
+  }
+
+  accept(row: LoanLevelRow): LoanLevelRow | null {
+    const id = String(row.loanId ?? '');
+    if (!id) throw new Error('Loan row without a Loan ID cannot be diffed');
+    if (this.seen.has(id)) throw new Error(`Duplicate Loan ID ${id} in the new tape`);
+    this.seen.add(id);
+    const old = this.prev.get(id);
+    if (old && !loanRowChanged(old, row)) {
+      this.stats.unchanged++;
+      return null;
+    }
+    if (old) {
+      this.apply(old, -1);
+      this.stats.changed++;
+    } else {
+      this.stats.added++;
+    }
+    this.apply(row, 1);
+    return row;
+  }
+
+  closed(): LoanLevelRow[] {
+    const out: LoanLevelRow[] = [];
+    for (const [id, r] of this.prev) {
+      if (this.seen.has(id)) continue;
+      this.apply(r, -1);
+      out.push(r);
+    }
+    this.stats.closed = out.length;
+    return out;
+  }
+}
+
+// Replay a delta's stored loans onto the materialised base snapshot (in place)
+export function applyDelta(
+  snapshot: Map<string, LoanLevelRow>,
+  loans: { row: LoanLevelRow; deltaOp: string }[],
+) {
+  for (const { row, deltaOp } of loans) {
+    if (deltaOp === 'closed') snapshot.delete(String(row.loanId));
+    else snapshot.set(String(row.loanId), row);
+  }
+}
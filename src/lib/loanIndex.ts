@@ -0,0 +1,318 @@
+import type { LoanLevelRow, PoolSelectionState } from './types';
+import { getDpdBucket } from './types';
+import { ticketBucket } from './rollRate';
+import type { LoanFilters } from './poolSelection';
+
+/* ================================================================
+   Bitmap index over a loan book
+   One bitset per categorical value (geography, product, segment, DPD
+   bucket, ticket size, NBFI) and one sorted permutation per range column
+   (disbursed amount, tenure, rate). A filter becomes a handful of
+   word-wise ANDs, so the selection and monitoring pages can re-filter
+   million-row books on every slider move.
+   Indexes are built lazily and cached per rows array.
+   ================================================================ */
+
+export type Bitset = Uint32Array;
+
+export interface SortedColumn {
+  order: Uint32Array;        // row indices sorted by value, rows with a missing value excluded
+  values: Float64Array;      // values[i] = value of row order[i]
+  missing: Bitset;           // rows where the value is null / undefined
+}
+
+export interface LoanIndex<T extends LoanLevelRow = LoanLevelRow> {
+  rows: T[];
+  length: number;
+  words: number;
+  balance: Float64Array;
+  geography: Map<string, Bitset>;
+  product: Map<string, Bitset>;
+  segment: Map<string, Bitset>;
+  poolSegment: Map<string, Bitset>;   // segment || product || 'Other', the key excludedSegments matches on
+  dpdBucket: Map<string, Bitset>;
+  ticketSize: Map<string, Bitset>;
+  nbfi: Map<string, Bitset>;          // _nbfiId on portfolio-tagged rows
+  amount: SortedColumn;
+  tenure: SortedColumn;
+  rate: SortedColumn;
+}
+
+// --------------------------------------------------------------------------
+// Bitset primitives
+// --------------------------------------------------------------------------
+export function emptyBits(length: number): Bitset {
+  return new Uint32Array((length + 31) >>> 5);
+}
+
+export function fullBits(length: number): Bitset {
+  const b = emptyBits(length);
+  b.fill(0xffffffff);
+  const tail = length & 31;
+  if (tail) b[b.length - 1] = (1 << tail) - 1;
+  return b;
+}
+
+function setBit(b: Bitset, i: number) {
+  b[i >>> 5] |= 1 << (i & 31);
+}
+
+function clearBit(b: Bitset, i: number) {
+  b[i >>> 5] &= ~(1 << (i & 31));
+}
+
+export function andInto(target: Bitset, other: Bitset): Bitset {
+  for (let w = 0; w < target.length; w++) target[w] &= other[w];
+  return target;
+}
+
+export function orInto(target: Bitset, other: Bitset): Bitset {
+  for (let w = 0; w < target.length; w++) target[w] |= other[w];
+  return target;
+}
+
+export function andNotInto(target: Bitset, other: Bitset): Bitset {
+  for (let w = 0; w < target.length; w++) target[w] &= ~other[w];
+  return target;
+}
+
+function popcount32(v: number): number {
+  v = v - ((v >>> 1) & 0x55555555);
+  v = (v & 0x33333333) + ((v >>> 2) & 0x33333333);
+  return Math.imul((v + (v >>> 4)) & 0x0f0f0f0f, 0x01010101) >>> 24;
+}
+
+export function countBits(b: Bitset): number {
+  let n = 0;
+  for (let w = 0; w < b.length; w++) if (b[w]) n += popcount32(b[w]);
+  return n;
+}
+
+export function forEachBit(b: Bitset, fn: (i: number) => void) {
+  for (let w = 0; w < b.length; w++) {
+    let word = b[w];
+    while (word) {
+      const t = word & -word;
+      fn((w << 5) + 31 - Math.clz32(t));
+      word ^= t;
+    }
+  }
+}
+
+/* ================================================================
+   Index construction
+   ================================================================ */
+
+function addTo(map: Map<string, Bitset>, key: string, i: number, length: number) {
+  let b = map.get(key);
+  if (!b) { b = emptyBits(length); map.set(key, b); }
+  setBit(b, i);
+}
+
+function sortedColumn(length: number, value: (i: number) => number | null | undefined): SortedColumn {
+  const missing = emptyBits(length);
+  const present: number[] = [];
+  const raw = new Float64Array(length);
+  for (let i = 0; i < length; i++) {
+    const v = value(i);
+    if (v == null) { setBit(missing, i); continue; }
+    raw[i] = v;
+    present.push(i);
+  }
+  const order = Uint32Array.from(present).sort((a, b) => raw[a] - raw[b]);
+  const values = new Float64Array(order.length);
+  for (let k = 0; k < order.length; k++) values[k] = raw[order[k]];
+  return { order, values, missing };
+}
+
+export function buildLoanIndex<T extends LoanLevelRow>(rows: T[]): LoanIndex<T> {
+  const n = rows.length;
+  const idx: LoanIndex<T> = {
+    rows,
+    length: n,
+    words: (n + 31) >>> 5,
+    balance: new Float64Array(n),
+    geography: new Map(),
+    product: new Map(),
+    segment: new Map(),
+    poolSegment: new Map(),
+    dpdBucket: new Map(),
+    ticketSize: new Map(),
+    nbfi: new Map(),
+    amount: sortedColumn(n, i => rows[i].loanDisbursedAmount),
+    tenure: sortedColumn(n, i => rows[i].residualTenureMonths),
+    rate: sortedColumn(n, i => rows[i].interestRate),
+  };
+  for (let i = 0; i < n; i++) {
+    const r = rows[i];
+    idx.balance[i] = r.currentBalance;
+    addTo(idx.geography, r.geography || 'Unknown', i, n);
+    addTo(idx.product, r.product || 'Unknown', i, n);
+    addTo(idx.segment, r.segment || 'Unknown', i, n);
+    addTo(idx.poolSegment, r.segment || r.product || 'Other', i, n);
+    addTo(idx.dpdBucket, getDpdBucket(r.dpdAsOfReportingDate), i, n);
+    addTo(idx.ticketSize, ticketBucket(r.loanDisbursedAmount ?? r.currentBalance), i, n);
+    addTo(idx.nbfi, (r as { _nbfiId?: string })._nbfiId ?? '', i, n);
+  }
+  return idx;
+}
+
+const indexCache = new WeakMap<object, LoanIndex>();
+
+// Cached per rows array — callers memoise their row arrays, so the index is built once per book
+export function getLoanIndex<T extends LoanLevelRow>(rows: T[]): LoanIndex<T> {
+  let idx = indexCache.get(rows) as LoanIndex<T> | undefined;
+  if (!idx) {
+    idx = buildLoanIndex(rows);
+    indexCache.set(rows, idx as unknown as LoanIndex);
+  }
+  return idx;
+}
+
+/* ================================================================
+   Queries
+   ================================================================ */
+
+// Rows whose key is any of `values`; an empty list means no constraint (null)
+export function anyOf(idx: LoanIndex<LoanLevelRow>, map: Map<string, Bitset>, values: readonly string[] | undefined): Bitset | null {
+  if (!values || values.length === 0) return null;
+  const out = emptyBits(idx.length);
+  for (const v of values) {
+    const b = map.get(v);
+    if (b) orInto(out, b);
+  }
+  return out;
+}
+
+function lowerBound(values: Float64Array, x: number): number {
+  let lo = 0, hi = values.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (values[mid] < x) lo = mid + 1; else hi = mid;
+  }
+  return lo;
+}
+
+function upperBound(values: Float64Array, x: number): number {
+  let lo = 0, hi = values.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >>> 1;
+    if (values[mid] <= x) lo = mid + 1; else hi = mid;
+  }
+  return lo;
+}
+
+// Rows with min <= value <= max. Missing values pass when `keepMissing` is set.
+export function inRange(
+  length: number,
+  col: SortedColumn,
+  min: number | null | undefined,
+  max: number | null | undefined,
+  keepMissing: boolean,
+): Bitset | null {
+  if (min == null && max == null) return null;
+  const lo = min == null ? 0 : lowerBound(col.values, min);
+  const hi = max == null ? col.values.length : upperBound(col.values, max);
+  let out: Bitset;
+  // Touch whichever side of the range is smaller
+  if (hi - lo > col.order.length / 2) {
+    out = fullBits(length);
+    for (let k = 0; k < lo; k++) clearBit(out, col.order[k]);
+    for (let k = hi; k < col.order.length; k++) clearBit(out, col.order[k]);
+    if (!keepMissing) andNotInto(out, col.missing);
+  } else {
+    out = emptyBits(length);
+    for (let k = lo; k < hi; k++) setBit(out, col.order[k]);
+    if (keepMissing) orInto(out, col.missing);
+  }
+  return out;
+}
+
+function intersect(parts: (Bitset | null)[]): Bitset | null {
+  let out: Bitset | null = null;
+  for (const p of parts) {
+    if (!p) continue;
+    out = out ? andInto(out, p) : Uint32Array.from(p);
+  }
+  return out;
+}
+
+// Mask for a pool filter snapshot, ignoring confirmation state. null = every row passes.
+export function poolFilterMask(
+  idx: LoanIndex<LoanLevelRow>,
+  f: PoolSelectionState['filterSnapshot'],
+  excludedSegments: readonly string[] = [],
+): Bitset | null {
+  const excluded = anyOf(idx, idx.poolSegment, excludedSegments);
+  const mask = intersect([
+    // Loans missing an amount, residual tenure or rate are never excluded by that range
+    inRange(idx.length, idx.amount, f.loanAmountMin, f.loanAmountMax, true),
+    inRange(idx.length, idx.tenure, f.tenureMin, f.tenureMax, true),
+    inRange(idx.length, idx.rate, f.rateMin, f.rateMax, true),
+    anyOf(idx, idx.geography, f.geographies),
+    anyOf(idx, idx.product, f.products),
+    anyOf(idx, idx.dpdBucket, f.dpdBuckets),
+  ]);
+  if (!excluded) return mask;
+  return andNotInto(mask ?? fullBits(idx.length), excluded);
+}
+
+// Mask for a confirmed pool selection; unconfirmed or missing selections pass everything
+export function poolSelectionMask(idx: LoanIndex<LoanLevelRow>, selection: PoolSelectionState | undefined): Bitset | null {
+  if (!selection || !selection.confirmedAt) return null;
+  return poolFilterMask(idx, selection.filterSnapshot, selection.excludedSegments);
+}
+
+export function hasLoanFilters(filters: LoanFilters): boolean {
+  return filters.product.length > 0 || filters.geography.length > 0 || filters.segment.length > 0
+    || filters.dpdBuckets.length > 0 || filters.ticketSize.length > 0;
+}
+
+export function loanFiltersMask(idx: LoanIndex<LoanLevelRow>, filters: LoanFilters): Bitset | null {
+  return intersect([
+    anyOf(idx, idx.product, filters.product),
+    anyOf(idx, idx.geography, filters.geography),
+    anyOf(idx, idx.segment, filters.segment),
+    anyOf(idx, idx.dpdBucket, filters.dpdBuckets),
+    anyOf(idx, idx.ticketSize, filters.ticketSize),
+  ]);
+}
+
+// Per-NBFI confirmed selections over a portfolio-tagged book
+export function portfolioSelectionMask(
+  idx: LoanIndex<LoanLevelRow>,
+  selectedPoolByNbfi: Record<string, PoolSelectionState>,
+): Bitset | null {
+  let out: Bitset | null = null;
+  let constrained = false;
+  for (const [nbfiId, nbfiBits] of idx.nbfi) {
+    const sel = poolSelectionMask(idx, selectedPoolByNbfi[nbfiId]);
+    if (sel) constrained = true;
+    const part = sel ? andInto(sel, nbfiBits) : nbfiBits;
+    out = out ? orInto(out, part) : Uint32Array.from(part);
+  }
+  return constrained ? out : null;
+}
+
+export function combineMasks(...masks: (Bitset | null)[]): Bitset | null {
+  return intersect(masks);
+}
+
+// Rows under a mask, in original book order
+export function selectRows<T extends LoanLevelRow>(idx: LoanIndex<T>, mask: Bitset | null): T[] {
+  if (!mask) return idx.rows;
+  const out: T[] = [];
+  forEachBit(mask, i => { out.push(idx.rows[i]); });
+  return out;
+}
+
+// Count and balance under a mask without materialising rows — for live slider read-outs
+export function maskTotals(idx: LoanIndex<LoanLevelRow>, mask: Bitset | null): { count: number; balance: number } {
+  let balance = 0;
+  if (!mask) {
+    for (let i = 0; i < idx.length; i++) balance += idx.balance[i];
+    return { count: idx.length, balance };
+  }
+  forEachBit(mask, i => { balance += idx.balance[i]; });
+  return { count: countBits(mask), balance };
+}
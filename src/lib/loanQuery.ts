@@ -0,0 +1,341 @@
+/**
+ * Paged loan-row queries for table views.
+ * Full books are paged in the database: keyset cursors on Loan.id under any
+ * multi-column sort, prefix search as an index range, and only the projected
+ * columns selected. Delta books are paged the same way in SQL over their chain
+ * (nearest full snapshot plus every delta up to the book): a Loan row is live
+ * when it is an upsert and no later book of the chain holds the same loanId.
+ * Legacy books keep their rows in a JSON blob. They are materialised once
+ * (through the caller's cached loader) and paged in memory, with the sorted
+ * order cached per query.
+ */
+
+import type { Prisma } from '@/generated/prisma/client';
+import type { LoanLevelRow } from './types';
+import { LruCache, stableKey } from './analyticsCache';
+import {
+  LOAN_FIELDS, filterRowsInMemory, fromLoanRecord, loanSelect, loanWhere, readLoanRows, resolveDeltaChain,
+  type LoanField, type LoanRowQuery,
+} from './loanStore';
+
+type LoanQueryClient = Prisma.TransactionClient;
+
+export const LOAN_PAGE_DEFAULT = 100;
+export const LOAN_PAGE_MAX = 1000;
+
+export interface LoanSort {
+  field: LoanField;
+  dir: 'asc' | 'desc';
+}
+
+export interface LoanPageQuery extends LoanRowQuery {
+  sort?: LoanSort[];
+  search?: string;        // prefix of loanId or borrowerName
+  limit?: number;
+  cursor?: string | null; // nextCursor of the previous page
+  offset?: number;        // jump straight to a row position (ignored when cursor is set)
+}
+
+export interface LoanPage {
+  rows: LoanLevelRow[];
+  nextCursor: string | null;
+  total: number | null;   // only computed for the first page of a query (no cursor)
+}
+
+// "-currentBalance,loanId" → [{ currentBalance desc }, { loanId asc }]
+export function parseLoanSort(spec: string | null | undefined): LoanSort[] {
+  if (!spec) return [];
+  const out: LoanSort[] = [];
+  for (const part of spec.split(',')) {
+    const desc = part.startsWith('-');
+    const field = (desc ? part.slice(1) : part) as LoanField;
+    if ((LOAN_FIELDS as readonly string[]).includes(field)) out.push({ field, dir: desc ? 'desc' : 'asc' });
+  }
+  return out;
+}
+
+// Full and delta books page by keyset ({ k: last Loan.id }), legacy books by row position ({ o })
+export type LoanPaging = 'keyset' | 'offset';
+
+// How one book is read: `chain` lists the books of a delta book, oldest first (null for a full book)
+export interface LoanBookPlan {
+  paging: LoanPaging;
+  chain: string[] | null;
+}
+type Cursor = { k: number } | { o: number };
+
+function encodeCursor(c: Cursor): string {
+  return Buffer.from(JSON.stringify(c)).toString('base64url');
+}
+
+function parseCursor(s: string, paging: LoanPaging): Cursor | string {
+  let c: unknown;
+  try {
+    c = JSON.parse(Buffer.from(s, 'base64url').toString());
+  } catch {
+    return 'cursor is not a nextCursor value';
+  }
+  if (typeof c !== 'object' || c === null || Array.isArray(c)) return 'cursor is not a nextCursor value';
+  const key = paging === 'keyset' ? 'k' : 'o';
+  // Usually a cursor from before the latest book replaced one of the other kind
+  if (!(key in c)) return `cursor does not belong to this loan book (expected ${paging === 'keyset' ? 'a keyset' : 'an offset'} cursor)`;
+  const v = (c as Record<string, unknown>)[key];
+  if (!Number.isSafeInteger(v) || (v as number) < 0) return 'cursor is not a nextCursor value';
+  return { [key]: v } as Cursor;
+}
+
+// Why `s` cannot continue a query on a book paged by `paging`, or null if it can
+export function loanCursorProblem(s: string | null | undefined, paging: LoanPaging): string | null {
+  if (!s) return null;
+  const c = parseCursor(s, paging);
+  return typeof c === 'string' ? c : null;
+}
+
+function decodeCursor(s: string | null | undefined, paging: LoanPaging): Cursor | null {
+  if (!s) return null;
+  const c = parseCursor(s, paging);
+  if (typeof c === 'string') throw new Error(`Invalid loan cursor: ${c}`);
+  return c;
+}
+
+// Upper bound of a prefix range; BINARY-collated indexes serve "col >= p AND col < p + U+FFFF"
+const PREFIX_END = '\uffff';
+
+function clampLimit(limit: number | undefined): number {
+  return Math.min(Math.max(Math.floor(limit ?? LOAN_PAGE_DEFAULT), 1), LOAN_PAGE_MAX);
+}
+
+/* ================================================================
+   Database path (full books)
+   ================================================================ */
+
+async function queryStoredPage(client: LoanQueryClient, loanBookId: string, q: LoanPageQuery): Promise<LoanPage> {
+  const limit = clampLimit(q.limit);
+  const where = loanWhere(loanBookId, q);
+  if (q.search) {
+    const range = { gte: q.search, lt: q.search + PREFIX_END };
+    where.OR = [{ loanId: range }, { borrowerName: range }];
+  }
+  const orderBy: Prisma.LoanOrderByWithRelationInput[] = (q.sort ?? []).map((s) => ({ [s.field]: s.dir }));
+  orderBy.push({ id: 'asc' }); // tie-break so the keyset cursor is total
+
+  const cursor = decodeCursor(q.cursor, 'keyset');
+  const page = await client.loan.findMany({
+    where,
+    select: { ...loanSelect(q.fields), id: true },
+    orderBy,
+    take: limit + 1,
+    ...(cursor && 'k' in cursor
+      ? { cursor: { id: cursor.k }, skip: 1 }
+      : q.offset ? { skip: q.offset } : {}),
+  });
+  const hasMore = page.length > limit;
+  const rows = page.slice(0, limit);
+  const total = cursor ? null : await client.loan.count({ where });
+  return {
+    rows: rows.map((l) => fromLoanRecord(l as Partial<Record<LoanField, unknown>>)),
+    nextCursor: hasMore ? encodeCursor({ k: (rows[rows.length - 1] as { id: number }).id }) : null,
+    total,
+  };
+}
+
+/* ================================================================
+   Delta chain path (SQL)
+   ================================================================ */
+
+const BOOLEAN_FIELDS = new Set<LoanField>(['loanWrittenOff', 'repossession']);
+
+// Raw rows carry SQLite's storage types: 0/1 for booleans, possibly bigint for integers
+function fromRawLoan(raw: Record<string, unknown>, fields: readonly LoanField[]): LoanLevelRow {
+  const rec: Partial<Record<LoanField, unknown>> = {};
+  for (const f of fields) {
+    const v = raw[f];
+    rec[f] = BOOLEAN_FIELDS.has(f) ? (v == null ? v : !!Number(v)) : typeof v === 'bigint' ? Number(v) : v;
+  }
+  return fromLoanRecord(rec);
+}
+
+type SqlPart = { sql: string; params: unknown[] };
+
+// "After the cursor row" under one sort key, with SQLite's NULL order (first ascending, last descending)
+function afterKey(col: string, dir: 'asc' | 'desc', v: unknown): { after: SqlPart; same: SqlPart } {
+  if (v == null) {
+    return { after: { sql: dir === 'asc' ? `${col} IS NOT NULL` : '0', params: [] }, same: { sql: `${col} IS NULL`, params: [] } };
+  }
+  return {
+    after: dir === 'asc' ? { sql: `${col} > ?`, params: [v] } : { sql: `(${col} < ? OR ${col} IS NULL)`, params: [v] },
+    same: { sql: `${col} = ?`, params: [v] },
+  };
+}
+
+async function queryChainPage(client: LoanQueryClient, chain: string[], q: LoanPageQuery): Promise<LoanPage> {
+  const limit = clampLimit(q.limit);
+  const sort = q.sort ?? [];
+  const fields = q.fields?.length ? q.fields : LOAN_FIELDS;
+  const col = (f: string) => `l."${f}"`;
+
+  // Live rows of the chain: upserts not replaced or closed by a later book
+  const params: unknown[] = [];
+  const cte = `WITH chain(bookId, pos) AS (VALUES ${chain.map((id, i) => { params.push(id); return `(?, ${i})`; }).join(', ')})`;
+  const where = [
+    `l."loanBookId" IN (SELECT bookId FROM chain)`,
+    `l."deltaOp" = 'upsert'`,
+    `NOT EXISTS (SELECT 1 FROM chain cn JOIN "Loan" n ON n."loanBookId" = cn.bookId
+       WHERE n."loanId" = l."loanId" AND cn.pos > (SELECT pos FROM chain WHERE bookId = l."loanBookId"))`,
+  ];
+  const inList = (f: string, values: string[] | undefined) => {
+    if (!values?.length) return;
+    params.push(...values);
+    where.push(`${col(f)} IN (${values.map(() => '?').join(', ')})`);
+  };
+  inList('dpdBucket', q.dpdBuckets);
+  inList('geography', q.geographies);
+  inList('product', q.products);
+  if (q.search) {
+    params.push(q.search, q.search + PREFIX_END, q.search, q.search + PREFIX_END);
+    where.push(`((l."loanId" >= ? AND l."loanId" < ?) OR (l."borrowerName" >= ? AND l."borrowerName" < ?))`);
+  }
+  const filterParams = params.length;
+
+  const cursor = decodeCursor(q.cursor, 'keyset');
+  const keyset: string[] = [];
+  if (cursor && 'k' in cursor) {
+    // Like Prisma's cursor: read the sort values of the last row returned
+    const last = await client.loan.findUnique({
+      where: { id: cursor.k },
+      select: sort.length ? loanSelect(sort.map((s) => s.field)) : { id: true },
+    });
+    if (!last) throw new Error('Invalid loan cursor: row no longer exists');
+    // (a > x) OR (a = x AND b > y) OR ... OR (a = x AND b = y AND id > k)
+    const eq: SqlPart[] = [];
+    const or: SqlPart[][] = [];
+    for (const s of sort) {
+      const v = (last as Record<string, unknown>)[s.field];
+      const k = afterKey(col(s.field), s.dir, typeof v === 'boolean' ? Number(v) : v);
+      or.push([...eq, k.after]);
+      eq.push(k.same);
+    }
+    or.push([...eq, { sql: 'l."id" > ?', params: [cursor.k] }]);
+    keyset.push(`(${or.map((parts) => `(${parts.map((x) => x.sql).join(' AND ')})`).join(' OR ')})`);
+    for (const parts of or) for (const x of parts) params.push(...x.params);
+  }
+  const orderBy = [...sort.map((s) => `${col(s.field)} ${s.dir.toUpperCase()}`), 'l."id" ASC'].join(', ');
+  const pageSql = `${cte} SELECT l."id" AS "id", ${fields.map((f) => `${col(f)} AS "${f}"`).join(', ')}
+    FROM "Loan" l WHERE ${[...where, ...keyset].join(' AND ')}
+    ORDER BY ${orderBy} LIMIT ${limit + 1}${!cursor && q.offset ? ` OFFSET ${Math.floor(q.offset)}` : ''}`;
+  const page = await client.$queryRawUnsafe<Record<string, unknown>[]>(pageSql, ...params);
+
+  let total: number | null = null;
+  if (!cursor) {
+    const countSql = `${cte} SELECT COUNT(*) AS "n" FROM "Loan" l WHERE ${where.join(' AND ')}`;
+    const [{ n }] = await client.$queryRawUnsafe<{ n: number | bigint }[]>(countSql, ...params.slice(0, filterParams));
+    total = Number(n);
+  }
+  const hasMore = page.length > limit;
+  const rows = page.slice(0, limit);
+  return {
+    rows: rows.map((r) => fromRawLoan(r, fields)),
+    nextCursor: hasMore ? encodeCursor({ k: Number(rows[rows.length - 1].id) }) : null,
+    total,
+  };
+}
+
+/* ================================================================
+   In-memory path (legacy books)
+   ================================================================ */
+
+// Sorted, filtered row order per (book, query) — reused while the user pages through it
+const globalForQuery = globalThis as unknown as { loanOrderCache: LruCache<LoanLevelRow[]> | undefined };
+const loanOrderCache = globalForQuery.loanOrderCache ?? new LruCache<LoanLevelRow[]>(16);
+globalForQuery.loanOrderCache = loanOrderCache;
+
+function compareRows(sort: LoanSort[]) {
+  return (a: LoanLevelRow, b: LoanLevelRow) => {
+    for (const s of sort) {
+      const x = a[s.field], y = b[s.field];
+      if (x === y) continue;
+      // Missing values sort first ascending, like SQLite NULLs
+      const c = x == null ? -1 : y == null ? 1 : x < y ? -1 : 1;
+      return s.dir === 'asc' ? c : -c;
+    }
+    return 0;
+  };
+}
+
+function queryRowsPage(loanBookId: string, all: LoanLevelRow[], q: LoanPageQuery): LoanPage {
+  const limit = clampLimit(q.limit);
+  const key = `${loanBookId}|${stableKey({ sort: q.sort, search: q.search, d: q.dpdBuckets, g: q.geographies, p: q.products })}`;
+  let ordered = loanOrderCache.get(key);
+  if (!ordered) {
+    ordered = filterRowsInMemory(all, { dpdBuckets: q.dpdBuckets, geographies: q.geographies, products: q.products });
+    if (q.search) {
+      const p = q.search;
+      ordered = ordered.filter((r) => String(r.loanId).startsWith(p) || (r.borrowerName ?? '').startsWith(p));
+    }
+    // Array.prototype.sort is stable, so ties keep book order
+    if (q.sort?.length) ordered = [...ordered].sort(compareRows(q.sort));
+    loanOrderCache.set(key, ordered);
+  }
+
+  const cursor = decodeCursor(q.cursor, 'offset');
+  const start = cursor && 'o' in cursor ? cursor.o : q.offset ?? 0;
+  const end = Math.min(start + limit, ordered.length);
+  const fields = q.fields;
+  const slice = ordered.slice(start, end);
+  return {
+    rows: fields?.length
+      ? slice.map((r) => {
+          const p: Record<string, unknown> = {};
+          for (const f of fields) if (r[f] !== undefined) p[f] = r[f];
+          return p as unknown as LoanLevelRow;
+        })
+      : slice,
+    nextCursor: end < ordered.length ? encodeCursor({ o: end }) : null,
+    total: cursor ? null : ordered.length,
+  };
+}
+
+// How a book's pages are read, or null when there is no such book
+export async function loanBookPlan(client: LoanQueryClient, loanBookId: string): Promise<LoanBookPlan | null> {
+  const book = await client.loanBook.findUnique({ where: { id: loanBookId }, select: { kind: true } });
+  if (!book) return null;
+  const { fullId, deltas } = book.kind === 'delta'
+    ? await resolveDeltaChain(client, loanBookId)
+    : { fullId: loanBookId, deltas: [] };
+  // Legacy books keep their rows in the JSON blob; test for it without loading it
+  const legacy = !!fullId && (await client.loanBook.count({ where: { id: fullId, rows: { not: null } } })) > 0;
+  if (legacy) return { paging: 'offset', chain: null };
+  return { paging: 'keyset', chain: deltas.length ? (fullId ? [fullId, ...deltas] : deltas) : null };
+}
+
+// Throws on a cursor that does not fit the book (check loanCursorProblem first to answer 400)
+export async function queryLoanPage(
+  client: LoanQueryClient,
+  loanBookId: string,
+  q: LoanPageQuery,
+  loadRows: (loanBookId: string) => Promise<LoanLevelRow[]> = (id) => readLoanRows(client, id),
+  plan?: LoanBookPlan | null,
+): Promise<LoanPage> {
+  const p = plan === undefined ? await loanBookPlan(client, loanBookId) : plan;
+  if (!p) return { rows: [], nextCursor: null, total: 0 };
+  if (p.paging === 'offset') return queryRowsPage(loanBookId, await loadRows(loanBookId), q);
+  if (p.chain) return queryChainPage(client, p.chain, q);
+  return queryStoredPage(client, loanBookId, q);
+}
+
+// Every row of a query, one page at a time, for exports. Full and delta books walk the Loan table
+// by keyset cursor, so only one page is in memory; legacy books page the materialised rows.
+export async function* iterateLoanPages(
+  client: LoanQueryClient,
+  loanBookId: string,
+  q: Omit<LoanPageQuery, 'limit' | 'cursor' | 'offset'>,
+  loadRows?: (loanBookId: string) => Promise<LoanLevelRow[]>,
+): AsyncGenerator<LoanLevelRow[]> {
+  const plan = await loanBookPlan(client, loanBookId);
+  let cursor: string | null = null;
+  do {
+    const page: LoanPage = await queryLoanPage(client, loanBookId, { ...q, limit: LOAN_PAGE_MAX, cursor }, loadRows, plan);
+    if (page.rows.length) yield page.rows;
+    cursor = page.nextCursor;
+  } while (cursor);
+}
@@ -0,0 +1,308 @@
+/**
+ * Columnar loan-book storage.
+ * Each LoanBook snapshot owns one typed `Loan` row per loan, so readers can project
+ * only the columns they need and filter on indexed dimensions instead of parsing
+ * the whole tape. Books written before the Loan table existed keep their JSON blob
+ * in `LoanBook.rows` and are read through the legacy path until re-uploaded.
+ * Delta books (kind = 'delta') store only the loans that changed since baseBookId
+ * and are materialised by replaying the chain back to the nearest full snapshot.
+ */
+
+import type { Prisma } from '@/generated/prisma/client';
+import type { LoanLevelRow } from './types';
+import { getDpdBucket } from './types';
+import {
+  DELTA_MAX_CHAIN, LoanDeltaBuilder, applyDelta, computeAggregates,
+  type BookAggregates, type DeltaStats,
+} from './loanDelta';
+import { computeRollup, readRollupCells, writePortfolioRollup } from './portfolioRollup';
+
+type LoanStoreClient = Prisma.TransactionClient;
+
+// Rows per createMany call — keeps each statement well under SQLite's variable limit
+export const LOAN_WRITE_BATCH = 1000;
+
+export const LOAN_FIELDS = [
+  'loanId',
+  'applicationId',
+  'dpdAsOfReportingDate',
+  'currentBalance',
+  'loanDisbursedAmount',
+  'totalOverdueAmount',
+  'loanDisbursedDate',
+  'interestRate',
+  'loanWrittenOff',
+  'repossession',
+  'recoveryAfterWriteoff',
+  'geography',
+  'product',
+  'segment',
+  'borrowerName',
+  'residualTenureMonths',
+] as const satisfies readonly (keyof LoanLevelRow)[];
+
+export type LoanField = (typeof LOAN_FIELDS)[number];
+
+export type LoanBookMode = 'full' | 'delta';
+
+export interface LoanRowQuery {
+  fields?: LoanField[];
+  dpdBuckets?: string[];
+  geographies?: string[];
+  products?: string[];
+}
+
+// --------------------------------------------------------------------------
+// Row codec: LoanLevelRow <-> Loan columns
+// --------------------------------------------------------------------------
+export function toLoanData(
+  row: LoanLevelRow,
+  loanBookId: string,
+  nbfiId: string,
+  deltaOp: 'upsert' | 'closed' = 'upsert',
+): Prisma.LoanCreateManyInput {
+  const dpd = Math.round(Number(row.dpdAsOfReportingDate) || 0);
+  return {
+    loanBookId,
+    nbfiId,
+    deltaOp,
+    loanId: String(row.loanId ?? ''),
+    applicationId: String(row.applicationId ?? ''),
+    dpdAsOfReportingDate: dpd,
+    dpdBucket: getDpdBucket(dpd),
+    currentBalance: Number(row.currentBalance) || 0,
+    loanDisbursedAmount: Number(row.loanDisbursedAmount) || 0,
+    totalOverdueAmount: Number(row.totalOverdueAmount) || 0,
+    loanDisbursedDate: String(row.loanDisbursedDate ?? ''),
+    interestRate: Number(row.interestRate) || 0,
+    loanWrittenOff: !!row.loanWrittenOff,
+    repossession: !!row.repossession,
+    recoveryAfterWriteoff: Number(row.recoveryAfterWriteoff) || 0,
+    geography: row.geography ?? null,
+    product: row.product ?? null,
+    segment: row.segment ?? null,
+    borrowerName: row.borrowerName ?? null,
+    residualTenureMonths: row.residualTenureMonths != null ? Math.round(row.residualTenureMonths) : null,
+  };
+}
+
+export function fromLoanRecord(rec: Partial<Record<LoanField, unknown>>): LoanLevelRow {
+  const row: Record<string, unknown> = {};
+  for (const f of LOAN_FIELDS) {
+    const v = rec[f];
+    if (v !== null && v !== undefined) row[f] = v;
+  }
+  return row as unknown as LoanLevelRow;
+}
+
+export function loanSelect(fields?: LoanField[]): Prisma.LoanSelect {
+  const select: Record<string, boolean> = {};
+  for (const f of fields?.length ? fields : LOAN_FIELDS) select[f] = true;
+  return select as Prisma.LoanSelect;
+}
+
+export function loanWhere(loanBookId: string, q: LoanRowQuery): Prisma.LoanWhereInput {
+  const where: Prisma.LoanWhereInput = { loanBookId };
+  if (q.dpdBuckets?.length) where.dpdBucket = { in: q.dpdBuckets };
+  if (q.geographies?.length) where.geography = { in: q.geographies };
+  if (q.products?.length) where.product = { in: q.products };
+  return where;
+}
+
+// --------------------------------------------------------------------------
+// Writes
+// --------------------------------------------------------------------------
+export async function writeLoanRows(
+  client: LoanStoreClient,
+  loanBookId: string,
+  nbfiId: string,
+  rows: LoanLevelRow[],
+  deltaOp: 'upsert' | 'closed' = 'upsert',
+): Promise<void> {
+  for (let i = 0; i < rows.length; i += LOAN_WRITE_BATCH) {
+    const batch = rows.slice(i, i + LOAN_WRITE_BATCH).map((r) => toLoanData(r, loanBookId, nbfiId, deltaOp));
+    await client.loan.createMany({ data: batch });
+  }
+}
+
+export interface DeltaBase {
+  baseBookId: string;
+  chainDepth: number;
+  builder: LoanDeltaBuilder;
+}
+
+// Previous ready snapshot to diff against, or null when the next book should be stored in full
+export async function prepareDeltaBase(client: LoanStoreClient, nbfiId: string): Promise<DeltaBase | null> {
+  const base = await client.loanBook.findFirst({
+    where: { nbfiId, status: 'ready' },
+    orderBy: { uploadedAt: 'desc' },
+    select: { id: true, chainDepth: true, aggregates: true },
+  });
+  if (!base || base.chainDepth + 1 > DELTA_MAX_CHAIN) return null;
+  const prevRows = await readLoanRows(client, base.id);
+  const prevAgg = base.aggregates ? (JSON.parse(base.aggregates) as BookAggregates) : null;
+  const prevRollup = await readRollupCells(client, base.id);
+  return { baseBookId: base.id, chainDepth: base.chainDepth + 1, builder: new LoanDeltaBuilder(prevRows, prevAgg, prevRollup) };
+}
+
+// First missing or repeated Loan ID, described for an error message; null when every row has its own id.
+// Books are keyed by loanId (deltas diff on it), so either makes the upload invalid.
+export function findLoanIdProblem(rows: LoanLevelRow[]): string | null {
+  const ids = new Set<string>();
+  for (let i = 0; i < rows.length; i++) {
+    const id = String(rows[i].loanId ?? '').trim();
+    if (!id) return `row ${i + 1} has no Loan ID`;
+    if (ids.has(id)) return `Loan ID ${id} appears more than once (row ${i + 1})`;
+    ids.add(id);
+  }
+  return null;
+}
+
+// Create a new LoanBook snapshot and store its rows column-wise.
+// mode 'delta' stores only the changes against the latest ready book (falls back to full
+// when there is none, or the delta chain is at DELTA_MAX_CHAIN).
+export async function createLoanBook(
+  client: LoanStoreClient,
+  nbfiId: string,
+  rows: LoanLevelRow[],
+  mode: LoanBookMode = 'full',
+): Promise<{ id: string; rowCount: number; totalBalance: number; kind: LoanBookMode; delta: DeltaStats | null }> {
+  const problem = findLoanIdProblem(rows);
+  if (problem) throw new Error(`Invalid loan book: ${problem}`);
+  const base = mode === 'delta' ? await prepareDeltaBase(client, nbfiId) : null;
+  if (!base) {
+    const aggregates = computeAggregates(rows);
+    const loanBook = await client.loanBook.create({
+      data: { nbfiId, rowCount: rows.length, totalBalance: aggregates.totalBalance, aggregates: JSON.stringify(aggregates) },
+    });
+    await writeLoanRows(client, loanBook.id, nbfiId, rows);
+    await writePortfolioRollup(client, nbfiId, loanBook.id, computeRollup(rows));
+    return { id: loanBook.id, rowCount: rows.length, totalBalance: aggregates.totalBalance, kind: 'full', delta: null };
+  }
+
+  const changed = rows.filter((r) => base.builder.accept(r) !== null);
+  const closed = base.builder.closed();
+  const agg = base.builder.aggregates;
+  const loanBook = await client.loanBook.create({
+    data: {
+      nbfiId,
+      kind: 'delta',
+      baseBookId: base.baseBookId,
+      chainDepth: base.chainDepth,
+      rowCount: agg.rowCount,
+      totalBalance: agg.totalBalance,
+      aggregates: JSON.stringify(agg),
+    },
+  });
+  await writeLoanRows(client, loanBook.id, nbfiId, changed);
+  await writeLoanRows(client, loanBook.id, nbfiId, closed, 'closed');
+  await writePortfolioRollup(client, nbfiId, loanBook.id, base.builder.rollup);
+  return { id: loanBook.id, rowCount: agg.rowCount, totalBalance: agg.totalBalance, kind: 'delta', delta: base.builder.stats };
+}
+
+// --------------------------------------------------------------------------
+// Reads
+// --------------------------------------------------------------------------
+export async function findLatestLoanBook(client: LoanStoreClient, nbfiId: string) {
+  return client.loanBook.findFirst({
+    where: { nbfiId, status: 'ready' },
+    orderBy: { uploadedAt: 'desc' },
+    select: { id: true, nbfiId: true, uploadedAt: true, rowCount: true, totalBalance: true },
+  });
+}
+
+export function filterRowsInMemory(rows: LoanLevelRow[], q: LoanRowQuery): LoanLevelRow[] {
+  const out = rows.filter((r) => {
+    if (q.dpdBuckets?.length && !q.dpdBuckets.includes(getDpdBucket(r.dpdAsOfReportingDate))) return false;
+    if (q.geographies?.length && !q.geographies.includes(r.geography ?? '')) return false;
+    if (q.products?.length && !q.products.includes(r.product ?? '')) return false;
+    return true;
+  });
+  if (!q.fields?.length) return out;
+  const fields = q.fields;
+  return out.map((r) => {
+    const p: Record<string, unknown> = {};
+    for (const f of fields) if (r[f] !== undefined) p[f] = r[f];
+    return p as unknown as LoanLevelRow;
+  });
+}
+
+// The books a delta book is read from: the nearest full snapshot (null if the chain is broken)
+// and the deltas on top of it, oldest first, ending with loanBookId itself
+export async function resolveDeltaChain(
+  client: LoanStoreClient,
+  loanBookId: string,
+): Promise<{ fullId: string | null; deltas: string[] }> {
+  const deltas: string[] = [];
+  let cursor: string | null = loanBookId;
+  let fullId: string | null = null;
+  while (cursor) {
+    const book: { id: string; kind: string; baseBookId: string | null } | null = await client.loanBook.findUnique({
+      where: { id: cursor },
+      select: { id: true, kind: true, baseBookId: true },
+    });
+    if (!book) break;
+    if (book.kind !== 'delta') { fullId = book.id; break; }
+    deltas.push(book.id);
+    cursor = book.baseBookId;
+  }
+  return { fullId, deltas: deltas.reverse() };
+}
+
+// Replay a delta chain: nearest full snapshot first, then each delta in order
+async function materialiseDeltaBook(client: LoanStoreClient, loanBookId: string): Promise<LoanLevelRow[]> {
+  const { fullId, deltas } = await resolveDeltaChain(client, loanBookId);
+  const snapshot = new Map<string, LoanLevelRow>();
+  if (fullId) for (const r of await readLoanRows(client, fullId)) snapshot.set(String(r.loanId), r);
+  for (const id of deltas) {
+    const loans = await client.loan.findMany({
+      where: { loanBookId: id },
+      select: { ...loanSelect(), deltaOp: true },
+      orderBy: { id: 'asc' },
+    });
+    applyDelta(snapshot, loans.map((l) => ({
+      row: fromLoanRecord(l as Partial<Record<LoanField, unknown>>),
+      deltaOp: (l as { deltaOp: string }).deltaOp,
+    })));
+  }
+  return [...snapshot.values()];
+}
+
+export async function readLoanRows(
+  client: LoanStoreClient,
+  loanBookId: string,
+  q: LoanRowQuery = {},
+): Promise<LoanLevelRow[]> {
+  const meta = await client.loanBook.findUnique({ where: { id: loanBookId }, select: { kind: true } });
+  if (meta?.kind === 'delta') return filterRowsInMemory(await materialiseDeltaBook(client, loanBookId), q);
+
+  const loans = await client.loan.findMany({
+    where: loanWhere(loanBookId, q),
+    select: loanSelect(q.fields),
+    orderBy: { id: 'asc' },
+  });
+  if (loans.length) return loans.map((l) => fromLoanRecord(l as Partial<Record<LoanField, unknown>>));
+
+  // Legacy snapshot still held as a JSON blob
+  const legacy = await client.loanBook.findUnique({ where: { id: loanBookId }, select: { rows: true } });
+  if (!legacy?.rows) return [];
+  return filterRowsInMemory(JSON.parse(legacy.rows) as LoanLevelRow[], q);
+}
+
+// Stored aggregates for a book; computed and persisted on first use for books written before they existed
+export async function readBookAggregates(client: LoanStoreClient, loanBookId: string): Promise<BookAggregates> {
+  const book = await client.loanBook.findUnique({ where: { id: loanBookId }, select: { aggregates: true } });
+  if (book?.aggregates) return JSON.parse(book.aggregates) as BookAggregates;
+  const aggregates = computeAggregates(await readLoanRows(client, loanBookId));
+  await client.loanBook.update({ where: { id: loanBookId }, data: { aggregates: JSON.stringify(aggregates) } });
+  return aggregates;
+}
+
+export async function readLatestLoanRows(
+  client: LoanStoreClient,
+  nbfiId: string,
+  q: LoanRowQuery = {},
+): Promise<LoanLevelRow[]> {
+  const book = await findLatestLoanBook(client, nbfiId);
+  return book ? readLoanRows(client, book.id, q) : [];
+}
@@ -0,0 +1,520 @@
+/**
+ * Streaming loan-tape ingestion.
+ * Parses a raw CSV / XLSX upload record by record, maps headers through the
+ * loan_book doc-type schema, validates each row against the rules listed in
+ * getValidationTests('loan_book'), and writes accepted rows to the Loan table in
+ * batched transactions. Memory is bounded by the batch size plus the sets needed
+ * for the uniqueness checks.
+ */
+
+import { Readable } from 'stream';
+import ExcelJS from 'exceljs';
+import { db } from './db';
+import { invalidateAnalytics } from './analyticsCache';
+import { queueCovenantEvaluation } from './covenantEngine';
+import {
+  getSchema, getValidationTests, type DocTypeSchema, type FeedIssue, type ValidationTest,
+} from './integrationSchemas';
+import { writeLoanRows, prepareDeltaBase, type DeltaBase, type LoanBookMode } from './loanStore';
+import { emptyAggregates, applyToAggregates, type DeltaStats } from './loanDelta';
+import { applyToRollup, writePortfolioRollup, type RollupCells } from './portfolioRollup';
+import { GEOGRAPHIES } from './seedTransactions';
+import type { LoanBookUploadMeta, LoanLevelRow } from './types';
+
+export type TapeFormat = 'csv' | 'xlsx';
+
+// Rows accumulated before each write transaction
+export const INGEST_TX_BATCH = 5000;
+
+export interface IngestProgress {
+  rowsRead: number;
+  rowsWritten: number;
+  rowsRejected: number;
+  bytesRead: number;
+  totalBytes?: number;
+}
+
+export interface IngestResult extends IngestProgress {
+  loanBookId: string | null;
+  kind: LoanBookMode;
+  rowCount: number;            // loans in the resulting snapshot (differs from rowsWritten for deltas)
+  totalBalance: number;
+  delta: DeltaStats | null;
+  tests: ValidationTest[];
+  issues: FeedIssue[];
+  ok: boolean;
+}
+
+// --------------------------------------------------------------------------
+// Byte counting — wraps the upload stream so progress can be reported
+// --------------------------------------------------------------------------
+export function countBytes(stream: ReadableStream<Uint8Array>, onBytes: (n: number) => void): ReadableStream<Uint8Array> {
+  return stream.pipeThrough(new TransformStream<Uint8Array, Uint8Array>({
+    transform(chunk, controller) {
+      onBytes(chunk.byteLength);
+      controller.enqueue(chunk);
+    },
+  }));
+}
+
+// --------------------------------------------------------------------------
+// CSV — RFC 4180 records (quoted fields, "" escapes, embedded newlines, CRLF)
+// --------------------------------------------------------------------------
+export async function* parseCsvRecords(stream: ReadableStream<Uint8Array>): AsyncGenerator<string[]> {
+  const decoder = new TextDecoder();
+  const reader = stream.getReader();
+  let field = '';
+  let record: string[] = [];
+  let inQuotes = false;
+  let pendingQuote = false; // saw a quote inside a quoted field; next char decides
+  let skipLf = false;
+
+  const endRecord = () => {
+    record.push(field);
+    field = '';
+    const out = record;
+    record = [];
+    return out;
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    const text = done ? decoder.decode() : decoder.decode(value, { stream: true });
+    const ready: string[][] = [];
+
+    for (let i = 0; i < text.length; i++) {
+      const ch = text[i];
+      if (skipLf) {
+        skipLf = false;
+        if (ch === '\n') continue;
+      }
+      if (inQuotes) {
+        if (pendingQuote) {
+          pendingQuote = false;
+          if (ch === '"') { field += '"'; continue; }
+          inQuotes = false;
+          // fall through and treat ch as an unquoted character
+        } else if (ch === '"') {
+          pendingQuote = true;
+          continue;
+        } else {
+          field += ch;
+          continue;
+        }
+      }
+      if (ch === '"' && field === '') inQuotes = true;
+      else if (ch === ',') { record.push(field); field = ''; }
+      else if (ch === '\n' || ch === '\r') { ready.push(endRecord()); skipLf = ch === '\r'; }
+      else field += ch;
+    }
+
+    for (const r of ready) {
+      if (r.length === 1 && r[0] === '') continue; // blank line
+      yield r;
+    }
+    if (done) break;
+  }
+
+  if (pendingQuote) inQuotes = false;
+  if (field !== '' || record.length) yield endRecord();
+}
+
+// --------------------------------------------------------------------------
+// XLSX — ExcelJS streaming reader, first worksheet only
+// --------------------------------------------------------------------------
+function cellText(v: ExcelJS.CellValue): string {
+  if (v === null || v === undefined) return '';
+  if (v instanceof Date) return v.toISOString().slice(0, 10);
+  if (typeof v === 'object') {
+    if ('result' in v) return cellText(v.result as ExcelJS.CellValue);
+    if ('text' in v) return String(v.text);
+    if ('richText' in v) return v.richText.map((t) => t.text).join('');
+    return '';
+  }
+  return String(v);
+}
+
+export async function* parseXlsxRecords(stream: ReadableStream<Uint8Array>): AsyncGenerator<string[]> {
+  const input = Readable.fromWeb(stream as import('stream/web').ReadableStream<Uint8Array>);
+  const workbook = new ExcelJS.stream.xlsx.WorkbookReader(input, {
+    entries: 'emit', sharedStrings: 'cache', hyperlinks: 'ignore', styles: 'ignore', worksheets: 'emit',
+  });
+  for await (const worksheet of workbook) {
+    for await (const row of worksheet) {
+      const values = (row as ExcelJS.Row).values as ExcelJS.CellValue[];
+      // ExcelJS row values are 1-indexed
+      const out: string[] = [];
+      for (let c = 1; c < values.length; c++) out.push(cellText(values[c]));
+      if (out.some((v) => v !== '')) yield out;
+    }
+    break;
+  }
+}
+
+// --------------------------------------------------------------------------
+// Header mapping & row coercion
+// --------------------------------------------------------------------------
+function normalizeHeader(h: string): string {
+  return h.trim().toLowerCase().replace(/[\s\-\/]+/g, '_').replace(/[^a-z0-9_]/g, '');
+}
+
+export function resolveColumnMapping(header: string[], schema: DocTypeSchema): (keyof LoanLevelRow | null)[] {
+  const byKey = new Map(schema.fields.map((f) => [f.key.toLowerCase(), f.key]));
+  return header.map((h) => {
+    const norm = normalizeHeader(h);
+    const key = byKey.get(h.trim().toLowerCase()) ?? byKey.get(norm.replace(/_/g, '')) ?? schema.autoMapping[norm];
+    return (key as keyof LoanLevelRow) ?? null;
+  });
+}
+
+const TRUE_VALUES = new Set(['true', '1', 'yes', 'y', 't']);
+const FALSE_VALUES = new Set(['false', '0', 'no', 'n', 'f', '']);
+const DATE_RE = /^\d{4}-\d{2}-\d{2}$/;
+
+// --------------------------------------------------------------------------
+// Streaming validator — mirrors the rule list in getValidationTests('loan_book')
+// --------------------------------------------------------------------------
+type RuleId =
+  | 'requiredColumns' | 'uniqueLoanId' | 'dpdNumeric' | 'balancesNumeric' | 'dateFormat' | 'rateRange'
+  | 'booleans' | 'noNulls' | 'balanceLeDisbursed' | 'noNegativeBalance' | 'knownGeography' | 'uniqueAppId';
+
+// The getValidationTests('loan_book') entry each rule reports under, matched by name
+const RULE_TESTS: Record<RuleId, string> = {
+  requiredColumns: 'All 11 required columns present',
+  uniqueLoanId: 'Loan ID is unique across all rows',
+  dpdNumeric: 'DPD is numeric and non-negative',
+  balancesNumeric: 'Balance fields are numeric (Current Balance, Disbursed, Overdue, Recovery)',
+  dateFormat: 'Disbursement date format valid (YYYY-MM-DD)',
+  rateRange: 'Interest rate in range 0–100%',
+  booleans: 'Written Off and Repossession are valid boolean values',
+  noNulls: 'No null values in required columns',
+  balanceLeDisbursed: 'Current Balance ≤ Disbursed Amount',
+  noNegativeBalance: 'No negative Current Balance',
+  knownGeography: 'Geography values in known list (10 counties)',
+  uniqueAppId: 'No duplicate Application IDs',
+};
+const RULE_ORDER = Object.keys(RULE_TESTS) as RuleId[];
+const RULE_BY_TEST = new Map(RULE_ORDER.map((rule) => [RULE_TESTS[rule], rule]));
+
+const RULE_LABELS: Record<RuleId, string> = {
+  requiredColumns: 'missing required column',
+  uniqueLoanId: 'duplicate Loan ID',
+  dpdNumeric: 'non-numeric or negative DPD',
+  balancesNumeric: 'non-numeric balance field',
+  dateFormat: 'invalid disbursement date',
+  rateRange: 'interest rate outside 0–100%',
+  booleans: 'invalid boolean flag',
+  noNulls: 'null required value (auto-filled)',
+  balanceLeDisbursed: 'Current Balance above Disbursed Amount',
+  noNegativeBalance: 'negative Current Balance',
+  knownGeography: 'unknown geography',
+  uniqueAppId: 'duplicate Application ID',
+};
+
+// Error category and column reported for each rule in the feed error log
+const RULE_ISSUES: Record<RuleId, [FeedIssue['errorType'], string]> = {
+  requiredColumns: ['schema_mismatch', 'header'],
+  uniqueLoanId: ['duplicate_key', 'loanId'],
+  dpdNumeric: ['invalid_format', 'dpdAsOfReportingDate'],
+  balancesNumeric: ['invalid_format', 'currentBalance'],
+  dateFormat: ['invalid_format', 'loanDisbursedDate'],
+  rateRange: ['out_of_range', 'interestRate'],
+  booleans: ['invalid_format', 'loanWrittenOff'],
+  noNulls: ['missing_field', 'currentBalance'],
+  balanceLeDisbursed: ['out_of_range', 'currentBalance'],
+  noNegativeBalance: ['out_of_range', 'currentBalance'],
+  knownGeography: ['out_of_range', 'geography'],
+  uniqueAppId: ['duplicate_key', 'applicationId'],
+};
+
+// Row numbers kept per failing rule
+const SAMPLE_ROWS = 5;
+
+export class LoanTapeValidator {
+  private readonly templates = getValidationTests('loan_book');
+  private readonly failures = new Map<RuleId, { count: number; firstRow: number; sample?: string; rows: number[] }>();
+  private readonly loanIds = new Set<string>();
+  private readonly appIds = new Set<string>();
+  private readonly knownGeos = new Set(GEOGRAPHIES.map((g) => g.toLowerCase()));
+  private missingColumns: string[] = [];
+
+  constructor(private readonly schema: DocTypeSchema) {}
+
+  checkHeader(mapping: (keyof LoanLevelRow | null)[]): boolean {
+    const mapped = new Set(mapping.filter(Boolean));
+    this.missingColumns = this.schema.fields.filter((f) => f.required && !mapped.has(f.key as keyof LoanLevelRow)).map((f) => f.label);
+    if (this.missingColumns.length) this.fail('requiredColumns', 1, this.missingColumns.join(', '));
+    return this.missingColumns.length === 0;
+  }
+
+  private fail(rule: RuleId, rowNum: number, sample?: string) {
+    const f = this.failures.get(rule);
+    if (!f) this.failures.set(rule, { count: 1, firstRow: rowNum, sample, rows: [rowNum] });
+    else {
+      f.count++;
+      if (f.rows.length < SAMPLE_ROWS) f.rows.push(rowNum);
+    }
+  }
+
+  private severity(rule: RuleId): ValidationTest['severity'] {
+    return this.templates.find((t) => t.name === RULE_TESTS[rule])?.severity ?? 'error';
+  }
+
+  /** Coerce one record; returns null when the row breaks an error-severity rule. */
+  checkRow(record: string[], mapping: (keyof LoanLevelRow | null)[], rowNum: number): LoanLevelRow | null {
+    const raw: Partial<Record<keyof LoanLevelRow, string>> = {};
+    for (let c = 0; c < mapping.length; c++) {
+      const key = mapping[c];
+      if (key) raw[key] = (record[c] ?? '').trim();
+    }
+    const errors: RuleId[] = [];
+    const flag = (rule: RuleId, sample?: string) => {
+      this.fail(rule, rowNum, sample);
+      if (this.severity(rule) === 'error') errors.push(rule);
+    };
+
+    const num = (key: keyof LoanLevelRow, rule: RuleId): number => {
+      const s = raw[key];
+      if (s === undefined || s === '') { this.fail('noNulls', rowNum, String(key)); return 0; }
+      const n = Number(s.replace(/,/g, ''));
+      if (!Number.isFinite(n)) { flag(rule, `${String(key)}=${s}`); return 0; }
+      return n;
+    };
+    const bool = (key: keyof LoanLevelRow): boolean => {
+      const s = (raw[key] ?? '').toLowerCase();
+      if (TRUE_VALUES.has(s)) return true;
+      if (!FALSE_VALUES.has(s)) flag('booleans', `${String(key)}=${raw[key]}`);
+      return false;
+    };
+
+    const loanId = raw.loanId ?? '';
+    const applicationId = raw.applicationId ?? '';
+    if (!loanId) {
+      // Unlike other nulls this cannot be auto-filled: books are keyed (and deltas diffed) by Loan ID
+      this.fail('noNulls', rowNum, 'loanId');
+      errors.push('noNulls');
+    } else if (this.loanIds.has(loanId)) flag('uniqueLoanId', loanId);
+    else this.loanIds.add(loanId);
+    if (applicationId) {
+      if (this.appIds.has(applicationId)) flag('uniqueAppId', applicationId);
+      else this.appIds.add(applicationId);
+    }
+
+    const dpd = num('dpdAsOfReportingDate', 'dpdNumeric');
+    if (dpd < 0) flag('dpdNumeric', String(dpd));
+    const currentBalance = num('currentBalance', 'balancesNumeric');
+    const loanDisbursedAmount = num('loanDisbursedAmount', 'balancesNumeric');
+    const totalOverdueAmount = num('totalOverdueAmount', 'balancesNumeric');
+    const recoveryAfterWriteoff = num('recoveryAfterWriteoff', 'balancesNumeric');
+    const interestRate = num('interestRate', 'rateRange');
+    if (interestRate < 0 || interestRate > 100) flag('rateRange', String(interestRate));
+    if (currentBalance < 0) flag('noNegativeBalance', String(currentBalance));
+    if (currentBalance > loanDisbursedAmount) flag('balanceLeDisbursed', loanId);
+
+    const loanDisbursedDate = raw.loanDisbursedDate ?? '';
+    if (!DATE_RE.test(loanDisbursedDate) || Number.isNaN(Date.parse(loanDisbursedDate))) flag('dateFormat', loanDisbursedDate);
+
+    const geography = raw.geography || undefined;
+    if (geography && !this.knownGeos.has(geography.toLowerCase())) this.fail('knownGeography', rowNum, geography);
+
+    const tenure = raw.residualTenureMonths ? Number(raw.residualTenureMonths) : undefined;
+    const row: LoanLevelRow = {
+      loanId,
+      applicationId,
+      dpdAsOfReportingDate: dpd,
+      currentBalance,
+      loanDisbursedAmount,
+      totalOverdueAmount,
+      loanDisbursedDate,
+      interestRate,
+      loanWrittenOff: bool('loanWrittenOff'),
+      repossession: bool('repossession'),
+      recoveryAfterWriteoff,
+      geography,
+      product: raw.product || undefined,
+      segment: raw.segment || undefined,
+      borrowerName: raw.borrowerName || undefined,
+      residualTenureMonths: tenure != null && Number.isFinite(tenure) ? tenure : undefined,
+    };
+    return errors.length ? null : row;
+  }
+
+  results(): ValidationTest[] {
+    const detail = (rule: RuleId) => {
+      const f = this.failures.get(rule)!;
+      return rule === 'requiredColumns'
+        ? `Missing: ${f.sample}`
+        : `${f.count.toLocaleString()} row${f.count === 1 ? '' : 's'} with ${RULE_LABELS[rule]} — first at row ${f.firstRow}${f.sample ? ` (${f.sample})` : ''}`;
+    };
+    const tests: ValidationTest[] = this.templates.map((t) => {
+      const rule = RULE_BY_TEST.get(t.name);
+      if (!rule || !this.failures.has(rule)) return { name: t.name, pass: true, severity: t.severity };
+      return { name: t.name, pass: false, detail: detail(rule), severity: t.severity };
+    });
+    // A failing rule whose test was renamed or dropped from the list is still reported
+    const listed = new Set(this.templates.map((t) => t.name));
+    for (const rule of RULE_ORDER) {
+      if (this.failures.has(rule) && !listed.has(RULE_TESTS[rule])) {
+        tests.push({ name: RULE_TESTS[rule], pass: false, detail: detail(rule), severity: 'error' });
+      }
+    }
+    return tests;
+  }
+
+  /** One entry per failing rule, in the shape of the integration page's error log. */
+  issues(): FeedIssue[] {
+    return RULE_ORDER.flatMap((rule) => {
+      const f = this.failures.get(rule);
+      if (!f) return [];
+      const [errorType, column] = RULE_ISSUES[rule];
+      // Null and numeric failures name the offending column in their sample
+      const field = (rule === 'noNulls' || rule === 'balancesNumeric' || rule === 'booleans') && f.sample
+        ? f.sample.split('=')[0]
+        : column;
+      return [{
+        errorType,
+        field,
+        rowCount: rule === 'requiredColumns' ? 0 : f.count,
+        message: rule === 'requiredColumns'
+          ? `Required columns not found: ${f.sample}`
+          : `${f.count.toLocaleString()} row${f.count === 1 ? '' : 's'} with ${RULE_LABELS[rule]}${f.sample ? ` (first: ${f.sample})` : ''}`,
+        severity: this.severity(rule),
+        sampleRows: rule === 'requiredColumns' ? [] : f.rows,
+      }];
+    });
+  }
+}
+
+// --------------------------------------------------------------------------
+// Ingestion driver
+// --------------------------------------------------------------------------
+export async function ingestLoanTape(
+  nbfiId: string,
+  body: ReadableStream<Uint8Array>,
+  opts: { format: TapeFormat; mode?: LoanBookMode; totalBytes?: number; onProgress?: (p: IngestProgress) => void },
+): Promise<IngestResult> {
+  const schema = getSchema('loan_book');
+  const validator = new LoanTapeValidator(schema);
+  const progress: IngestProgress = { rowsRead: 0, rowsWritten: 0, rowsRejected: 0, bytesRead: 0, totalBytes: opts.totalBytes };
+  const counted = countBytes(body, (n) => { progress.bytesRead += n; });
+  const records = opts.format === 'xlsx' ? parseXlsxRecords(counted) : parseCsvRecords(counted);
+
+  let mapping: (keyof LoanLevelRow | null)[] | null = null;
+  let loanBookId: string | null = null;
+  let base: DeltaBase | null = null;
+  // Full snapshots accumulate aggregates row by row; deltas carry the base's forward
+  const fullAgg = emptyAggregates();
+  const fullRollup: RollupCells = new Map();
+  let accepted = 0;
+  let batch: LoanLevelRow[] = [];
+
+  const flush = async (deltaOp: 'upsert' | 'closed' = 'upsert') => {
+    if (!batch.length || !loanBookId) return;
+    const rows = batch;
+    batch = [];
+    const id = loanBookId;
+    await db.$transaction(async (tx) => writeLoanRows(tx, id, nbfiId, rows, deltaOp), { timeout: 60000 });
+    progress.rowsWritten += rows.length;
+    opts.onProgress?.({ ...progress });
+  };
+
+  try {
+    for await (const record of records) {
+      if (!mapping) {
+        mapping = resolveColumnMapping(record, schema);
+        if (!validator.checkHeader(mapping)) break;
+        if (opts.mode === 'delta') base = await prepareDeltaBase(db, nbfiId);
+        const book = await db.loanBook.create({
+          data: base
+            ? { nbfiId, status: 'ingesting', kind: 'delta', baseBookId: base.baseBookId, chainDepth: base.chainDepth }
+            : { nbfiId, status: 'ingesting' },
+        });
+        loanBookId = book.id;
+        continue;
+      }
+      progress.rowsRead++;
+      const row = validator.checkRow(record, mapping, progress.rowsRead + 1);
+      if (!row) { progress.rowsRejected++; continue; }
+      accepted++;
+      if (base) {
+        if (!base.builder.accept(row)) continue;
+      } else {
+        applyToAggregates(fullAgg, row, 1);
+        applyToRollup(fullRollup, row, 1);
+      }
+      batch.push(row);
+      if (batch.length >= INGEST_TX_BATCH) await flush();
+    }
+    await flush();
+    if (base && accepted > 0) {
+      // Loans absent from the new tape become 'closed' tombstones
+      const closed = base.builder.closed();
+      for (let i = 0; i < closed.length; i += INGEST_TX_BATCH) {
+        batch = closed.slice(i, i + INGEST_TX_BATCH);
+        await flush('closed');
+      }
+    }
+  } catch (err) {
+    if (loanBookId) await db.loanBook.update({ where: { id: loanBookId }, data: { status: 'failed' } });
+    throw err;
+  }
+
+  const aggregates = base ? base.builder.aggregates : fullAgg;
+  const ok = !!loanBookId && accepted > 0;
+  if (loanBookId && ok) {
+    const id = loanBookId;
+    const rollup = base ? base.builder.rollup : fullRollup;
+    await db.$transaction(async (tx) => {
+      await tx.loanBook.update({
+        where: { id },
+        data: { status: 'ready', rowCount: aggregates.rowCount, totalBalance: aggregates.totalBalance, aggregates: JSON.stringify(aggregates) },
+      });
+      await writePortfolioRollup(tx, nbfiId, id, rollup);
+    }, { timeout: 60000 });
+  } else if (loanBookId) {
+    await db.loanBook.update({ where: { id: loanBookId }, data: { status: 'failed' } });
+  }
+  return {
+    ...progress,
+    loanBookId: ok ? loanBookId : null,
+    kind: base ? 'delta' : 'full',
+    rowCount: aggregates.rowCount,
+    totalBalance: aggregates.totalBalance,
+    delta: base ? base.builder.stats : null,
+    tests: validator.results(),
+    issues: validator.issues(),
+    ok,
+  };
+}
+
+// Bookkeeping once a tape has been accepted: upload metadata on the NBFI, an audit
+// entry, and a refresh of the cached analytics and covenant readings
+export async function recordLoanBookUpload(
+  nbfiId: string,
+  result: IngestResult,
+  upload: { filename: string; source: LoanBookUploadMeta['source']; userId: string; userName: string },
+) {
+  invalidateAnalytics(nbfiId);
+  queueCovenantEvaluation(nbfiId);
+  const meta: LoanBookUploadMeta = {
+    source: upload.source,
+    uploadedAt: new Date().toISOString(),
+    uploadedBy: upload.userName,
+    rowCount: result.rowCount,
+    totalBalance: result.totalBalance,
+    filename: upload.filename,
+    inputFormat: 'snapshot',
+  };
+  await db.nbfi.update({ where: { id: nbfiId }, data: { loanBookMeta: JSON.stringify(meta) } });
+  await db.auditLog.create({
+    data: {
+      nbfiId,
+      userId: upload.userId,
+      userName: upload.userName,
+      action: 'loan_book_uploaded',
+      notes: result.delta
+        ? `${result.rowsRead - result.rowsRejected} loan rows ingested from ${upload.filename} as a delta (${result.delta.added} new, ${result.delta.changed} changed, ${result.delta.closed} closed, ${result.rowsRejected} rejected)`
+        : `${result.rowsWritten} loan rows ingested from ${upload.filename} (${result.rowsRejected} rejected)`,
+    },
+  });
+}
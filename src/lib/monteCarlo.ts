@@ -0,0 +1,311 @@
+/**
+ * Monte Carlo roll-rate / loss simulation.
+ * Bucket balances are pushed through the transition matrix month by month along
+ * correlated macro paths: one systematic factor per path follows an AR(1) process,
+ * and each month's roll-forward probabilities are conditioned on it with the
+ * one-factor Vasicek formula. Performing balances amortise out of the book at a
+ * fixed monthly rate. Horizon loss per path = Σ bucket balance × LOSS_RATES,
+ * and the path losses give VaR / expected shortfall per scenario.
+ * Paths are simulated in fixed-size chunks on typed arrays across a worker_threads
+ * pool; chunk seeds depend only on (seed, chunk index), so results do not depend
+ * on the pool size.
+ */
+
+import { Worker } from 'worker_threads';
+import { DPD_BUCKETS } from './types';
+import { LOSS_RATES, SCENARIO_MATRICES, type ScenarioKey } from './rollRate';
+import { WorkerPool } from './workerPool';
+
+const N = DPD_BUCKETS.length;
+
+// Paths per worker task
+export const MC_CHUNK_PATHS = 500;
+
+export interface MonteCarloChunk {
+  balances: number[];     // opening balance per bucket, DPD_BUCKETS order
+  matrix: number[];       // N×N row-major transition probabilities
+  lossRates: number[];    // per bucket
+  months: number;
+  paths: number;
+  rho: number;            // loading of roll-forward rates on the systematic factor
+  phi: number;            // month-to-month persistence of the factor
+  amortisation: number;   // monthly share of the Current balance repaid and leaving the book
+  seed: number;
+}
+
+export interface MonteCarloOptions {
+  paths?: number;
+  months?: number;
+  rho?: number;
+  phi?: number;
+  amortisation?: number;
+  seed?: number;
+  scenarios?: ScenarioKey[];
+  // Per-scenario matrices; defaults to SCENARIO_MATRICES
+  matrices?: Partial<Record<ScenarioKey, Record<string, Record<string, number>>>>;
+}
+
+export interface LossDistribution {
+  scenario: ScenarioKey;
+  paths: number;
+  months: number;
+  totalBalance: number;
+  openingLoss: number;        // Σ opening balance × LOSS_RATES — the deterministic starting point
+  expectedLoss: number;
+  stdDev: number;
+  percentiles: { p50: number; p90: number; p95: number; p99: number; p999: number };
+  var99: number;
+  es99: number;
+  es975: number;
+  lossRate: { mean: number; p99: number; es99: number };   // % of opening balance
+  histogram: { from: number; to: number; count: number }[];
+}
+
+/* ================================================================
+   Numerics
+   ================================================================ */
+
+// mulberry32 — small, fast, seedable
+function rng(seed: number): () => number {
+  let a = seed >>> 0;
+  return () => {
+    a = (a + 0x6d2b79f5) >>> 0;
+    let t = a;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+// Standard normal CDF via erfc (Numerical Recipes erfcc, |ε| < 1.2e-7)
+export function normCdf(x: number): number {
+  const z = Math.abs(x) / Math.SQRT2;
+  const t = 1 / (1 + 0.5 * z);
+  const r = t * Math.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 +
+    t * (-0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 +
+    t * (-0.82215223 + t * 0.17087277)))))))));
+  return x >= 0 ? 1 - r / 2 : r / 2;
+}
+
+// Inverse standard normal CDF (Acklam, |ε| < 1.2e-9)
+export function normInv(p: number): number {
+  if (p <= 0) return -Infinity;
+  if (p >= 1) return Infinity;
+  const a = [-39.69683028665376, 220.9460984245205, -275.9285104469687, 138.357751867269, -30.66479806614716, 2.506628277459239];
+  const b = [-54.47609879822406, 161.5858368580409, -155.6989798598866, 66.80131188771972, -13.28068155288572];
+  const c = [-0.007784894002430293, -0.3223964580411365, -2.400758277161838, -2.549732539343734, 4.374664141464968, 2.938163982698783];
+  const d = [0.007784695709041462, 0.3224671290700398, 2.445134137142996, 3.754408661907416];
+  const lo = 0.02425;
+  if (p < lo) {
+    const q = Math.sqrt(-2 * Math.log(p));
+    return (((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1);
+  }
+  if (p > 1 - lo) {
+    const q = Math.sqrt(-2 * Math.log(1 - p));
+    return -(((((c[0] * q + c[1]) * q + c[2]) * q + c[3]) * q + c[4]) * q + c[5]) / ((((d[0] * q + d[1]) * q + d[2]) * q + d[3]) * q + 1);
+  }
+  const q = p - 0.5;
+  const r = q * q;
+  return (((((a[0] * r + a[1]) * r + a[2]) * r + a[3]) * r + a[4]) * r + a[5]) * q /
+    (((((b[0] * r + b[1]) * r + b[2]) * r + b[3]) * r + b[4]) * r + 1);
+}
+
+/* ================================================================
+   Kernel — one chunk of paths, struct-of-arrays state
+   ================================================================ */
+
+export function simulateChunk(c: MonteCarloChunk): Float64Array {
+  const { paths, months, rho, phi } = c;
+  const M = Float64Array.from(c.matrix);
+  const sqrtRho = Math.sqrt(rho);
+  const sqrt1mRho = Math.sqrt(1 - rho);
+  const innov = Math.sqrt(1 - phi * phi);
+
+  // Per source bucket: unconditional roll-forward mass and its normal threshold
+  const pw = new Float64Array(N);
+  const thr = new Float64Array(N);
+  for (let f = 0; f < N; f++) {
+    let s = 0;
+    for (let t = f + 1; t < N; t++) s += M[f * N + t];
+    pw[f] = s;
+    thr[f] = s > 0 && s < 1 ? normInv(s) : 0;
+  }
+
+  let cur = new Float64Array(paths * N);
+  let next = new Float64Array(paths * N);
+  for (let p = 0; p < paths; p++) for (let b = 0; b < N; b++) cur[p * N + b] = c.balances[b];
+  const z = new Float64Array(paths);
+  const sW = new Float64Array(paths);
+  const sS = new Float64Array(paths);
+
+  const rand = rng(c.seed);
+  const gauss = () => {
+    const u = rand() || Number.MIN_VALUE;
+    return Math.sqrt(-2 * Math.log(u)) * Math.cos(2 * Math.PI * rand());
+  };
+  for (let p = 0; p < paths; p++) z[p] = gauss();
+
+  for (let m = 0; m < months; m++) {
+    if (m > 0) for (let p = 0; p < paths; p++) z[p] = phi * z[p] + innov * gauss();
+    next.fill(0);
+    for (let f = 0; f < N; f++) {
+      const base = pw[f];
+      if (base > 0 && base < 1) {
+        // Vasicek conditional roll-forward probability; a bad draw (z < 0) pushes it up
+        for (let p = 0; p < paths; p++) {
+          const cond = normCdf((thr[f] - sqrtRho * z[p]) / sqrt1mRho);
+          sW[p] = cond / base;
+          sS[p] = (1 - cond) / (1 - base);
+        }
+      } else {
+        sW.fill(1);
+        sS.fill(1);
+      }
+      for (let t = 0; t < N; t++) {
+        const prob = M[f * N + t];
+        if (prob === 0) continue;
+        const scale = t > f ? sW : sS;
+        for (let p = 0; p < paths; p++) next[p * N + t] += cur[p * N + f] * prob * scale[p];
+      }
+    }
+    if (c.amortisation > 0) {
+      const keep = 1 - c.amortisation;
+      for (let p = 0; p < paths; p++) next[p * N] *= keep;
+    }
+    const tmp = cur; cur = next; next = tmp;
+  }
+
+  const losses = new Float64Array(paths);
+  for (let p = 0; p < paths; p++) {
+    let l = 0;
+    for (let b = 0; b < N; b++) l += cur[p * N + b] * c.lossRates[b];
+    losses[p] = l;
+  }
+  return losses;
+}
+
+/* ================================================================
+   Summary statistics
+   ================================================================ */
+
+function quantile(sorted: Float64Array, q: number): number {
+  if (!sorted.length) return 0;
+  const pos = (sorted.length - 1) * q;
+  const lo = Math.floor(pos);
+  const hi = Math.min(lo + 1, sorted.length - 1);
+  return sorted[lo] + (sorted[hi] - sorted[lo]) * (pos - lo);
+}
+
+function tailMean(sorted: Float64Array, q: number): number {
+  const start = Math.min(Math.floor(sorted.length * q), sorted.length - 1);
+  let s = 0;
+  for (let i = start; i < sorted.length; i++) s += sorted[i];
+  return sorted.length ? s / (sorted.length - start) : 0;
+}
+
+export function summariseLosses(
+  scenario: ScenarioKey,
+  losses: Float64Array,
+  months: number,
+  totalBalance: number,
+  openingLoss: number,
+  bins = 20,
+): LossDistribution {
+  const sorted = Float64Array.from(losses).sort();
+  const n = sorted.length;
+  let sum = 0, sumSq = 0;
+  for (let i = 0; i < n; i++) { sum += sorted[i]; sumSq += sorted[i] * sorted[i]; }
+  const mean = n ? sum / n : 0;
+  const stdDev = n ? Math.sqrt(Math.max(sumSq / n - mean * mean, 0)) : 0;
+  const var99 = quantile(sorted, 0.99);
+  const es99 = tailMean(sorted, 0.99);
+
+  const lo = n ? sorted[0] : 0;
+  const hi = n ? sorted[n - 1] : 0;
+  const width = (hi - lo) / bins || 1;
+  const histogram = Array.from({ length: bins }, (_, i) => ({ from: Math.round(lo + i * width), to: Math.round(lo + (i + 1) * width), count: 0 }));
+  for (let i = 0; i < n; i++) histogram[Math.min(Math.floor((sorted[i] - lo) / width), bins - 1)].count++;
+
+  const pct = (v: number) => (totalBalance > 0 ? (v / totalBalance) * 100 : 0);
+  return {
+    scenario,
+    paths: n,
+    months,
+    totalBalance: Math.round(totalBalance),
+    openingLoss: Math.round(openingLoss),
+    expectedLoss: Math.round(mean),
+    stdDev: Math.round(stdDev),
+    percentiles: {
+      p50: Math.round(quantile(sorted, 0.5)),
+      p90: Math.round(quantile(sorted, 0.9)),
+      p95: Math.round(quantile(sorted, 0.95)),
+      p99: Math.round(var99),
+      p999: Math.round(quantile(sorted, 0.999)),
+    },
+    var99: Math.round(var99),
+    es99: Math.round(es99),
+    es975: Math.round(tailMean(sorted, 0.975)),
+    lossRate: { mean: pct(mean), p99: pct(var99), es99: pct(es99) },
+    histogram,
+  };
+}
+
+/* ================================================================
+   Orchestration
+   ================================================================ */
+
+type McPool = WorkerPool<MonteCarloChunk, Float64Array>;
+const globalForPool = globalThis as unknown as { monteCarloPool: McPool | undefined };
+
+export function getMonteCarloPool(): McPool {
+  if (!globalForPool.monteCarloPool) {
+    globalForPool.monteCarloPool = new WorkerPool<MonteCarloChunk, Float64Array>(
+      'monteCarlo',
+      () => new Worker(new URL('./monteCarlo.worker.ts', import.meta.url)),
+      simulateChunk,
+    );
+  }
+  return globalForPool.monteCarloPool;
+}
+
+function flattenMatrix(m: Record<string, Record<string, number>>): number[] {
+  const out = new Array<number>(N * N).fill(0);
+  DPD_BUCKETS.forEach((from, f) => DPD_BUCKETS.forEach((to, t) => { out[f * N + t] = m[from]?.[to] ?? 0; }));
+  return out;
+}
+
+export async function runMonteCarlo(
+  bucketBalances: Record<string, number>,
+  opts: MonteCarloOptions = {},
+  pool: McPool = getMonteCarloPool(),
+): Promise<LossDistribution[]> {
+  const paths = Math.max(1, Math.floor(opts.paths ?? 10_000));
+  const months = Math.max(1, Math.floor(opts.months ?? 36));
+  const rho = Math.min(Math.max(opts.rho ?? 0.12, 0), 0.99);
+  const phi = Math.min(Math.max(opts.phi ?? 0.7, 0), 0.99);
+  const amortisation = Math.min(Math.max(opts.amortisation ?? 1 / 24, 0), 1);
+  const seed = opts.seed ?? 20240101;
+  const scenarios = opts.scenarios ?? (['base', 'stress', 'severe'] as ScenarioKey[]);
+
+  const balances = DPD_BUCKETS.map((b) => bucketBalances[b] ?? 0);
+  const lossRates = DPD_BUCKETS.map((b) => LOSS_RATES[b] ?? 0);
+  const totalBalance = balances.reduce((s, v) => s + v, 0);
+  const openingLoss = balances.reduce((s, v, i) => s + v * lossRates[i], 0);
+
+  return Promise.all(scenarios.map(async (scenario, si) => {
+    const matrix = flattenMatrix(opts.matrices?.[scenario] ?? SCENARIO_MATRICES[scenario]);
+    const chunks: Promise<Float64Array>[] = [];
+    for (let start = 0, k = 0; start < paths; start += MC_CHUNK_PATHS, k++) {
+      chunks.push(pool.run({
+        balances, matrix, lossRates, months, rho, phi, amortisation,
+        paths: Math.min(MC_CHUNK_PATHS, paths - start),
+        seed: (seed + Math.imul(si + 1, 0x9e3779b1) + Math.imul(k + 1, 0x85ebca6b)) >>> 0,
+      }));
+    }
+    const parts = await Promise.all(chunks);
+    const losses = new Float64Array(paths);
+    let off = 0;
+    for (const part of parts) { losses.set(part, off); off += part.length; }
+    return summariseLosses(scenario, losses, months, totalBalance, openingLoss);
+  }));
+}
@@ -0,0 +1,8 @@
+// worker_threads entry for the Monte Carlo pool (see monteCarlo.ts / workerPool.ts)
+import { serveWorkerTasks } from './workerPool';
+import { simulateChunk, type MonteCarloChunk } from './monteCarlo';
+
+serveWorkerTasks<MonteCarloChunk, Float64Array>((task) => {
+  const losses = simulateChunk(task);
+  return { result: losses, transfer: [losses.buffer] };
+});
@@ -1,47 +1,50 @@
-import { LoanLevelRow, PoolSelectionState, getDpdBucket } from './types';
+import { LoanLevelRow, PoolSelectionState } from './types';
+import {
+  getLoanIndex, poolSelectionMask, portfolioSelectionMask, loanFiltersMask, hasLoanFilters, combineMasks, selectRows,
+} from './loanIndex';
 
-export function applyPoolSelection(
-  rows: LoanLevelRow[],
+// Both entry points evaluate against the cached bitmap index of `rows` (see loanIndex.ts);
+// pass `filters` to apply the monitoring-page filters in the same pass.
+export function applyPoolSelection<T extends LoanLevelRow>(
+  rows: T[],
   selection: PoolSelectionState | undefined,
-): LoanLevelRow[] {
-  if (!selection || !selection.confirmedAt) return rows;
-  const f = selection.filterSnapshot;
-  const excl = selection.excludedSegments;
-  return rows.filter(r => {
-    if (excl.includes(r.segment || r.product || 'Other')) return false;
-    if (f.loanAmountMin != null && r.loanDisbursedAmount < f.loanAmountMin) return false;
-    if (f.loanAmountMax != null && r.loanDisbursedAmount > f.loanAmountMax) return false;
-    if (f.tenureMin != null && r.residualTenureMonths != null && r.residualTenureMonths < f.tenureMin) return false;
-    if (f.tenureMax != null && r.residualTenureMonths != null && r.residualTenureMonths > f.tenureMax) return false;
-    if (f.rateMin != null && r.interestRate < f.rateMin) return false;
-    if (f.rateMax != null && r.interestRate > f.rateMax) return false;
-    if (f.geographies.length > 0 && !f.geographies.includes(r.geography || 'Unknown')) return false;
-    if (f.products.length > 0 && !f.products.includes(r.product || 'Unknown')) return false;
-    if (f.dpdBuckets && f.dpdBuckets.length > 0 && !f.dpdBuckets.includes(getDpdBucket(r.dpdAsOfReportingDate))) return false;
-    return true;
-  });
+  filters?: LoanFilters,
+): T[] {
+  const active = filters && hasLoanFilters(filters) ? filters : undefined;
+  if ((!selection || !selection.confirmedAt) && !active) return rows;
+  const idx = getLoanIndex(rows);
+  return selectRows(idx, combineMasks(
+    poolSelectionMask(idx, selection),
+    active ? loanFiltersMask(idx, active) : null,
+  ));
 }
 
 export function applyPoolSelectionForPortfolio<T extends LoanLevelRow & { _nbfiId?: string }>(
   rows: T[],
   selectedPoolByNbfi: Record<string, PoolSelectionState>,
+  filters?: LoanFilters,
 ): T[] {
-  return rows.filter(r => {
-    const nbfiId = r._nbfiId ?? '';
-    const sel = selectedPoolByNbfi[nbfiId];
-    if (!sel || !sel.confirmedAt) return true;
-    const f = sel.filterSnapshot;
-    const excl = sel.excludedSegments;
-    if (excl.includes(r.segment || r.product || 'Other')) return false;
-    if (f.loanAmountMin != null && r.loanDisbursedAmount < f.loanAmountMin) return false;
-    if (f.loanAmountMax != null && r.loanDisbursedAmount > f.loanAmountMax) return false;
-    if (f.tenureMin != null && r.residualTenureMonths != null && r.residualTenureMonths < f.tenureMin) return false;
-    if (f.tenureMax != null && r.residualTenureMonths != null && r.residualTenureMonths > f.tenureMax) return false;
-    if (f.rateMin != null && r.interestRate < f.rateMin) return false;
-    if (f.rateMax != null && r.interestRate > f.rateMax) return false;
-    if (f.geographies.length > 0 && !f.geographies.includes(r.geography || 'Unknown')) return false;
-    if (f.products.length > 0 && !f.products.includes(r.product || 'Unknown')) return false;
-    if (f.dpdBuckets && f.dpdBuckets.length > 0 && !f.dpdBuckets.includes(getDpdBucket(r.dpdAsOfReportingDate))) return false;
-    return true;
-  });
+  const active = filters && hasLoanFilters(filters) ? filters : undefined;
+  if (!active && !Object.values(selectedPoolByNbfi).some(s => s.confirmedAt)) return rows;
+  const idx = getLoanIndex(rows);
+  return selectRows(idx, combineMasks(
+    portfolioSelectionMask(idx, selectedPoolByNbfi),
+    active ? loanFiltersMask(idx, active) : null,
+  ));
+}
+
+export interface LoanFilters {
+  product: string[];
+  geography: string[];
+  segment: string[];
+  dpdBuckets: string[];
+  ticketSize: string[];
+}
+
+export const EMPTY_LOAN_FILTERS: LoanFilters = { product: [], geography: [], segment: [], dpdBuckets: [], ticketSize: [] };
+
+export function applyLoanFilters<T extends LoanLevelRow>(rows: T[], filters: LoanFilters): T[] {
+  if (!hasLoanFilters(filters)) return rows;
+  const idx = getLoanIndex(rows);
+  return selectRows(idx, loanFiltersMask(idx, filters));
 }
@@ -0,0 +1,328 @@
+import type { LoanLevelRow } from './types';
+import { DPD_BUCKETS } from './types';
+import {
+  LOSS_RATES, LENDER_PROVISION_RATES, ADVANCE_RATES,
+  type computeFinancialSummary, type computeECL, type computeCureRate, type computeCNL, type computeCDR,
+  type computeHHI, type computeRepaymentVelocity, type computeBorrowingBase, type computeShadowReconciliation,
+  type EligibilityStep,
+} from './rollRate';
+
+/* ================================================================
+   Struct-of-arrays loan book
+   One typed column per numeric field, dictionary-coded categoricals.
+   Built once per book; every metric below reads only the columns it needs.
+   ================================================================ */
+
+export interface DictColumn {
+  codes: Uint16Array;
+  values: string[];
+}
+
+export interface LoanColumns {
+  length: number;
+  balance: Float64Array;
+  disbursed: Float64Array;
+  overdue: Float64Array;
+  rate: Float64Array;
+  recovery: Float64Array;
+  // dpd and tenure stay float64 so fractional and missing (NaN) values meet the same
+  // thresholds as the row-based functions in rollRate.ts
+  dpd: Float64Array;
+  bucket: Uint8Array;        // index into DPD_BUCKETS
+  tenure: Float64Array;      // residualTenureMonths, NaN when missing
+  writtenOff: Uint8Array;
+  repossession: Uint8Array;
+  geography: DictColumn;
+  product: DictColumn;
+  segment: DictColumn;
+}
+
+const N_BUCKETS = DPD_BUCKETS.length;
+const BUCKET_LOSS = Float64Array.from(DPD_BUCKETS, b => LOSS_RATES[b] ?? 0);
+const BUCKET_PROVISION = Float64Array.from(DPD_BUCKETS, b => LENDER_PROVISION_RATES[b] ?? 0);
+const BUCKET_ADVANCE = Float64Array.from(DPD_BUCKETS, b => ADVANCE_RATES[b] ?? 0);
+const BUCKET_LGD = Float64Array.from(DPD_BUCKETS, b => (b === 'Current' || b === '1-30' ? 0.45 : 0.65));
+
+export function bucketIndex(dpd: number): number {
+  if (dpd <= 0) return 0;
+  if (dpd <= 30) return 1;
+  if (dpd <= 60) return 2;
+  if (dpd <= 90) return 3;
+  if (dpd <= 180) return 4;
+  return 5;
+}
+
+function dictEncoder(n: number) {
+  const codes = new Uint16Array(n);
+  const values: string[] = [];
+  const lookup = new Map<string, number>();
+  return {
+    set(i: number, v: string) {
+      let c = lookup.get(v);
+      if (c === undefined) { c = values.length; values.push(v); lookup.set(v, c); }
+      codes[i] = c;
+    },
+    column: (): DictColumn => ({ codes, values }),
+  };
+}
+
+export function toLoanColumns(rows: LoanLevelRow[]): LoanColumns {
+  const n = rows.length;
+  const cols = {
+    length: n,
+    balance: new Float64Array(n),
+    disbursed: new Float64Array(n),
+    overdue: new Float64Array(n),
+    rate: new Float64Array(n),
+    recovery: new Float64Array(n),
+    dpd: new Float64Array(n),
+    bucket: new Uint8Array(n),
+    tenure: new Float64Array(n),
+    writtenOff: new Uint8Array(n),
+    repossession: new Uint8Array(n),
+  };
+  const geo = dictEncoder(n), prod = dictEncoder(n), seg = dictEncoder(n);
+  for (let i = 0; i < n; i++) {
+    const r = rows[i];
+    const dpd = r.dpdAsOfReportingDate;
+    cols.balance[i] = r.currentBalance;
+    cols.disbursed[i] = r.loanDisbursedAmount;
+    cols.overdue[i] = r.totalOverdueAmount;
+    cols.rate[i] = r.interestRate;
+    cols.recovery[i] = r.recoveryAfterWriteoff;
+    cols.dpd[i] = dpd;
+    cols.bucket[i] = bucketIndex(dpd);
+    cols.tenure[i] = r.residualTenureMonths ?? NaN;
+    cols.writtenOff[i] = r.loanWrittenOff ? 1 : 0;
+    cols.repossession[i] = r.repossession ? 1 : 0;
+    geo.set(i, r.geography || 'Unknown');
+    prod.set(i, r.product || 'Unknown');
+    seg.set(i, r.segment || 'Unknown');
+  }
+  return { ...cols, geography: geo.column(), product: prod.column(), segment: seg.column() };
+}
+
+/* ================================================================
+   Fused metrics — same result shapes as the per-metric functions in rollRate.ts
+   Pass 1 accumulates every additive sum; pass 2 applies the pool-relative
+   single-loan cap used by the borrowing base and eligibility waterfall.
+   ================================================================ */
+
+export interface PortfolioMetrics {
+  count: number;
+  totalBalance: number;
+  bucketBalances: Record<string, number>;
+  bucketCounts: Record<string, number>;
+  par30Count: number;
+  par90Count: number;
+  nplBalance: number;
+  estimatedLoss: { amount: number; rate: number };
+  financialSummary: ReturnType<typeof computeFinancialSummary>;
+  ecl: ReturnType<typeof computeECL>;
+  provisions: number;
+  cureRate: ReturnType<typeof computeCureRate>;
+  cnl: ReturnType<typeof computeCNL>;
+  cdr: ReturnType<typeof computeCDR>;
+  geographyHHI: ReturnType<typeof computeHHI>;
+  productHHI: ReturnType<typeof computeHHI>;
+  repaymentVelocity: ReturnType<typeof computeRepaymentVelocity>;
+  borrowingBase: ReturnType<typeof computeBorrowingBase>;
+  eligibility: EligibilityStep[];
+  shadow: ReturnType<typeof computeShadowReconciliation>;
+}
+
+const ELIGIBILITY_CRITERIA = [
+  'DPD ≤ 60 days',
+  'Not written off',
+  'Balance within 1% pool cap',
+  'No repossession flag',
+  'Residual tenure > 0',
+];
+
+function hhiFromSums(sums: Float64Array, values: string[], totalBal: number): ReturnType<typeof computeHHI> {
+  if (totalBal === 0) return { hhi: 0, normalized: 0, segments: [] };
+  const segments: { name: string; share: number; balance: number }[] = [];
+  for (let c = 0; c < values.length; c++) segments.push({ name: values[c], share: sums[c] / totalBal, balance: sums[c] });
+  segments.sort((a, b) => b.share - a.share);
+  let hhi = 0;
+  for (const s of segments) hhi += s.share * s.share;
+  const n = segments.length;
+  const normalized = n > 1 ? (hhi - 1 / n) / (1 - 1 / n) : 1;
+  return { hhi: Math.round(hhi * 10000) / 10000, normalized: Math.round(normalized * 10000) / 10000, segments };
+}
+
+export function computePortfolioMetrics(cols: LoanColumns, facilityAmount: number): PortfolioMetrics {
+  const n = cols.length;
+  const { balance, disbursed, overdue, rate, recovery, dpd, bucket, tenure, writtenOff, repossession } = cols;
+  const bucketBal = new Float64Array(N_BUCKETS);
+  const bucketCnt = new Float64Array(N_BUCKETS);
+  const geoBal = new Float64Array(cols.geography.values.length);
+  const prodBal = new Float64Array(cols.product.values.length);
+  const geoCodes = cols.geography.codes, prodCodes = cols.product.codes;
+
+  let totalBal = 0, totalDisbursed = 0, totalOverdue = 0, rateBal = 0, rateSum = 0;
+  let grossLoss = 0, writeOffCount = 0, recoveries = 0, newDefaults = 0, overdue30 = 0;
+  let scheduled = 0, actual = 0;
+  let delinqBal = 0, delinqCount = 0, curedBal = 0;
+
+  // ---- Pass 1: additive sums ----
+  for (let i = 0; i < n; i++) {
+    const bal = balance[i];
+    const b = bucket[i];
+    const d = dpd[i];
+    const wo = writtenOff[i];
+    totalBal += bal;
+    totalDisbursed += disbursed[i];
+    totalOverdue += overdue[i];
+    rateBal += rate[i] * bal;
+    rateSum += rate[i];
+    recoveries += recovery[i];
+    bucketBal[b] += bal;
+    bucketCnt[b]++;
+    geoBal[geoCodes[i]] += bal;
+    prodBal[prodCodes[i]] += bal;
+    if (wo) { grossLoss += bal; writeOffCount++; }
+    if (d > 90 && !wo) newDefaults += bal;
+    if (d > 30) overdue30 += overdue[i];
+    // Cure rate tests DPD itself, as computeCureRate: a missing (NaN) DPD is bucketed 180+ but is not delinquent
+    if (d > 0) {
+      delinqBal += bal;
+      delinqCount++;
+      if (d <= 30) curedBal += bal;
+    }
+
+    // Repayment velocity (EMI on residual tenure), as computeRepaymentVelocity
+    const monthlyRate = (rate[i] || 15) / 100 / 12;
+    const t = tenure[i] || 12;
+    if (bal > 0) {
+      const f = Math.pow(1 + monthlyRate, t);
+      const emi = (bal * monthlyRate * f) / (f - 1);
+      scheduled += emi;
+      const ratio = d === 0 ? 1.0 + (recovery[i] > 0 ? 0.05 : 0)
+        : d <= 30 ? 0.92 : d <= 60 ? 0.75 : d <= 90 ? 0.50 : d <= 180 ? 0.20 : 0.05;
+      actual += emi * ratio;
+    }
+  }
+
+  // ---- Pass 2: pool-cap dependent (borrowing base, eligibility waterfall) ----
+  const singleLoanCap = totalBal * 0.01;
+  let eligible = 0, ineligible = 0, eligibleCount = 0, ineligibleCount = 0;
+  const failCount = new Float64Array(ELIGIBILITY_CRITERIA.length);
+  const failBal = new Float64Array(ELIGIBILITY_CRITERIA.length);
+  for (let i = 0; i < n; i++) {
+    const bal = balance[i];
+    const ar = BUCKET_ADVANCE[bucket[i]];
+    if (ar === 0 || writtenOff[i]) { ineligible += bal; ineligibleCount++; }
+    else {
+      const contrib = bal * ar;
+      eligible += contrib < singleLoanCap ? contrib : singleLoanCap;
+      eligibleCount++;
+    }
+    // Negated so a missing (NaN) DPD fails the first criterion, as in computeEligibilityWaterfall
+    const firstFail = !(dpd[i] <= 60) ? 0 : writtenOff[i] ? 1 : bal > singleLoanCap ? 2 : repossession[i] ? 3 : tenure[i] > 0 ? -1 : 4;
+    if (firstFail >= 0) { failCount[firstFail]++; failBal[firstFail] += bal; }
+  }
+
+  // ---- Derive per-metric results ----
+  const bucketBalances: Record<string, number> = {};
+  const bucketCounts: Record<string, number> = {};
+  let lossAmt = 0, provisions = 0, ecl12m = 0;
+  for (let b = 0; b < N_BUCKETS; b++) {
+    bucketBalances[DPD_BUCKETS[b]] = bucketBal[b];
+    bucketCounts[DPD_BUCKETS[b]] = bucketCnt[b];
+    lossAmt += bucketBal[b] * BUCKET_LOSS[b];
+    provisions += bucketBal[b] * BUCKET_PROVISION[b];
+    ecl12m += bucketBal[b] * Math.min(BUCKET_LOSS[b], 1.0) * BUCKET_LGD[b];
+  }
+  const nplBalance = bucketBal[4] + bucketBal[5];
+  const par30Count = bucketCnt[2] + bucketCnt[3] + bucketCnt[4] + bucketCnt[5];
+  const par90Count = bucketCnt[4] + bucketCnt[5];
+
+  const netLoss = grossLoss - recoveries;
+  const financialSummary = {
+    totalBal, grossLoss, netLoss, recovery: recoveries, provisions, totalOverdue,
+    avgInterest: n > 0 ? rateBal / totalBal : 0,
+    writeOffCount,
+    writeOffRate: n > 0 ? (writeOffCount / n) * 100 : 0,
+    recoveryRate: grossLoss > 0 ? (recoveries / grossLoss) * 100 : 0,
+    overdueRatio: totalBal > 0 ? (totalOverdue / totalBal) * 100 : 0,
+  };
+
+  const cureRate = delinqCount === 0
+    ? { rate: 0, curedBalance: 0, delinquentBalance: 0 }
+    : { rate: delinqBal > 0 ? (curedBal / delinqBal) * 100 : 0, curedBalance: curedBal, delinquentBalance: delinqBal };
+
+  const monthlyDefault = totalBal > 0 ? newDefaults / totalBal : 0;
+  const reserves = eligible * 0.05;
+  const bb = eligible - reserves;
+  const utilizationPct = bb > 0 ? (facilityAmount / bb) * 100 : 100;
+
+  const eligibility: EligibilityStep[] = [];
+  let remainingCount = n, remainingBal = totalBal;
+  for (let k = 0; k < ELIGIBILITY_CRITERIA.length; k++) {
+    const passCount = remainingCount - failCount[k];
+    const passBal = remainingBal - failBal[k];
+    eligibility.push({
+      criteria: ELIGIBILITY_CRITERIA[k],
+      passCount, failCount: failCount[k],
+      passBalance: Math.round(passBal), failBalance: Math.round(failBal[k]), cumEligibleBalance: Math.round(passBal),
+    });
+    remainingCount = passCount;
+    remainingBal = passBal;
+  }
+
+  // Shadow ledger reconciliation
+  const principalRepaid = totalDisbursed - totalBal;
+  const avgRate = n > 0 ? rateSum / n : 15;
+  const interestCalc = Math.round(totalBal * (avgRate / 100) / 12);
+  const collections = Math.round(principalRepaid * 0.08 + interestCalc);
+  const shadowPrincipal = Math.round(collections - interestCalc);
+  const tapePrincipal = Math.round(principalRepaid * 0.08);
+  const variance = tapePrincipal - shadowPrincipal;
+  const variancePct = tapePrincipal > 0 ? (variance / tapePrincipal) * 100 : 0;
+  const status: 'reconciled' | 'minor_variance' | 'material_variance' = Math.abs(variancePct) < 1 ? 'reconciled' : Math.abs(variancePct) < 5 ? 'minor_variance' : 'material_variance';
+
+  const vp = scheduled > 0 ? actual / scheduled : 1.0;
+
+  return {
+    count: n,
+    totalBalance: totalBal,
+    bucketBalances,
+    bucketCounts,
+    par30Count,
+    par90Count,
+    nplBalance,
+    estimatedLoss: { amount: lossAmt, rate: totalBal > 0 ? lossAmt / totalBal : 0 },
+    financialSummary,
+    ecl: { ecl12m, eclLifetime: lossAmt, totalBal },
+    provisions,
+    cureRate,
+    cnl: { cnl: totalDisbursed > 0 ? ((grossLoss - recoveries) / totalDisbursed) * 100 : 0, chargeoffs: grossLoss, recoveries, origVol: totalDisbursed },
+    cdr: { cdr: (1 - Math.pow(1 - monthlyDefault, 12)) * 100, monthlyDefault: monthlyDefault * 100, newDefaults, poolBal: totalBal },
+    geographyHHI: hhiFromSums(geoBal, cols.geography.values, totalBal),
+    productHHI: hhiFromSums(prodBal, cols.product.values, totalBal),
+    repaymentVelocity: { vp: Math.round(vp * 1000) / 1000, scheduledTotal: Math.round(scheduled), actualTotal: Math.round(actual) },
+    borrowingBase: {
+      borrowingBase: Math.round(bb),
+      eligible: Math.round(eligible),
+      ineligible: Math.round(ineligible),
+      reserves: Math.round(reserves),
+      headroom: Math.round(bb - facilityAmount),
+      utilizationPct: Math.round(utilizationPct * 10) / 10,
+      totalBalance: Math.round(totalBal),
+      eligibleCount,
+      ineligibleCount,
+      facilityAmount,
+    },
+    eligibility,
+    shadow: {
+      loanTape: { principalReduction: tapePrincipal, totalBalance: Math.round(totalBal), loanCount: n },
+      shadowLedger: { expectedPrincipal: shadowPrincipal, interestCalc, expectedCollections: collections },
+      reconciliation: { variance: Math.round(variance), variancePct: Math.round(variancePct * 100) / 100, delinquencyAdj: Math.round(overdue30 * 0.02), status },
+    },
+  };
+}
+
+export function computePortfolioMetricsFromRows(rows: LoanLevelRow[], facilityAmount: number): PortfolioMetrics {
+  return computePortfolioMetrics(toLoanColumns(rows), facilityAmount);
+}
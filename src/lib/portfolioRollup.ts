@@ -0,0 +1,268 @@
+/**
+ * Materialised portfolio rollup.
+ * Each ready loan book is reduced to cells keyed by (DPD bucket, geography,
+ * product, vintage) holding balances, counts and PAR numerators. The cells of
+ * the latest book of every transaction are stored in PortfolioRollup, so
+ * dashboard and portfolio-scope monitoring aggregate a few thousand cells in
+ * SQL instead of loading and tagging every loan of every NBFI.
+ *
+ * Cells are maintained the same way as BookAggregates (loanDelta.ts): full
+ * books accumulate them row by row, and delta books carry the base book's cells
+ * forward by subtracting replaced loans and adding new ones.
+ */
+
+import type { Prisma } from '@/generated/prisma/client';
+import { db } from './db';
+import type { LoanLevelRow } from './types';
+import { DPD_BUCKETS, getDpdBucket } from './types';
+import { bucketLosses, vintageKey } from './rollRate';
+import { getNbfiIdForTransaction } from './seedTransactions';
+import { LOAN_WRITE_BATCH, readLoanRows } from './loanStore';
+
+type RollupClient = Prisma.TransactionClient;
+
+/* ================================================================
+   Cells
+   ================================================================ */
+
+export interface RollupCell {
+  dpdBucket: string;
+  geography: string;
+  product: string;
+  vintage: string;
+  loanCount: number;
+  balance: number;
+  disbursed: number;
+  overdue: number;
+  interestWeighted: number;
+  par30Count: number;
+  par30Balance: number;
+  par90Count: number;
+  par90Balance: number;
+  writtenOffCount: number;
+  writtenOffBalance: number;
+  recovery: number;
+}
+
+export type RollupCells = Map<string, RollupCell>;
+
+const MEASURES = [
+  'loanCount', 'balance', 'disbursed', 'overdue', 'interestWeighted',
+  'par30Count', 'par30Balance', 'par90Count', 'par90Balance',
+  'writtenOffCount', 'writtenOffBalance', 'recovery',
+] as const;
+type Measure = (typeof MEASURES)[number];
+
+// Add (sign = 1) or remove (sign = -1) one loan's contribution; mirrors applyToAggregates
+export function applyToRollup(cells: RollupCells, r: LoanLevelRow, sign: 1 | -1) {
+  const dpdBucket = getDpdBucket(r.dpdAsOfReportingDate);
+  const geography = r.geography || 'Unknown';
+  const product = r.product || 'Unknown';
+  const vintage = vintageKey(r.loanDisbursedDate);
+  const key = `${dpdBucket}\u0001${geography}\u0001${product}\u0001${vintage}`;
+  let c = cells.get(key);
+  if (!c) {
+    c = {
+      dpdBucket, geography, product, vintage,
+      loanCount: 0, balance: 0, disbursed: 0, overdue: 0, interestWeighted: 0,
+      par30Count: 0, par30Balance: 0, par90Count: 0, par90Balance: 0,
+      writtenOffCount: 0, writtenOffBalance: 0, recovery: 0,
+    };
+    cells.set(key, c);
+  }
+  const bal = r.currentBalance * sign;
+  c.loanCount += sign;
+  c.balance += bal;
+  c.disbursed += r.loanDisbursedAmount * sign;
+  c.overdue += r.totalOverdueAmount * sign;
+  c.interestWeighted += r.interestRate * bal;
+  if (r.dpdAsOfReportingDate > 30) { c.par30Count += sign; c.par30Balance += bal; }
+  if (r.dpdAsOfReportingDate > 90) { c.par90Count += sign; c.par90Balance += bal; }
+  if (r.loanWrittenOff) { c.writtenOffCount += sign; c.writtenOffBalance += bal; }
+  c.recovery += r.recoveryAfterWriteoff * sign;
+  if (c.loanCount === 0) cells.delete(key);
+}
+
+export function computeRollup(rows: LoanLevelRow[]): RollupCells {
+  const cells: RollupCells = new Map();
+  for (const r of rows) applyToRollup(cells, r, 1);
+  return cells;
+}
+
+export function cloneRollup(cells: RollupCells): RollupCells {
+  const out: RollupCells = new Map();
+  for (const [k, c] of cells) out.set(k, { ...c });
+  return out;
+}
+
+/* ================================================================
+   Storage
+   ================================================================ */
+
+// Replace a transaction's stored cells with those of its newly ready book
+export async function writePortfolioRollup(
+  client: RollupClient,
+  transactionId: string,
+  loanBookId: string,
+  cells: RollupCells,
+): Promise<void> {
+  const nbfiId = getNbfiIdForTransaction(transactionId);
+  const data = [...cells.values()].map((c) => ({ ...c, nbfiId, transactionId, loanBookId }));
+  await client.portfolioRollup.deleteMany({ where: { transactionId } });
+  for (let i = 0; i < data.length; i += LOAN_WRITE_BATCH) {
+    await client.portfolioRollup.createMany({ data: data.slice(i, i + LOAN_WRITE_BATCH) });
+  }
+}
+
+// Stored cells of one book, or null when the rollup no longer holds that book
+export async function readRollupCells(client: RollupClient, loanBookId: string): Promise<RollupCells | null> {
+  const rows = await client.portfolioRollup.findMany({ where: { loanBookId } });
+  if (rows.length === 0) return null;
+  const cells: RollupCells = new Map();
+  for (const r of rows) {
+    const c: RollupCell = { dpdBucket: r.dpdBucket, geography: r.geography, product: r.product, vintage: r.vintage } as RollupCell;
+    for (const m of MEASURES) c[m] = r[m];
+    cells.set(`${c.dpdBucket}\u0001${c.geography}\u0001${c.product}\u0001${c.vintage}`, c);
+  }
+  return cells;
+}
+
+// Rebuild cells for transactions whose latest ready book has none (books written before the
+// rollup existed, or whose rollup write was lost). Returns the number of books rolled up.
+export async function syncPortfolioRollup(client: RollupClient): Promise<number> {
+  const books = await client.loanBook.findMany({
+    where: { status: 'ready' },
+    orderBy: { uploadedAt: 'desc' },
+    select: { id: true, nbfiId: true },
+  });
+  const latest = new Map<string, string>();
+  for (const b of books) if (!latest.has(b.nbfiId)) latest.set(b.nbfiId, b.id);
+
+  const stored = await client.portfolioRollup.findMany({ distinct: ['transactionId'], select: { transactionId: true, loanBookId: true } });
+  const current = new Map(stored.map((s) => [s.transactionId, s.loanBookId]));
+
+  let rebuilt = 0;
+  for (const [transactionId, loanBookId] of latest) {
+    if (current.get(transactionId) === loanBookId) continue;
+    await writePortfolioRollup(client, transactionId, loanBookId, computeRollup(await readLoanRows(client, loanBookId)));
+    rebuilt++;
+  }
+  // Transactions whose books were all removed
+  const orphaned = [...current.keys()].filter((t) => !latest.has(t));
+  if (orphaned.length) await client.portfolioRollup.deleteMany({ where: { transactionId: { in: orphaned } } });
+  return rebuilt;
+}
+
+const globalForRollup = globalThis as unknown as { rollupSync: Promise<number> | undefined };
+
+// syncPortfolioRollup against the app database; concurrent callers share one run
+export function ensurePortfolioRollup(): Promise<number> {
+  if (!globalForRollup.rollupSync) {
+    globalForRollup.rollupSync = db
+      .$transaction((tx) => syncPortfolioRollup(tx), { timeout: 120000 })
+      .finally(() => { globalForRollup.rollupSync = undefined; });
+  }
+  return globalForRollup.rollupSync;
+}
+
+/* ================================================================
+   Queries
+   ================================================================ */
+
+export const ROLLUP_DIMENSIONS = ['nbfiId', 'transactionId', 'dpdBucket', 'geography', 'product', 'vintage'] as const;
+export type RollupDimension = (typeof ROLLUP_DIMENSIONS)[number];
+
+export interface RollupFilter {
+  nbfiIds?: string[];
+  transactionIds?: string[];
+  dpdBuckets?: string[];
+  geographies?: string[];
+  products?: string[];
+  vintages?: string[];
+}
+
+export interface RollupGroup extends Record<Measure, number> {
+  key: Partial<Record<RollupDimension, string>>;
+  avgInterest: number;                     // balance-weighted, %
+  bucketBalances: Record<string, number>;
+  bucketCounts: Record<string, number>;
+  expectedLoss: number;                    // = lifetime ECL
+  ecl12m: number;
+  provisions: number;
+}
+
+export interface PortfolioRollupResult {
+  groups: RollupGroup[];
+  totals: RollupGroup;
+  dimensions: { nbfiId: string[]; geography: string[]; product: string[]; vintage: string[] };
+}
+
+function rollupWhere(f: RollupFilter): Prisma.PortfolioRollupWhereInput {
+  const where: Prisma.PortfolioRollupWhereInput = {};
+  if (f.nbfiIds?.length) where.nbfiId = { in: f.nbfiIds };
+  if (f.transactionIds?.length) where.transactionId = { in: f.transactionIds };
+  if (f.dpdBuckets?.length) where.dpdBucket = { in: f.dpdBuckets };
+  if (f.geographies?.length) where.geography = { in: f.geographies };
+  if (f.products?.length) where.product = { in: f.products };
+  if (f.vintages?.length) where.vintage = { in: f.vintages };
+  return where;
+}
+
+function emptyGroup(key: RollupGroup['key']): RollupGroup {
+  const bucketBalances: Record<string, number> = {};
+  const bucketCounts: Record<string, number> = {};
+  for (const b of DPD_BUCKETS) { bucketBalances[b] = 0; bucketCounts[b] = 0; }
+  const g = { key, avgInterest: 0, bucketBalances, bucketCounts, expectedLoss: 0, ecl12m: 0, provisions: 0 } as RollupGroup;
+  for (const m of MEASURES) g[m] = 0;
+  return g;
+}
+
+function finishGroup(g: RollupGroup): RollupGroup {
+  g.avgInterest = g.balance > 0 ? g.interestWeighted / g.balance : 0;
+  Object.assign(g, bucketLosses(g.bucketBalances));
+  return g;
+}
+
+// Sums of the stored cells grouped by `groupBy`. The DPD bucket is always grouped on in SQL
+// and folded here, so bucket-rate losses and provisions come out of the same query.
+export async function queryPortfolioRollup(
+  client: RollupClient,
+  groupBy: RollupDimension[],
+  filter: RollupFilter = {},
+): Promise<PortfolioRollupResult> {
+  const where = rollupWhere(filter);
+  const by = [...new Set<RollupDimension>([...groupBy, 'dpdBucket'])];
+  const _sum = Object.fromEntries(MEASURES.map((m) => [m, true])) as Record<Measure, true>;
+  const rows = await client.portfolioRollup.groupBy({ by, where, _sum });
+
+  const groups = new Map<string, RollupGroup>();
+  const totals = emptyGroup({});
+  for (const row of rows as unknown as (Record<RollupDimension, string> & { _sum: Record<Measure, number | null> })[]) {
+    const key: RollupGroup['key'] = {};
+    for (const d of groupBy) key[d] = row[d];
+    const k = groupBy.map((d) => row[d]).join('\u0001');
+    let g = groups.get(k);
+    if (!g) groups.set(k, (g = emptyGroup(key)));
+    for (const target of [g, totals]) {
+      for (const m of MEASURES) target[m] += row._sum[m] ?? 0;
+      target.bucketBalances[row.dpdBucket] += row._sum.balance ?? 0;
+      target.bucketCounts[row.dpdBucket] += row._sum.loanCount ?? 0;
+    }
+  }
+
+  const distinct = async (field: 'nbfiId' | 'geography' | 'product' | 'vintage') =>
+    (await client.portfolioRollup.findMany({
+      distinct: [field],
+      select: { [field]: true } as Prisma.PortfolioRollupSelect,
+      orderBy: { [field]: 'asc' } as Prisma.PortfolioRollupOrderByWithRelationInput,
+    })).map((r) => (r as Record<string, string>)[field]);
+  const [nbfiId, geography, product, vintage] = await Promise.all([
+    distinct('nbfiId'), distinct('geography'), distinct('product'), distinct('vintage'),
+  ]);
+
+  return {
+    groups: [...groups.values()].map(finishGroup),
+    totals: finishGroup(totals),
+    dimensions: { nbfiId, geography, product, vintage },
+  };
+}
@@ -99,6 +99,20 @@ export function computeProvisions(rows: LoanLevelRow[]) {
   return total;
 }
 
+// Bucket-rate losses from pre-aggregated balances (e.g. PortfolioRollup cells).
+// Same rates as estimateLoss / computeECL / computeProvisions, without the loans.
+export function bucketLosses(bucketBalances: Record<string, number>) {
+  let expectedLoss = 0, ecl12m = 0, provisions = 0;
+  for (const [bucket, bal] of Object.entries(bucketBalances)) {
+    const rate = LOSS_RATES[bucket] ?? 0;
+    const lgd = bucket === 'Current' || bucket === '1-30' ? 0.45 : 0.65;
+    expectedLoss += bal * rate;
+    ecl12m += bal * Math.min(rate, 1.0) * lgd;
+    provisions += bal * (LENDER_PROVISION_RATES[bucket] ?? 0);
+  }
+  return { expectedLoss, ecl12m, provisions };
+}
+
 /* ================================================================
    Financial Summary
    ================================================================ */
@@ -123,11 +137,26 @@ export function computeFinancialSummary(rows: LoanLevelRow[]) {
    Roll Rate Projection (Markov chain forward)
    ================================================================ */
 
-export function rollRateProjection(rows: LoanLevelRow[], periods = 3, scenario: ScenarioKey = 'base') {
-  const matrix = SCENARIO_MATRICES[scenario];
+// `matrix` overrides the hard-coded scenario matrix, e.g. an empirical estimate from transitionMatrix.ts
+export function rollRateProjection(
+  rows: LoanLevelRow[],
+  periods = 3,
+  scenario: ScenarioKey = 'base',
+  matrix?: Record<string, Record<string, number>>,
+) {
   const current: Record<string, number> = {};
   DPD_BUCKETS.forEach(b => (current[b] = 0));
   rows.forEach(r => { current[getDpdBucket(r.dpdAsOfReportingDate)] += r.currentBalance; });
+  return projectBucketBalances(current, periods, scenario, matrix);
+}
+
+// Same projection starting from pre-aggregated bucket balances (e.g. PortfolioMetrics.bucketBalances)
+export function projectBucketBalances(
+  current: Record<string, number>,
+  periods = 3,
+  scenario: ScenarioKey = 'base',
+  matrix: Record<string, Record<string, number>> = SCENARIO_MATRICES[scenario],
+) {
   const result = [{ ...current }];
   for (let p = 0; p < periods; p++) {
     const next: Record<string, number> = {};
@@ -161,89 +190,165 @@ export function computeCureRate(rows: LoanLevelRow[]) {
 }
 
 /* ================================================================
-   Vintage Analysis — balance-weighted PAR
+   Group-by Index — one pass per breakdown
+   Assigns each row a group code and accumulates per-group partial sums
+   (including estimated loss), so vintage / dimension breakdowns are linear
+   in row count instead of re-filtering the book per group.
    ================================================================ */
 
-export function computeVintageData(rows: LoanLevelRow[]) {
-  const map: Record<string, { count: number; disbursed: number; balance: number; dpd30Bal: number; dpd90Bal: number; chargeoffs: number; recoveries: number }> = {};
-  rows.forEach(r => {
-    const q = r.loanDisbursedDate.slice(0, 4) + '-Q' + Math.ceil((parseInt(r.loanDisbursedDate.slice(5, 7)) || 1) / 3);
-    if (!map[q]) map[q] = { count: 0, disbursed: 0, balance: 0, dpd30Bal: 0, dpd90Bal: 0, chargeoffs: 0, recoveries: 0 };
-    map[q].count++;
-    map[q].disbursed += r.loanDisbursedAmount;
-    map[q].balance += r.currentBalance;
-    if (r.dpdAsOfReportingDate > 30) map[q].dpd30Bal += r.currentBalance;
-    if (r.dpdAsOfReportingDate > 90) map[q].dpd90Bal += r.currentBalance;
-    if (r.loanWrittenOff) map[q].chargeoffs += r.currentBalance;
-    map[q].recoveries += r.recoveryAfterWriteoff;
-  });
-  return Object.entries(map).sort(([a], [b]) => a.localeCompare(b)).map(([vintage, d]) => ({
-    vintage, ...d,
-    dpd30Pct: d.balance > 0 ? (d.dpd30Bal / d.balance) * 100 : 0,
-    dpd90Pct: d.balance > 0 ? (d.dpd90Bal / d.balance) * 100 : 0,
-    cnl: d.disbursed > 0 ? ((d.chargeoffs - d.recoveries) / d.disbursed) * 100 : 0,
-    estLossRate: d.balance > 0 ? estimateLoss(rows.filter(r => (r.loanDisbursedDate.slice(0, 4) + '-Q' + Math.ceil((parseInt(r.loanDisbursedDate.slice(5, 7)) || 1) / 3)) === vintage)).rate * 100 : 0,
+export interface GroupStats {
+  count: number;
+  disbursed: number;
+  balance: number;
+  dpd30Bal: number;
+  dpd90Bal: number;
+  overdue: number;
+  chargeoffs: number;
+  recoveries: number;
+  lossAmt: number;
+}
+
+export interface GroupIndex {
+  keys: string[];          // group key per code, in first-seen order
+  codes: Int32Array;       // group code per row
+  stats: GroupStats[];     // partial sums per code
+}
+
+const vintageKeyCache = new Map<string, string>();
+
+export function vintageKey(disbursedDate: string): string {
+  let q = vintageKeyCache.get(disbursedDate);
+  if (q === undefined) {
+    q = disbursedDate.slice(0, 4) + '-Q' + Math.ceil((parseInt(disbursedDate.slice(5, 7)) || 1) / 3);
+    if (vintageKeyCache.size > 10000) vintageKeyCache.clear();
+    vintageKeyCache.set(disbursedDate, q);
+  }
+  return q;
+}
+
+function emptyStats(): GroupStats {
+  return { count: 0, disbursed: 0, balance: 0, dpd30Bal: 0, dpd90Bal: 0, overdue: 0, chargeoffs: 0, recoveries: 0, lossAmt: 0 };
+}
+
+export function buildGroupIndexes<K extends string>(
+  rows: LoanLevelRow[],
+  keyFns: Record<K, (r: LoanLevelRow) => string>,
+): Record<K, GroupIndex> {
+  const dims = Object.keys(keyFns) as K[];
+  const state = dims.map(dim => ({
+    dim, keyFn: keyFns[dim], lookup: new Map<string, number>(),
+    index: { keys: [] as string[], codes: new Int32Array(rows.length), stats: [] as GroupStats[] },
   }));
+  for (let i = 0; i < rows.length; i++) {
+    const r = rows[i];
+    const bal = r.currentBalance;
+    const loss = bal * (LOSS_RATES[getDpdBucket(r.dpdAsOfReportingDate)] ?? 0);
+    for (const st of state) {
+      const k = st.keyFn(r);
+      let c = st.lookup.get(k);
+      if (c === undefined) {
+        c = st.index.keys.length;
+        st.lookup.set(k, c);
+        st.index.keys.push(k);
+        st.index.stats.push(emptyStats());
+      }
+      st.index.codes[i] = c;
+      const g = st.index.stats[c];
+      g.count++;
+      g.disbursed += r.loanDisbursedAmount;
+      g.balance += bal;
+      g.overdue += r.totalOverdueAmount;
+      if (r.dpdAsOfReportingDate > 30) g.dpd30Bal += bal;
+      if (r.dpdAsOfReportingDate > 90) g.dpd90Bal += bal;
+      if (r.loanWrittenOff) g.chargeoffs += bal;
+      g.recoveries += r.recoveryAfterWriteoff;
+      g.lossAmt += loss;
+    }
+  }
+  const out = {} as Record<K, GroupIndex>;
+  for (const st of state) out[st.dim] = st.index;
+  return out;
+}
+
+export function buildGroupIndex(rows: LoanLevelRow[], keyFn: (r: LoanLevelRow) => string): GroupIndex {
+  return buildGroupIndexes(rows, { key: keyFn }).key;
+}
+
+const byVintage = (r: LoanLevelRow) => vintageKey(r.loanDisbursedDate);
+
+/* ================================================================
+   Vintage Analysis — balance-weighted PAR
+   ================================================================ */
+
+export function computeVintageData(rows: LoanLevelRow[], index: GroupIndex = buildGroupIndex(rows, byVintage)) {
+  return index.keys
+    .map((vintage, c) => ({ vintage, d: index.stats[c] }))
+    .sort((a, b) => a.vintage.localeCompare(b.vintage))
+    .map(({ vintage, d }) => ({
+      vintage,
+      count: d.count, disbursed: d.disbursed, balance: d.balance, dpd30Bal: d.dpd30Bal, dpd90Bal: d.dpd90Bal, chargeoffs: d.chargeoffs, recoveries: d.recoveries,
+      dpd30Pct: d.balance > 0 ? (d.dpd30Bal / d.balance) * 100 : 0,
+      dpd90Pct: d.balance > 0 ? (d.dpd90Bal / d.balance) * 100 : 0,
+      cnl: d.disbursed > 0 ? ((d.chargeoffs - d.recoveries) / d.disbursed) * 100 : 0,
+      estLossRate: d.balance > 0 ? (d.lossAmt / d.balance) * 100 : 0,
+    }));
 }
 
 /* ================================================================
    Vintage CNL Curves (by months-on-book)
    ================================================================ */
 
-export function computeVintageCurves(rows: LoanLevelRow[]) {
-  const vintageGroups: Record<string, LoanLevelRow[]> = {};
-  rows.forEach(r => {
-    const q = r.loanDisbursedDate.slice(0, 4) + '-Q' + Math.ceil((parseInt(r.loanDisbursedDate.slice(5, 7)) || 1) / 3);
-    if (!vintageGroups[q]) vintageGroups[q] = [];
-    vintageGroups[q].push(r);
+export function computeVintageCurves(rows: LoanLevelRow[], index: GroupIndex = buildGroupIndex(rows, byVintage)) {
+  const codeByVintage = new Map(index.keys.map((k, c) => [k, c]));
+  const vintages = [...index.keys].sort().slice(-6);
+  // Full-life CNL per vintage is MOB-independent — compute once, then ramp
+  const cnlFull = vintages.map(v => {
+    const d = index.stats[codeByVintage.get(v)!];
+    return d.disbursed > 0 ? ((d.chargeoffs - d.recoveries) / d.disbursed) * 100 : 0;
   });
-  const vintages = Object.keys(vintageGroups).sort().slice(-6);
-  const mobPoints: Record<string, Record<string, number>> = {};
+  const data: ({ mob: number } & Record<string, number>)[] = [];
   for (let mob = 1; mob <= 18; mob++) {
-    mobPoints[`${mob}`] = {};
-    for (const v of vintages) {
-      const grp = vintageGroups[v];
-      const origVol = grp.reduce((s, r) => s + r.loanDisbursedAmount, 0);
-      const chargeoffs = grp.filter(r => r.loanWrittenOff).reduce((s, r) => s + r.currentBalance, 0);
-      const recoveries = grp.reduce((s, r) => s + r.recoveryAfterWriteoff, 0);
-      const cnlFull = origVol > 0 ? ((chargeoffs - recoveries) / origVol) * 100 : 0;
-      const ramp = Math.min(mob / 18, 1.0);
-      const cnl = Math.round(Math.max(0, cnlFull * ramp) * 100) / 100;
-      mobPoints[`${mob}`][v] = cnl;
-    }
+    const point = { mob } as { mob: number } & Record<string, number>;
+    const ramp = Math.min(mob / 18, 1.0);
+    vintages.forEach((v, i) => { point[v] = Math.round(Math.max(0, cnlFull[i] * ramp) * 100) / 100; });
+    data.push(point);
   }
-  return { vintages, data: Object.entries(mobPoints).map(([mob, vals]) => ({ mob: parseInt(mob), ...vals })) };
+  return { vintages, data };
 }
 
 /* ================================================================
    Dimension Data — balance-weighted PAR
    ================================================================ */
 
+function dimensionRows(index: GroupIndex) {
+  return index.keys.map((name, c) => {
+    const d = index.stats[c];
+    return {
+      name,
+      count: d.count, balance: d.balance, dpd30Bal: d.dpd30Bal, dpd90Bal: d.dpd90Bal, overdue: d.overdue,
+      par30: d.balance > 0 ? (d.dpd30Bal / d.balance) * 100 : 0,
+      par90: d.balance > 0 ? (d.dpd90Bal / d.balance) * 100 : 0,
+      estLoss: d.balance > 0 ? (d.lossAmt / d.balance) * 100 : 0,
+    };
+  }).sort((a, b) => b.estLoss - a.estLoss);
+}
+
 export function computeDimensionData(rows: LoanLevelRow[], keyFn: (r: LoanLevelRow) => string) {
-  const map: Record<string, { count: number; balance: number; dpd30Bal: number; dpd90Bal: number; overdue: number }> = {};
-  rows.forEach(r => {
-    const k = keyFn(r);
-    if (!map[k]) map[k] = { count: 0, balance: 0, dpd30Bal: 0, dpd90Bal: 0, overdue: 0 };
-    map[k].count++;
-    map[k].balance += r.currentBalance;
-    map[k].overdue += r.totalOverdueAmount;
-    if (r.dpdAsOfReportingDate > 30) map[k].dpd30Bal += r.currentBalance;
-    if (r.dpdAsOfReportingDate > 90) map[k].dpd90Bal += r.currentBalance;
-  });
-  return Object.entries(map).map(([name, d]) => ({
-    name, ...d,
-    par30: d.balance > 0 ? (d.dpd30Bal / d.balance) * 100 : 0,
-    par90: d.balance > 0 ? (d.dpd90Bal / d.balance) * 100 : 0,
-    estLoss: estimateLoss(rows.filter(r => keyFn(r) === name)).rate * 100,
-  })).sort((a, b) => b.estLoss - a.estLoss);
+  return dimensionRows(buildGroupIndex(rows, keyFn));
 }
 
 export function computeStressIndicators(rows: LoanLevelRow[]) {
+  const idx = buildGroupIndexes(rows, {
+    geography: r => r.geography || 'Unknown',
+    product: r => r.product || 'Unknown',
+    segment: r => r.segment || 'Unknown',
+    ticketSize: r => ticketBucket(r.loanDisbursedAmount),
+  });
   return {
-    geography: computeDimensionData(rows, r => r.geography || 'Unknown'),
-    product: computeDimensionData(rows, r => r.product || 'Unknown'),
-    segment: computeDimensionData(rows, r => r.segment || 'Unknown'),
-    ticketSize: computeDimensionData(rows, r => ticketBucket(r.loanDisbursedAmount)),
+    geography: dimensionRows(idx.geography),
+    product: dimensionRows(idx.product),
+    segment: dimensionRows(idx.segment),
+    ticketSize: dimensionRows(idx.ticketSize),
   };
 }
 
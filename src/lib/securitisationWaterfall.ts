@@ -21,32 +21,83 @@ export interface WaterfallResult {
   equityResidual: number;
 }
 
-export function runWaterfall(
+// Tranche setup shared by every stress cell with the same pool, structure and term
+export interface PreparedWaterfall {
+  poolBalance: number;
+  avgRate: number;
+  structure: SecuritisationStructure;
+  periods: number;
+  monthlyRate: number;
+  initSenior: number;
+  initMezz: number;
+  initEquity: number;
+  seniorShare: number;
+  mezzShare: number;
+  equityShare: number;
+  seniorCoupon: number;
+  mezzCoupon: number;
+}
+
+export function prepareWaterfall(
   poolBalance: number,
   avgRate: number,
   structure: SecuritisationStructure,
-  lossRate: number,
-  prepayRate: number,
   periods: number = 12,
-): WaterfallResult {
+): PreparedWaterfall {
   const ocFactor = 1 + structure.overCollateralisationPct / 100;
   const noteBalance = poolBalance / ocFactor;
+  return {
+    poolBalance,
+    avgRate,
+    structure,
+    periods,
+    monthlyRate: avgRate / 100 / 12,
+    initSenior: noteBalance * (structure.seniorPct / 100),
+    initMezz: noteBalance * (structure.mezzaninePct / 100),
+    initEquity: noteBalance * (structure.equityPct / 100),
+    seniorShare: structure.seniorPct / 100,
+    mezzShare: structure.mezzaninePct / 100,
+    equityShare: structure.equityPct / 100,
+    seniorCoupon: structure.seniorCoupon / 100 / 12,
+    mezzCoupon: structure.mezzanineCoupon / 100 / 12,
+  };
+}
 
-  let seniorBal = noteBalance * (structure.seniorPct / 100);
-  let mezzBal = noteBalance * (structure.mezzaninePct / 100);
-  let equityBal = noteBalance * (structure.equityPct / 100);
-
-  const seniorCoupon = structure.seniorCoupon / 100 / 12;
-  const mezzCoupon = structure.mezzanineCoupon / 100 / 12;
+// Raw outcome of one cell — what the grid engine and breakeven solver need
+export interface WaterfallTotals {
+  totalCollections: number;
+  totalLosses: number;
+  seniorIntPaid: number; seniorPrinPaid: number; seniorShortfall: number; seniorBal: number;
+  mezzIntPaid: number; mezzPrinPaid: number; mezzShortfall: number; mezzBal: number;
+  equityIntPaid: number; equityBal: number;
+}
 
-  let runningPool = poolBalance;
-  let totalCollections = 0;
-  let totalLosses = 0;
+// Pool-level cash flows per period, before allocation to the tranches
+export interface PoolCashflows {
+  periods: number;
+  interest: Float64Array;
+  scheduledPrincipal: Float64Array;
+  prepayment: Float64Array;
+  recoveries: Float64Array;   // recovered share of defaulted balance, collected as principal
+  losses: Float64Array;
+}
 
-  let seniorIntPaid = 0, seniorPrinPaid = 0, seniorShortfall = 0;
-  let mezzIntPaid = 0, mezzPrinPaid = 0, mezzShortfall = 0;
-  let equityIntPaid = 0;
+export function emptyCashflows(periods: number): PoolCashflows {
+  return {
+    periods,
+    interest: new Float64Array(periods),
+    scheduledPrincipal: new Float64Array(periods),
+    prepayment: new Float64Array(periods),
+    recoveries: new Float64Array(periods),
+    losses: new Float64Array(periods),
+  };
+}
 
+// The pool amortised as one loan at its average rate, with flat annual loss and prepay rates
+export function poolAverageCashflows(w: PreparedWaterfall, lossRate: number, prepayRate: number): PoolCashflows {
+  const { periods } = w;
+  const cf = emptyCashflows(periods);
+  let runningPool = w.poolBalance;
   const monthlyLossRate = 1 - Math.pow(1 - lossRate / 100, 1 / 12);
   const monthlyPrepay = prepayRate / 100 / 12;
 
@@ -54,11 +105,35 @@ export function runWaterfall(
     const periodLoss = runningPool * monthlyLossRate;
     const periodPrepay = runningPool * monthlyPrepay;
     const scheduledPrincipal = runningPool / Math.max(periods - m, 1);
-    const interestIncome = runningPool * (avgRate / 100 / 12);
-    const actualPrincipal = scheduledPrincipal + periodPrepay;
+    cf.interest[m] = runningPool * w.monthlyRate;
+    cf.scheduledPrincipal[m] = scheduledPrincipal;
+    cf.prepayment[m] = periodPrepay;
+    cf.losses[m] = periodLoss;
 
-    runningPool -= (actualPrincipal + periodLoss);
+    runningPool -= (scheduledPrincipal + periodPrepay + periodLoss);
     if (runningPool < 0) runningPool = 0;
+  }
+  return cf;
+}
+
+// Sequential-pay allocation: Senior interest, Mezzanine interest, Senior principal, Mezzanine principal, residual to Equity
+export function allocateWaterfall(w: PreparedWaterfall, cf: PoolCashflows): WaterfallTotals {
+  let seniorBal = w.initSenior;
+  let mezzBal = w.initMezz;
+  let equityBal = w.initEquity;
+
+  let totalCollections = 0;
+  let totalLosses = 0;
+
+  let seniorIntPaid = 0, seniorPrinPaid = 0, seniorShortfall = 0;
+  let mezzIntPaid = 0, mezzPrinPaid = 0, mezzShortfall = 0;
+  let equityIntPaid = 0;
+
+  for (let m = 0; m < cf.periods; m++) {
+    const periodLoss = cf.losses[m];
+    const scheduledPrincipal = cf.scheduledPrincipal[m];
+    const interestIncome = cf.interest[m];
+    const actualPrincipal = scheduledPrincipal + cf.prepayment[m] + cf.recoveries[m];
 
     const availableCash = interestIncome + actualPrincipal - periodLoss;
     totalCollections += interestIncome + actualPrincipal;
@@ -66,26 +141,26 @@ export function runWaterfall(
 
     let remaining = Math.max(availableCash, 0);
 
-    const seniorIntDue = seniorBal * seniorCoupon;
+    const seniorIntDue = seniorBal * w.seniorCoupon;
     const seniorIntActual = Math.min(remaining, seniorIntDue);
     remaining -= seniorIntActual;
     seniorIntPaid += seniorIntActual;
     if (seniorIntActual < seniorIntDue) seniorShortfall += seniorIntDue - seniorIntActual;
 
-    const mezzIntDue = mezzBal * mezzCoupon;
+    const mezzIntDue = mezzBal * w.mezzCoupon;
     const mezzIntActual = Math.min(remaining, mezzIntDue);
     remaining -= mezzIntActual;
     mezzIntPaid += mezzIntActual;
     if (mezzIntActual < mezzIntDue) mezzShortfall += mezzIntDue - mezzIntActual;
 
-    const seniorPrinDue = Math.min(seniorBal, scheduledPrincipal * (structure.seniorPct / 100));
+    const seniorPrinDue = Math.min(seniorBal, scheduledPrincipal * w.seniorShare);
     const seniorPrinActual = Math.min(remaining, seniorPrinDue);
     remaining -= seniorPrinActual;
     seniorBal -= seniorPrinActual;
     seniorPrinPaid += seniorPrinActual;
     if (seniorPrinActual < seniorPrinDue) seniorShortfall += seniorPrinDue - seniorPrinActual;
 
-    const mezzPrinDue = Math.min(mezzBal, scheduledPrincipal * (structure.mezzaninePct / 100));
+    const mezzPrinDue = Math.min(mezzBal, scheduledPrincipal * w.mezzShare);
     const mezzPrinActual = Math.min(remaining, mezzPrinDue);
     remaining -= mezzPrinActual;
     mezzBal -= mezzPrinActual;
@@ -93,19 +168,29 @@ export function runWaterfall(
     if (mezzPrinActual < mezzPrinDue) mezzShortfall += mezzPrinDue - mezzPrinActual;
 
     equityIntPaid += remaining;
-    equityBal = Math.max(equityBal - periodLoss * (structure.equityPct / 100), 0);
+    equityBal = Math.max(equityBal - periodLoss * w.equityShare, 0);
   }
 
-  const initSenior = noteBalance * (structure.seniorPct / 100);
-  const initMezz = noteBalance * (structure.mezzaninePct / 100);
-  const initEquity = noteBalance * (structure.equityPct / 100);
+  return {
+    totalCollections, totalLosses,
+    seniorIntPaid, seniorPrinPaid, seniorShortfall, seniorBal,
+    mezzIntPaid, mezzPrinPaid, mezzShortfall, mezzBal,
+    equityIntPaid, equityBal,
+  };
+}
+
+export function simulateWaterfall(w: PreparedWaterfall, lossRate: number, prepayRate: number): WaterfallTotals {
+  return allocateWaterfall(w, poolAverageCashflows(w, lossRate, prepayRate));
+}
 
+export function waterfallResult(w: PreparedWaterfall, t: WaterfallTotals, lossRate: number, prepayRate: number): WaterfallResult {
+  const { structure, periods } = w;
   const buildTranche = (
     name: 'Senior' | 'Mezzanine' | 'Equity',
     init: number, intPaid: number, prinPaid: number, endBal: number, shortfall: number,
   ): TrancheResult => {
     const annualDue = name === 'Equity' ? 0 : init * ((name === 'Senior' ? structure.seniorCoupon : structure.mezzanineCoupon) / 100);
-    const coverage = annualDue > 0 ? (intPaid + prinPaid) / (annualDue + init / (periods / 12)) : (name === 'Equity' ? (equityIntPaid > 0 ? 999 : 0) : 999);
+    const coverage = annualDue > 0 ? (intPaid + prinPaid) / (annualDue + init / (periods / 12)) : (name === 'Equity' ? (t.equityIntPaid > 0 ? 999 : 0) : 999);
     return {
       tranche: name,
       initialBalance: Math.round(init),
@@ -119,20 +204,32 @@ export function runWaterfall(
   };
 
   return {
-    poolBalance: Math.round(poolBalance),
-    totalCollections: Math.round(totalCollections),
-    totalLosses: Math.round(totalLosses),
+    poolBalance: Math.round(w.poolBalance),
+    totalCollections: Math.round(t.totalCollections),
+    totalLosses: Math.round(t.totalLosses),
     lossRate,
     prepayRate,
     tranches: [
-      buildTranche('Senior', initSenior, seniorIntPaid, seniorPrinPaid, seniorBal, seniorShortfall),
-      buildTranche('Mezzanine', initMezz, mezzIntPaid, mezzPrinPaid, mezzBal, mezzShortfall),
-      buildTranche('Equity', initEquity, equityIntPaid, 0, equityBal, 0),
+      buildTranche('Senior', w.initSenior, t.seniorIntPaid, t.seniorPrinPaid, t.seniorBal, t.seniorShortfall),
+      buildTranche('Mezzanine', w.initMezz, t.mezzIntPaid, t.mezzPrinPaid, t.mezzBal, t.mezzShortfall),
+      buildTranche('Equity', w.initEquity, t.equityIntPaid, 0, t.equityBal, 0),
     ],
-    equityResidual: Math.round(equityIntPaid),
+    equityResidual: Math.round(t.equityIntPaid),
   };
 }
 
+export function runWaterfall(
+  poolBalance: number,
+  avgRate: number,
+  structure: SecuritisationStructure,
+  lossRate: number,
+  prepayRate: number,
+  periods: number = 12,
+): WaterfallResult {
+  const w = prepareWaterfall(poolBalance, avgRate, structure, periods);
+  return waterfallResult(w, simulateWaterfall(w, lossRate, prepayRate), lossRate, prepayRate);
+}
+
 export function runStressGrid(
   poolBalance: number,
   avgRate: number,
@@ -140,20 +237,51 @@ export function runStressGrid(
   lossRates: number[] = [3, 6, 9, 12],
   prepayRates: number[] = [0, 10, 20, 30],
 ): { lossRate: number; prepayRate: number; result: WaterfallResult }[] {
+  const w = prepareWaterfall(poolBalance, avgRate, structure);
   const grid: { lossRate: number; prepayRate: number; result: WaterfallResult }[] = [];
   for (const lr of lossRates) {
     for (const pr of prepayRates) {
-      grid.push({ lossRate: lr, prepayRate: pr, result: runWaterfall(poolBalance, avgRate, structure, lr, pr) });
+      grid.push({ lossRate: lr, prepayRate: pr, result: waterfallResult(w, simulateWaterfall(w, lr, pr), lr, pr) });
     }
   }
   return grid;
 }
 
+// Largest annual loss rate (%) at which the tranche takes no shortfall, by bisection.
+// Shortfall is monotone in the loss rate, so [lo, hi] always brackets the breakeven.
+export function breakevenLossRate(
+  w: PreparedWaterfall,
+  tranche: 'Senior' | 'Mezzanine',
+  prepayRate: number,
+  tolerance: number = 0.01,
+  maxLossRate: number = 100,
+): number {
+  const impaired = (lossRate: number) => {
+    const t = simulateWaterfall(w, lossRate, prepayRate);
+    // Same rounding as TrancheResult.shortfall, so the breakeven agrees with the reported status
+    return Math.round(tranche === 'Senior' ? t.seniorShortfall : t.mezzShortfall) > 0;
+  };
+  if (impaired(0)) return 0;
+  if (!impaired(maxLossRate)) return maxLossRate;
+  let lo = 0, hi = maxLossRate;
+  while (hi - lo > tolerance) {
+    const mid = (lo + hi) / 2;
+    if (impaired(mid)) hi = mid; else lo = mid;
+  }
+  return Math.floor(lo * 100) / 100;
+}
+
 export function poolMetricsFromLoans(rows: LoanLevelRow[]) {
-  const totalBalance = rows.reduce((s, r) => s + r.currentBalance, 0);
-  const avgRate = rows.length > 0 ? rows.reduce((s, r) => s + r.interestRate, 0) / rows.length : 15;
-  const avgTenure = rows.filter(r => r.residualTenureMonths != null).length > 0
-    ? rows.filter(r => r.residualTenureMonths != null).reduce((s, r) => s + (r.residualTenureMonths || 0), 0) / rows.filter(r => r.residualTenureMonths != null).length
-    : 12;
+  let totalBalance = 0, rateSum = 0, tenureSum = 0, tenureCount = 0;
+  for (const r of rows) {
+    totalBalance += r.currentBalance;
+    rateSum += r.interestRate;
+    if (r.residualTenureMonths != null) {
+      tenureSum += r.residualTenureMonths || 0;
+      tenureCount++;
+    }
+  }
+  const avgRate = rows.length > 0 ? rateSum / rows.length : 15;
+  const avgTenure = tenureCount > 0 ? tenureSum / tenureCount : 12;
   return { totalBalance, avgRate, avgTenure };
 }
@@ -1,13 +1,13 @@
 import type { LoanLevelRow } from './types';
 import baseLoanBook from '../../data/mock-loan-book.json';
 
-const GEOGRAPHIES = ['Nairobi', 'Mombasa', 'Nakuru', 'Kisumu', 'Eldoret', 'Nyeri', 'Thika', 'Machakos', 'Malindi', 'Kitale'];
-const PRODUCTS = ['Boda-Boda', 'Agri-Finance', 'Check-off', 'SACCO', 'MSME', 'Personal', 'SME Trade'];
-const SEGMENTS = ['Individual', 'Retail', 'MSME', 'Corporate'];
-const FIRST_NAMES = ['John', 'Mary', 'Peter', 'Jane', 'James', 'Grace', 'David', 'Esther', 'Samuel', 'Wanjiku', 'Mwangi', 'Akinyi', 'Otieno', 'Nyambura', 'Kimani', 'Chebet', 'Kipchoge', 'Njeri', 'Oduor', 'Wambui'];
-const LAST_NAMES = ['Mwangi', 'Ochieng', 'Kimani', 'Njoroge', 'Wanjiku', 'Otieno', 'Akinyi', 'Chebet', 'Mutai', 'Korir', 'Ngethe', 'Wahome', 'Karanja', 'Githinji', 'Kamau'];
+export const GEOGRAPHIES = ['Nairobi', 'Mombasa', 'Nakuru', 'Kisumu', 'Eldoret', 'Nyeri', 'Thika', 'Machakos', 'Malindi', 'Kitale'];
+export const PRODUCTS = ['Boda-Boda', 'Agri-Finance', 'Check-off', 'SACCO', 'MSME', 'Personal', 'SME Trade'];
+export const SEGMENTS = ['Individual', 'Retail', 'MSME', 'Corporate'];
+export const FIRST_NAMES = ['John', 'Mary', 'Peter', 'Jane', 'James', 'Grace', 'David', 'Esther', 'Samuel', 'Wanjiku', 'Mwangi', 'Akinyi', 'Otieno', 'Nyambura', 'Kimani', 'Chebet', 'Kipchoge', 'Njeri', 'Oduor', 'Wambui'];
+export const LAST_NAMES = ['Mwangi', 'Ochieng', 'Kimani', 'Njoroge', 'Wanjiku', 'Otieno', 'Akinyi', 'Chebet', 'Mutai', 'Korir', 'Ngethe', 'Wahome', 'Karanja', 'Githinji', 'Kamau'];
 
-function seededRandom(seed: number) {
+export function seededRandom(seed: number) {
   let s = seed;
   return () => {
     s = (s * 16807 + 0) % 2147483647;
@@ -73,9 +73,9 @@ export const TRANSACTION_NAMES: Record<string, string> = {
 
 const base = baseLoanBook as LoanLevelRow[];
 
-type HealthProfile = { current: number; d1_30: number; d31_60: number; d61_90: number; d91_180: number; d180p: number };
+export type HealthProfile = { current: number; d1_30: number; d31_60: number; d61_90: number; d91_180: number; d180p: number };
 
-const NBFI_HEALTH: Record<string, HealthProfile> = {
+export const NBFI_HEALTH: Record<string, HealthProfile> = {
   'seed-1': { current: 0.71, d1_30: 0.13, d31_60: 0.07, d61_90: 0.04, d91_180: 0.03, d180p: 0.02 },
   'seed-2': { current: 0.74, d1_30: 0.12, d31_60: 0.06, d61_90: 0.03, d91_180: 0.03, d180p: 0.02 },
   'seed-3': { current: 0.78, d1_30: 0.10, d31_60: 0.05, d61_90: 0.03, d91_180: 0.02, d180p: 0.02 },
@@ -88,7 +88,7 @@ const NBFI_HEALTH: Record<string, HealthProfile> = {
   'seed-10': { current: 0.70, d1_30: 0.13, d31_60: 0.07, d61_90: 0.04, d91_180: 0.03, d180p: 0.03 },
 };
 
-function assignDpd(rng: () => number, profile: HealthProfile): number {
+export function assignDpd(rng: () => number, profile: HealthProfile): number {
   const r = rng();
   const { current, d1_30, d31_60, d61_90, d91_180 } = profile;
   if (r < current) return 0;
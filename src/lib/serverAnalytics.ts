@@ -0,0 +1,237 @@
+/**
+ * Server-side analytics payload for one NBFI's latest loan book.
+ * Runs the rollRate.ts / securitisationWaterfall.ts functions next to the data
+ * and returns only the aggregated results, so dashboards fetch kilobytes rather
+ * than the full loan array.
+ */
+
+import { db } from './db';
+import { analyticsCache, analyticsKey, loanRowsCache } from './analyticsCache';
+import { findLatestLoanBook, readLoanRows, readBookAggregates } from './loanStore';
+import { toPoolSelectionState } from './dbHelpers';
+import { computePortfolioMetrics, toLoanColumns } from './portfolioKernel';
+import {
+  projectBucketBalances, buildGroupIndex, vintageKey, computeVintageData, computeVintageCurves,
+  computeStressIndicators, generateTrendData, type ScenarioKey,
+} from './rollRate';
+import { applyLoanFilters, applyPoolSelection, type LoanFilters } from './poolSelection';
+import { breakevenLossRate, poolMetricsFromLoans, prepareWaterfall, runStressGrid } from './securitisationWaterfall';
+import { solveBreakevens, solveStressGrid, type Breakeven, type StressGridResult, type StressGridSpec } from './stressGrid';
+import { findLatestTransitionEstimate, stressTransitionMatrix, type TransitionMatrix } from './transitionMatrix';
+import { runMonteCarlo, type LossDistribution, type MonteCarloOptions } from './monteCarlo';
+import { CASHFLOW_CHUNK_LOANS, runLoanLevelWaterfall, type CashflowAssumptions } from './loanCashflow';
+import type { WaterfallResult } from './securitisationWaterfall';
+import type { LoanLevelRow, SecuritisationStructure } from './types';
+import { span } from './instrumentation';
+
+export interface AnalyticsRequest {
+  filters: LoanFilters;
+  scenario: ScenarioKey;
+  securityPackage: boolean;
+  trendMonths: number;
+}
+
+function poolBreakeven(pool: { totalBalance: number; avgRate: number }, structure: SecuritisationStructure) {
+  const w = prepareWaterfall(pool.totalBalance, pool.avgRate, structure);
+  return { senior: breakevenLossRate(w, 'Senior', 0), mezzanine: breakevenLossRate(w, 'Mezzanine', 0) };
+}
+
+export function computeAnalyticsPayload(
+  rows: LoanLevelRow[],
+  facilityAmount: number,
+  req: AnalyticsRequest,
+  structure?: SecuritisationStructure,
+  empirical?: { id: string; matrix: TransitionMatrix } | null,
+) {
+  const metrics = computePortfolioMetrics(toLoanColumns(rows), facilityAmount);
+  const vintageIndex = buildGroupIndex(rows, r => vintageKey(r.loanDisbursedDate));
+  const pool = structure ? poolMetricsFromLoans(rows) : null;
+  return {
+    metrics,
+    transitionMatrix: empirical
+      ? { source: 'empirical' as const, estimateId: empirical.id, matrix: empirical.matrix }
+      : { source: 'default' as const, estimateId: null, matrix: null },
+    rollRate: projectBucketBalances(metrics.bucketBalances, 3, 'base', empirical?.matrix),
+    rollRateScenario: projectBucketBalances(
+      metrics.bucketBalances, 3, req.scenario,
+      empirical ? stressTransitionMatrix(empirical.matrix, req.scenario) : undefined,
+    ),
+    vintages: computeVintageData(rows, vintageIndex),
+    vintageCurves: computeVintageCurves(rows, vintageIndex),
+    stress: computeStressIndicators(rows),
+    trend: generateTrendData(rows, req.trendMonths),
+    waterfall: pool && structure
+      ? { pool, grid: runStressGrid(pool.totalBalance, pool.avgRate, structure), breakeven: poolBreakeven(pool, structure) }
+      : null,
+  };
+}
+
+export type AnalyticsPayload = ReturnType<typeof computeAnalyticsPayload>;
+
+// Filter options of the analytics views: the distinct values in the whole, unfiltered book
+export function bookDimensions(rows: LoanLevelRow[]) {
+  const geography = new Set<string>(), product = new Set<string>(), segment = new Set<string>();
+  for (const r of rows) {
+    geography.add(r.geography || 'Unknown');
+    product.add(r.product || 'Unknown');
+    segment.add(r.segment || 'Unknown');
+  }
+  return { geography: [...geography].sort(), product: [...product].sort(), segment: [...segment].sort() };
+}
+
+export type NbfiAnalytics = AnalyticsPayload & { dimensions: ReturnType<typeof bookDimensions> };
+
+export async function loadBookRows(loanBookId: string): Promise<LoanLevelRow[]> {
+  const cached = loanRowsCache.get(loanBookId);
+  if (cached) return cached;
+  const rows = await readLoanRows(db, loanBookId);
+  loanRowsCache.set(loanBookId, rows);
+  return rows;
+}
+
+export async function getNbfiAnalytics(
+  nbfiId: string,
+  req: AnalyticsRequest,
+): Promise<{ payload: NbfiAnalytics; loanBookId: string; cacheHit: boolean } | null> {
+  const [nbfi, book, ps, estimate] = await Promise.all([
+    db.nbfi.findUnique({ where: { id: nbfiId }, select: { fundingAmount: true, securitisationStructure: true } }),
+    findLatestLoanBook(db, nbfiId),
+    db.poolSelection.findUnique({ where: { nbfiId } }),
+    db.transitionEstimate.findFirst({ where: { nbfiId }, orderBy: { createdAt: 'desc' }, select: { id: true } }),
+  ]);
+  if (!nbfi || !book) return null;
+
+  const selection = ps ? toPoolSelectionState(ps) : undefined;
+  const key = analyticsKey(nbfiId, {
+    book: book.id,
+    pool: req.securityPackage && selection?.confirmedAt ? selection : null,
+    filters: req.filters,
+    scenario: req.scenario,
+    trendMonths: req.trendMonths,
+    facility: nbfi.fundingAmount,
+    structure: nbfi.securitisationStructure,
+    transitions: estimate?.id ?? null,
+  });
+  const hit = analyticsCache.get(key) as NbfiAnalytics | undefined;
+  if (hit) return { payload: hit, loanBookId: book.id, cacheHit: true };
+
+  const bookRows = await loadBookRows(book.id);
+  const structure = nbfi.securitisationStructure ? (JSON.parse(nbfi.securitisationStructure) as SecuritisationStructure) : undefined;
+  const empirical = estimate ? await findLatestTransitionEstimate(db, nbfiId) : null;
+  const payload: NbfiAnalytics = span('compute', () => ({
+    ...computeAnalyticsPayload(
+      req.securityPackage ? applyPoolSelection(bookRows, selection, req.filters) : applyLoanFilters(bookRows, req.filters),
+      nbfi.fundingAmount, req, structure,
+      empirical ? { id: empirical.id, matrix: empirical.overall.matrix } : null,
+    ),
+    dimensions: bookDimensions(bookRows),
+  }));
+  analyticsCache.set(key, payload);
+  return { payload, loanBookId: book.id, cacheHit: false };
+}
+
+// Monte Carlo loss distribution for the latest book, from its stored bucket aggregates
+export async function getNbfiMonteCarlo(
+  nbfiId: string,
+  opts: Omit<MonteCarloOptions, 'matrices'>,
+): Promise<{ results: LossDistribution[]; loanBookId: string; estimateId: string | null; cacheHit: boolean } | null> {
+  const book = await findLatestLoanBook(db, nbfiId);
+  if (!book) return null;
+  const estimate = await findLatestTransitionEstimate(db, nbfiId);
+  const key = analyticsKey(nbfiId, { monteCarlo: opts, book: book.id, transitions: estimate?.id ?? null });
+  const hit = analyticsCache.get(key) as LossDistribution[] | undefined;
+  if (hit) return { results: hit, loanBookId: book.id, estimateId: estimate?.id ?? null, cacheHit: true };
+
+  const aggregates = await readBookAggregates(db, book.id);
+  const base = estimate?.overall.matrix;
+  const results = await span('compute', () => runMonteCarlo(aggregates.bucketBalances, {
+    ...opts,
+    matrices: base
+      ? { base, stress: stressTransitionMatrix(base, 'stress'), severe: stressTransitionMatrix(base, 'severe') }
+      : undefined,
+  }));
+  analyticsCache.set(key, results);
+  return { results, loanBookId: book.id, estimateId: estimate?.id ?? null, cacheHit: false };
+}
+
+// Dense stress grid (and optional breakevens) over the confirmed pool of the latest book
+export async function getNbfiStressGrid(
+  nbfiId: string,
+  spec: StressGridSpec,
+  withBreakeven: boolean,
+): Promise<{ grid: StressGridResult; breakevens: Breakeven[] | null; loanBookId: string; cacheHit: boolean } | null | 'no-structure'> {
+  const [nbfi, book, ps] = await Promise.all([
+    db.nbfi.findUnique({ where: { id: nbfiId }, select: { securitisationStructure: true } }),
+    findLatestLoanBook(db, nbfiId),
+    db.poolSelection.findUnique({ where: { nbfiId } }),
+  ]);
+  if (!nbfi || !book) return null;
+  if (!nbfi.securitisationStructure) return 'no-structure';
+
+  const structure = JSON.parse(nbfi.securitisationStructure) as SecuritisationStructure;
+  const bookRows = await loadBookRows(book.id);
+  const [grid, breakevens] = await span('compute', () => {
+    const pool = poolMetricsFromLoans(applyPoolSelection(bookRows, ps ? toPoolSelectionState(ps) : undefined));
+    return Promise.all([
+      solveStressGrid(pool.totalBalance, pool.avgRate, structure, spec),
+      withBreakeven ? solveBreakevens(pool.totalBalance, pool.avgRate, structure, spec) : null,
+    ]);
+  });
+  return {
+    grid: grid.result,
+    breakevens: breakevens?.result ?? null,
+    loanBookId: book.id,
+    cacheHit: grid.cacheHit && (breakevens?.cacheHit ?? true),
+  };
+}
+
+export interface LoanLevelWaterfallPayload {
+  result: WaterfallResult;
+  periods: { interest: number[]; scheduledPrincipal: number[]; prepayment: number[]; recoveries: number[]; losses: number[] };
+  loanCount: number;
+}
+
+// Loan-level cash-flow waterfall over the confirmed pool of the latest book
+export async function getNbfiLoanLevelWaterfall(
+  nbfiId: string,
+  assumptions: CashflowAssumptions,
+  periods: number,
+): Promise<{ payload: LoanLevelWaterfallPayload; loanBookId: string; cacheHit: boolean } | null | 'no-structure'> {
+  const [nbfi, book, ps] = await Promise.all([
+    db.nbfi.findUnique({ where: { id: nbfiId }, select: { securitisationStructure: true } }),
+    findLatestLoanBook(db, nbfiId),
+    db.poolSelection.findUnique({ where: { nbfiId } }),
+  ]);
+  if (!nbfi || !book) return null;
+  if (!nbfi.securitisationStructure) return 'no-structure';
+
+  const selection = ps ? toPoolSelectionState(ps) : undefined;
+  const key = analyticsKey(nbfiId, {
+    loanLevelWaterfall: { assumptions, periods },
+    book: book.id,
+    pool: selection ?? null,
+    structure: nbfi.securitisationStructure,
+  });
+  const hit = analyticsCache.get(key) as LoanLevelWaterfallPayload | undefined;
+  if (hit) return { payload: hit, loanBookId: book.id, cacheHit: true };
+
+  const structure = JSON.parse(nbfi.securitisationStructure) as SecuritisationStructure;
+  const bookRows = await loadBookRows(book.id);
+  const run = await span('compute', () => {
+    const rows = applyPoolSelection(bookRows, selection);
+    return runLoanLevelWaterfall(rows, structure, assumptions, periods, { workers: rows.length > CASHFLOW_CHUNK_LOANS });
+  });
+  const payload: LoanLevelWaterfallPayload = {
+    result: run.result,
+    periods: {
+      interest: Array.from(run.cashflows.interest, Math.round),
+      scheduledPrincipal: Array.from(run.cashflows.scheduledPrincipal, Math.round),
+      prepayment: Array.from(run.cashflows.prepayment, Math.round),
+      recoveries: Array.from(run.cashflows.recoveries, Math.round),
+      losses: Array.from(run.cashflows.losses, Math.round),
+    },
+    loanCount: run.loanCount,
+  };
+  analyticsCache.set(key, payload);
+  return { payload, loanBookId: book.id, cacheHit: false };
+}
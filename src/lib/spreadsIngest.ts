@@ -0,0 +1,230 @@
+/**
+ * Directory ingestion of financial-spreads workbooks (scripts/ingest-excel.ts --dir).
+ * The directory holds one workbook per NBFI, named <nbfiId>.xlsx. Workbooks whose
+ * sha256 was already ingested for that NBFI are skipped. The rest are parsed on a
+ * worker pool (spreadsWorkbook.ts) and merged into the NBFI's existing
+ * financialData, or into the default template when it has none. Results are
+ * written in batched transactions: financialData, an audit entry and a FeedFile row
+ * per NBFI. The FeedFile rows show on the Financials tab of the integration page.
+ */
+
+import { readdir, stat } from 'fs/promises';
+import path from 'path';
+import { performance } from 'perf_hooks';
+import { Worker } from 'worker_threads';
+import { db } from './db';
+import { runBounded, sha256File } from './feedIngest';
+import type { FeedIssue } from './integrationSchemas';
+import {
+  defaultFinancialData, mergeSpreads, parseSpreadsWorkbook, type MergeResult, type ParsedSpreads,
+} from './spreadsWorkbook';
+import type { FinancialData } from './types';
+import { WorkerPool } from './workerPool';
+
+// NBFIs per write transaction
+export const SPREADS_TX_BATCH = 50;
+
+/* ================================================================
+   Directory ingestion
+   ================================================================ */
+
+type SpreadsPool = WorkerPool<string, ParsedSpreads>;
+
+export function createSpreadsPool(size?: number): SpreadsPool {
+  return new WorkerPool<string, ParsedSpreads>(
+    'spreadsWorkbook',
+    () => new Worker(new URL('./spreadsWorkbook.worker.ts', import.meta.url)),
+    parseSpreadsWorkbook,
+    size,
+  );
+}
+
+export interface SpreadsFileOutcome {
+  nbfiId: string;
+  fileName: string;
+  status: 'success' | 'partial' | 'failed' | 'unchanged' | 'unknown_nbfi';
+  matched: number;
+  unmatched: number;
+  parseMs: number;
+}
+
+export interface SpreadsIngestSummary {
+  files: number;
+  ingested: number;
+  unchanged: number;
+  failed: number;
+  ms: number;
+  updatedNbfiIds: string[];
+  outcomes: SpreadsFileOutcome[];
+}
+
+interface Candidate {
+  nbfiId: string;
+  fileName: string;
+  path: string;
+  bytes: number;
+  checksum: string;
+}
+
+interface Parsed extends Candidate {
+  parsed: ParsedSpreads | null;
+  error: string | null;
+  parseMs: number;
+}
+
+async function parseBatch(pool: SpreadsPool, batch: Candidate[]): Promise<Parsed[]> {
+  return Promise.all(batch.map(async (c) => {
+    const t0 = performance.now();
+    try {
+      const parsed = await pool.run(c.path);
+      return { ...c, parsed, error: null, parseMs: Math.round(performance.now() - t0) };
+    } catch (err) {
+      return { ...c, parsed: null, error: (err as Error).message, parseMs: Math.round(performance.now() - t0) };
+    }
+  }));
+}
+
+function unmatchedIssues(merge: MergeResult): FeedIssue[] {
+  return merge.unmatched.map(({ sheet, rows }) => ({
+    errorType: 'schema_mismatch',
+    field: sheet,
+    rowCount: rows.length,
+    message: `${rows.length} row${rows.length === 1 ? '' : 's'} not in the spreads template (first: "${rows[0].label}")`,
+    severity: 'warning',
+    sampleRows: rows.slice(0, 5).map((r) => r.row),
+  }));
+}
+
+// One transaction per batch: financialData, FeedFile and audit entry for every NBFI in it
+async function writeBatch(batch: Parsed[], userName: string): Promise<SpreadsFileOutcome[]> {
+  const existing = await db.nbfi.findMany({
+    where: { id: { in: batch.filter((p) => p.parsed).map((p) => p.nbfiId) } },
+    select: { id: true, financialData: true },
+  });
+  const current = new Map(existing.map((n) => [n.id, n.financialData]));
+
+  const outcomes: SpreadsFileOutcome[] = [];
+  const writes = batch.map((p) => {
+    let merge: MergeResult | null = null;
+    let issues: FeedIssue[];
+    if (p.parsed) {
+      const raw = current.get(p.nbfiId);
+      merge = mergeSpreads(raw ? (JSON.parse(raw) as FinancialData) : defaultFinancialData(), p.parsed);
+      issues = unmatchedIssues(merge);
+    } else {
+      issues = [{ errorType: 'invalid_format', field: 'file', rowCount: 0, message: `Workbook could not be read: ${p.error}`, severity: 'error', sampleRows: [] }];
+    }
+    const unmatched = merge ? merge.unmatched.reduce((s, u) => s + u.rows.length, 0) : 0;
+    const status = !merge || merge.matched === 0 ? 'failed' : unmatched > 0 ? 'partial' : 'success';
+    outcomes.push({ nbfiId: p.nbfiId, fileName: p.fileName, status, matched: merge?.matched ?? 0, unmatched, parseMs: p.parseMs });
+    return { p, merge: status === 'failed' ? null : merge, issues, status, unmatched };
+  });
+
+  await db.$transaction(async (tx) => {
+    for (const { p, merge, issues, status, unmatched } of writes) {
+      if (merge) await tx.nbfi.update({ where: { id: p.nbfiId }, data: { financialData: JSON.stringify(merge.data) } });
+      const file = {
+        docTypeId: 'financial_statements',
+        fileName: p.fileName,
+        source: 'manual',
+        status,
+        bytes: p.bytes,
+        rowsRead: p.parsed ? p.parsed.input.length + p.parsed.nbfi.length + p.parsed.cashflow.length : 0,
+        rowsAccepted: merge?.matched ?? 0,
+        rowsRejected: unmatched,
+        errorCount: issues.length,
+        durationMs: p.parseMs,
+        tests: '[]',
+        issues: JSON.stringify(issues),
+        completedAt: new Date(),
+      };
+      // Upsert so a forced re-run of an unchanged workbook replaces its earlier record
+      await tx.feedFile.upsert({
+        where: { nbfiId_checksum: { nbfiId: p.nbfiId, checksum: p.checksum } },
+        create: { nbfiId: p.nbfiId, checksum: p.checksum, ...file },
+        update: { ...file, receivedAt: new Date() },
+      });
+    }
+    const updated = writes.filter((w) => w.merge);
+    if (updated.length) {
+      await tx.auditLog.createMany({
+        data: updated.map(({ p, merge, unmatched }) => ({
+          nbfiId: p.nbfiId,
+          userId: 'system',
+          userName,
+          action: 'financial_data_ingested',
+          notes: `Financial spreads loaded from ${p.fileName}: ${merge!.matched} rows matched${unmatched ? `, ${unmatched} not in the template` : ''}`,
+        })),
+      });
+    }
+  }, { timeout: 60000 });
+  return outcomes;
+}
+
+export async function ingestSpreadsDirectory(
+  dir: string,
+  opts: { pool?: SpreadsPool; force?: boolean; batchSize?: number; userName?: string } = {},
+): Promise<SpreadsIngestSummary> {
+  const t0 = Date.now();
+  const names = (await readdir(dir)).filter((n) => /\.xlsx$/i.test(n) && !n.startsWith('~$') && !n.startsWith('.')).sort();
+  const outcomes: SpreadsFileOutcome[] = [];
+  const ids = names.map((n) => n.replace(/\.xlsx$/i, ''));
+  const known = new Set((await db.nbfi.findMany({ where: { id: { in: ids } }, select: { id: true } })).map((n) => n.id));
+
+  // Hash every workbook of a known NBFI (I/O bound, so a plain concurrency limit is enough)
+  const candidates: Candidate[] = [];
+  await runBounded(names, 16, async (fileName) => {
+    const nbfiId = fileName.replace(/\.xlsx$/i, '');
+    if (!known.has(nbfiId)) {
+      outcomes.push({ nbfiId, fileName, status: 'unknown_nbfi', matched: 0, unmatched: 0, parseMs: 0 });
+      return;
+    }
+    const file = path.join(dir, fileName);
+    const [checksum, st] = await Promise.all([sha256File(file), stat(file)]);
+    candidates.push({ nbfiId, fileName, path: file, bytes: st.size, checksum });
+  });
+
+  // One query decides which workbooks changed since their last ingestion. A workbook whose last
+  // attempt failed is retried (writeBatch upserts over the failed record).
+  const seen = opts.force ? [] : await db.feedFile.findMany({
+    where: {
+      nbfiId: { in: candidates.map((c) => c.nbfiId) },
+      checksum: { in: candidates.map((c) => c.checksum) },
+      status: { not: 'failed' },
+    },
+    select: { nbfiId: true, checksum: true },
+  });
+  const seenKeys = new Set(seen.map((s) => `${s.nbfiId}:${s.checksum}`));
+  const changed: Candidate[] = [];
+  for (const c of candidates) {
+    if (seenKeys.has(`${c.nbfiId}:${c.checksum}`)) outcomes.push({ nbfiId: c.nbfiId, fileName: c.fileName, status: 'unchanged', matched: 0, unmatched: 0, parseMs: 0 });
+    else changed.push(c);
+  }
+  changed.sort((a, b) => a.fileName.localeCompare(b.fileName));
+
+  // Parse batch k+1 on the pool while batch k is written
+  const pool = opts.pool ?? createSpreadsPool();
+  const size = opts.batchSize ?? SPREADS_TX_BATCH;
+  const batches: Candidate[][] = [];
+  for (let i = 0; i < changed.length; i += size) batches.push(changed.slice(i, i + size));
+  try {
+    let next = batches.length ? parseBatch(pool, batches[0]) : null;
+    for (let b = 0; b < batches.length; b++) {
+      const parsed = await next!;
+      next = b + 1 < batches.length ? parseBatch(pool, batches[b + 1]) : null;
+      outcomes.push(...await writeBatch(parsed, opts.userName ?? 'Batch import'));
+    }
+  } finally {
+    if (!opts.pool) await pool.destroy();
+  }
+
+  return {
+    files: names.length,
+    ingested: outcomes.filter((o) => o.status === 'success' || o.status === 'partial').length,
+    unchanged: outcomes.filter((o) => o.status === 'unchanged').length,
+    failed: outcomes.filter((o) => o.status === 'failed').length,
+    ms: Date.now() - t0,
+    updatedNbfiIds: outcomes.filter((o) => o.status === 'success' || o.status === 'partial').map((o) => o.nbfiId),
+    outcomes,
+  };
+}
@@ -0,0 +1,221 @@
+/**
+ * Financial-spreads workbooks: sparse parsing and merge into FinancialData.
+ * A spreads workbook carries the three tabs written by writeSpreadsSheets: NBFI,
+ * Input Template and Cash Flow Statement. Only those sheets are parsed, and each
+ * is read sparsely — just the populated cells of its label and value columns, not
+ * the dense rectangle of its used range. Values are matched to the FinancialData
+ * template rows by label, in order, so a label repeated across sections pairs up
+ * by occurrence.
+ *
+ * Kept free of database imports so spreadsWorkbook.worker.ts can load it.
+ */
+
+import * as XLSX from 'xlsx';
+import type { FinancialData, FinancialRow, PeriodInfo } from './types';
+import inputTemplateDefault from '../../data/input-template.json';
+import nbfiOutputDefault from '../../data/nbfi-output.json';
+import cashflowDefault from '../../data/cashflow.json';
+
+export const SPREADS_SHEETS = ['NBFI', 'Input Template', 'Cash Flow Statement'];
+type Cell = string | number | null;
+
+export interface LabelledRow {
+  label: string;
+  row: number;        // 1-based sheet row, for error reports
+  cells: Cell[];      // value columns after the label
+}
+
+export interface ParsedSpreads {
+  orgName: string | null;
+  periods: PeriodInfo[];
+  cashflowDates: string[];
+  nbfi: LabelledRow[];        // NBFI tab: [value, %chg, value, %chg]
+  input: LabelledRow[];       // Input Template: [current, previous]
+  cashflow: LabelledRow[];    // Cash Flow Statement: [period 1, period 2]
+  cells: number;              // populated cells visited
+}
+
+/* ================================================================
+   Sparse sheet reading
+   ================================================================ */
+
+export interface SheetRow {
+  row: number;        // 1-based sheet row
+  cells: Cell[];      // columns [0, width)
+}
+
+// Populated cells of columns [0, width) grouped by row, in row order. Only the cells
+// present in the sheet are visited; blank rows and columns cost nothing.
+export function readSheetRows(sheet: XLSX.WorkSheet, width?: number): SheetRow[] {
+  const w = width ?? XLSX.utils.decode_range(sheet['!ref'] || 'A1').e.c + 1;
+  const rows = new Map<number, Cell[]>();
+  for (const addr of Object.keys(sheet)) {
+    if (addr[0] === '!') continue;
+    const v = (sheet[addr] as XLSX.CellObject).v;
+    if (v === undefined || v === null || v === '') continue;
+    const { r, c } = XLSX.utils.decode_cell(addr);
+    if (c >= w) continue;
+    let row = rows.get(r);
+    if (!row) rows.set(r, (row = new Array<Cell>(w).fill(null)));
+    row[c] = v instanceof Date ? v.toISOString().slice(0, 10) : typeof v === 'boolean' ? String(v) : v;
+  }
+  return [...rows.entries()].sort((a, b) => a[0] - b[0]).map(([r, cells]) => ({ row: r + 1, cells }));
+}
+
+function labelledRows(sheet: XLSX.WorkSheet | undefined, labelCol: number, valueCols: number): LabelledRow[] {
+  if (!sheet) return [];
+  const out: LabelledRow[] = [];
+  for (const { row, cells } of readSheetRows(sheet, labelCol + 1 + valueCols)) {
+    const label = cells[labelCol];
+    if (typeof label !== 'string' || !label.trim()) continue;
+    out.push({ label: label.trim(), row, cells: cells.slice(labelCol + 1) });
+  }
+  return out;
+}
+
+const text = (v: Cell | undefined) => (v == null ? '' : String(v).trim());
+
+export function parseSpreadsWorkbook(file: string): ParsedSpreads {
+  const wb = XLSX.readFile(file, { sheets: SPREADS_SHEETS, cellDates: true, cellFormula: false, cellHTML: false, cellText: false, cellStyles: false });
+  const nbfi = labelledRows(wb.Sheets['NBFI'], 0, 4);
+  const input = labelledRows(wb.Sheets['Input Template'], 1, 2);
+  const cashflow = labelledRows(wb.Sheets['Cash Flow Statement'], 1, 2);
+
+  // Statement header block at the top of the NBFI tab (columns B and D)
+  const header = (prefix: string) => nbfi.find((r) => r.label.startsWith(prefix))?.cells;
+  const types = header('Statement Type');
+  const dates = header('Statement Date');
+  const months = header('Period (Months)');
+  const periods: PeriodInfo[] = dates
+    ? [0, 2].filter((c) => text(dates[c])).map((c) => ({
+        date: text(dates[c]),
+        type: text(types?.[c]) || 'Audited',
+        months: Number(months?.[c]) || 12,
+      }))
+    : [];
+
+  const org = input.find((r) => r.label.startsWith('Name of the Organisation'));
+  const cfHeader = cashflow.find((r) => r.label === 'Particulars');
+  return {
+    orgName: org ? org.label.replace(/^Name of the Organisation:?\s*/, '') || null : null,
+    periods,
+    cashflowDates: cfHeader ? cfHeader.cells.map(text).filter(Boolean) : [],
+    nbfi,
+    input,
+    cashflow,
+    cells: [nbfi, input, cashflow].reduce((s, rows) => s + rows.reduce((n, r) => n + 1 + r.cells.filter((c) => c != null).length, 0), 0),
+  };
+}
+
+/* ================================================================
+   Merge into FinancialData
+   ================================================================ */
+
+const normLabel = (s: string) => s.trim().toLowerCase().replace(/\s+/g, ' ');
+
+function toNumber(v: Cell | undefined): number | null {
+  if (v == null || v === '') return null;
+  if (typeof v === 'number') return v;
+  const n = Number(v.replace(/,/g, ''));
+  return Number.isFinite(n) ? n : null;
+}
+
+// Workbook rows queued per label; each template row takes the next occurrence of its label
+class LabelQueue {
+  private readonly byLabel = new Map<string, LabelledRow[]>();
+  private readonly used = new Set<LabelledRow>();
+
+  constructor(private readonly rows: LabelledRow[]) {
+    for (const r of rows) {
+      const k = normLabel(r.label);
+      const q = this.byLabel.get(k);
+      if (q) q.push(r);
+      else this.byLabel.set(k, [r]);
+    }
+  }
+
+  take(label: string): LabelledRow | undefined {
+    const r = this.byLabel.get(normLabel(label))?.shift();
+    if (r) this.used.add(r);
+    return r;
+  }
+
+  // Rows carrying a number that no template row claimed
+  unmatched(): LabelledRow[] {
+    return this.rows.filter((r) => !this.used.has(r) && r.cells.some((c) => typeof c === 'number'));
+  }
+}
+
+export interface MergeResult {
+  data: FinancialData;
+  matched: number;
+  unmatched: { sheet: string; rows: LabelledRow[] }[];
+}
+
+export function defaultFinancialData(): FinancialData {
+  return structuredClone({ inputTemplate: inputTemplateDefault, nbfiOutput: nbfiOutputDefault, cashFlow: cashflowDefault }) as unknown as FinancialData;
+}
+
+export function mergeSpreads(base: FinancialData, parsed: ParsedSpreads): MergeResult {
+  const data = structuredClone(base);
+  let matched = 0;
+
+  const input = new LabelQueue(parsed.input);
+  const fillFinancial = (q: LabelQueue, rows: FinancialRow[]) => {
+    for (const row of rows) {
+      const src = q.take(row.label);
+      if (!src || row.isHeader) continue;
+      row.values = [toNumber(src.cells[0]), toNumber(src.cells[1])];
+      matched++;
+    }
+  };
+  fillFinancial(input, data.inputTemplate.partA.balanceSheet.rows);
+  fillFinancial(input, data.inputTemplate.partA.profitAndLoss.rows);
+
+  // NBFI tab columns after the label: value, %chg, value, %chg
+  const nbfi = new LabelQueue(parsed.nbfi);
+  const out = data.nbfiOutput;
+  for (const row of [...out.balanceSheet.rows, ...out.incomeStatement.rows, ...out.cashflowSummary.rows]) {
+    const src = nbfi.take(row.label);
+    if (!src || row.isHeader) continue;
+    row.values = [toNumber(src.cells[0]), toNumber(src.cells[2])];
+    row.pctChanges = [toNumber(src.cells[1]), toNumber(src.cells[3])];
+    matched++;
+  }
+  // BCC indicators may be text (ratings, "n/a")
+  const numberOrText = (c: Cell | undefined) => (typeof c === 'string' && toNumber(c) === null ? c : toNumber(c));
+  for (const row of out.bccSummary) {
+    const src = nbfi.take(row.label);
+    if (!src) continue;
+    row.values = [numberOrText(src.cells[0]), numberOrText(src.cells[2])];
+    row.pctChanges = [numberOrText(src.cells[1]), numberOrText(src.cells[3])];
+    matched++;
+  }
+
+  const cashflow = new LabelQueue(parsed.cashflow);
+  for (const section of data.cashFlow.sections) {
+    fillFinancial(cashflow, section.rows);
+    if (section.subtotal) fillFinancial(cashflow, [section.subtotal]);
+  }
+
+  if (parsed.orgName) data.inputTemplate.orgName = parsed.orgName;
+  if (parsed.periods.length) {
+    out.periods = parsed.periods;
+    data.inputTemplate.periods = parsed.periods;
+  }
+  if (parsed.cashflowDates.length) {
+    data.cashFlow.periods = parsed.cashflowDates.map((date, i) => ({ ...(parsed.periods[i] ?? { type: 'Audited', months: 12 }), date }));
+  }
+
+  // The statement header block is read into periods, not matched to template rows
+  const headerLabels = /^(Statement Type|Auditors|Opinion|Statement Date|Period \(Months\)|Amounts in|Indicator \()/;
+  return {
+    data,
+    matched,
+    unmatched: [
+      { sheet: 'NBFI', rows: nbfi.unmatched().filter((r) => !headerLabels.test(r.label)) },
+      { sheet: 'Input Template', rows: input.unmatched() },
+      { sheet: 'Cash Flow Statement', rows: cashflow.unmatched() },
+    ].filter((u) => u.rows.length),
+  };
+}
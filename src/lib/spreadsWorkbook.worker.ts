@@ -0,0 +1,5 @@
+// worker_threads entry for the spreads-workbook pool (see spreadsIngest.ts / workerPool.ts)
+import { serveWorkerTasks } from './workerPool';
+import { parseSpreadsWorkbook, type ParsedSpreads } from './spreadsWorkbook';
+
+serveWorkerTasks<string, ParsedSpreads>((file) => ({ result: parseSpreadsWorkbook(file) }));
@@ -0,0 +1,195 @@
+/**
+ * Dense securitisation stress grids and breakeven solving.
+ * A grid is the cross product of loss rates × prepay rates × terms × OC levels.
+ * Each (term, OC) slice shares one prepareWaterfall() setup. Slices are split
+ * into row chunks and run on a worker_threads pool (see workerPool.ts). Results
+ * are memoised by structure hash plus grid spec, so re-opening the same
+ * structure is a lookup rather than a re-run.
+ */
+
+import { createHash } from 'crypto';
+import { Worker } from 'worker_threads';
+import type { SecuritisationStructure } from './types';
+import { LruCache, stableKey } from './analyticsCache';
+import { WorkerPool } from './workerPool';
+import { breakevenLossRate, prepareWaterfall, simulateWaterfall } from './securitisationWaterfall';
+
+// Cells per worker task: big enough to amortise message passing, small enough to spread a 50×50 slice
+export const STRESS_CHUNK_CELLS = 250;
+
+export interface StressGridSpec {
+  lossRates: number[];
+  prepayRates: number[];
+  periods?: number[];   // default [12]
+  ocPcts?: number[];    // default: the structure's own overCollateralisationPct
+}
+
+// Measures stored per cell, in this order
+export const STRESS_MEASURES = ['seniorShortfall', 'mezzanineShortfall', 'equityResidual', 'totalLosses'] as const;
+const M = STRESS_MEASURES.length;
+
+export interface StressGridResult {
+  hash: string;
+  lossRates: number[];
+  prepayRates: number[];
+  periods: number[];
+  ocPcts: number[];
+  // Row-major: cell (o, t, l, p) starts at (((o * T + t) * L + l) * P + p) * STRESS_MEASURES.length
+  cells: Float64Array;
+}
+
+export interface Breakeven {
+  periods: number;
+  ocPct: number;
+  prepayRate: number;
+  senior: number;
+  mezzanine: number;
+}
+
+export type StressTask =
+  | { kind: 'grid'; poolBalance: number; avgRate: number; structure: SecuritisationStructure; periods: number; lossRates: number[]; prepayRates: number[] }
+  | { kind: 'breakeven'; poolBalance: number; avgRate: number; structure: SecuritisationStructure; periods: number; prepayRates: number[] };
+
+/* ================================================================
+   Kernel (runs inside a worker, or inline)
+   ================================================================ */
+
+export function runStressTask(task: StressTask): Float64Array {
+  const w = prepareWaterfall(task.poolBalance, task.avgRate, task.structure, task.periods);
+  if (task.kind === 'breakeven') {
+    const out = new Float64Array(task.prepayRates.length * 2);
+    task.prepayRates.forEach((pr, i) => {
+      out[i * 2] = breakevenLossRate(w, 'Senior', pr);
+      out[i * 2 + 1] = breakevenLossRate(w, 'Mezzanine', pr);
+    });
+    return out;
+  }
+  const P = task.prepayRates.length;
+  const out = new Float64Array(task.lossRates.length * P * M);
+  for (let l = 0; l < task.lossRates.length; l++) {
+    for (let p = 0; p < P; p++) {
+      const t = simulateWaterfall(w, task.lossRates[l], task.prepayRates[p]);
+      const o = (l * P + p) * M;
+      out[o] = Math.round(t.seniorShortfall);
+      out[o + 1] = Math.round(t.mezzShortfall);
+      out[o + 2] = Math.round(t.equityIntPaid);
+      out[o + 3] = Math.round(t.totalLosses);
+    }
+  }
+  return out;
+}
+
+/* ================================================================
+   Memoisation
+   ================================================================ */
+
+// Identifies everything a cell depends on besides its own axis values
+export function structureHash(poolBalance: number, avgRate: number, structure: SecuritisationStructure): string {
+  return createHash('sha1').update(stableKey({ poolBalance, avgRate, structure })).digest('hex').slice(0, 16);
+}
+
+type StressPool = WorkerPool<StressTask, Float64Array>;
+const globalForStress = globalThis as unknown as {
+  stressGridPool: StressPool | undefined;
+  stressGridCache: LruCache<StressGridResult | Breakeven[]> | undefined;
+};
+
+export const stressGridCache = globalForStress.stressGridCache ?? new LruCache<StressGridResult | Breakeven[]>(64);
+globalForStress.stressGridCache = stressGridCache;
+
+export function getStressGridPool(): StressPool {
+  if (!globalForStress.stressGridPool) {
+    globalForStress.stressGridPool = new WorkerPool<StressTask, Float64Array>(
+      'stressGrid',
+      () => new Worker(new URL('./stressGrid.worker.ts', import.meta.url)),
+      runStressTask,
+    );
+  }
+  return globalForStress.stressGridPool;
+}
+
+/* ================================================================
+   Orchestration
+   ================================================================ */
+
+function axes(structure: SecuritisationStructure, spec: StressGridSpec) {
+  return {
+    periods: spec.periods?.length ? spec.periods : [12],
+    ocPcts: spec.ocPcts?.length ? spec.ocPcts : [structure.overCollateralisationPct],
+  };
+}
+
+export async function solveStressGrid(
+  poolBalance: number,
+  avgRate: number,
+  structure: SecuritisationStructure,
+  spec: StressGridSpec,
+  pool: StressPool = getStressGridPool(),
+): Promise<{ result: StressGridResult; cacheHit: boolean }> {
+  const hash = structureHash(poolBalance, avgRate, structure);
+  const { periods, ocPcts } = axes(structure, spec);
+  const { lossRates, prepayRates } = spec;
+  const key = `grid|${hash}|${stableKey({ lossRates, prepayRates, periods, ocPcts })}`;
+  const hit = stressGridCache.get(key) as StressGridResult | undefined;
+  if (hit) return { result: hit, cacheHit: true };
+
+  const L = lossRates.length, P = prepayRates.length, T = periods.length;
+  const cells = new Float64Array(ocPcts.length * T * L * P * M);
+  const rowsPerChunk = Math.max(1, Math.floor(STRESS_CHUNK_CELLS / Math.max(P, 1)));
+  const jobs: Promise<void>[] = [];
+  ocPcts.forEach((ocPct, o) => {
+    const s = { ...structure, overCollateralisationPct: ocPct };
+    periods.forEach((term, t) => {
+      for (let l0 = 0; l0 < L; l0 += rowsPerChunk) {
+        const offset = ((o * T + t) * L + l0) * P * M;
+        jobs.push(pool.run({
+          kind: 'grid', poolBalance, avgRate, structure: s, periods: term,
+          lossRates: lossRates.slice(l0, l0 + rowsPerChunk), prepayRates,
+        }).then((part) => { cells.set(part, offset); }));
+      }
+    });
+  });
+  await Promise.all(jobs);
+
+  const result: StressGridResult = { hash, lossRates, prepayRates, periods, ocPcts, cells };
+  stressGridCache.set(key, result);
+  return { result, cacheHit: false };
+}
+
+// Senior / Mezzanine breakeven loss rates for every (term, OC, prepay) combination
+export async function solveBreakevens(
+  poolBalance: number,
+  avgRate: number,
+  structure: SecuritisationStructure,
+  spec: Omit<StressGridSpec, 'lossRates'>,
+  pool: StressPool = getStressGridPool(),
+): Promise<{ result: Breakeven[]; cacheHit: boolean }> {
+  const hash = structureHash(poolBalance, avgRate, structure);
+  const { periods, ocPcts } = axes(structure, { ...spec, lossRates: [] });
+  const { prepayRates } = spec;
+  const key = `breakeven|${hash}|${stableKey({ prepayRates, periods, ocPcts })}`;
+  const hit = stressGridCache.get(key) as Breakeven[] | undefined;
+  if (hit) return { result: hit, cacheHit: true };
+
+  const slices = await Promise.all(ocPcts.flatMap((ocPct) => periods.map(async (term) => {
+    const out = await pool.run({
+      kind: 'breakeven', poolBalance, avgRate,
+      structure: { ...structure, overCollateralisationPct: ocPct }, periods: term, prepayRates,
+    });
+    return prepayRates.map((prepayRate, i): Breakeven => ({
+      periods: term, ocPct, prepayRate, senior: out[i * 2], mezzanine: out[i * 2 + 1],
+    }));
+  })));
+
+  const result = slices.flat();
+  stressGridCache.set(key, result);
+  return { result, cacheHit: false };
+}
+
+// Evenly spaced axis values, inclusive of both ends, rounded to 2dp
+export function gridAxis(from: number, to: number, steps: number): number[] {
+  if (steps <= 1) return [Math.round(from * 100) / 100];
+  const out: number[] = [];
+  for (let i = 0; i < steps; i++) out.push(Math.round((from + ((to - from) * i) / (steps - 1)) * 100) / 100);
+  return out;
+}
@@ -0,0 +1,8 @@
+// worker_threads entry for the stress-grid pool (see stressGrid.ts / workerPool.ts)
+import { serveWorkerTasks } from './workerPool';
+import { runStressTask, type StressTask } from './stressGrid';
+
+serveWorkerTasks<StressTask, Float64Array>((task) => {
+  const out = runStressTask(task);
+  return { result: out, transfer: [out.buffer] };
+});
@@ -0,0 +1,214 @@
+/**
+ * Deterministic synthetic loan books for benchmarks and load tests.
+ * Rows use the same geographies, products, segments and DPD health profiles as
+ * the seeded demo books (seedTransactions.ts), but are generated from scratch
+ * rather than cloned from the base book, so any size from 10k to several million
+ * loans can be produced. Every loan draws from its own seeded stream: loan i is
+ * the same whatever the book size, and a 10k book is a prefix of the 5M one.
+ *
+ * Histories walk each loan through the base roll-rate matrix month by month and
+ * come out in the long (HistoricalLoanRow) or wide (dpd_YYYY_MM / bal_YYYY_MM)
+ * shape accepted by the loan-history upload. Everything is produced lazily, so
+ * callers can stream rows instead of holding them.
+ */
+
+import type { HistoricalLoanRow, LoanLevelRow, WideFormatLoanRow } from './types';
+import { TRANSITION_MATRIX } from './rollRate';
+import {
+  GEOGRAPHIES, PRODUCTS, SEGMENTS, FIRST_NAMES, LAST_NAMES, NBFI_HEALTH, assignDpd, seededRandom,
+} from './seedTransactions';
+
+export interface SyntheticBookOptions {
+  seed?: number;            // default 1
+  profile?: string;         // NBFI_HEALTH key for the DPD mix, default 'seed-1'
+  reportingDate?: string;   // "YYYY-MM-DD"; loans are disbursed in the 36 months before it
+  idPrefix?: string;        // loanId prefix, default 'SYN'
+}
+
+const DEFAULT_REPORTING_DATE = '2026-01-31';
+
+// Independent Lehmer stream per loan; the multiplier spreads neighbouring indexes apart
+function loanRandom(seed: number, i: number): () => number {
+  const s = (seed * 2654435761 + i * 40503 + 1) % 2147483646;
+  const rng = seededRandom(s + 1);
+  rng(); // the first draw of a Lehmer stream tracks its seed too closely
+  return rng;
+}
+
+const pad = (n: number, w: number) => n.toString().padStart(w, '0');
+
+// Calendar month `offset` months from (year, month); month is 1-based
+function shiftMonth(year: number, month: number, offset: number): [number, number] {
+  const idx = year * 12 + (month - 1) + offset;
+  return [Math.floor(idx / 12), (idx % 12) + 1];
+}
+
+function monthEnd(year: number, month: number): string {
+  return `${year}-${pad(month, 2)}-${pad(new Date(Date.UTC(year, month, 0)).getUTCDate(), 2)}`;
+}
+
+function parseYm(date: string): [number, number] {
+  return [parseInt(date.slice(0, 4)), parseInt(date.slice(5, 7))];
+}
+
+const round2 = (v: number) => Math.round(v * 100) / 100;
+
+/* ================================================================
+   Snapshot books
+   ================================================================ */
+
+interface LoanDraw {
+  row: LoanLevelRow;
+  termMonths: number;
+  ageMonths: number;
+}
+
+function drawLoan(i: number, opts: SyntheticBookOptions): LoanDraw {
+  const rng = loanRandom(opts.seed ?? 1, i);
+  const profile = NBFI_HEALTH[opts.profile ?? 'seed-1'] ?? NBFI_HEALTH['seed-1'];
+  const [ry, rm] = parseYm(opts.reportingDate ?? DEFAULT_REPORTING_DATE);
+  const id = `${opts.idPrefix ?? 'SYN'}-${pad(i + 1, 7)}`;
+
+  const disbursed = Math.round(20000 * Math.exp(rng() * 3.2) / 100) * 100;   // ~20K to ~490K
+  const termMonths = 6 + Math.floor(rng() * 43);
+  const ageMonths = Math.floor(rng() * Math.min(36, termMonths));
+  const [dy, dm] = shiftMonth(ry, rm, -ageMonths);
+  const dpd = assignDpd(rng, profile);
+  const bal = round2(disbursed * (1 - ageMonths / termMonths) * (0.9 + rng() * 0.1));
+  const written = rng() < (dpd > 180 ? 0.35 : dpd > 90 ? 0.06 : 0);
+
+  return {
+    termMonths,
+    ageMonths,
+    row: {
+      loanId: id,
+      applicationId: `APP-${id}`,
+      dpdAsOfReportingDate: dpd,
+      currentBalance: bal,
+      loanDisbursedAmount: disbursed,
+      totalOverdueAmount: dpd > 0 ? round2(bal * (dpd / 360)) : 0,
+      loanDisbursedDate: `${dy}-${pad(dm, 2)}-${pad(1 + Math.floor(rng() * 28), 2)}`,
+      interestRate: round2(12 + rng() * 12),
+      loanWrittenOff: written,
+      repossession: written && rng() < 0.3,
+      recoveryAfterWriteoff: written ? round2(bal * rng() * 0.25) : 0,
+      geography: GEOGRAPHIES[Math.floor(rng() * GEOGRAPHIES.length)],
+      product: PRODUCTS[Math.floor(rng() * PRODUCTS.length)],
+      segment: SEGMENTS[Math.floor(rng() * SEGMENTS.length)],
+      borrowerName: `${FIRST_NAMES[Math.floor(rng() * FIRST_NAMES.length)]} ${LAST_NAMES[Math.floor(rng() * LAST_NAMES.length)]}`,
+      residualTenureMonths: termMonths - ageMonths,
+    },
+  };
+}
+
+export function* syntheticLoans(count: number, opts: SyntheticBookOptions = {}): Generator<LoanLevelRow> {
+  for (let i = 0; i < count; i++) yield drawLoan(i, opts).row;
+}
+
+export function generateSyntheticBook(count: number, opts: SyntheticBookOptions = {}): LoanLevelRow[] {
+  const rows: LoanLevelRow[] = new Array(count);
+  for (let i = 0; i < count; i++) rows[i] = drawLoan(i, opts).row;
+  return rows;
+}
+
+/* ================================================================
+   Multi-month histories
+   ================================================================ */
+
+const BUCKET_DPD_RANGE: Record<string, [number, number]> = {
+  Current: [0, 0], '1-30': [1, 30], '31-60': [31, 60], '61-90': [61, 90], '91-180': [91, 180], '180+': [181, 360],
+};
+
+function nextBucket(bucket: string, u: number): string {
+  let acc = 0;
+  for (const [to, p] of Object.entries(TRANSITION_MATRIX[bucket])) {
+    acc += p;
+    if (u < acc) return to;
+  }
+  return bucket;
+}
+
+// DPD keeps counting while a loan stays in the same bucket; a new bucket starts at a random day in it
+function walkDpd(prev: number, bucket: string, rng: () => number): number {
+  const [lo, hi] = BUCKET_DPD_RANGE[bucket];
+  if (hi === 0) return 0;
+  return prev >= lo && prev <= hi ? Math.min(hi, prev + 30) : lo + Math.floor(rng() * (hi - lo + 1));
+}
+
+// Long format: one row per loan per month-end, loans in order and each loan's months
+// contiguous, over the `months` periods ending at the reporting date. A loan appears
+// from its disbursal month and leaves once repaid or written off.
+export function* syntheticHistory(
+  count: number,
+  months: number,
+  opts: SyntheticBookOptions = {},
+): Generator<HistoricalLoanRow> {
+  const [ry, rm] = parseYm(opts.reportingDate ?? DEFAULT_REPORTING_DATE);
+  const periods: string[] = [];
+  for (let k = months - 1; k >= 0; k--) periods.push(monthEnd(...shiftMonth(ry, rm, -k)));
+
+  for (let i = 0; i < count; i++) {
+    const { row, termMonths, ageMonths } = drawLoan(i, opts);
+    const rng = loanRandom((opts.seed ?? 1) + 7919, i);
+    let bucket = 'Current';
+    let written = false;
+    let dpd = 0;
+    let bal = row.loanDisbursedAmount;
+    // Periods before disbursal are skipped; the walk starts in the disbursal month
+    for (let p = Math.max(0, months - 1 - ageMonths); p < months; p++) {
+      const age = ageMonths - (months - 1 - p);
+      if (age >= termMonths && bucket === 'Current') break;      // repaid
+      if (age > 0) {
+        bucket = nextBucket(bucket, rng());
+        dpd = walkDpd(dpd, bucket, rng);
+      }
+      // Delinquent loans stop amortising
+      if (bucket === 'Current') bal = round2(row.loanDisbursedAmount * (1 - age / termMonths));
+      if (!written && bucket === '180+' && rng() < 0.35) written = true;
+      yield {
+        loanId: row.loanId,
+        reportingDate: periods[p],
+        dpd,
+        currentBalance: bal,
+        disbursedAmount: row.loanDisbursedAmount,
+        overdueAmount: dpd > 0 ? round2(bal * (dpd / 360)) : 0,
+        writtenOff: written,
+        repossession: written && row.repossession,
+        recoveryAmount: written ? round2(bal * rng() * 0.05) : 0,
+        interestRate: row.interestRate,
+        geography: row.geography,
+        product: row.product,
+        segment: row.segment,
+        borrowerName: row.borrowerName,
+        disbursedDate: row.loanDisbursedDate,
+        residualTenureMonths: Math.max(0, termMonths - age),
+      };
+      if (written) break;
+    }
+  }
+}
+
+// Pivot a long history (each loan's rows contiguous, as syntheticHistory yields them)
+// into one wide row per loan with dpd_YYYY_MM / bal_YYYY_MM pairs
+export function* toWideFormat(history: Iterable<HistoricalLoanRow>): Generator<WideFormatLoanRow> {
+  let current: WideFormatLoanRow | null = null;
+  for (const h of history) {
+    if (!current || current.loanId !== h.loanId) {
+      if (current) yield current;
+      current = {
+        loanId: h.loanId,
+        disbursedDate: h.disbursedDate ?? '',
+        disbursedAmount: h.disbursedAmount,
+        interestRate: h.interestRate,
+        geography: h.geography,
+        product: h.product,
+        segment: h.segment,
+        borrowerName: h.borrowerName,
+      };
+    }
+    const period = h.reportingDate.slice(0, 7).replace('-', '_');
+    current[`dpd_${period}`] = h.dpd;
+    current[`bal_${period}`] = h.currentBalance;
+  }
+  if (current) yield current;
+}
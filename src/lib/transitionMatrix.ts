@@ -0,0 +1,362 @@
+/**
+ * Empirical DPD transition matrices from loan performance history.
+ * Streams a long (one row per loan per period) or wide (dpd_YYYY_MM / bal_YYYY_MM
+ * column pairs) history file once and accumulates balance-weighted bucket-to-bucket
+ * transitions for the whole book, per product and per vintage in the same pass.
+ * Wide rows are walked pair by pair, never expanded into long rows; long rows only
+ * keep each loan's first/last observed period.
+ */
+
+import type { Prisma } from '@/generated/prisma/client';
+import { DPD_BUCKETS } from './types';
+import { getSchema } from './integrationSchemas';
+import { SCENARIO_MATRICES, TRANSITION_MATRIX, vintageKey, type ScenarioKey } from './rollRate';
+import { countBytes, parseCsvRecords, parseXlsxRecords, resolveColumnMapping, type TapeFormat } from './loanTapeIngest';
+
+export type TransitionMatrix = Record<string, Record<string, number>>;
+export type HistoryFormat = 'long' | 'wide';
+
+export interface SegmentTransitions {
+  matrix: TransitionMatrix;
+  observations: number;     // loan-month transitions observed
+  weight: number;           // origin balance behind those transitions
+}
+
+export interface TransitionEstimateResult {
+  format: HistoryFormat;
+  rowsRead: number;
+  loanCount: number;
+  periodStart: string | null;   // YYYY-MM
+  periodEnd: string | null;
+  periodCount: number;
+  skipped: number;              // observations that did not extend a loan's contiguous run
+  overall: SegmentTransitions;
+  byProduct: Record<string, SegmentTransitions>;
+  byVintage: Record<string, SegmentTransitions>;
+}
+
+export interface HistoryProgress {
+  rowsRead: number;
+  bytesRead: number;
+  totalBytes?: number;
+}
+
+// Rows between progress callbacks
+const PROGRESS_EVERY = 50_000;
+// Segments with less origin balance than this share of the book fall back to the overall row
+const MIN_SEGMENT_ROW_WEIGHT = 0.001;
+
+const N = DPD_BUCKETS.length;
+const WIDE_COLUMN_RE = /^(dpd|bal)_(\d{4})_(\d{2})$/i;
+
+/* ================================================================
+   Accumulators — N×N balance and count grids per segment
+   ================================================================ */
+
+interface Accumulator {
+  balance: Float64Array;
+  count: Uint32Array;
+}
+
+function newAccumulator(): Accumulator {
+  return { balance: new Float64Array(N * N), count: new Uint32Array(N * N) };
+}
+
+function accumulatorFor(map: Map<string, Accumulator>, key: string): Accumulator {
+  let acc = map.get(key);
+  if (!acc) { acc = newAccumulator(); map.set(key, acc); }
+  return acc;
+}
+
+function bucketIndex(dpd: number): number {
+  if (dpd <= 0) return 0;
+  if (dpd <= 30) return 1;
+  if (dpd <= 60) return 2;
+  if (dpd <= 90) return 3;
+  if (dpd <= 180) return 4;
+  return 5;
+}
+
+// Month number since year 0, so consecutive periods differ by exactly 1
+function monthIndex(date: string): number {
+  const y = parseInt(date.slice(0, 4), 10);
+  const m = parseInt(date.slice(5, 7), 10);
+  return Number.isFinite(y) && Number.isFinite(m) ? y * 12 + (m - 1) : NaN;
+}
+
+function monthLabel(idx: number): string {
+  return `${Math.floor(idx / 12)}-${String((idx % 12) + 1).padStart(2, '0')}`;
+}
+
+function toNumber(v: string | undefined): number {
+  if (v == null || v === '') return NaN;
+  return Number(v.replace(/,/g, ''));
+}
+
+class TransitionAccumulator {
+  readonly overall = newAccumulator();
+  readonly byProduct = new Map<string, Accumulator>();
+  readonly byVintage = new Map<string, Accumulator>();
+  minPeriod = Infinity;
+  maxPeriod = -Infinity;
+
+  add(from: number, to: number, originBalance: number, product: string, vintage: string) {
+    const cell = from * N + to;
+    const w = originBalance > 0 ? originBalance : 0;
+    for (const acc of [this.overall, accumulatorFor(this.byProduct, product), accumulatorFor(this.byVintage, vintage)]) {
+      acc.balance[cell] += w;
+      acc.count[cell]++;
+    }
+  }
+
+  seePeriod(p: number) {
+    if (p < this.minPeriod) this.minPeriod = p;
+    if (p > this.maxPeriod) this.maxPeriod = p;
+  }
+}
+
+// Normalise a grid to row-stochastic form. Rows with too little weight borrow `fallback`.
+function toMatrix(acc: Accumulator, fallback: TransitionMatrix, minRowWeight: number): SegmentTransitions {
+  const matrix: TransitionMatrix = {};
+  let observations = 0;
+  let weight = 0;
+  for (let f = 0; f < N; f++) {
+    let rowW = 0;
+    for (let t = 0; t < N; t++) { rowW += acc.balance[f * N + t]; observations += acc.count[f * N + t]; }
+    weight += rowW;
+    const from = DPD_BUCKETS[f];
+    if (rowW <= minRowWeight) {
+      matrix[from] = { ...(fallback[from] ?? {}) };
+      continue;
+    }
+    const row: Record<string, number> = {};
+    for (let t = 0; t < N; t++) {
+      const v = acc.balance[f * N + t];
+      if (v > 0) row[DPD_BUCKETS[t]] = v / rowW;
+    }
+    matrix[from] = row;
+  }
+  return { matrix, observations, weight };
+}
+
+/* ================================================================
+   Streaming estimation
+   ================================================================ */
+
+interface LoanRun {
+  firstP: number; firstB: number; firstBal: number;
+  lastP: number; lastB: number; lastBal: number;
+  product: string; vintage: string;
+}
+
+export function detectHistoryFormat(header: string[]): HistoryFormat {
+  return header.some((h) => WIDE_COLUMN_RE.test(h.trim())) ? 'wide' : 'long';
+}
+
+export async function estimateTransitionMatrices(
+  body: ReadableStream<Uint8Array>,
+  opts: { format: TapeFormat; totalBytes?: number; onProgress?: (p: HistoryProgress) => void },
+): Promise<TransitionEstimateResult> {
+  const progress: HistoryProgress = { rowsRead: 0, bytesRead: 0, totalBytes: opts.totalBytes };
+  const counted = countBytes(body, (n) => { progress.bytesRead += n; });
+  const records = opts.format === 'xlsx' ? parseXlsxRecords(counted) : parseCsvRecords(counted);
+  const acc = new TransitionAccumulator();
+  const schema = getSchema('loan_performance_history');
+
+  let format: HistoryFormat = 'long';
+  let col: Record<string, number> = {};
+  // wide: [period, dpdCol, balCol] sorted by period
+  let periods: [number, number, number][] = [];
+  const runs = new Map<string, LoanRun>();
+  let wideLoans = 0;
+  let skipped = 0;
+  let header: string[] | null = null;
+
+  for await (const record of records) {
+    if (!header) {
+      header = record;
+      format = detectHistoryFormat(record);
+      const mapping = resolveColumnMapping(record, schema) as (string | null)[];
+      col = {};
+      mapping.forEach((k, i) => { if (k && col[k] === undefined) col[k] = i; });
+      if (format === 'wide') {
+        const byPeriod = new Map<number, [number, number]>();
+        record.forEach((h, i) => {
+          const m = WIDE_COLUMN_RE.exec(h.trim());
+          if (!m) return;
+          const p = parseInt(m[2], 10) * 12 + parseInt(m[3], 10) - 1;
+          const pair = byPeriod.get(p) ?? [-1, -1];
+          pair[m[1].toLowerCase() === 'dpd' ? 0 : 1] = i;
+          byPeriod.set(p, pair);
+        });
+        periods = [...byPeriod.entries()].sort((a, b) => a[0] - b[0]).map(([p, [d, b]]) => [p, d, b]);
+        for (const [p] of periods) acc.seePeriod(p);
+      }
+      continue;
+    }
+
+    progress.rowsRead++;
+    if (progress.rowsRead % PROGRESS_EVERY === 0) opts.onProgress?.({ ...progress });
+    const product = (record[col.product] ?? '').trim() || 'Unknown';
+    const disbursed = (record[col.disbursedDate] ?? '').trim();
+    const vintage = disbursed ? vintageKey(disbursed) : 'Unknown';
+
+    if (format === 'wide') {
+      wideLoans++;
+      let prevP = NaN, prevB = -1, prevBal = 0;
+      for (const [p, dpdCol, balCol] of periods) {
+        const dpd = dpdCol >= 0 ? toNumber(record[dpdCol]) : NaN;
+        if (!Number.isFinite(dpd)) { prevP = NaN; continue; }
+        const b = bucketIndex(dpd);
+        const bal = balCol >= 0 ? toNumber(record[balCol]) : NaN;
+        if (p === prevP + 1) acc.add(prevB, b, prevBal, product, vintage);
+        prevP = p; prevB = b; prevBal = Number.isFinite(bal) ? bal : 0;
+      }
+      continue;
+    }
+
+    const loanId = (record[col.loanId] ?? '').trim();
+    const p = monthIndex((record[col.reportingDate] ?? '').trim());
+    const dpd = toNumber(record[col.dpd]);
+    if (!loanId || !Number.isFinite(p) || !Number.isFinite(dpd)) { skipped++; continue; }
+    const b = bucketIndex(dpd);
+    const rawBal = toNumber(record[col.currentBalance]);
+    const bal = Number.isFinite(rawBal) ? rawBal : 0;
+    acc.seePeriod(p);
+
+    const run = runs.get(loanId);
+    if (!run) {
+      runs.set(loanId, { firstP: p, firstB: b, firstBal: bal, lastP: p, lastB: b, lastBal: bal, product, vintage });
+    } else if (p === run.lastP + 1) {
+      acc.add(run.lastB, b, run.lastBal, run.product, run.vintage);
+      run.lastP = p; run.lastB = b; run.lastBal = bal;
+    } else if (p === run.firstP - 1) {
+      // Files sorted newest-first extend the run backwards
+      acc.add(b, run.firstB, bal, run.product, run.vintage);
+      run.firstP = p; run.firstB = b; run.firstBal = bal;
+    } else {
+      skipped++;
+    }
+  }
+  opts.onProgress?.({ ...progress });
+
+  const overall = toMatrix(acc.overall, TRANSITION_MATRIX, 0);
+  const minRowWeight = overall.weight * MIN_SEGMENT_ROW_WEIGHT;
+  const segments = (m: Map<string, Accumulator>) =>
+    Object.fromEntries([...m.entries()].map(([k, a]) => [k, toMatrix(a, overall.matrix, minRowWeight)]));
+  const hasPeriods = acc.minPeriod <= acc.maxPeriod;
+  return {
+    format,
+    rowsRead: progress.rowsRead,
+    loanCount: format === 'wide' ? wideLoans : runs.size,
+    periodStart: hasPeriods ? monthLabel(acc.minPeriod) : null,
+    periodEnd: hasPeriods ? monthLabel(acc.maxPeriod) : null,
+    periodCount: hasPeriods ? acc.maxPeriod - acc.minPeriod + 1 : 0,
+    skipped,
+    overall,
+    byProduct: segments(acc.byProduct),
+    byVintage: segments(acc.byVintage),
+  };
+}
+
+/* ================================================================
+   Scenario stressing
+   Empirical matrices describe the base case. Stress / severe scale each
+   row's roll-forward mass by the ratio the hard-coded scenario matrices
+   apply to the hard-coded base, then renormalise.
+   ================================================================ */
+
+function worseningMass(row: Record<string, number>, fromIdx: number): number {
+  let s = 0;
+  DPD_BUCKETS.forEach((to, t) => { if (t > fromIdx) s += row[to] ?? 0; });
+  return s;
+}
+
+export function stressTransitionMatrix(base: TransitionMatrix, scenario: ScenarioKey): TransitionMatrix {
+  if (scenario === 'base') return base;
+  const ref = SCENARIO_MATRICES[scenario];
+  const out: TransitionMatrix = {};
+  DPD_BUCKETS.forEach((from, f) => {
+    const row = base[from] ?? {};
+    const refBase = worseningMass(TRANSITION_MATRIX[from] ?? {}, f);
+    const factor = refBase > 0 ? worseningMass(ref[from] ?? {}, f) / refBase : 1;
+    const next: Record<string, number> = {};
+    let total = 0;
+    DPD_BUCKETS.forEach((to, t) => {
+      const p = row[to];
+      if (!p) return;
+      next[to] = t > f ? p * factor : p;
+      total += next[to];
+    });
+    for (const to of Object.keys(next)) next[to] /= total;
+    out[from] = next;
+  });
+  return out;
+}
+
+// Matrix for a segment if it was estimated, else the overall book
+export function pickTransitionMatrix(
+  est: Pick<TransitionEstimateResult, 'overall' | 'byProduct' | 'byVintage'>,
+  segment?: { product?: string; vintage?: string },
+): TransitionMatrix {
+  if (segment?.product && est.byProduct[segment.product]) return est.byProduct[segment.product].matrix;
+  if (segment?.vintage && est.byVintage[segment.vintage]) return est.byVintage[segment.vintage].matrix;
+  return est.overall.matrix;
+}
+
+/* ================================================================
+   Persistence — one TransitionEstimate row per history upload
+   ================================================================ */
+
+export async function saveTransitionEstimate(
+  client: Prisma.TransactionClient,
+  nbfiId: string,
+  result: TransitionEstimateResult,
+  filename?: string,
+) {
+  return client.transitionEstimate.create({
+    data: {
+      nbfiId,
+      filename: filename ?? null,
+      format: result.format,
+      rowsRead: result.rowsRead,
+      loanCount: result.loanCount,
+      periodStart: result.periodStart,
+      periodEnd: result.periodEnd,
+      periodCount: result.periodCount,
+      skipped: result.skipped,
+      overall: JSON.stringify(result.overall),
+      byProduct: JSON.stringify(result.byProduct),
+      byVintage: JSON.stringify(result.byVintage),
+    },
+  });
+}
+
+export interface StoredTransitionEstimate extends TransitionEstimateResult {
+  id: string;
+  createdAt: Date;
+  filename: string | null;
+}
+
+export async function findLatestTransitionEstimate(
+  client: Prisma.TransactionClient,
+  nbfiId: string,
+): Promise<StoredTransitionEstimate | null> {
+  const rec = await client.transitionEstimate.findFirst({ where: { nbfiId }, orderBy: { createdAt: 'desc' } });
+  if (!rec) return null;
+  return {
+    id: rec.id,
+    createdAt: rec.createdAt,
+    filename: rec.filename,
+    format: rec.format as HistoryFormat,
+    rowsRead: rec.rowsRead,
+    loanCount: rec.loanCount,
+    periodStart: rec.periodStart,
+    periodEnd: rec.periodEnd,
+    periodCount: rec.periodCount,
+    skipped: rec.skipped,
+    overall: JSON.parse(rec.overall),
+    byProduct: JSON.parse(rec.byProduct),
+    byVintage: JSON.parse(rec.byVintage),
+  };
+}
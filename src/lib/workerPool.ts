@@ -0,0 +1,192 @@
+/**
+ * Fixed-size worker_threads pool for CPU-bound analytics kernels.
+ * Tasks are queued and handed to the next idle worker; each worker module
+ * answers { id, task } messages with { id, result } or { id, error } (see
+ * serveWorkerTasks). When workers cannot be started (e.g. a runtime that cannot
+ * load the worker module) the pool runs tasks inline through `fallback`, so
+ * callers always get a result. The fallback is logged once per pool and shown
+ * by GET /api/metrics (see workerPoolStats).
+ *
+ * Workers are created by a factory that each call site writes out literally:
+ *
+ *   () => new Worker(new URL('./x.worker.ts', import.meta.url))
+ *
+ * The bundler only emits a worker chunk for that exact expression; a URL
+ * passed around as a value is left pointing at a source file it never built.
+ */
+
+import os from 'os';
+import { Worker, parentPort, type TransferListItem } from 'worker_threads';
+
+interface Pending<TOut> {
+  resolve: (v: TOut) => void;
+  reject: (e: Error) => void;
+}
+
+// Task inputs are copied, not transferred, so a task can still be re-run inline if its worker dies on startup
+interface Job<TIn> {
+  id: number;
+  task: TIn;
+}
+
+export function defaultPoolSize(): number {
+  const cores = typeof os.availableParallelism === 'function' ? os.availableParallelism() : os.cpus().length;
+  return Math.max(1, cores - 1);
+}
+
+export interface WorkerPoolStats {
+  name: string;
+  size: number;
+  workers: number;
+  inline: boolean;
+  failed: boolean;       // inline because workers could not start, not by choice (size 0)
+  inlineTasks: number;
+}
+
+// Every pool created in this process, for the metrics endpoint
+const globalForPools = globalThis as unknown as { workerPools: Set<WorkerPool<unknown, unknown>> | undefined };
+const pools = globalForPools.workerPools ?? (globalForPools.workerPools = new Set());
+
+export function workerPoolStats(): WorkerPoolStats[] {
+  return [...pools].map((p) => p.stats());
+}
+
+export class WorkerPool<TIn, TOut> {
+  private readonly workers: Worker[] = [];
+  private readonly idle: Worker[] = [];
+  private readonly queue: Job<TIn>[] = [];
+  private readonly pending = new Map<number, Pending<TOut>>();
+  private readonly busy = new Map<Worker, Job<TIn>>();
+  private readonly served = new WeakSet<Worker>();
+  private nextId = 1;
+  private inline: boolean;
+  private failed = false;
+  private inlineTasks = 0;
+
+  constructor(
+    readonly name: string,
+    private readonly createWorker: () => Worker,
+    private readonly fallback: (task: TIn) => TOut,
+    readonly size: number = defaultPoolSize(),
+  ) {
+    // size 0 runs every task inline (useful for single-thread baselines)
+    this.inline = size <= 0;
+    pools.add(this as WorkerPool<unknown, unknown>);
+  }
+
+  stats(): WorkerPoolStats {
+    return { name: this.name, size: this.size, workers: this.workers.length, inline: this.inline, failed: this.failed, inlineTasks: this.inlineTasks };
+  }
+
+  // Workers are gone for good: say so once, loudly, then run everything on this thread
+  private fallBack(err: unknown) {
+    if (!this.failed) {
+      console.error(`[workerPool] ${this.name}: workers unavailable, running tasks inline on the main thread:`, err);
+    }
+    this.failed = true;
+    this.inline = true;
+  }
+
+  private spawn(): Worker | null {
+    try {
+      const w = this.createWorker();
+      w.unref();
+      w.on('message', (msg: { id: number; result?: TOut; error?: string }) => {
+        const p = this.pending.get(msg.id);
+        this.pending.delete(msg.id);
+        this.busy.delete(w);
+        this.served.add(w);
+        w.unref();
+        if (p) {
+          if (msg.error !== undefined) p.reject(new Error(msg.error));
+          else p.resolve(msg.result as TOut);
+        }
+        this.release(w);
+      });
+      w.on('error', (err) => this.retire(w, err));
+      w.on('exit', (code) => { if (code !== 0) this.retire(w, new Error(`worker exited with code ${code}`)); });
+      this.workers.push(w);
+      return w;
+    } catch (err) {
+      this.fallBack(err);
+      return null;
+    }
+  }
+
+  // A crashed worker fails its in-flight task and is replaced lazily. A worker that dies before
+  // answering anything could not load its module, so the pool switches to inline execution.
+  private retire(w: Worker, err: Error) {
+    const job = this.busy.get(w);
+    this.busy.delete(w);
+    const i = this.workers.indexOf(w);
+    if (i >= 0) this.workers.splice(i, 1);
+    const j = this.idle.indexOf(w);
+    if (j >= 0) this.idle.splice(j, 1);
+    if (!this.served.has(w)) {
+      this.fallBack(err);
+      if (job) this.queue.unshift(job);
+    } else if (job) {
+      this.pending.get(job.id)?.reject(err);
+      this.pending.delete(job.id);
+    }
+    this.drain();
+  }
+
+  private release(w: Worker) {
+    this.idle.push(w);
+    this.drain();
+  }
+
+  private drain() {
+    while (this.queue.length) {
+      let w = this.idle.pop();
+      if (!w && this.workers.length < this.size && !this.inline) w = this.spawn() ?? undefined;
+      if (!w) break;
+      const job = this.queue.shift()!;
+      this.busy.set(w, job);
+      w.ref(); // keep the process alive only while a task is in flight
+      w.postMessage({ id: job.id, task: job.task });
+    }
+    if (this.inline) this.runQueuedInline();
+  }
+
+  private runQueuedInline() {
+    while (this.queue.length) {
+      const job = this.queue.shift()!;
+      const p = this.pending.get(job.id);
+      this.pending.delete(job.id);
+      this.inlineTasks++;
+      try { p?.resolve(this.fallback(job.task)); } catch (e) { p?.reject(e as Error); }
+    }
+  }
+
+  run(task: TIn): Promise<TOut> {
+    return new Promise<TOut>((resolve, reject) => {
+      const id = this.nextId++;
+      this.pending.set(id, { resolve, reject });
+      this.queue.push({ id, task });
+      this.drain();
+    });
+  }
+
+  async destroy(): Promise<void> {
+    const ws = this.workers.splice(0);
+    this.idle.length = 0;
+    pools.delete(this as WorkerPool<unknown, unknown>);
+    await Promise.all(ws.map((w) => w.terminate()));
+  }
+}
+
+// Worker-side loop: call from a *.worker.ts module with the kernel it exposes
+export function serveWorkerTasks<TIn, TOut>(handler: (task: TIn) => { result: TOut; transfer?: TransferListItem[] }) {
+  if (!parentPort) return;
+  const port = parentPort;
+  port.on('message', ({ id, task }: { id: number; task: TIn }) => {
+    try {
+      const { result, transfer } = handler(task);
+      port.postMessage({ id, result }, transfer ?? []);
+    } catch (err) {
+      port.postMessage({ id, error: err instanceof Error ? err.message : String(err) });
+    }
+  });
+}